@@ -94,8 +94,11 @@ async def post_init(application: Application) -> None:
                     try:
                         # Ejecutar en thread para no bloquear event loop
                         import asyncio
-                        await asyncio.to_thread(refresh_bot_tables, cfg.database_url)
-                        logger.info("Tablas bot.* refrescadas")
+                        res = await asyncio.to_thread(refresh_bot_tables, cfg.database_url)
+                        logger.info(
+                            f"Tablas bot.* refrescadas ({res.get('mode')}: {res.get('changed_skus')} SKUs "
+                            f"en {res.get('duration_ms')} ms)"
+                        )
                     except Exception as e:
                         logger.warning(f"Fallo refresh bot tables: {e}")
 
@@ -734,9 +734,13 @@ async def cmd_refresh_bot_tables(update: Update, context: ContextTypes.DEFAULT_T
     try:
         import asyncio
         cfg = context.bot_data["config"]
-        res = await asyncio.to_thread(refresh_bot_tables, cfg.database_url)
+        full = bool(context.args) and context.args[0].lower() in ("full", "completo")
+        res = await asyncio.to_thread(refresh_bot_tables, cfg.database_url, full)
         if res.get("success"):
-            await update.message.reply_text("✅ Tablas bot.* refrescadas")
+            await update.message.reply_text(
+                f"✅ Tablas bot.* refrescadas ({res.get('mode')}, {res.get('changed_skus')} SKUs, "
+                f"{res.get('duration_ms')} ms)"
+            )
         else:
             await update.message.reply_text("⚠️ No se pudo refrescar tablas bot.*")
     except Exception as e:
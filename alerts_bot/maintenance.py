@@ -2,11 +2,26 @@ from __future__ import annotations
 """
 Mantenimiento del Bot: refrescar tablas materializadas en PostgreSQL
 sin tocar tablas principales de scraping.
+
+El refresco es incremental: solo se recalculan los SKUs cuyos precios del
+día cambiaron desde la última marca de agua (bot.refresh_state) y sus filas
+se actualizan con upsert. Todo ocurre en una transacción, por lo que los
+lectores ven siempre la versión anterior completa o la nueva completa.
 """
 
 import os
+import time
 import psycopg2
 
+# Columnas de master_precios que marcan cuándo cambió una fila (en orden de preferencia).
+# timestamp_creacion no sirve: no avanza cuando se actualiza el precio de una fila
+# existente, así que las tablas que solo la tienen usan el modo 'full'
+CHANGE_COLUMNS = ['timestamp_ultima_actualizacion', 'ultima_actualizacion', 'updated_at']
+
+# Margen hacia atrás sobre la marca de agua: filas escritas con timestamp
+# anterior pero confirmadas después del último refresco
+OVERLAP_SECONDS = int(os.getenv('BOT_REFRESH_OVERLAP_SECONDS', '120'))
+
 
 def _dsn_from_env() -> str:
     dsn = os.getenv('DATABASE_URL') or os.getenv('PG_DSN')
@@ -38,93 +53,246 @@ def _price_expr(cols: set) -> str:
     return 'COALESCE(' + ','.join(chosen) + ')' if chosen else '0'
 
 
-def refresh_bot_tables(database_url: str | None = None) -> dict:
+def _change_column(cols: set) -> str | None:
+    for c in CHANGE_COLUMNS:
+        if c in cols:
+            return c
+    return None
+
+
+def _refresh_mode(state: tuple | None, change_col: str | None, full: bool) -> str:
+    """'incremental' si hay marca de agua vigente del día; si no 'full'.
+
+    state: (fecha, watermark, es_hoy) de bot.refresh_state
+    """
+    if full or change_col is None or state is None:
+        return 'full'
+    _, watermark, is_today = state
+    if watermark is None or not is_today:
+        return 'full'
+    return 'incremental'
+
+
+def _ensure_tables(cur) -> None:
+    cur.execute("CREATE SCHEMA IF NOT EXISTS bot")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bot.current_spread (
+          internal_sku TEXT PRIMARY KEY,
+          min_price NUMERIC,
+          max_price NUMERIC,
+          spread_pct DOUBLE PRECISION,
+          retailer_count INTEGER,
+          refreshed_at TIMESTAMP DEFAULT NOW()
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bot.intraday_delta (
+          internal_sku TEXT,
+          retailer TEXT,
+          min_24h NUMERIC,
+          max_24h NUMERIC,
+          delta_abs NUMERIC,
+          delta_pct DOUBLE PRECISION,
+          refreshed_at TIMESTAMP DEFAULT NOW(),
+          PRIMARY KEY (internal_sku, retailer)
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bot.refresh_state (
+          name TEXT PRIMARY KEY,
+          fecha DATE,
+          watermark TIMESTAMP,
+          last_mode TEXT,
+          changed_skus INTEGER,
+          duration_ms DOUBLE PRECISION,
+          refreshed_at TIMESTAMP DEFAULT NOW()
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bot_current_spread_pct ON bot.current_spread(spread_pct DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bot_intraday_delta_pct ON bot.intraday_delta(delta_pct DESC)")
+
+
+def refresh_bot_tables(database_url: str | None = None, full: bool = False) -> dict:
     """Refresca bot.current_spread y bot.intraday_delta.
 
     Crea schema y tablas si no existen. No modifica tablas principales.
+    Recalcula solo los SKUs con precios cambiados desde la última marca de
+    agua; reconstruye todo (sin TRUNCATE) con `full=True`, al cambiar el día
+    o si master_precios no tiene columna de actualización.
     """
+    started = time.perf_counter()
     dsn = database_url or _dsn_from_env()
     conn = psycopg2.connect(dsn)
     try:
         cur = conn.cursor()
         cols = _available_columns(cur, 'master_precios')
         price = _price_expr(cols)
+        change_col = _change_column(cols)
+
+        _ensure_tables(cur)
 
-        cur.execute("CREATE SCHEMA IF NOT EXISTS bot")
+        # Bloquear la fila de estado: serializa el job periódico y /refresh_bot
         cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS bot.current_spread (
-              internal_sku TEXT PRIMARY KEY,
-              min_price NUMERIC,
-              max_price NUMERIC,
-              spread_pct DOUBLE PRECISION,
-              retailer_count INTEGER,
-              refreshed_at TIMESTAMP DEFAULT NOW()
-            )
-            """
+            "INSERT INTO bot.refresh_state(name) VALUES ('bot_tables') ON CONFLICT (name) DO NOTHING"
         )
         cur.execute(
             """
-            CREATE TABLE IF NOT EXISTS bot.intraday_delta (
-              internal_sku TEXT,
-              retailer TEXT,
-              min_24h NUMERIC,
-              max_24h NUMERIC,
-              delta_abs NUMERIC,
-              delta_pct DOUBLE PRECISION,
-              refreshed_at TIMESTAMP DEFAULT NOW(),
-              PRIMARY KEY (internal_sku, retailer)
-            )
+            SELECT fecha, watermark, fecha = CURRENT_DATE
+            FROM bot.refresh_state WHERE name = 'bot_tables' FOR UPDATE
             """
         )
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_bot_current_spread_pct ON bot.current_spread(spread_pct DESC)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_bot_intraday_delta_pct ON bot.intraday_delta(delta_pct DESC)")
+        state = cur.fetchone()
+        mode = _refresh_mode(state, change_col, full)
+
+        # SKUs a recalcular (y marca de agua nueva = último cambio visto)
+        changed_at = f"MAX({change_col})" if change_col else "NULL::timestamp"
+        if mode == 'incremental':
+            cur.execute(
+                f"""
+                CREATE TEMP TABLE _bot_changed ON COMMIT DROP AS
+                SELECT codigo_interno AS internal_sku, {changed_at} AS changed_at
+                FROM master_precios
+                WHERE fecha = CURRENT_DATE
+                  AND {change_col} > %s - make_interval(secs => %s)
+                GROUP BY codigo_interno
+                """,
+                (state[1], OVERLAP_SECONDS),
+            )
+        else:
+            cur.execute(
+                f"""
+                CREATE TEMP TABLE _bot_changed ON COMMIT DROP AS
+                SELECT codigo_interno AS internal_sku, {changed_at} AS changed_at
+                FROM master_precios
+                WHERE fecha = CURRENT_DATE
+                GROUP BY codigo_interno
+                """
+            )
+        cur.execute("ALTER TABLE _bot_changed ADD PRIMARY KEY (internal_sku)")
+        cur.execute("ANALYZE _bot_changed")
+        cur.execute("SELECT COUNT(*), MAX(changed_at) FROM _bot_changed")
+        changed_skus, new_watermark = cur.fetchone()
+
+        # Borrado de filas que ya no aplican: en modo incremental solo entre
+        # los SKUs recalculados; en modo full también las de SKUs sin precio hoy
+        if mode == 'incremental':
+            stale_using, stale_scope = "USING _bot_changed c", "AND c.internal_sku = t.internal_sku"
+        else:
+            stale_using, stale_scope = "", ""
 
-        # Refresh
-        cur.execute("TRUNCATE bot.current_spread")
         cur.execute(
             f"""
-            INSERT INTO bot.current_spread(internal_sku, min_price, max_price, spread_pct, retailer_count, refreshed_at)
-            SELECT codigo_interno AS internal_sku,
+            CREATE TEMP TABLE _bot_spread ON COMMIT DROP AS
+            SELECT p.codigo_interno AS internal_sku,
                    MIN({price}) AS min_price,
                    MAX({price}) AS max_price,
                    CASE WHEN MIN({price})>0 THEN (MAX({price})-MIN({price}))::float/NULLIF(MIN({price}),0) ELSE 0 END AS spread_pct,
-                   COUNT(DISTINCT retailer) AS retailer_count,
-                   NOW()
-            FROM master_precios
-            WHERE fecha = CURRENT_DATE
-            GROUP BY codigo_interno
-            HAVING COUNT(DISTINCT retailer) >= 2
+                   COUNT(DISTINCT p.retailer) AS retailer_count
+            FROM master_precios p
+            JOIN _bot_changed c ON c.internal_sku = p.codigo_interno
+            WHERE p.fecha = CURRENT_DATE
+            GROUP BY p.codigo_interno
+            HAVING COUNT(DISTINCT p.retailer) >= 2
+            """
+        )
+        cur.execute(
+            """
+            INSERT INTO bot.current_spread(internal_sku, min_price, max_price, spread_pct, retailer_count, refreshed_at)
+            SELECT internal_sku, min_price, max_price, spread_pct, retailer_count, NOW()
+            FROM _bot_spread
+            ON CONFLICT (internal_sku) DO UPDATE SET
+              min_price = EXCLUDED.min_price,
+              max_price = EXCLUDED.max_price,
+              spread_pct = EXCLUDED.spread_pct,
+              retailer_count = EXCLUDED.retailer_count,
+              refreshed_at = EXCLUDED.refreshed_at
+            """
+        )
+        spread_rows = cur.rowcount
+        cur.execute(
+            f"""
+            DELETE FROM bot.current_spread t {stale_using}
+            WHERE NOT EXISTS (SELECT 1 FROM _bot_spread f WHERE f.internal_sku = t.internal_sku)
+            {stale_scope}
             """
         )
+        spread_deleted = cur.rowcount
 
-        cur.execute("TRUNCATE bot.intraday_delta")
         cur.execute(
             f"""
-            WITH today AS (
-              SELECT codigo_interno AS internal_sku, retailer, {price} AS price
-              FROM master_precios
-              WHERE fecha = CURRENT_DATE
-            )
+            CREATE TEMP TABLE _bot_delta ON COMMIT DROP AS
+            SELECT p.codigo_interno AS internal_sku,
+                   p.retailer,
+                   MIN({price}) AS min_24h,
+                   MAX({price}) AS max_24h,
+                   (MAX({price})-MIN({price})) AS delta_abs,
+                   CASE WHEN MIN({price})>0 THEN (MAX({price})-MIN({price}))::float/NULLIF(MIN({price}),0) ELSE 0 END AS delta_pct
+            FROM master_precios p
+            JOIN _bot_changed c ON c.internal_sku = p.codigo_interno
+            WHERE p.fecha = CURRENT_DATE
+            GROUP BY p.codigo_interno, p.retailer
+            """
+        )
+        cur.execute(
+            """
             INSERT INTO bot.intraday_delta(internal_sku, retailer, min_24h, max_24h, delta_abs, delta_pct, refreshed_at)
-            SELECT internal_sku,
-                   retailer,
-                   MIN(price) AS min_24h,
-                   MAX(price) AS max_24h,
-                   (MAX(price)-MIN(price)) AS delta_abs,
-                   CASE WHEN MIN(price)>0 THEN (MAX(price)-MIN(price))::float/NULLIF(MIN(price),0) ELSE 0 END AS delta_pct,
-                   NOW()
-            FROM today
-            GROUP BY internal_sku, retailer
+            SELECT internal_sku, retailer, min_24h, max_24h, delta_abs, delta_pct, NOW()
+            FROM _bot_delta
+            ON CONFLICT (internal_sku, retailer) DO UPDATE SET
+              min_24h = EXCLUDED.min_24h,
+              max_24h = EXCLUDED.max_24h,
+              delta_abs = EXCLUDED.delta_abs,
+              delta_pct = EXCLUDED.delta_pct,
+              refreshed_at = EXCLUDED.refreshed_at
             """
         )
+        delta_rows = cur.rowcount
+        cur.execute(
+            f"""
+            DELETE FROM bot.intraday_delta t {stale_using}
+            WHERE NOT EXISTS (
+              SELECT 1 FROM _bot_delta f WHERE f.internal_sku = t.internal_sku AND f.retailer = t.retailer
+            )
+            {stale_scope}
+            """
+        )
+        delta_deleted = cur.rowcount
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        cur.execute(
+            """
+            UPDATE bot.refresh_state
+            SET fecha = CURRENT_DATE,
+                watermark = CASE WHEN fecha = CURRENT_DATE THEN GREATEST(watermark, %s) ELSE %s END,
+                last_mode = %s,
+                changed_skus = %s,
+                duration_ms = %s,
+                refreshed_at = NOW()
+            WHERE name = 'bot_tables'
+            """,
+            (new_watermark, new_watermark, mode, changed_skus, duration_ms),
+        )
 
         conn.commit()
-        return {"success": True}
+        return {
+            "success": True,
+            "mode": mode,
+            "changed_skus": changed_skus,
+            "spread_rows": spread_rows,
+            "spread_deleted": spread_deleted,
+            "delta_rows": delta_rows,
+            "delta_deleted": delta_deleted,
+            "duration_ms": round(duration_ms, 1),
+        }
     finally:
         try:
             cur.close()
         except Exception:
             pass
         conn.close()
-
@@ -3,24 +3,55 @@ from typing import List, Dict, Any, Optional, Tuple
 import os
 import duckdb
 
+try:
+    from core.connection_manager import ConnectionManager
+except Exception:
+    ConnectionManager = None
+
 class ProductsRepo:
     def __init__(self, duckdb_path: str, parquet_root: str):
         self.duckdb_path = duckdb_path
         self.parquet_root = parquet_root
-        self.con = duckdb.connect(self.duckdb_path, read_only=False)
-        self._configure()
+        if ConnectionManager:
+            # Conexión compartida del proceso; cada thread usa su propio cursor
+            self._db = ConnectionManager.get_instance().duckdb(
+                self.duckdb_path,
+                init_statements=self._init_statements(),
+                setup_statements=self._setup_statements(),
+            )
+            self._con = None
+        else:
+            self._db = None
+            self._con = duckdb.connect(self.duckdb_path, read_only=False)
+            for sql in self._setup_statements() + self._init_statements():
+                self._con.execute(sql)
+
+    @property
+    def con(self):
+        return self._db.cursor() if self._db else self._con
+
+    def _setup_statements(self) -> List[str]:
+        # una sola vez por base de datos (conexión escritora)
+        return [
+            # habilitar globbing
+            "PRAGMA enable_object_cache;",
+            "INSTALL httpfs; LOAD httpfs;",  # por si acaso
+        ]
 
-    def _configure(self):
-        # habilitar globbing
-        self.con.execute("PRAGMA enable_object_cache;")
-        self.con.execute("INSTALL httpfs; LOAD httpfs;")  # por si acaso
-        # setea la ruta por defecto
-        self.con.execute(f"SET home_directory='{os.path.abspath(self.parquet_root)}';")
+    def _init_statements(self) -> List[str]:
+        # en cada cursor: settings de sesión
+        return [
+            # setea la ruta por defecto
+            f"SET home_directory='{os.path.abspath(self.parquet_root)}';",
+        ]
 
     def ensure_views(self, sql_path: str) -> None:
         with open(sql_path, "r", encoding="utf-8") as f:
             sql = f.read()
-        self.con.execute(sql)
+        if self._db:
+            self._db.write(sql)
+        else:
+            self.con.execute(sql)
 
     # -------- búsquedas --------
     def search_products(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
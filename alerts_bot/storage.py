@@ -9,6 +9,11 @@ try:
 except Exception:
     redis = None
 
+try:
+    from core.connection_manager import get_redis_client
+except Exception:
+    get_redis_client = None
+
 # Redis key schema (prefixes)
 # users:set -> all user ids
 # user:{uid}:hash -> {username, spread_threshold, delta_threshold, summary_on, role}
@@ -22,7 +27,11 @@ class RedisStorage:
     def __init__(self, redis_url: str):
         if not redis:
             raise RuntimeError("Redis library not available")
-        self.r = redis.Redis.from_url(redis_url, decode_responses=True)
+        if get_redis_client:
+            # Pool compartido del proceso (core.connection_manager)
+            self.r = get_redis_client(redis_url, decode_responses=True)
+        else:
+            self.r = redis.Redis.from_url(redis_url, decode_responses=True)
 
     # ---------- users & roles ----------
     def register_user(self, uid: int, username: str) -> None:
@@ -85,7 +85,8 @@ class BackendArbitrageEngine:
             'total_runs': 0,
             'total_opportunities_found': 0,
             'total_matches_created': 0,
-            'last_run_duration': 0
+            'last_run_duration': 0,
+            'last_run_rematched': 0
         }
         
         logger.info(f"🚀 Motor de arbitraje inicializado")
@@ -144,6 +145,11 @@ class BackendArbitrageEngine:
                 return
             
             logger.info(f"✅ Encontrados {len(matches)} matches de productos")
+            incremental_stats = self.ml_integration.last_incremental_stats
+            if incremental_stats:
+                self.stats['last_run_rematched'] = incremental_stats['dirty']
+                logger.info(f"🔖 Re-puntuados {incremental_stats['dirty']}/{incremental_stats['products']} productos "
+                            f"({incremental_stats['kept_matches']} matches reutilizados)")
             
             # Fase 2: Guardar matches en BD
             logger.info("💾 Fase 2: Guardando matches en base de datos...")
@@ -189,7 +195,8 @@ class BackendArbitrageEngine:
             logger.error(traceback.format_exc())
             
         finally:
-            self.ml_integration.disconnect()
+            # Entre ciclos: el índice de nombres sigue en memoria y se guarda por intervalo
+            self.ml_integration.disconnect(shutdown=False)
     
     def _save_opportunities(self, opportunities: List[Dict[str, Any]]) -> int:
         """Guarda oportunidades de arbitraje en la base de datos"""
@@ -50,6 +50,10 @@ CREATE INDEX IF NOT EXISTS idx_arbitrage_categoria ON arbitrage_opportunities(ca
 CREATE INDEX IF NOT EXISTS idx_arbitrage_marca ON arbitrage_opportunities(marca_producto);
 CREATE INDEX IF NOT EXISTS idx_arbitrage_execution ON arbitrage_opportunities(execution_status);
 
+-- Hash de oportunidad para el guardado por conjuntos (SmartArbitrageDataSaver)
+ALTER TABLE arbitrage_opportunities ADD COLUMN IF NOT EXISTS opportunity_hash VARCHAR(16);
+CREATE INDEX IF NOT EXISTS idx_arbitrage_opportunity_hash ON arbitrage_opportunities(opportunity_hash) WHERE validez_oportunidad = 'active';
+
 -- Tabla para tracking histórico de precios de oportunidades
 CREATE TABLE IF NOT EXISTS arbitrage_price_history (
     id SERIAL PRIMARY KEY,
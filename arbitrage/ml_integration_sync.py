@@ -13,11 +13,36 @@ from typing import List, Dict, Any, Tuple, Optional
 import psycopg2
 import psycopg2.extras
 import json
+import time
 from datetime import datetime, timedelta
+import numpy as np
 
 # Agregar paths necesarios
 sys.path.append(str(Path(__file__).parent.parent))
 
+try:
+    from core.candidate_blocking import CandidateBlocker
+    BLOCKING_AVAILABLE = True
+except ImportError:
+    BLOCKING_AVAILABLE = False
+
+try:
+    from core.product_name_index import ProductNameIndex, NAME_INDEX_AVAILABLE
+except ImportError:
+    NAME_INDEX_AVAILABLE = False
+
+try:
+    from core.match_watermarks import MatchWatermarkStore
+    WATERMARKS_AVAILABLE = True
+except ImportError:
+    WATERMARKS_AVAILABLE = False
+
+try:
+    from core.opportunity_sql import build_opportunity_query, opportunity_params, row_to_opportunity
+    OPPORTUNITY_SQL_AVAILABLE = True
+except ImportError:
+    OPPORTUNITY_SQL_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
@@ -37,9 +62,29 @@ class ArbitrageMLIntegration:
             'min_margin_clp': 5000,
             'min_percentage': 15.0,
             'min_similarity_score': 0.85,
-            'max_price_ratio': 5.0
+            'max_price_ratio': 5.0,
+            'max_price_age_days': 3  # Solo precios recientes para detectar oportunidades
         }
         
+        # Generación de candidatos por bloques (False = todos contra todos)
+        self.use_blocking = True
+        self.last_blocking_stats: Dict[str, Any] = {}
+        
+        # Índice TF-IDF de nombres (vecinos en otros retailers), persistido en disco.
+        # Sus top-k vecinos se suman a los pares candidatos del blocking
+        self.name_index_path = Path(__file__).parent.parent / 'data' / 'name_index'
+        self.name_index = None
+        self.name_index_k = 5
+        self.name_index_min_score = 0.5
+        self.name_index_save_interval = 3600  # segundos entre guardados a disco
+        self._name_index_dirty = False
+        self._name_index_saved_at = 0.0
+        
+        # Matching incremental: solo productos nuevos o cambiados desde el ciclo anterior
+        self.incremental = True
+        self.watermarks = MatchWatermarkStore() if WATERMARKS_AVAILABLE else None
+        self.last_incremental_stats: Dict[str, Any] = {}
+        
         self._initialize_ml_scorer()
     
     def _initialize_ml_scorer(self):
@@ -63,13 +108,22 @@ class ArbitrageMLIntegration:
             self.db_conn = psycopg2.connect(conn_string)
             self.db_conn.autocommit = True
             self._load_config_from_db()
+            if self.name_index is None:
+                self._load_name_index()
             logger.info("✅ Conexión establecida con PostgreSQL para arbitraje")
         except Exception as e:
             logger.error(f"❌ Error conectando a PostgreSQL: {e}")
             raise
     
-    def disconnect(self):
-        """Cierra conexión con PostgreSQL"""
+    def disconnect(self, shutdown: bool = True):
+        """
+        Cierra conexión con PostgreSQL
+        
+        Args:
+            shutdown: True al detener el proceso (guarda el índice de nombres
+                pendiente); False entre ciclos (respeta name_index_save_interval)
+        """
+        self.save_name_index(force=shutdown)
         if self.db_conn:
             self.db_conn.close()
             logger.info("🔌 Conexión PostgreSQL cerrada")
@@ -102,11 +156,16 @@ class ArbitrageMLIntegration:
         except Exception as e:
             logger.warning(f"⚠️ Error cargando configuración, usando valores por defecto: {e}")
     
-    def find_product_matches(self, limit: int = 200) -> List[Dict[str, Any]]:
+    def find_product_matches(self, limit: Optional[int] = None,
+                             min_similarity: Optional[float] = None) -> List[Dict[str, Any]]:
         """
         Encuentra matches de productos usando el ML existente
+        
+        Solo se puntúan los pares candidatos del blocking, por lo que se
+        puede analizar el catálogo completo (limit=None).
         """
-        logger.info(f"🔍 Buscando matches de productos (límite: {limit})")
+        min_sim = min_similarity or self.config['min_similarity_score']
+        logger.info(f"🔍 Buscando matches de productos (límite: {limit or 'sin límite'})")
         
         try:
             with self.db_conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
@@ -130,57 +189,72 @@ class ArbitrageMLIntegration:
                 productos = cur.fetchall()
                 
                 logger.info(f"📦 Analizando {len(productos)} productos para matching")
+                vigentes = None
+                if self.name_index is not None:
+                    cur.execute("SELECT codigo_interno FROM master_productos")
+                    vigentes = [row[0] for row in cur.fetchall()]
+                self.update_name_index(productos, vigentes)
                 
                 matches_found = []
                 processed_pairs = set()
                 
-                # Comparar productos de diferentes retailers
-                for i, prod_a in enumerate(productos):
-                    for j in range(i+1, len(productos)):
-                        prod_b = productos[j]
-                        
-                        # Solo comparar productos de diferentes retailers
-                        if prod_a['retailer'] == prod_b['retailer']:
-                            continue
-                        
-                        # Evitar duplicados
-                        pair_key = tuple(sorted([prod_a['codigo_interno'], prod_b['codigo_interno']]))
-                        if pair_key in processed_pairs:
-                            continue
-                        processed_pairs.add(pair_key)
-                        
-                        # Verificar precios válidos
-                        precio_a = prod_a['precio_oferta'] or prod_a['precio_normal']
-                        precio_b = prod_b['precio_oferta'] or prod_b['precio_normal']
-                        
-                        if not precio_a or not precio_b:
-                            continue
-                        
-                        # Evitar comparaciones absurdas
-                        precio_ratio = max(precio_a, precio_b) / min(precio_a, precio_b)
-                        if precio_ratio > self.config['max_price_ratio']:
-                            continue
-                        
-                        # Calcular similitud ML
-                        similarity_score = self._calculate_similarity(dict(prod_a), dict(prod_b))
-                        
-                        if similarity_score >= self.config['min_similarity_score']:
-                            match_data = {
-                                'codigo_base': prod_a['codigo_interno'],
-                                'codigo_match': prod_b['codigo_interno'],
-                                'similarity_score': similarity_score,
-                                'match_type': self._classify_match_type(similarity_score),
-                                'match_confidence': self._classify_confidence(similarity_score),
-                                'match_reason': f"ML Score: {similarity_score:.4f}",
-                                'match_features': {
-                                    'brand_match': prod_a['marca'].lower() == prod_b['marca'].lower(),
-                                    'category_match': prod_a['categoria'] == prod_b['categoria'],
-                                    'price_ratio': precio_ratio,
-                                    'retailer_a': prod_a['retailer'],
-                                    'retailer_b': prod_b['retailer']
-                                }
+                # Solo pares candidatos: mismo bloque (categoría/marca/capacidad/banda de precio)
+                # y distinto retailer; en modo incremental, además, que toquen un producto
+                # nuevo o cambiado desde el ciclo anterior
+                plan = self.watermarks.plan(productos) if self.incremental and self.watermarks is not None else None
+                pairs = self._candidate_pairs(productos)
+                if plan is not None:
+                    pairs = plan.filter_pairs(pairs)
+                
+                candidatos = []
+                for i, j in pairs:
+                    prod_a, prod_b = productos[i], productos[j]
+                    
+                    # Evitar duplicados
+                    pair_key = tuple(sorted([prod_a['codigo_interno'], prod_b['codigo_interno']]))
+                    if pair_key in processed_pairs:
+                        continue
+                    processed_pairs.add(pair_key)
+                    
+                    # Precios válidos y comparables (ratio máximo)
+                    precio_ratio = self._price_ratio(prod_a, prod_b)
+                    if precio_ratio is None:
+                        continue
+                    
+                    candidatos.append((i, j, precio_ratio))
+                
+                # Scoring de todos los candidatos en una llamada (vectorizado sin scorer ML)
+                scores = self._calculate_similarities(productos, [(i, j) for i, j, _ in candidatos])
+                
+                for (i, j, precio_ratio), similarity_score in zip(candidatos, scores):
+                    prod_a, prod_b = productos[i], productos[j]
+                    
+                    if similarity_score >= min_sim:
+                        match_data = {
+                            'codigo_base': prod_a['codigo_interno'],
+                            'codigo_match': prod_b['codigo_interno'],
+                            'similarity_score': similarity_score,
+                            'match_type': self._classify_match_type(similarity_score),
+                            'match_confidence': self._classify_confidence(similarity_score),
+                            'match_reason': f"ML Score: {similarity_score:.4f}",
+                            'match_features': {
+                                'brand_match': prod_a['marca'].lower() == prod_b['marca'].lower(),
+                                'category_match': prod_a['categoria'] == prod_b['categoria'],
+                                'price_ratio': precio_ratio,
+                                'retailer_a': prod_a['retailer'],
+                                'retailer_b': prod_b['retailer']
                             }
-                            matches_found.append(match_data)
+                        }
+                        matches_found.append(match_data)
+                
+                if plan is not None:
+                    vigentes = self._refresh_kept_matches(productos, plan)
+                    self.watermarks.commit(productos, plan, matches_found)
+                    self.last_incremental_stats = {**self.watermarks.last_stats,
+                                                   'scored_pairs': len(candidatos),
+                                                   'kept_matches': len(vigentes)}
+                    logger.info(f"🔖 {len(matches_found)} matches nuevos + {len(vigentes)} vigentes sin re-puntuar")
+                    matches_found.extend(vigentes)
                 
                 logger.info(f"✅ Encontrados {len(matches_found)} matches potenciales")
                 return matches_found
@@ -191,6 +265,175 @@ class ArbitrageMLIntegration:
             traceback.print_exc()
             return []
     
+    def _load_name_index(self):
+        """Carga el índice de nombres desde disco (vacío si no existe)"""
+        if not NAME_INDEX_AVAILABLE:
+            logger.warning("⚠️ Índice de nombres no disponible (requiere scikit-learn y scipy)")
+            return
+        self.name_index = ProductNameIndex.load_or_create(str(self.name_index_path))
+        self._name_index_saved_at = time.monotonic()
+        logger.info(f"🔎 Índice de nombres: {len(self.name_index)} productos")
+    
+    def update_name_index(self, productos: List[Any], vigentes: Optional[List[str]] = None) -> int:
+        """
+        Agrega al índice los productos nuevos o renombrados y quita los que
+        ya no están en master_productos (`vigentes`, None = no quitar)
+        
+        Se persiste a lo más cada `name_index_save_interval` segundos y al detener (disconnect).
+        """
+        if self.name_index is None:
+            return 0
+        try:
+            changed = self.name_index.add(productos)
+            if vigentes is not None:
+                changed += self.name_index.retain(vigentes)
+            if changed:
+                self._name_index_dirty = True
+            self.save_name_index()
+            return changed
+        except Exception as e:
+            logger.warning(f"⚠️ Error actualizando índice de nombres: {e}")
+            return 0
+    
+    def save_name_index(self, force: bool = False) -> bool:
+        """Guarda el índice si tiene cambios y pasó el intervalo (o `force`)"""
+        if self.name_index is None or not self._name_index_dirty:
+            return False
+        if not force and time.monotonic() - self._name_index_saved_at < self.name_index_save_interval:
+            return False
+        try:
+            self.name_index.save(str(self.name_index_path))
+        except Exception as e:
+            logger.warning(f"⚠️ Error guardando índice de nombres: {e}")
+            return False
+        self._name_index_dirty = False
+        self._name_index_saved_at = time.monotonic()
+        return True
+    
+    def find_similar_products(self, codigo_interno: str, k: int = 5,
+                              min_score: float = 0.3) -> List[Tuple[str, str, float]]:
+        """
+        Top-k productos de otros retailers con nombre más parecido
+        
+        Returns:
+            Lista de (codigo_interno, retailer, similitud coseno)
+        """
+        if self.name_index is None:
+            return []
+        return self.name_index.most_similar(codigo_interno, k=k, min_score=min_score)
+    
+    def _price_ratio(self, prod_a: Any, prod_b: Any) -> Optional[float]:
+        """Ratio precio alto/bajo; None si falta un precio o supera max_price_ratio"""
+        precio_a = prod_a['precio_oferta'] or prod_a['precio_normal']
+        precio_b = prod_b['precio_oferta'] or prod_b['precio_normal']
+        if not precio_a or not precio_b:
+            return None
+        precio_ratio = max(precio_a, precio_b) / min(precio_a, precio_b)
+        if precio_ratio > self.config['max_price_ratio']:
+            return None
+        return precio_ratio
+    
+    def _refresh_kept_matches(self, productos: List[Any], plan) -> List[Dict[str, Any]]:
+        """Matches guardados entre productos sin cambios, con el ratio de precio actual"""
+        vigentes = []
+        for match, i, j in self.watermarks.kept_matches(productos, plan):
+            precio_ratio = self._price_ratio(productos[i], productos[j])
+            if precio_ratio is None:
+                continue
+            vigentes.append({**match, 'match_features': {**match['match_features'], 'price_ratio': precio_ratio}})
+        return vigentes
+    
+    def _candidate_pairs(self, productos: List[Any]) -> List[Tuple[int, int]]:
+        """
+        Pares (i, j) a puntuar: bloques por categoría/marca/capacidad/banda de
+        precio (core.candidate_blocking) o, sin blocking, todos los pares
+        de retailers distintos
+        """
+        if self.use_blocking and BLOCKING_AVAILABLE:
+            blocker = CandidateBlocker(max_price_ratio=self.config['max_price_ratio'])
+            pairs = blocker.candidate_pairs(productos)
+            self.last_blocking_stats = blocker.last_stats
+            logger.info(f"🧱 {len(pairs)} pares candidatos de {blocker.last_stats['brute_force_pairs']} "
+                        f"posibles ({blocker.last_stats['blocks']} bloques)")
+            
+            # Vecinos por nombre fuera del bloque (marca/categoría faltante o distinta)
+            extra = self._name_neighbour_pairs(productos) - set(pairs)
+            if extra:
+                self.last_blocking_stats = {**self.last_blocking_stats, 'name_index_pairs': len(extra)}
+                logger.info(f"🔎 +{len(extra)} pares candidatos por índice de nombres")
+            return list(pairs) + sorted(extra)
+        
+        return [
+            (i, j)
+            for i in range(len(productos))
+            for j in range(i + 1, len(productos))
+            if productos[i]['retailer'] != productos[j]['retailer']
+        ]
+    
+    def _name_neighbour_pairs(self, productos: List[Any]) -> set:
+        """Pares (i, j) entre cada producto y sus top-k vecinos por nombre en el índice"""
+        if self.name_index is None or self.name_index_k <= 0:
+            return set()
+        posiciones: Dict[str, int] = {}
+        for i, producto in enumerate(productos):
+            posiciones.setdefault(producto['codigo_interno'], i)
+        codigos = list(posiciones)
+        vecinos = self.name_index.most_similar_batch(codigos, k=self.name_index_k,
+                                                     min_score=self.name_index_min_score)
+        pairs = set()
+        for codigo, neighbours in zip(codigos, vecinos):
+            i = posiciones[codigo]
+            for otro, _, _ in neighbours:
+                j = posiciones.get(otro)
+                if j is not None and j != i:
+                    pairs.add((min(i, j), max(i, j)))
+        return pairs
+    
+    def _calculate_similarities(self, productos: List[Any], pairs: List[Tuple[int, int]]) -> List[float]:
+        """
+        Similitud de muchos pares (i, j) en una llamada
+        
+        Sin scorer ML el fallback marca/categoría se evalúa vectorizado con
+        ids enteros por producto (mismos valores que _calculate_similarity);
+        con scorer, o para productos sin marca de texto, se puntúa par a par.
+        """
+        if not pairs:
+            return []
+        if self.match_scorer is not None:
+            return [self._calculate_similarity(dict(productos[i]), dict(productos[j])) for i, j in pairs]
+        
+        marca_ids, categoria_ids, marca_valida = self._encode_fallback_features(productos)
+        index = np.asarray(pairs, dtype=np.int64)
+        left, right = index[:, 0], index[:, 1]
+        brand_match = marca_ids[left] == marca_ids[right]
+        category_match = categoria_ids[left] == categoria_ids[right]
+        scores = np.select([brand_match & category_match, brand_match, category_match], [0.9, 0.85, 0.7], default=0.6).tolist()
+        
+        # Marca no textual: mismo camino (y mismos errores) que el scoring por par
+        for position in np.flatnonzero(~(marca_valida[left] & marca_valida[right])):
+            i, j = pairs[position]
+            scores[position] = self._calculate_similarity(dict(productos[i]), dict(productos[j]))
+        return scores
+    
+    @staticmethod
+    def _encode_fallback_features(productos: List[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Ids enteros de marca (minúsculas) y categoría por producto"""
+        marcas: Dict[Any, int] = {}
+        categorias: Dict[Any, int] = {}
+        n = len(productos)
+        marca_ids = np.empty(n, dtype=np.int64)
+        categoria_ids = np.empty(n, dtype=np.int64)
+        marca_valida = np.ones(n, dtype=bool)
+        for index, prod in enumerate(productos):
+            marca = prod['marca']
+            if isinstance(marca, str):
+                marca_ids[index] = marcas.setdefault(marca.lower(), len(marcas))
+            else:
+                marca_ids[index] = -1 - index  # nunca coincide; se puntúa par a par
+                marca_valida[index] = False
+            categoria_ids[index] = categorias.setdefault(prod['categoria'], len(categorias))
+        return marca_ids, categoria_ids, marca_valida
+    
     def _calculate_similarity(self, prod_a: Dict, prod_b: Dict) -> float:
         """
         Calcula similitud usando el ML existente
@@ -321,117 +564,20 @@ class ArbitrageMLIntegration:
         """
         logger.info("🎯 Detectando oportunidades de arbitraje")
         
+        if not OPPORTUNITY_SQL_AVAILABLE:
+            logger.error("❌ core.opportunity_sql no disponible")
+            return []
+
         try:
             with self.db_conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                cur.execute("""
-                    WITH price_differences AS (
-                        SELECT 
-                            pm.id as matching_id,
-                            pm.similarity_score,
-                            pm.match_confidence,
-                            
-                            -- Determinar producto más barato y más caro
-                            CASE 
-                                WHEN pr1.precio_oferta <= pr2.precio_oferta 
-                                THEN pm.codigo_base 
-                                ELSE pm.codigo_match 
-                            END as codigo_barato,
-                            
-                            CASE 
-                                WHEN pr1.precio_oferta <= pr2.precio_oferta 
-                                THEN pm.codigo_match 
-                                ELSE pm.codigo_base 
-                            END as codigo_caro,
-                            
-                            -- Precios
-                            LEAST(pr1.precio_oferta, pr2.precio_oferta) as precio_barato,
-                            GREATEST(pr1.precio_oferta, pr2.precio_oferta) as precio_caro,
-                            
-                            -- Retailers
-                            CASE 
-                                WHEN pr1.precio_oferta <= pr2.precio_oferta 
-                                THEN p1.retailer 
-                                ELSE p2.retailer 
-                            END as retailer_compra,
-                            
-                            CASE 
-                                WHEN pr1.precio_oferta <= pr2.precio_oferta 
-                                THEN p2.retailer 
-                                ELSE p1.retailer 
-                            END as retailer_venta,
-                            
-                            -- Diferencias
-                            GREATEST(pr1.precio_oferta, pr2.precio_oferta) - LEAST(pr1.precio_oferta, pr2.precio_oferta) as diferencia,
-                            
-                            -- Info productos
-                            p1.nombre as nombre_1, p2.nombre as nombre_2
-                            
-                        FROM product_matching pm
-                        JOIN master_productos p1 ON pm.codigo_base = p1.codigo_interno
-                        JOIN master_productos p2 ON pm.codigo_match = p2.codigo_interno
-                        JOIN master_precios pr1 ON p1.codigo_interno = pr1.codigo_interno
-                        JOIN master_precios pr2 ON p2.codigo_interno = pr2.codigo_interno
-                        
-                        WHERE pm.is_active = TRUE
-                          AND pm.similarity_score >= %s
-                          AND pr1.precio_oferta IS NOT NULL
-                          AND pr2.precio_oferta IS NOT NULL
-                          AND pr1.precio_oferta != pr2.precio_oferta
-                    )
-                    
-                    SELECT *,
-                           (diferencia * 100.0 / precio_barato) as diferencia_porcentaje
-                    FROM price_differences
-                    WHERE diferencia >= %s
-                      AND (diferencia * 100.0 / precio_barato) >= %s
-                    ORDER BY diferencia DESC, diferencia_porcentaje DESC
-                    LIMIT 20
-                """, (
-                    self.config['min_similarity_score'],
-                    self.config['min_margin_clp'],
-                    self.config['min_percentage']
-                ))
-                
-                opportunities_raw = cur.fetchall()
-                
-                opportunities = []
-                for row in opportunities_raw:
-                    # Calcular métricas
-                    margen_bruto = row['diferencia']
-                    costos_estimados = int(row['precio_barato'] * 0.08)  # 8% costos
-                    ganancia_neta = margen_bruto - costos_estimados
-                    roi_estimado = (ganancia_neta / row['precio_barato']) * 100
-                    
-                    opportunity_score = self._calculate_opportunity_score(
-                        float(row['diferencia_porcentaje']),
-                        float(row['similarity_score']),
-                        margen_bruto
-                    )
-                    
-                    opportunity = {
-                        'matching_id': row['matching_id'],
-                        'producto_barato_codigo': row['codigo_barato'],
-                        'producto_caro_codigo': row['codigo_caro'],
-                        'retailer_compra': row['retailer_compra'],
-                        'retailer_venta': row['retailer_venta'],
-                        'precio_compra': row['precio_barato'],
-                        'precio_venta': row['precio_caro'],
-                        'diferencia_absoluta': row['diferencia'],
-                        'diferencia_porcentaje': float(row['diferencia_porcentaje']),
-                        'margen_bruto': margen_bruto,
-                        'roi_estimado': roi_estimado,
-                        'opportunity_score': opportunity_score,
-                        'risk_level': self._calculate_risk_level(row['match_confidence'], roi_estimado),
-                        'detection_method': 'ml_price_difference',
-                        'metadata': {
-                            'similarity_score': float(row['similarity_score']),
-                            'match_confidence': row['match_confidence'],
-                            'nombre_barato': row['nombre_1'],
-                            'nombre_caro': row['nombre_2']
-                        }
-                    }
-                    opportunities.append(opportunity)
-                
+                # Una sola consulta: último precio por SKU, métricas, score, riesgo y ranking en SQL
+                cur.execute(
+                    build_opportunity_query('product_matching', paramstyle='pyformat'),
+                    opportunity_params(self.config, limit=20)
+                )
+
+                opportunities = [row_to_opportunity(row) for row in cur.fetchall()]
+
                 logger.info(f"🎯 Detectadas {len(opportunities)} oportunidades de arbitraje")
                 return opportunities
                 
@@ -440,26 +586,6 @@ class ArbitrageMLIntegration:
             import traceback
             traceback.print_exc()
             return []
-    
-    def _calculate_opportunity_score(self, diferencia_pct: float, similarity_score: float, margen_bruto: int) -> float:
-        """Calcula score de oportunidad"""
-        diff_score = min(diferencia_pct / 100.0, 1.0)
-        sim_score = float(similarity_score)
-        margin_score = min(margen_bruto / 100000.0, 1.0)
-        
-        combined_score = (diff_score * 0.4) + (sim_score * 0.3) + (margin_score * 0.3)
-        return 0.5 + (combined_score * 0.5)
-    
-    def _calculate_risk_level(self, match_confidence: str, roi_estimado: float) -> str:
-        """Calcula nivel de riesgo"""
-        if match_confidence == 'high' and roi_estimado > 30:
-            return 'low'
-        elif match_confidence == 'medium' and roi_estimado > 20:
-            return 'medium'
-        elif roi_estimado > 10:
-            return 'medium'
-        else:
-            return 'high'
 
 
 # Test function
@@ -468,7 +594,7 @@ def test_ml_integration():
     
     db_params = {
         'host': os.environ.get('PGHOST', 'localhost'),
-        'port': int(os.environ.get('PGPORT', '5434'))  # Updated to match docker-compose.yml,
+        'port': int(os.environ.get('PGPORT', '5434')),  # Updated to match docker-compose.yml
         'database': os.environ.get('PGDATABASE', 'price_orchestrator'),
         'user': os.environ.get('PGUSER', 'orchestrator'),
         'password': os.environ.get('PGPASSWORD', 'orchestrator_2025')
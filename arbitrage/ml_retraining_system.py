@@ -36,6 +36,7 @@ try:
     from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
     from sklearn.preprocessing import StandardScaler, LabelEncoder
     import joblib
+    from scipy import sparse
 except ImportError as e:
     print(f"❌ Dependencias ML no disponibles: {e}")
     print("Instalar con: pip install scikit-learn pandas joblib")
@@ -47,6 +48,12 @@ except ImportError:
     SentenceTransformer = None
     print("WARNING: SentenceTransformers no disponible - usando features tradicionales")
 
+try:
+    from core.training_pairs import TrainingPairSampler
+    TRAINING_PAIRS_AVAILABLE = True
+except ImportError:
+    TRAINING_PAIRS_AVAILABLE = False
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -72,6 +79,13 @@ class MLRetrainingSystem:
         self.models = {}
         self.feature_importance = {}
         
+        # Muestreo estratificado de pares (core.training_pairs)
+        self.max_training_products = 50000
+        self.positive_quota = 50000
+        self.hard_negative_quota = 100000
+        self.easy_negative_quota = 25000
+        self.near_miss_per_product = 4
+        
         # Intentar cargar embedder
         if SentenceTransformer:
             try:
@@ -125,9 +139,11 @@ class MLRetrainingSystem:
             WHERE p.activo = true
                 AND p.nombre IS NOT NULL
                 AND LENGTH(TRIM(p.nombre)) > 10
-            ORDER BY p.retailer, p.categoria
-            LIMIT 1000
-        """)
+            -- Intercalar retailers para que el LIMIT no favorezca a los primeros
+            ORDER BY ROW_NUMBER() OVER (PARTITION BY p.retailer ORDER BY p.categoria, p.codigo_interno),
+                p.retailer
+            LIMIT %s
+        """, (self.max_training_products,))
         
         data = cursor.fetchall()
         df = pd.DataFrame(data)
@@ -140,18 +156,48 @@ class MLRetrainingSystem:
     def generate_enhanced_features(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, List[str]]:
         """
         Genera features avanzadas usando TODOS los campos nuevos
+
+        Los pares se muestrean por estratos (positivos de bloques, negativos
+        difíciles casi match y negativos fáciles) con cuotas por par de
+        retailers, y las features se calculan en forma columnar.
         """
         logger.info("🔧 Generando features ML avanzadas...")
         
-        feature_list = []
-        all_features = []
+        products = df.to_dict('records')
+        
+        if not TRAINING_PAIRS_AVAILABLE:
+            return self._generate_features_pairwise(products)
+        
+        columns = self._product_columns(products)
+        sampler = TrainingPairSampler(
+            positive_quota=self.positive_quota,
+            hard_negative_quota=self.hard_negative_quota,
+            easy_negative_quota=self.easy_negative_quota,
+            near_miss_per_product=self.near_miss_per_product
+        )
+        pair_i, pair_j, labels, _ = sampler.sample(
+            products, lambda i, j: self._match_labels_columnar(columns, i, j)
+        )
+        
+        logger.info(f"🎯 Generadas {len(labels)} comparaciones")
+        logger.info(f"📊 Distribución labels: {pd.Series(labels).value_counts().to_dict()}")
+        
+        if len(labels) == 0:
+            return np.array([]), np.array([]), []
+        
+        features = self._pair_features_columnar(columns, pair_i, pair_j)
+        feature_names = list(features.keys())
+        X = np.column_stack([features[fname] for fname in feature_names])
         
-        # Generar pares de productos para comparación
+        return X, labels, feature_names
+    
+    def _generate_features_pairwise(self, products: List[Dict]) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """
+        Generación par a par (sin core.training_pairs): primeros 5000 pares cross-retailer
+        """
         comparisons = []
         labels = []
         
-        products = df.to_dict('records')
-        
         for i, prod_a in enumerate(products):
             for j, prod_b in enumerate(products[i+1:], i+1):
                 if prod_a['retailer'] != prod_b['retailer']:  # Solo cross-retailer
@@ -187,6 +233,169 @@ class MLRetrainingSystem:
         
         return np.array([]), np.array([]), []
     
+    def _product_columns(self, products: List[Dict]) -> Dict[str, Any]:
+        """
+        Normaliza cada producto una sola vez (mismas reglas que
+        _extract_pair_features) en arrays indexables por par
+        """
+        def codes(values: List[str]) -> np.ndarray:
+            # '' = sin dato → -1 (nunca coincide)
+            uniques = {}
+            return np.array([uniques.setdefault(v, len(uniques)) if v else -1 for v in values], dtype=np.int64)
+        
+        def numbers(values: List[Optional[float]]) -> np.ndarray:
+            return np.array([v or 0 for v in values], dtype=np.float64)
+        
+        def value(prod: Dict, field: str, default):
+            # NULL de columnas numéricas llega como NaN desde el DataFrame
+            raw = prod[field]
+            return default if raw is None or pd.isna(raw) else raw
+        
+        # Matriz binaria producto × token para Jaccard por pares
+        vocabulary = {}
+        rows, cols = [], []
+        for row, prod in enumerate(products):
+            for token in set((prod['nombre'] or '').lower().split()):
+                rows.append(row)
+                cols.append(vocabulary.setdefault(token, len(vocabulary)))
+        tokens = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+            shape=(len(products), max(len(vocabulary), 1))
+        )
+        
+        columns = {
+            'tokens': tokens,
+            'token_count': np.diff(tokens.indptr),
+            'brand': codes([(p['marca'] or '').upper().strip() for p in products]),
+            'storage': numbers([self._normalize_storage(p['storage']) for p in products]),
+            'ram': numbers([self._normalize_ram(p['ram']) for p in products]),
+            'screen': numbers([self._normalize_screen(p['screen_size']) for p in products]),
+            'color': codes([(p['color'] or '').lower().strip() for p in products]),
+            'rating': np.array([float(value(p, 'rating', 0) or 0) for p in products], dtype=np.float64),
+            'reviews': np.array([int(value(p, 'reviews_count', 0) or 0) for p in products], dtype=np.float64),
+            'in_stock': np.array([not (p['out_of_stock'] or False) for p in products], dtype=bool),
+            'price': np.array([float(value(p, 'precio_min_dia', 0) or 0) for p in products], dtype=np.float64),
+            'popularity': np.array([int(value(p, 'veces_visto', 1) or 1) for p in products], dtype=np.float64),
+            'category': codes([(p['categoria'] or '').lower() for p in products]),
+            'embeddings': None
+        }
+        
+        # Embeddings en lote, una vez por nombre distinto
+        if self.embedder:
+            names = [p['nombre'] or '' for p in products]
+            unique_names = sorted({name for name in names if name})
+            try:
+                vectors = np.asarray(self.embedder.encode(unique_names, batch_size=256), dtype=np.float64)
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                vectors = vectors / np.where(norms > 0, norms, 1.0)
+                position = {name: k for k, name in enumerate(unique_names)}
+                columns['embeddings'] = vectors
+                columns['embedding_row'] = np.array([position.get(name, -1) for name in names], dtype=np.int64)
+            except Exception as e:
+                logger.warning(f"No se pudieron calcular embeddings en lote: {e}")
+        
+        return columns
+    
+    def _pair_jaccard(self, columns: Dict[str, Any], i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """Jaccard de tokens de nombre para arrays de pares (0 si algún nombre está vacío)"""
+        tokens = columns['tokens']
+        intersection = np.asarray(tokens[i].multiply(tokens[j]).sum(axis=1)).ravel()
+        count_i, count_j = columns['token_count'][i], columns['token_count'][j]
+        union = count_i + count_j - intersection
+        both = (count_i > 0) & (count_j > 0)
+        return np.where(both, intersection / np.where(both, union, 1), 0.0)
+    
+    def _pair_features_columnar(self, columns: Dict[str, Any], i: np.ndarray, j: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Equivalente columnar de _extract_pair_features para arrays de índices
+        """
+        def flag(mask: np.ndarray) -> np.ndarray:
+            return mask.astype(np.float64)
+        
+        features = {}
+        
+        embeddings = columns['embeddings']
+        if embeddings is not None:
+            rows_i, rows_j = columns['embedding_row'][i], columns['embedding_row'][j]
+            valid = (rows_i >= 0) & (rows_j >= 0)
+            similarity = np.einsum('ij,ij->i', embeddings[rows_i], embeddings[rows_j])
+            features['text_similarity_embedding'] = np.where(valid, similarity, 0.0)
+        else:
+            features['text_similarity_embedding'] = np.zeros(len(i))
+        
+        features['text_similarity_jaccard'] = self._pair_jaccard(columns, i, j)
+        
+        brand_i, brand_j = columns['brand'][i], columns['brand'][j]
+        features['brand_exact_match'] = flag((brand_i >= 0) & (brand_i == brand_j))
+        
+        for name in ('storage', 'ram'):
+            a, b = columns[name][i], columns[name][j]
+            features[f'{name}_match'] = flag((a > 0) & (b > 0) & (a == b))
+            features[f'{name}_available'] = flag((a > 0) | (b > 0))
+        
+        screen_i, screen_j = columns['screen'][i], columns['screen'][j]
+        features['screen_match'] = flag((screen_i > 0) & (screen_j > 0) & (np.abs(screen_i - screen_j) <= 0.5))
+        features['screen_available'] = flag((screen_i > 0) | (screen_j > 0))
+        
+        color_i, color_j = columns['color'][i], columns['color'][j]
+        features['color_match'] = flag((color_i >= 0) & (color_i == color_j))
+        
+        rating_i, rating_j = columns['rating'][i], columns['rating'][j]
+        rated = (rating_i > 0) & (rating_j > 0)
+        features['rating_diff'] = np.where(rated, np.abs(rating_i - rating_j), 0.0)
+        features['rating_available'] = flag(rated)
+        
+        reviews_i, reviews_j = columns['reviews'][i], columns['reviews'][j]
+        reviewed = (reviews_i > 0) & (reviews_j > 0)
+        features['reviews_ratio'] = np.where(
+            reviewed, np.minimum(reviews_i, reviews_j) / np.where(reviewed, np.maximum(reviews_i, reviews_j), 1), 0.0
+        )
+        
+        features['both_in_stock'] = flag(columns['in_stock'][i] & columns['in_stock'][j])
+        
+        price_i, price_j = columns['price'][i], columns['price'][j]
+        priced = (price_i > 0) & (price_j > 0)
+        safe_max = np.where(priced, np.maximum(price_i, price_j), 1)
+        safe_mean = np.where(priced, (price_i + price_j) / 2, 1)
+        features['price_ratio'] = np.where(priced, np.minimum(price_i, price_j) / safe_max, 0.0)
+        features['price_diff_percent'] = np.where(priced, np.abs(price_i - price_j) / safe_mean * 100, 0.0)
+        features['price_available'] = flag(priced)
+        
+        popularity_i, popularity_j = columns['popularity'][i], columns['popularity'][j]
+        features['popularity_ratio'] = np.minimum(popularity_i, popularity_j) / np.maximum(popularity_i, popularity_j)
+        
+        category_i, category_j = columns['category'][i], columns['category'][j]
+        features['category_match'] = flag((category_i >= 0) & (category_i == category_j))
+        
+        return features
+    
+    def _match_labels_columnar(self, columns: Dict[str, Any], i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """
+        Equivalente columnar de _determine_match_label para arrays de índices
+        """
+        brand_i, brand_j = columns['brand'][i], columns['brand'][j]
+        is_match = (brand_i >= 0) & (brand_i == brand_j)
+        
+        named = (columns['token_count'][i] > 0) & (columns['token_count'][j] > 0)
+        is_match &= ~(named & (self._pair_jaccard(columns, i, j) < 0.6))
+        
+        specs_available = np.zeros(len(i), dtype=bool)
+        specs_match = np.zeros(len(i), dtype=bool)
+        for name in ('storage', 'ram', 'screen'):
+            a, b = columns[name][i], columns[name][j]
+            both = (a > 0) & (b > 0)
+            equal = np.abs(a - b) <= 0.5 if name == 'screen' else a == b
+            specs_available |= both
+            specs_match |= both & equal
+        is_match &= ~(specs_available & ~specs_match)
+        
+        price_i, price_j = columns['price'][i], columns['price'][j]
+        priced = (price_i > 0) & (price_j > 0)
+        ratio = np.maximum(price_i, price_j) / np.where(priced, np.minimum(price_i, price_j), 1)
+        is_match &= ~(priced & (ratio > 3.0))
+        
+        return is_match.astype(np.int64)
+    
     def _extract_pair_features(self, prod_a: Dict, prod_b: Dict) -> Dict[str, float]:
         """
         Extrae features de un par de productos usando TODOS los campos nuevos
@@ -623,7 +832,7 @@ def main():
     
     db_params = {
         'host': os.environ.get('PGHOST', 'localhost'),
-        'port': int(os.environ.get('PGPORT', '5434'))  # Updated to match docker-compose.yml,
+        'port': int(os.environ.get('PGPORT', '5434')),  # Updated to match docker-compose.yml
         'database': os.environ.get('PGDATABASE', 'price_orchestrator'),
         'user': os.environ.get('PGUSER', 'orchestrator'),
         'password': os.environ.get('PGPASSWORD', 'orchestrator_2025')
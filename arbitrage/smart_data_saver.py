@@ -23,11 +23,59 @@ import logging
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Columnas del staging del guardado por conjuntos (nombre, tipo SQL)
+_STAGE_COLUMNS = (
+    ('opportunity_hash', 'VARCHAR(16)'),
+    ('matching_id', 'INTEGER'),
+    ('producto_barato_codigo', 'VARCHAR(50)'),
+    ('producto_caro_codigo', 'VARCHAR(50)'),
+    ('retailer_compra', 'VARCHAR(20)'),
+    ('retailer_venta', 'VARCHAR(20)'),
+    ('precio_compra', 'BIGINT'),
+    ('precio_venta', 'BIGINT'),
+    ('margen_bruto', 'BIGINT'),
+    ('diferencia_porcentaje', 'DECIMAL(7,2)'),
+    ('opportunity_score', 'DECIMAL(5,4)'),
+    ('risk_level', 'VARCHAR(20)'),
+    ('fecha_deteccion', 'DATE'),
+    ('metadata', 'JSONB'),
+    ('link_producto_barato', 'TEXT'),
+    ('link_producto_caro', 'TEXT'),
+    ('codigo_sku_barato', 'VARCHAR(100)'),
+    ('codigo_sku_caro', 'VARCHAR(100)'),
+    ('categoria_producto', 'VARCHAR(100)'),
+    ('marca_producto', 'VARCHAR(100)'),
+    ('rating_barato', 'DECIMAL(3,2)'),
+    ('rating_caro', 'DECIMAL(3,2)'),
+    ('reviews_barato', 'INTEGER'),
+    ('reviews_caro', 'INTEGER'),
+    ('precio_normal_barato', 'BIGINT'),
+    ('precio_normal_caro', 'BIGINT'),
+    ('precio_oferta_barato', 'BIGINT'),
+    ('precio_oferta_caro', 'BIGINT'),
+    ('descuento_porcentaje_barato', 'DECIMAL(5,2)'),
+    ('descuento_porcentaje_caro', 'DECIMAL(5,2)'),
+    ('stock_barato', 'BOOLEAN'),
+    ('stock_caro', 'BOOLEAN'),
+    ('confidence_score', 'DECIMAL(5,4)'),
+    ('profit_potential_score', 'DECIMAL(5,4)'),
+    ('execution_difficulty', 'VARCHAR(20)'),
+    ('risk_assessment', 'TEXT'),
+)
+
+# Datos completos del producto: misma búsqueda que _enrich_opportunity_data
+_PRODUCT_DATA_COLUMNS = """
+    p.codigo_interno, p.link, p.sku, p.nombre, p.marca, p.categoria,
+    p.rating, p.reviews_count, p.out_of_stock, p.discount_percent,
+    pr.precio_normal, pr.precio_oferta, pr.precio_min_dia,
+    pr.descuento_porcentaje as desc_pct
+"""
+
 class SmartArbitrageDataSaver:
     """
     🚀 Sistema inteligente para guardar oportunidades de arbitraje
@@ -44,6 +92,8 @@ class SmartArbitrageDataSaver:
         self.conn = None
         self.change_threshold_percent = 1.0  # 1% cambio mínimo para actualizar
         self.min_price_change_clp = 500      # $500 cambio mínimo absoluto
+        self.use_bulk = True                 # Guardado por conjuntos (False = fila a fila)
+        self._hash_column_ready = False
         
     def connect(self):
         """Conecta a PostgreSQL"""
@@ -70,6 +120,13 @@ class SmartArbitrageDataSaver:
         """
         logger.info(f"📊 Procesando {len(opportunities)} oportunidades para guardado inteligente...")
         
+        if self.use_bulk and opportunities:
+            try:
+                return self._save_opportunities_bulk(opportunities)
+            except Exception as e:
+                self.conn.rollback()
+                logger.warning(f"⚠️ Guardado por conjuntos falló, usando guardado fila a fila: {e}")
+        
         stats = {
             'new_opportunities': 0,
             'updated_opportunities': 0,
@@ -78,6 +135,10 @@ class SmartArbitrageDataSaver:
         }
         
         cursor = self.conn.cursor()
+        try:
+            self._ensure_hash_column(cursor)
+        except Exception as e:
+            logger.warning(f"⚠️ Sin columna opportunity_hash, buscando por retailers + marca: {e}")
         
         for opp in opportunities:
             try:
@@ -87,8 +148,12 @@ class SmartArbitrageDataSaver:
                 # Generar hash único para la oportunidad
                 opportunity_hash = self._generate_opportunity_hash(enriched_opp)
                 
-                # Verificar si existe oportunidad similar
-                existing_opp = self._find_existing_opportunity(enriched_opp, cursor)
+                # Verificar si existe oportunidad activa con el mismo hash
+                if self._hash_column_ready:
+                    existing_opp = self._find_existing_opportunity(opportunity_hash, cursor)
+                else:
+                    existing_opp = self._find_existing_by_retailers(enriched_opp, cursor)
+                    opportunity_hash = None
                 
                 if existing_opp:
                     # Verificar si hay cambios significativos
@@ -124,44 +189,296 @@ class SmartArbitrageDataSaver:
         logger.info(f"✅ Guardado completado: {stats}")
         return stats
     
+    def _save_opportunities_bulk(self, opportunities: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Guardado por conjuntos de todas las oportunidades del ciclo
+        
+        1. Enriquecimiento de productos en una sola consulta (LATERAL)
+        2. Staging en tabla temporal con el hash de cada oportunidad
+        3. Clasificación nueva / con cambios / sin cambios contra las
+           oportunidades activas con el mismo hash (mismos umbrales que
+           _detect_significant_changes)
+        4. Un statement por clase + invalidación de obsoletas
+        
+        Returns:
+            Mismo dict de estadísticas que save_opportunities_smart
+        """
+        cursor = self.conn.cursor()
+        self._ensure_hash_column(cursor)
+        
+        enriched_opps = self._enrich_opportunities_bulk(opportunities, cursor)
+        
+        # Una fila por hash: las repeticiones dentro del ciclo cuentan como sin cambios
+        # y suman detecciones, igual que en el guardado fila a fila
+        staged, times_seen = {}, {}
+        for enriched_opp in enriched_opps:
+            opp_hash = self._generate_opportunity_hash(enriched_opp)
+            staged.setdefault(opp_hash, enriched_opp)
+            times_seen[opp_hash] = times_seen.get(opp_hash, 0) + 1
+        duplicated = len(enriched_opps) - len(staged)
+        
+        self._stage_opportunities(staged, times_seen, cursor)
+        
+        cursor.execute("""
+            CREATE TEMP TABLE _opp_classified ON COMMIT DROP AS
+            WITH existing AS (
+                SELECT DISTINCT ON (opportunity_hash)
+                       id, opportunity_hash, precio_compra, precio_venta, stock_barato, stock_caro
+                FROM arbitrage_opportunities
+                WHERE opportunity_hash IN (SELECT opportunity_hash FROM _opp_stage)
+                  AND validez_oportunidad = 'active'
+                  AND fecha_deteccion >= CURRENT_DATE - INTERVAL '7 days'
+                ORDER BY opportunity_hash, created_at DESC
+            ),
+            diffs AS (
+                SELECT s.opportunity_hash,
+                       e.id AS existing_id,
+                       (COALESCE(e.precio_compra, 0) > 0
+                        AND ABS(s.precio_compra - e.precio_compra) >= %(min_clp)s
+                        AND ABS(s.precio_compra - e.precio_compra) * 100.0 / e.precio_compra >= %(min_pct)s)::int
+                       + (COALESCE(e.precio_venta, 0) > 0
+                        AND ABS(s.precio_venta - e.precio_venta) >= %(min_clp)s
+                        AND ABS(s.precio_venta - e.precio_venta) * 100.0 / e.precio_venta >= %(min_pct)s)::int
+                       AS price_changes,
+                       (e.stock_barato IS DISTINCT FROM s.stock_barato)::int
+                       + (e.stock_caro IS DISTINCT FROM s.stock_caro)::int AS stock_changes
+                FROM _opp_stage s
+                LEFT JOIN existing e ON e.opportunity_hash = s.opportunity_hash
+            )
+            SELECT *,
+                   CASE
+                       WHEN existing_id IS NULL THEN 'new'
+                       WHEN price_changes + stock_changes > 0 THEN 'changed'
+                       ELSE 'unchanged'
+                   END AS change_class
+            FROM diffs
+        """, {'min_clp': self.min_price_change_clp, 'min_pct': self.change_threshold_percent})
+        
+        # Con cambios: historial + actualización
+        cursor.execute("""
+            INSERT INTO arbitrage_price_history
+            (opportunity_id, precio_compra_actual, precio_venta_actual, margen_actual, roi_actual,
+             stock_barato_disponible, stock_caro_disponible, price_change_reason)
+            SELECT c.existing_id, s.precio_compra, s.precio_venta, s.margen_bruto, s.diferencia_porcentaje,
+                   s.stock_barato, s.stock_caro,
+                   concat_ws(', ',
+                             CASE WHEN c.price_changes > 0 THEN c.price_changes || ' cambios de precio' END,
+                             CASE WHEN c.stock_changes > 0 THEN c.stock_changes || ' cambios de stock' END)
+            FROM _opp_classified c
+            JOIN _opp_stage s ON s.opportunity_hash = c.opportunity_hash
+            WHERE c.change_class = 'changed'
+        """)
+        cursor.execute("""
+            UPDATE arbitrage_opportunities ao SET
+                precio_compra = s.precio_compra,
+                precio_venta = s.precio_venta,
+                margen_bruto = s.margen_bruto,
+                diferencia_porcentaje = s.diferencia_porcentaje,
+                stock_barato = s.stock_barato,
+                stock_caro = s.stock_caro,
+                fecha_ultima_actualizacion_precio = NOW(),
+                times_detected = ao.times_detected + s.times_seen,
+                updated_at = NOW()
+            FROM _opp_classified c
+            JOIN _opp_stage s ON s.opportunity_hash = c.opportunity_hash
+            WHERE ao.id = c.existing_id AND c.change_class = 'changed'
+        """)
+        updated = cursor.rowcount
+        
+        # Sin cambios: solo contador de detecciones
+        cursor.execute("""
+            UPDATE arbitrage_opportunities ao SET
+                times_detected = ao.times_detected + s.times_seen,
+                updated_at = NOW()
+            FROM _opp_classified c
+            JOIN _opp_stage s ON s.opportunity_hash = c.opportunity_hash
+            WHERE ao.id = c.existing_id AND c.change_class = 'unchanged'
+        """)
+        unchanged = cursor.rowcount
+        
+        # Nuevas: un solo INSERT ... SELECT
+        columns = [name for name, _ in _STAGE_COLUMNS]
+        cursor.execute(f"""
+            INSERT INTO arbitrage_opportunities ({', '.join(columns)}, is_active, validez_oportunidad, times_detected)
+            SELECT {', '.join('s.' + name for name in columns)}, TRUE, 'active', s.times_seen
+            FROM _opp_stage s
+            JOIN _opp_classified c ON c.opportunity_hash = s.opportunity_hash
+            WHERE c.change_class = 'new'
+        """)
+        inserted = cursor.rowcount
+        
+        stats = {
+            'new_opportunities': inserted,
+            'updated_opportunities': updated,
+            'unchanged_opportunities': unchanged + duplicated,
+            'invalidated_opportunities': self._invalidate_obsolete_opportunities(cursor)
+        }
+        
+        self.conn.commit()
+        
+        logger.info(f"✅ Guardado por conjuntos completado: {stats}")
+        return stats
+    
+    def _ensure_hash_column(self, cursor):
+        """
+        Columna opportunity_hash (e índice) usada para clasificar por conjuntos
+        """
+        if self._hash_column_ready:
+            return
+        try:
+            cursor.execute("ALTER TABLE arbitrage_opportunities ADD COLUMN IF NOT EXISTS opportunity_hash VARCHAR(16)")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_arbitrage_opportunity_hash
+                ON arbitrage_opportunities(opportunity_hash) WHERE validez_oportunidad = 'active'
+            """)
+            backfilled = self._backfill_opportunity_hashes(cursor)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            self._hash_column_ready = False
+            raise
+        self._hash_column_ready = True
+        if backfilled:
+            logger.info(f"🔑 Hash calculado para {backfilled} oportunidades activas existentes")
+    
+    def _backfill_opportunity_hashes(self, cursor) -> int:
+        """
+        Calcula opportunity_hash de las oportunidades activas que aún no lo
+        tienen (creadas antes de la columna), para que se sigan reconociendo
+        como existentes en vez de duplicarse
+        """
+        cursor.execute("""
+            SELECT id, retailer_compra, retailer_venta, marca_producto, categoria_producto, metadata
+            FROM arbitrage_opportunities
+            WHERE opportunity_hash IS NULL
+            AND validez_oportunidad = 'active'
+            AND fecha_deteccion >= CURRENT_DATE - INTERVAL '7 days'
+        """)
+        rows = []
+        for row in cursor.fetchall():
+            metadata = row['metadata'] or {}
+            if isinstance(metadata, str):
+                metadata = json.loads(metadata)
+            opp = {
+                'retailer_compra': row['retailer_compra'],
+                'retailer_venta': row['retailer_venta'],
+                'marca_producto': row['marca_producto'],
+                'categoria_producto': row['categoria_producto'],
+                'metadata': {'nombre_barato': metadata.get('nombre_barato'),
+                             'nombre_caro': metadata.get('nombre_caro')},
+            }
+            rows.append((row['id'], self._generate_opportunity_hash(opp)))
+        if rows:
+            execute_values(cursor, """
+                UPDATE arbitrage_opportunities ao SET opportunity_hash = v.opportunity_hash
+                FROM (VALUES %s) AS v(id, opportunity_hash)
+                WHERE ao.id = v.id
+            """, rows, page_size=1000)
+        return len(rows)
+    
+    def _enrich_opportunities_bulk(self, opportunities: List[Dict[str, Any]], cursor) -> List[Dict[str, Any]]:
+        """
+        Enriquece todas las oportunidades con una sola consulta
+        
+        Cada oportunidad aporta dos búsquedas (producto barato y caro) con
+        el mismo criterio que _enrich_opportunity_data.
+        """
+        cursor.execute("""
+            CREATE TEMP TABLE _opp_lookup (
+                position INTEGER,
+                side CHAR(1),
+                name_pattern TEXT,
+                retailer VARCHAR(20)
+            ) ON COMMIT DROP
+        """)
+        lookups = []
+        for position, opp in enumerate(opportunities):
+            lookups.append((position, 'b', f"%{opp['metadata']['nombre_barato'][:30]}%", opp['retailer_compra']))
+            lookups.append((position, 'c', f"%{opp['metadata']['nombre_caro'][:30]}%", opp['retailer_venta']))
+        execute_values(cursor, "INSERT INTO _opp_lookup VALUES %s", lookups, page_size=1000)
+        
+        cursor.execute(f"""
+            SELECT l.position, l.side, d.*
+            FROM _opp_lookup l
+            JOIN LATERAL (
+                SELECT {_PRODUCT_DATA_COLUMNS}
+                FROM master_productos p
+                LEFT JOIN master_precios pr ON p.codigo_interno = pr.codigo_interno
+                WHERE p.nombre ILIKE l.name_pattern AND p.retailer = l.retailer
+                AND pr.fecha >= CURRENT_DATE - INTERVAL '3 days'
+                ORDER BY pr.fecha DESC
+                LIMIT 1
+            ) d ON TRUE
+        """)
+        found = {(row['position'], row['side']): row for row in cursor.fetchall()}
+        
+        return [
+            self._build_enriched_opportunity(opp, found.get((position, 'b')), found.get((position, 'c')))
+            for position, opp in enumerate(opportunities)
+        ]
+    
+    def _stage_opportunities(self, staged: Dict[str, Dict[str, Any]], times_seen: Dict[str, int], cursor):
+        """
+        Carga las oportunidades enriquecidas (una por hash) en _opp_stage,
+        con las veces que se detectó cada hash en el ciclo (times_seen)
+        """
+        column_defs = ', '.join(f"{name} {sql_type}" for name, sql_type in _STAGE_COLUMNS)
+        cursor.execute(f"CREATE TEMP TABLE _opp_stage ({column_defs}, times_seen INTEGER) ON COMMIT DROP")
+        
+        rows = [self._stage_row(opp_hash, opp) + (times_seen[opp_hash],) for opp_hash, opp in staged.items()]
+        columns = ', '.join([name for name, _ in _STAGE_COLUMNS] + ['times_seen'])
+        execute_values(cursor, f"INSERT INTO _opp_stage ({columns}) VALUES %s", rows, page_size=1000)
+        cursor.execute("ANALYZE _opp_stage")
+    
+    def _stage_row(self, opp_hash: str, opp: Dict[str, Any]) -> Tuple[Any, ...]:
+        """
+        Fila de staging en el orden de _STAGE_COLUMNS (mismos valores que _insert_new_opportunity)
+        """
+        matching_id = opp.get('matching_id')
+        values = {
+            'opportunity_hash': opp_hash,
+            'matching_id': matching_id if isinstance(matching_id, int) else None,
+            'producto_barato_codigo': opp.get('codigo_interno_barato'),
+            'producto_caro_codigo': opp.get('codigo_interno_caro'),
+            'metadata': json.dumps(opp['metadata']),
+            'reviews_barato': opp.get('reviews_barato', 0),
+            'reviews_caro': opp.get('reviews_caro', 0),
+            'stock_barato': opp.get('stock_barato', True),
+            'stock_caro': opp.get('stock_caro', True),
+        }
+        return tuple(values[name] if name in values else opp.get(name) for name, _ in _STAGE_COLUMNS)
+    
     def _enrich_opportunity_data(self, opp: Dict[str, Any]) -> Dict[str, Any]:
         """
         Enriquece la oportunidad con todos los datos necesarios desde la BD
         """
         cursor = self.conn.cursor()
         
-        # Buscar datos completos del producto barato
-        cursor.execute("""
-            SELECT p.codigo_interno, p.link, p.sku, p.nombre, p.marca, p.categoria,
-                   p.rating, p.reviews_count, p.out_of_stock, p.discount_percent,
-                   pr.precio_normal, pr.precio_oferta, pr.precio_min_dia,
-                   pr.descuento_porcentaje as desc_pct
+        product_query = f"""
+            SELECT {_PRODUCT_DATA_COLUMNS}
             FROM master_productos p
             LEFT JOIN master_precios pr ON p.codigo_interno = pr.codigo_interno
             WHERE p.nombre ILIKE %s AND p.retailer = %s
             AND pr.fecha >= CURRENT_DATE - INTERVAL '3 days'
             ORDER BY pr.fecha DESC
             LIMIT 1
-        """, (f"%{opp['metadata']['nombre_barato'][:30]}%", opp['retailer_compra']))
+        """
         
+        # Buscar datos completos del producto barato
+        cursor.execute(product_query, (f"%{opp['metadata']['nombre_barato'][:30]}%", opp['retailer_compra']))
         producto_barato = cursor.fetchone()
         
         # Buscar datos completos del producto caro
-        cursor.execute("""
-            SELECT p.codigo_interno, p.link, p.sku, p.nombre, p.marca, p.categoria,
-                   p.rating, p.reviews_count, p.out_of_stock, p.discount_percent,
-                   pr.precio_normal, pr.precio_oferta, pr.precio_min_dia,
-                   pr.descuento_porcentaje as desc_pct
-            FROM master_productos p
-            LEFT JOIN master_precios pr ON p.codigo_interno = pr.codigo_interno
-            WHERE p.nombre ILIKE %s AND p.retailer = %s
-            AND pr.fecha >= CURRENT_DATE - INTERVAL '3 days'
-            ORDER BY pr.fecha DESC
-            LIMIT 1
-        """, (f"%{opp['metadata']['nombre_caro'][:30]}%", opp['retailer_venta']))
-        
+        cursor.execute(product_query, (f"%{opp['metadata']['nombre_caro'][:30]}%", opp['retailer_venta']))
         producto_caro = cursor.fetchone()
         
+        return self._build_enriched_opportunity(opp, producto_barato, producto_caro)
+    
+    def _build_enriched_opportunity(self, opp: Dict[str, Any], producto_barato: Optional[Dict[str, Any]],
+                                    producto_caro: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Combina la oportunidad con los datos de producto barato/caro
+        """
         # Crear oportunidad enriquecida
         enriched = opp.copy()
         
@@ -226,11 +543,25 @@ class SmartArbitrageDataSaver:
         
         return hashlib.md5(hash_string.encode()).hexdigest()[:16]
     
-    def _find_existing_opportunity(self, opp: Dict[str, Any], cursor) -> Optional[Dict[str, Any]]:
+    def _find_existing_opportunity(self, opp_hash: str, cursor) -> Optional[Dict[str, Any]]:
         """
-        Busca oportunidad existente similar
+        Busca oportunidad activa con el mismo hash (mismo criterio que el guardado por conjuntos)
+        """
+        cursor.execute("""
+            SELECT * FROM arbitrage_opportunities
+            WHERE opportunity_hash = %s
+            AND validez_oportunidad = 'active'
+            AND fecha_deteccion >= CURRENT_DATE - INTERVAL '7 days'
+            ORDER BY created_at DESC
+            LIMIT 1
+        """, (opp_hash,))
+        
+        return cursor.fetchone()
+    
+    def _find_existing_by_retailers(self, opp: Dict[str, Any], cursor) -> Optional[Dict[str, Any]]:
+        """
+        Búsqueda previa a opportunity_hash (retailers + marca), usada si la migración falla
         """
-        # Buscar por retailers + marca + similitud de nombres
         cursor.execute("""
             SELECT * FROM arbitrage_opportunities
             WHERE retailer_compra = %s 
@@ -360,72 +691,59 @@ class SmartArbitrageDataSaver:
             WHERE id = %s
         """, (opp_id,))
     
-    def _insert_new_opportunity(self, opp: Dict[str, Any], opp_hash: str, cursor) -> int:
+    def _insert_new_opportunity(self, opp: Dict[str, Any], opp_hash: Optional[str], cursor) -> int:
         """
-        Inserta nueva oportunidad con todos los campos
+        Inserta nueva oportunidad con todos los campos (sin opportunity_hash si opp_hash es None)
         """
-        cursor.execute("""
-            INSERT INTO arbitrage_opportunities (
-                matching_id, producto_barato_codigo, producto_caro_codigo,
-                retailer_compra, retailer_venta, precio_compra, precio_venta,
-                margen_bruto, diferencia_porcentaje, opportunity_score, risk_level,
-                fecha_deteccion, metadata, is_active,
-                link_producto_barato, link_producto_caro,
-                codigo_sku_barato, codigo_sku_caro,
-                categoria_producto, marca_producto,
-                rating_barato, rating_caro, reviews_barato, reviews_caro,
-                precio_normal_barato, precio_normal_caro,
-                precio_oferta_barato, precio_oferta_caro,
-                descuento_porcentaje_barato, descuento_porcentaje_caro,
-                stock_barato, stock_caro,
-                confidence_score, profit_potential_score,
-                execution_difficulty, risk_assessment,
-                validez_oportunidad, times_detected
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-            ) RETURNING id
-        """, (
-            opp_hash,
-            opp.get('codigo_interno_barato'),
-            opp.get('codigo_interno_caro'),
-            opp['retailer_compra'],
-            opp['retailer_venta'],
-            opp['precio_compra'],
-            opp['precio_venta'],
-            opp['margen_bruto'],
-            opp['diferencia_porcentaje'],
-            opp['opportunity_score'],
-            opp['risk_level'],
-            opp['fecha_deteccion'],
-            json.dumps(opp['metadata']),
-            True,
-            opp.get('link_producto_barato'),
-            opp.get('link_producto_caro'),
-            opp.get('codigo_sku_barato'),
-            opp.get('codigo_sku_caro'),
-            opp.get('categoria_producto'),
-            opp.get('marca_producto'),
-            opp.get('rating_barato'),
-            opp.get('rating_caro'),
-            opp.get('reviews_barato', 0),
-            opp.get('reviews_caro', 0),
-            opp.get('precio_normal_barato'),
-            opp.get('precio_normal_caro'),
-            opp.get('precio_oferta_barato'),
-            opp.get('precio_oferta_caro'),
-            opp.get('descuento_porcentaje_barato'),
-            opp.get('descuento_porcentaje_caro'),
-            opp.get('stock_barato', True),
-            opp.get('stock_caro', True),
-            opp['confidence_score'],
-            opp['profit_potential_score'],
-            opp['execution_difficulty'],
-            opp['risk_assessment'],
-            'active',
-            1
-        ))
+        matching_id = opp.get('matching_id')
+        values = [
+            ('opportunity_hash', opp_hash),
+            ('matching_id', matching_id if isinstance(matching_id, int) else None),
+            ('producto_barato_codigo', opp.get('codigo_interno_barato')),
+            ('producto_caro_codigo', opp.get('codigo_interno_caro')),
+            ('retailer_compra', opp['retailer_compra']),
+            ('retailer_venta', opp['retailer_venta']),
+            ('precio_compra', opp['precio_compra']),
+            ('precio_venta', opp['precio_venta']),
+            ('margen_bruto', opp['margen_bruto']),
+            ('diferencia_porcentaje', opp['diferencia_porcentaje']),
+            ('opportunity_score', opp['opportunity_score']),
+            ('risk_level', opp['risk_level']),
+            ('fecha_deteccion', opp['fecha_deteccion']),
+            ('metadata', json.dumps(opp['metadata'])),
+            ('is_active', True),
+            ('link_producto_barato', opp.get('link_producto_barato')),
+            ('link_producto_caro', opp.get('link_producto_caro')),
+            ('codigo_sku_barato', opp.get('codigo_sku_barato')),
+            ('codigo_sku_caro', opp.get('codigo_sku_caro')),
+            ('categoria_producto', opp.get('categoria_producto')),
+            ('marca_producto', opp.get('marca_producto')),
+            ('rating_barato', opp.get('rating_barato')),
+            ('rating_caro', opp.get('rating_caro')),
+            ('reviews_barato', opp.get('reviews_barato', 0)),
+            ('reviews_caro', opp.get('reviews_caro', 0)),
+            ('precio_normal_barato', opp.get('precio_normal_barato')),
+            ('precio_normal_caro', opp.get('precio_normal_caro')),
+            ('precio_oferta_barato', opp.get('precio_oferta_barato')),
+            ('precio_oferta_caro', opp.get('precio_oferta_caro')),
+            ('descuento_porcentaje_barato', opp.get('descuento_porcentaje_barato')),
+            ('descuento_porcentaje_caro', opp.get('descuento_porcentaje_caro')),
+            ('stock_barato', opp.get('stock_barato', True)),
+            ('stock_caro', opp.get('stock_caro', True)),
+            ('confidence_score', opp['confidence_score']),
+            ('profit_potential_score', opp['profit_potential_score']),
+            ('execution_difficulty', opp['execution_difficulty']),
+            ('risk_assessment', opp['risk_assessment']),
+            ('validez_oportunidad', 'active'),
+            ('times_detected', 1),
+        ]
+        if opp_hash is None:
+            values = values[1:]
+        
+        cursor.execute(f"""
+            INSERT INTO arbitrage_opportunities ({', '.join(name for name, _ in values)})
+            VALUES ({', '.join(['%s'] * len(values))}) RETURNING id
+        """, tuple(value for _, value in values))
         
         return cursor.fetchone()['id']
     
@@ -489,7 +807,7 @@ def test_smart_saver():
     """
     db_params = {
         'host': os.environ.get('PGHOST', 'localhost'),
-        'port': int(os.environ.get('PGPORT', '5434'))  # Updated to match docker-compose.yml,
+        'port': int(os.environ.get('PGPORT', '5434')),  # Updated to match docker-compose.yml
         'database': os.environ.get('PGDATABASE', 'price_orchestrator'),
         'user': os.environ.get('PGUSER', 'orchestrator'),
         'password': os.environ.get('PGPASSWORD', 'orchestrator_2025')
@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+"""
+🏹 Arrow Schemas - Registro de schemas y builder de RecordBatch
+===============================================================
+
+Un schema Arrow explícito por tipo de registro persistido en Parquet:
+
+- `scraped_product`: respaldos crudos de scrapers (ParquetBackupSystem)
+- `backup_run`: respaldo por ejecución de ProductProcessor (StreamingBackupWriter)
+- `price_snapshot`: snapshots diarios de precios (MasterPricesManager)
+- `master_product`: master de productos (MasterProductsManager)
+
+`RecordBatchBuilder` convierte listas de dicts o dataclasses (o columnas
+ya armadas, p.ej. arrays NumPy) directamente en `pa.RecordBatch` con el
+schema registrado, sin pasar por pandas ni adivinar tipos por archivo:
+
+- Camino rápido: `pa.array(valores, type=...)` por columna.
+- Si una columna trae valores mezclados ("$1.299.990", "4,5", listas)
+  se coerciona valor a valor; lo no convertible queda en null.
+- Claves desconocidas del registro se guardan como JSON en la columna
+  `extra` cuando el schema la define (el schema del archivo no varía).
+
+Los tipos de fechas/timestamps de `price_snapshot` y `master_product`
+se mantienen como string ISO: son los tipos de los Parquet ya en disco
+y las consultas con `union_by_name` los combinan con los nuevos.
+"""
+
+import dataclasses
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+_SCHEMAS: Dict[str, "pa.Schema"] = {}
+
+_ARROW_ERRORS = (TypeError, ValueError, OverflowError) + (
+    (pa.ArrowInvalid, pa.ArrowTypeError) if PYARROW_AVAILABLE else ()
+)
+
+_TRUE_STRINGS = {'true', '1', 'si', 'sí', 'yes', 'y', 't'}
+
+# (record_type, clave) fuera del schema ya informadas en el log (una vez por proceso)
+_REPORTED_UNKNOWN: set = set()
+
+
+def register_schema(name: str, fields: Sequence[tuple], version: int = 1) -> "pa.Schema":
+    """
+    Registrar (o reemplazar) el schema de un tipo de registro
+
+    Args:
+        name: Tipo de registro ('scraped_product', ...)
+        fields: Pares (columna, tipo Arrow)
+        version: Versión del schema (queda en la metadata del Parquet)
+    """
+    schema = pa.schema(list(fields), metadata={'record_type': name, 'schema_version': str(version)})
+    _SCHEMAS[name] = schema
+    return schema
+
+
+def get_schema(name: str) -> "pa.Schema":
+    """Schema registrado para un tipo de registro"""
+    try:
+        return _SCHEMAS[name]
+    except KeyError:
+        raise KeyError(f"Schema Arrow no registrado: {name}") from None
+
+
+def list_schemas() -> List[str]:
+    return sorted(_SCHEMAS)
+
+
+# ---------- coerción valor a valor (camino lento) ----------
+
+def _is_missing(value: Any) -> bool:
+    return value is None or value == '' or (isinstance(value, float) and value != value)
+
+
+def _parse_number(text: str) -> float:
+    """
+    Número desde texto de precio/rating con separadores chilenos o ingleses
+
+    - Se ignoran '$', '%' y espacios
+    - Con '.' y ',' a la vez, el último es el decimal ("1.299,99", "1,299.99")
+    - Con uno solo: es de miles si se repite o si le siguen exactamente
+      3 dígitos tras una parte entera de 1-3 dígitos ("$1.299.990", "1.299");
+      si no, es decimal ("4,5", "1299.99")
+
+    Raises:
+        ValueError: Si no queda un número válido
+    """
+    text = text.replace('$', '').replace('%', '').replace('\xa0', '').replace(' ', '').strip()
+    if '.' in text and ',' in text:
+        thousands = '.' if text.rfind('.') < text.rfind(',') else ','
+        decimal = ',' if thousands == '.' else '.'
+        return float(text.replace(thousands, '').replace(decimal, '.'))
+
+    separator = '.' if '.' in text else ',' if ',' in text else None
+    if separator is None:
+        return float(text)
+    head, _, tail = text.partition(separator)
+    digits = head.lstrip('-+')
+    if text.count(separator) > 1 or (len(tail) == 3 and 1 <= len(digits) <= 3 and digits != '0'):
+        return float(text.replace(separator, ''))
+    return float(text.replace(separator, '.'))
+
+
+def _to_int(value: Any) -> Optional[int]:
+    """Precios/contadores a int tolerando strings con separadores ("$1.299.990", "1299.99")"""
+    if _is_missing(value):
+        return None
+    try:
+        return int(_parse_number(value) if isinstance(value, str) else float(value))
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    """Rating/porcentajes/precios a float con el mismo parseo que _to_int ("4,5", "$1.299,5")"""
+    if _is_missing(value):
+        return None
+    try:
+        return _parse_number(value) if isinstance(value, str) else float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _to_bool(value: Any) -> Optional[bool]:
+    if _is_missing(value):
+        return None
+    if isinstance(value, str):
+        return value.strip().lower() in _TRUE_STRINGS
+    return bool(value)
+
+
+def _to_str(value: Any) -> Optional[str]:
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, (list, tuple, dict)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _to_timestamp(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _to_str_list(value: Any) -> Optional[List[str]]:
+    if _is_missing(value):
+        return None
+    if isinstance(value, (list, tuple, set)):
+        return [str(v) for v in value]
+    return [str(value)]
+
+
+def _coercer(arrow_type) -> Callable[[Any], Any]:
+    if pa.types.is_integer(arrow_type):
+        return _to_int
+    if pa.types.is_floating(arrow_type):
+        return _to_float
+    if pa.types.is_boolean(arrow_type):
+        return _to_bool
+    if pa.types.is_timestamp(arrow_type):
+        return _to_timestamp
+    if pa.types.is_list(arrow_type):
+        return _to_str_list
+    return _to_str
+
+
+def _to_array(values: Sequence[Any], arrow_type) -> "pa.Array":
+    """Columna Arrow tipada: conversión directa y, si falla, coerción por valor"""
+    try:
+        return pa.array(values, type=arrow_type, from_pandas=True)
+    except _ARROW_ERRORS:
+        coerce = _coercer(arrow_type)
+        return pa.array([coerce(v) for v in values], type=arrow_type, from_pandas=True)
+
+
+class RecordBatchBuilder:
+    """
+    🏹 Convierte registros (dicts, dataclasses u objetos) en RecordBatch tipados
+    """
+
+    def __init__(self, schema: Union[str, "pa.Schema"], extra_column: Optional[str] = 'extra'):
+        """
+        Args:
+            schema: Nombre de schema registrado o schema Arrow
+            extra_column: Columna JSON para claves fuera del schema (si existe en el schema)
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow es requerido para RecordBatchBuilder")
+        self.schema = get_schema(schema) if isinstance(schema, str) else schema
+        names = self.schema.names
+        self.extra_column = extra_column if extra_column in names else None
+        self._known = set(names)
+
+    @staticmethod
+    def _as_mapping(record: Any) -> Optional[Dict[str, Any]]:
+        """Dict del registro sin copia profunda; None para objetos sin campos enumerables"""
+        if isinstance(record, dict):
+            return record
+        if dataclasses.is_dataclass(record):
+            return {f.name: getattr(record, f.name) for f in dataclasses.fields(record)}
+        return None
+
+    def build(self, records: Iterable[Any], constants: Optional[Dict[str, Any]] = None) -> "pa.RecordBatch":
+        """
+        RecordBatch con una fila por registro
+
+        Args:
+            records: Dicts, dataclasses u objetos con atributos por columna
+            constants: Valores fijos por columna para todas las filas (p.ej. backup_id)
+        """
+        constants = constants or {}
+        mappings = []
+        for record in records:
+            mapping = self._as_mapping(record)
+            if mapping is None:
+                mapping = {name: getattr(record, name, None) for name in self.schema.names}
+            mappings.append(mapping)
+
+        # Solo se recorren las columnas presentes en algún registro; el resto queda en null
+        present = set().union(*mappings) if mappings else set()
+        columns: Dict[str, List[Any]] = {}
+        for name in self.schema.names:
+            if name in present and name not in constants and name != self.extra_column:
+                columns[name] = [m.get(name) for m in mappings]
+
+        unknown = present - self._known
+        if unknown:
+            self._report_unknown(unknown)
+        if self.extra_column and (unknown or self.extra_column in present):
+            columns[self.extra_column] = [self._extra(m) for m in mappings]
+
+        return self.build_columns(columns, len(mappings), constants)
+
+    def _report_unknown(self, keys: set):
+        """Informa (una vez por clave) las claves fuera del schema: van a `extra` o se descartan"""
+        record_type = (self.schema.metadata or {}).get(b'record_type', b'?').decode()
+        new = sorted(k for k in keys if (record_type, k) not in _REPORTED_UNKNOWN)
+        if not new:
+            return
+        _REPORTED_UNKNOWN.update((record_type, k) for k in new)
+        if self.extra_column:
+            logger.info(f"🏹 Claves fuera del schema '{record_type}' guardadas en '{self.extra_column}': {new}")
+        else:
+            logger.warning(f"⚠️ Claves fuera del schema '{record_type}' descartadas (sin columna extra): {new}")
+
+    def _extra(self, mapping: Dict[str, Any]) -> Optional[str]:
+        extra = {k: v for k, v in mapping.items() if k not in self._known}
+        own = mapping.get(self.extra_column)
+        if isinstance(own, dict):
+            extra.update(own)
+        if not extra:
+            return None
+        return json.dumps(extra, ensure_ascii=False, default=str)
+
+    def build_columns(self, columns: Dict[str, Any], num_rows: int,
+                      constants: Optional[Dict[str, Any]] = None) -> "pa.RecordBatch":
+        """
+        RecordBatch desde columnas ya armadas (listas o arrays NumPy)
+
+        Columnas ausentes quedan en null; `constants` se repiten en todas las filas.
+        """
+        constants = constants or {}
+        arrays = []
+        for field in self.schema:
+            if field.name in constants:
+                arrays.append(_to_array([constants[field.name]] * num_rows, field.type))
+            elif field.name in columns:
+                arrays.append(_to_array(columns[field.name], field.type))
+            else:
+                arrays.append(pa.nulls(num_rows, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def build_table(self, records: Iterable[Any], constants: Optional[Dict[str, Any]] = None) -> "pa.Table":
+        """Igual que `build` pero como Table (para pq.write_table / DuckDB register)"""
+        return pa.Table.from_batches([self.build(records, constants)], schema=self.schema)
+
+
+# ---------- schemas registrados ----------
+
+if PYARROW_AVAILABLE:
+    register_schema('scraped_product', [
+        # Campos del dict legacy de scrapers (español)
+        ('nombre', pa.string()),
+        ('marca', pa.string()),
+        ('sku', pa.string()),
+        ('sku_original', pa.string()),
+        ('categoria', pa.string()),
+        ('retailer', pa.string()),
+        ('link', pa.string()),
+        ('precio_normal', pa.int64()),
+        ('precio_oferta', pa.int64()),
+        ('precio_tarjeta', pa.int64()),
+        ('rating', pa.float64()),
+        ('reviews_count', pa.int64()),
+        ('out_of_stock', pa.bool_()),
+        ('is_sponsored', pa.bool_()),
+        ('is_promoted', pa.bool_()),
+        ('storage', pa.string()),
+        ('ram', pa.string()),
+        ('screen_size', pa.string()),
+        ('color', pa.string()),
+        # Campos de ProductData (scrapers v5)
+        ('title', pa.string()),
+        ('brand', pa.string()),
+        ('category', pa.string()),
+        ('product_url', pa.string()),
+        ('current_price', pa.float64()),
+        ('original_price', pa.float64()),
+        ('card_price', pa.float64()),
+        ('discount_percentage', pa.int64()),
+        ('currency', pa.string()),
+        ('availability', pa.string()),
+        ('image_urls', pa.list_(pa.string())),
+        ('extraction_timestamp', pa.timestamp('us')),
+        ('additional_info', pa.string()),
+        # Resto de claves del scraper (JSON) y columnas técnicas del respaldo
+        ('extra', pa.string()),
+        ('backup_timestamp', pa.timestamp('us')),
+        ('backup_id', pa.string()),
+    ])
+
+    # Mismas columnas que el antiguo Excel de respaldo
+    register_schema('backup_run', [
+        ('sku_unico', pa.string()),
+        ('retailer', pa.string()),
+        ('nombre', pa.string()),
+        ('marca', pa.string()),
+        ('sku_original', pa.string()),
+        ('link', pa.string()),
+        ('precio_normal', pa.int64()),
+        ('precio_oferta', pa.int64()),
+        ('precio_tarjeta', pa.int64()),
+        ('rating', pa.float64()),
+        ('reviews', pa.int64()),
+        ('timestamp', pa.timestamp('us')),
+        ('storage', pa.string()),
+        ('ram', pa.string()),
+        ('color', pa.string()),
+    ])
+
+    register_schema('price_snapshot', [
+        ('id', pa.string()),
+        ('codigo_interno', pa.string()),
+        ('fecha', pa.string()),
+        ('retailer', pa.string()),
+        ('precio_normal', pa.int64()),
+        ('precio_oferta', pa.int64()),
+        ('precio_tarjeta', pa.int64()),
+        ('precio_min_dia', pa.int64()),
+        ('cambios_en_dia', pa.int64()),
+        ('precio_anterior_dia', pa.int64()),
+        ('cambio_porcentaje', pa.float64()),
+        ('cambio_absoluto', pa.int64()),
+        ('timestamp_creacion', pa.string()),
+        ('timestamp_ultima_actualizacion', pa.string()),
+        ('alertas_enviadas', pa.int64()),
+        ('tipos_alertas', pa.string()),
+        ('es_precio_historico_min', pa.bool_()),
+        ('es_precio_historico_max', pa.bool_()),
+        ('volatilidad_dia', pa.float64()),
+        ('fecha_captura', pa.string()),
+        ('internal_sku', pa.string()),
+        ('metadata', pa.string()),
+        ('descuento_porcentaje', pa.float64()),
+    ])
+
+    # Mismo orden que la tabla master_productos (INSERT ... SELECT * posicional)
+    register_schema('master_product', [
+        ('codigo_interno', pa.string()),
+        ('sku_hash', pa.string()),
+        ('link', pa.string()),
+        ('nombre', pa.string()),
+        ('sku', pa.string()),
+        ('marca', pa.string()),
+        ('categoria', pa.string()),
+        ('retailer', pa.string()),
+        ('storage', pa.string()),
+        ('ram', pa.string()),
+        ('screen_size', pa.string()),
+        ('camera', pa.string()),
+        ('front_camera', pa.string()),
+        ('color', pa.string()),
+        ('colors', pa.string()),
+        ('rating', pa.float64()),
+        ('reviews_count', pa.int64()),
+        ('badges', pa.string()),
+        ('emblems', pa.string()),
+        ('out_of_stock', pa.bool_()),
+        ('discount_percent', pa.string()),
+        ('shipping_options', pa.string()),
+        ('included_accessories', pa.string()),
+        ('fecha_primera_captura', pa.string()),
+        ('fecha_ultima_actualizacion', pa.string()),
+        ('ultimo_visto', pa.string()),
+        ('activo', pa.bool_()),
+        ('veces_visto', pa.int64()),
+        ('nombre_normalizado', pa.string()),
+        ('specs_hash', pa.string()),
+    ])
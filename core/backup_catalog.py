@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+🗂️ Backup Catalog - Catálogo indexado de respaldos Parquet
+===========================================================
+
+Reemplaza los `metadata_YYYYMMDD.json` diarios (leer todo + reescribir en
+cada página guardada) por una tabla SQLite append-only:
+
+- Un INSERT por respaldo (O(1)), seguro entre threads y procesos
+  (los scrapers corren en procesos separados; journal WAL de SQLite).
+- Índices por retailer/fecha, categoría/fecha y fecha: listar y calcular
+  estadísticas son queries indexadas, sin recorrer directorios.
+- Si el catálogo no existe, se reconstruye una vez desde los archivos y
+  metadata JSON legacy ya presentes en disco.
+- Un archivo compactado (varias categorías) tiene una fila por categoría;
+  la compactación reemplaza las filas de los archivos origen en una sola
+  transacción.
+
+Ubicación: <base_path>/backup_catalog.sqlite
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILENAME = "backup_catalog.sqlite"
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS backups (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        retailer TEXT NOT NULL,
+        category TEXT NOT NULL,
+        backup_date TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        products_count INTEGER DEFAULT 0,
+        file_size_mb REAL DEFAULT 0,
+        scraping_session_id TEXT DEFAULT '',
+        execution_time_seconds REAL DEFAULT 0,
+        success_rate REAL DEFAULT 1,
+        extra TEXT DEFAULT '{}',
+        UNIQUE (file_path, category)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_backups_retailer_date ON backups(retailer, backup_date)",
+    "CREATE INDEX IF NOT EXISTS idx_backups_category_date ON backups(category, backup_date)",
+    "CREATE INDEX IF NOT EXISTS idx_backups_date ON backups(backup_date)",
+]
+
+_COLUMNS = ('retailer', 'category', 'backup_date', 'timestamp', 'file_path', 'file_name', 'products_count',
+            'file_size_mb', 'scraping_session_id', 'execution_time_seconds', 'success_rate', 'extra')
+
+_INSERT_SQL = (f"INSERT OR REPLACE INTO backups ({', '.join(_COLUMNS)}) "
+               f"VALUES ({', '.join('?' for _ in _COLUMNS)})")
+
+# Prefijo de los archivos producidos por la compactación diaria
+COMPACTED_PREFIX = "compacted_"
+
+
+class BackupCatalog:
+    """
+    🗂️ Catálogo SQLite de respaldos (una fila por archivo Parquet y categoría)
+    """
+
+    def __init__(self, base_path: Path):
+        self.base_path = Path(base_path)
+        self.db_path = self.base_path / CATALOG_FILENAME
+        self._lock = threading.Lock()
+
+        is_new = not self.db_path.exists()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+        if is_new:
+            imported = self.rebuild_from_files()
+            if imported:
+                logger.info(f"🗂️ Catálogo de respaldos reconstruido: {imported} archivos")
+
+    # ---------- escritura ----------
+
+    @staticmethod
+    def _row(entry: Dict[str, Any]) -> tuple:
+        timestamp = entry['timestamp']
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        extra = {k: entry.get(k) for k in ('source_urls', 'errors', 'warnings', 'schema_version') if k in entry}
+
+        return (
+            entry['retailer'],
+            entry.get('category', ''),
+            timestamp.strftime('%Y-%m-%d'),
+            timestamp.isoformat(),
+            str(entry['file_path']),
+            Path(entry['file_path']).name,
+            int(entry.get('products_count') or 0),
+            float(entry.get('file_size_mb') or 0.0),
+            entry.get('scraping_session_id') or '',
+            float(entry.get('execution_time_seconds') or 0.0),
+            float(entry.get('success_rate', 1.0)),
+            json.dumps(extra, ensure_ascii=False, default=str),
+        )
+
+    def add(self, entry: Dict[str, Any]):
+        """
+        Registrar un respaldo (reemplaza si el archivo/categoría ya estaba catalogado)
+
+        Args:
+            entry: Campos de BackupMetadata (retailer, category, timestamp, file_path, ...)
+        """
+        row = self._row(entry)
+        with self._lock:
+            self._conn.execute(_INSERT_SQL, row)
+            self._conn.commit()
+
+    def replace_files(self, old_paths: List[str], new_entries: List[Dict[str, Any]]):
+        """Reemplazar archivos catalogados por otros en una sola transacción"""
+        rows = [self._row(entry) for entry in new_entries]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("DELETE FROM backups WHERE file_path = ?", [(p,) for p in old_paths])
+                self._conn.executemany(_INSERT_SQL, rows)
+
+    def remove_before(self, cutoff_date: str, retailer: str = None) -> int:
+        """Eliminar entradas anteriores a `cutoff_date` (YYYY-MM-DD)"""
+        sql = "DELETE FROM backups WHERE backup_date < ?"
+        params: List[Any] = [cutoff_date]
+        if retailer:
+            sql += " AND retailer = ?"
+            params.append(retailer)
+        with self._lock:
+            deleted = self._conn.execute(sql, params).rowcount
+            self._conn.commit()
+        return deleted
+
+    # ---------- consultas ----------
+
+    def _query(self, sql: str, params: List[Any] = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def list(self, retailer: str = None, category: str = None, since_date: str = None) -> List[Dict[str, Any]]:
+        """
+        Respaldos más recientes primero
+
+        Args:
+            since_date: Fecha mínima inclusive (YYYY-MM-DD)
+        """
+        conditions, params = [], []
+        if retailer:
+            conditions.append("retailer = ?")
+            params.append(retailer)
+        if category:
+            conditions.append("category = ?")
+            params.append(category)
+        if since_date:
+            conditions.append("backup_date >= ?")
+            params.append(since_date)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._query(f"SELECT * FROM backups {where} ORDER BY timestamp DESC", params)
+        return [dict(row) for row in rows]
+
+    def files_for_day(self, retailer: str, backup_date: str) -> List[Dict[str, Any]]:
+        """Entradas de un retailer/día (una por archivo y categoría)"""
+        rows = self._query("SELECT * FROM backups WHERE retailer = ? AND backup_date = ? ORDER BY timestamp",
+                           [retailer, backup_date])
+        return [dict(row) for row in rows]
+
+    def days_with_files(self, before_date: str, min_files: int = 2) -> List[tuple]:
+        """(retailer, fecha) anteriores a `before_date` con al menos `min_files` archivos"""
+        rows = self._query("""
+            SELECT retailer, backup_date FROM backups
+            WHERE backup_date < ?
+            GROUP BY retailer, backup_date
+            HAVING COUNT(DISTINCT file_path) >= ?
+            ORDER BY backup_date, retailer
+        """, [before_date, min_files])
+        return [(row['retailer'], row['backup_date']) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """Agregados por retailer y totales"""
+        per_retailer = self._query("""
+            SELECT retailer, COUNT(DISTINCT file_path) AS files, SUM(file_size_mb) AS size_mb,
+                   SUM(products_count) AS products
+            FROM backups GROUP BY retailer ORDER BY retailer
+        """)
+        dates = self._query("SELECT DISTINCT retailer, backup_date FROM backups ORDER BY retailer, backup_date")
+        oldest = self._query("SELECT file_path FROM backups ORDER BY timestamp ASC LIMIT 1")
+        newest = self._query("SELECT file_path FROM backups ORDER BY timestamp DESC LIMIT 1")
+
+        by_date: Dict[str, List[str]] = {}
+        for row in dates:
+            by_date.setdefault(row['retailer'], []).append(row['backup_date'])
+
+        return {
+            'retailers': {
+                row['retailer']: {
+                    'files': row['files'],
+                    'size_mb': row['size_mb'] or 0.0,
+                    'products': row['products'] or 0,
+                    'dates': by_date.get(row['retailer'], []),
+                }
+                for row in per_retailer
+            },
+            'oldest_backup': oldest[0]['file_path'] if oldest else None,
+            'newest_backup': newest[0]['file_path'] if newest else None,
+        }
+
+    # ---------- reconstrucción ----------
+
+    def rebuild_from_files(self) -> int:
+        """
+        Catalogar respaldos existentes en disco (layout retailer/YYYY-MM-DD/*.parquet)
+
+        Usa los metadata_*.json legacy cuando existen; si no, solo datos del archivo.
+
+        Returns:
+            Archivos catalogados
+        """
+        imported = 0
+        for date_dir in sorted(self.base_path.glob("*/*")):
+            if not date_dir.is_dir():
+                continue
+            try:
+                day = datetime.strptime(date_dir.name, "%Y-%m-%d")
+            except ValueError:
+                continue
+
+            legacy: Dict[str, Dict[str, Any]] = {}
+            for metadata_file in date_dir.glob("metadata_*.json"):
+                try:
+                    with open(metadata_file, 'r', encoding='utf-8') as f:
+                        for backup in json.load(f).get('backups', []):
+                            legacy[Path(backup['file_path']).name] = backup
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"⚠️ Metadata legacy ilegible {metadata_file}: {e}")
+
+            for parquet_file in date_dir.glob("*.parquet"):
+                stat = parquet_file.stat()
+                entry = {
+                    'retailer': date_dir.parent.name,
+                    'category': parquet_file.stem.rsplit('_', 2)[0],
+                    'timestamp': datetime.fromtimestamp(stat.st_mtime).replace(
+                        year=day.year, month=day.month, day=day.day),
+                    'file_size_mb': stat.st_size / (1024 * 1024),
+                    **legacy.get(parquet_file.name, {}),
+                    'file_path': str(parquet_file),
+                }
+                if parquet_file.name.startswith(COMPACTED_PREFIX):
+                    for category_entry in self._compacted_entries(parquet_file, entry):
+                        self.add(category_entry)
+                else:
+                    self.add(entry)
+                imported += 1
+        return imported
+
+    @staticmethod
+    def _compacted_entries(parquet_file: Path, entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Una entrada por categoría de un archivo compactado (tamaño prorrateado)"""
+        import pyarrow.parquet as pq
+
+        counts = pq.read_table(parquet_file, columns=['category']).column('category').value_counts()
+        total = sum(item['counts'].as_py() for item in counts) or 1
+        return [
+            {**entry, 'category': item['values'].as_py(), 'products_count': item['counts'].as_py(),
+             'file_size_mb': entry['file_size_mb'] * item['counts'].as_py() / total}
+            for item in counts
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+💾 Streaming Backup Writer - Respaldo columnar por ejecución
+============================================================
+
+Sink de respaldo para ProductProcessor: los productos se acumulan en
+batches y un thread de fondo los agrega como row groups a UN solo
+archivo Parquet por ejecución (schema explícito + compresión zstd).
+
+El Excel ya no se genera durante el scraping; se produce a demanda
+desde el Parquet con `export_backup_to_excel`.
+
+Estructura:
+data/excel_backup/
+├── backup_run_20250903_143022.parquet
+└── backup_run_20250903_143022.xlsx   (solo si se exporta)
+"""
+
+import logging
+import queue
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    pa = None
+    pq = None
+
+try:
+    from .arrow_schemas import RecordBatchBuilder, get_schema
+except ImportError:
+    from core.arrow_schemas import RecordBatchBuilder, get_schema
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def get_backup_schema():
+    """Schema Arrow del respaldo de productos (registrado en core.arrow_schemas)"""
+    return get_schema('backup_run')
+
+
+class StreamingBackupWriter:
+    """
+    💾 Escritor Parquet append-only con thread de fondo
+
+    `append()` solo agrega el registro a un buffer en memoria; al llenarse
+    el batch se encola y el thread escritor lo convierte a RecordBatch y lo
+    escribe. El event loop nunca espera I/O de disco.
+    """
+
+    def __init__(self,
+                 output_dir: Union[str, Path] = "data/excel_backup",
+                 run_id: Optional[str] = None,
+                 batch_size: int = 1000,
+                 compression: str = 'zstd',
+                 compression_level: int = 3,
+                 max_pending_batches: int = 64):
+        """
+        Inicializa el escritor
+
+        Args:
+            output_dir: Directorio de salida
+            run_id: Identificador de la ejecución (default: timestamp actual)
+            batch_size: Registros por RecordBatch
+            compression: Códec Parquet
+            compression_level: Nivel de compresión zstd
+            max_pending_batches: Batches en cola antes de aplicar back-pressure
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow es requerido para StreamingBackupWriter")
+
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.file_path = self.output_dir / f"backup_run_{self.run_id}.parquet"
+        self.schema = get_backup_schema()
+        self._builder = RecordBatchBuilder(self.schema)
+
+        self.batch_size = batch_size
+        self.compression = compression
+        self.compression_level = compression_level
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending_batches)
+        self._thread: Optional[threading.Thread] = None
+        self._writer = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.rows_written = 0
+        self.batches_written = 0
+        self.errors: List[str] = []
+
+    def _start(self):
+        """Arranca el thread escritor (perezoso, al primer batch)"""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name=f"backup_writer_{self.run_id}", daemon=True
+            )
+            self._thread.start()
+
+    def append(self, record: Dict[str, Any]):
+        """Agrega un registro; encola un batch cuando el buffer se llena"""
+        if self._closed:
+            raise RuntimeError("StreamingBackupWriter ya fue cerrado")
+
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Encola los registros en buffer para escritura en background"""
+        if not self._buffer:
+            return
+
+        rows, self._buffer = self._buffer, []
+        self._start()
+        self._queue.put(rows)
+
+    def _run(self):
+        """Loop del thread escritor"""
+        while True:
+            rows = self._queue.get()
+            try:
+                if rows is _STOP:
+                    break
+                self._write_rows(rows)
+            except Exception as e:
+                error_msg = f"Error escribiendo batch de respaldo: {e}"
+                logger.error(f"❌ {error_msg}")
+                self.errors.append(error_msg)
+            finally:
+                self._queue.task_done()
+
+        self._close_writer()
+
+    def _write_rows(self, rows: List[Dict[str, Any]]):
+        """Convierte filas a RecordBatch y las agrega al archivo"""
+        batch = self._builder.build(rows)
+        with self._lock:
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(
+                    self.file_path,
+                    self.schema,
+                    compression=self.compression,
+                    compression_level=self.compression_level,
+                    use_dictionary=True,
+                    write_statistics=True,
+                )
+            self._writer.write_batch(batch)
+            self.rows_written += batch.num_rows
+            self.batches_written += 1
+
+        logger.debug(f"💾 Batch de respaldo escrito: {batch.num_rows} filas → {self.file_path.name}")
+
+    def _close_writer(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def wait(self):
+        """Bloquea hasta que todos los batches encolados estén en disco"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> Optional[Path]:
+        """
+        Escribe lo pendiente y cierra el archivo (el footer Parquet se
+        escribe recién aquí, antes el archivo no es legible)
+
+        Returns:
+            Ruta del Parquet de la ejecución, o None si no se escribió nada
+        """
+        if self._closed:
+            return self.file_path if self.rows_written else None
+
+        self.flush()
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+
+        if self.rows_written:
+            logger.info(f"💾 Respaldo guardado: {self.file_path} ({self.rows_written} productos, "
+                        f"{self.batches_written} batches)")
+            return self.file_path
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas del escritor"""
+        return {
+            'file_path': str(self.file_path),
+            'rows_written': self.rows_written,
+            'rows_buffered': len(self._buffer),
+            'batches_written': self.batches_written,
+            'pending_batches': self._queue.qsize(),
+            'errors_count': len(self.errors),
+        }
+
+
+def export_backup_to_excel(parquet_path: Union[str, Path],
+                           excel_path: Optional[Union[str, Path]] = None) -> Path:
+    """
+    Genera el Excel de un respaldo a demanda
+
+    Args:
+        parquet_path: Parquet de la ejecución
+        excel_path: Ruta de salida (default: mismo nombre con .xlsx)
+
+    Returns:
+        Ruta del archivo Excel generado
+    """
+    parquet_path = Path(parquet_path)
+    excel_path = Path(excel_path) if excel_path else parquet_path.with_suffix('.xlsx')
+
+    df = pq.read_table(parquet_path).to_pandas()
+    df.to_excel(excel_path, index=False, engine='openpyxl')
+
+    logger.info(f"📊 Excel exportado: {excel_path} ({len(df)} productos)")
+    return excel_path
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+🧱 Candidate Blocking - Candidatos para matching cross-retailer
+===============================================================
+
+En vez de comparar cada producto contra todos (O(n²)), los productos se
+agrupan por claves de bloqueo y solo se puntúan pares dentro de un bloque
+y de retailers distintos:
+
+- Categoría normalizada (minúsculas, sin acentos, alias tipo celular → smartphones)
+- Marca normalizada
+- Capacidad (mayor token GB/TB entre storage, RAM y nombre)
+- Banda de precio logarítmica de ancho `max_price_ratio`: dos precios con
+  ratio <= max_price_ratio caen en la misma banda o en bandas vecinas
+
+Una marca faltante se toma del nombre si alguna palabra es una marca
+conocida del lote. Marca o capacidad desconocidas actúan como comodín (se
+comparan con todos los bloques compatibles de la categoría) y un precio
+faltante con todas las bandas, para no perder pares por datos incompletos.
+
+Uso:
+    blocker = CandidateBlocker(max_price_ratio=5.0)
+    for i, j in blocker.candidate_pairs(productos):
+        score(productos[i], productos[j])
+"""
+
+import logging
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Campos de precio en orden de preferencia (mismo criterio que el scoring)
+PRICE_FIELDS = ('precio_oferta', 'precio_normal', 'precio_actual')
+
+# Campos de donde se extraen tokens de capacidad
+CAPACITY_FIELDS = ('storage', 'ram', 'nombre', 'titulo')
+
+# Alias de categoría por palabra, en singular o plural (categorías distintas entre retailers)
+CATEGORY_ALIASES = {
+    'smartphone': 'smartphones',
+    'celular': 'smartphones',
+    'telefono': 'smartphones',
+    'movil': 'smartphones',
+    'tablet': 'tablets',
+    'ipad': 'tablets',
+    'notebook': 'notebooks',
+    'laptop': 'notebooks',
+    'portatil': 'notebooks',
+    'smartwatch': 'smartwatches',
+    'reloj': 'smartwatches',
+    'televisor': 'televisores',
+    'smarttv': 'televisores',
+}
+
+_GENERIC_BRANDS = {'', 'generico', 'generica', 'sinmarca', 'otros', 'otra', 'na', 'none', 'null'}
+
+_CAPACITY_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*(tb|gb)\b')
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def normalize_token(value: Any) -> str:
+    """Minúsculas, sin acentos y solo caracteres alfanuméricos"""
+    if value is None:
+        return ''
+    text = unicodedata.normalize('NFKD', str(value).lower())
+    return ''.join(ch for ch in text if ch.isalnum() and not unicodedata.combining(ch))
+
+
+def normalize_brand(value: Any) -> Optional[str]:
+    """Marca normalizada; None si falta o es genérica (comodín)"""
+    brand = normalize_token(value)
+    return None if brand in _GENERIC_BRANDS else brand
+
+
+def _category_words(value: Any) -> List[str]:
+    """Palabras de la categoría sin acentos, más cada par contiguo unido ('smart tv' → 'smarttv')"""
+    if value is None:
+        return []
+    text = unicodedata.normalize('NFKD', str(value).lower())
+    words = _WORD_RE.findall(''.join(ch for ch in text if not unicodedata.combining(ch)))
+    return words + [a + b for a, b in zip(words, words[1:])]
+
+
+def normalize_category(value: Any) -> str:
+    """Categoría canónica si alguna palabra es un alias o su plural (-s/-es); si no, la normalizada"""
+    words = _category_words(value)
+    for alias, canonical in CATEGORY_ALIASES.items():
+        if any(word in (alias, alias + 's', alias + 'es') for word in words):
+            return canonical
+    return normalize_token(value)
+
+
+def capacity_token(product: Any) -> Optional[str]:
+    """Mayor capacidad (en GB) mencionada en storage/RAM/nombre, p.ej. '256gb'"""
+    best = 0.0
+    for name in CAPACITY_FIELDS:
+        value = product.get(name)
+        if not value:
+            continue
+        for amount, unit in _CAPACITY_RE.findall(str(value).lower()):
+            gb = float(amount.replace(',', '.')) * (1024 if unit == 'tb' else 1)
+            best = max(best, gb)
+    return f"{int(best)}gb" if best else None
+
+
+def product_price(product: Any) -> Optional[float]:
+    """Primer precio positivo según PRICE_FIELDS"""
+    for name in PRICE_FIELDS:
+        value = product.get(name)
+        try:
+            if value and float(value) > 0:
+                return float(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _keys_compatible(key_a: Tuple, key_b: Tuple) -> bool:
+    return all(a is None or b is None or a == b for a, b in zip(key_a, key_b))
+
+
+def _bands_close(band_a: Optional[int], band_b: Optional[int]) -> bool:
+    return band_a is None or band_b is None or abs(band_a - band_b) <= 1
+
+
+class CandidateBlocker:
+    """
+    🧱 Generador de pares candidatos (índices) por bloques
+    """
+
+    def __init__(self, max_price_ratio: Optional[float] = 5.0, use_capacity: bool = True):
+        """
+        Args:
+            max_price_ratio: Ratio máximo precio alto/bajo (None desactiva bandas y filtro de precio)
+            use_capacity: Bloquear también por capacidad (storage/RAM)
+        """
+        self.max_price_ratio = max_price_ratio
+        self.use_capacity = use_capacity
+        self._log_ratio = math.log(max_price_ratio) if max_price_ratio and max_price_ratio > 1 else None
+        self.last_stats: Dict[str, Any] = {}
+
+    def block_key(self, product: Any) -> Tuple[str, Tuple[Optional[str], Optional[str]]]:
+        """(categoría, (marca, capacidad)); None en marca/capacidad = comodín"""
+        category = normalize_category(product.get('categoria') or product.get('category'))
+        brand = normalize_brand(product.get('marca') or product.get('brand'))
+        capacity = capacity_token(product) if self.use_capacity else None
+        return category, (brand, capacity)
+
+    @staticmethod
+    def _brand_from_name(product: Any, known_brands: set) -> Optional[str]:
+        """Marca faltante: primera palabra del nombre que sea una marca conocida del lote"""
+        name = product.get('nombre') or product.get('titulo') or ''
+        for word in str(name).split():
+            token = normalize_token(word)
+            if token in known_brands:
+                return token
+        return None
+
+    def price_band(self, price: Optional[float]) -> Optional[int]:
+        if not price or self._log_ratio is None:
+            return None
+        return int(math.floor(math.log(price) / self._log_ratio))
+
+    def candidate_pairs(self, products: Sequence[Any]) -> List[Tuple[int, int]]:
+        """
+        Pares (i, j) con i < j, de retailers distintos, dentro de un mismo
+        bloque (o bloque comodín compatible) y con ratio de precio permitido
+
+        Args:
+            products: Dicts o filas con `.get()` (asyncpg Record, DictRow)
+        """
+        # categoría -> (marca, capacidad) -> banda -> retailer -> índices
+        blocks: Dict[str, Dict[Tuple, Dict[Optional[int], Dict[str, List[int]]]]] = defaultdict(dict)
+        prices: List[Optional[float]] = []
+        retailer_counts: Dict[str, int] = defaultdict(int)
+
+        keyed = [self.block_key(product) for product in products]
+        known_brands = {key[0] for _, key in keyed if key[0]}
+
+        for index, product in enumerate(products):
+            category, key = keyed[index]
+            if key[0] is None and known_brands:
+                key = (self._brand_from_name(product, known_brands), key[1])
+            price = product_price(product)
+            retailer = str(product.get('retailer') or '')
+            prices.append(price)
+            retailer_counts[retailer] += 1
+            bands = blocks[category].setdefault(key, defaultdict(lambda: defaultdict(list)))
+            bands[self.price_band(price)][retailer].append(index)
+
+        pairs: List[Tuple[int, int]] = []
+        for keys in blocks.values():
+            key_list = list(keys)
+            for position, key in enumerate(key_list):
+                self._pairs_between(keys[key], keys[key], prices, pairs, same_block=True)
+                if None not in key:
+                    continue
+                # Comodín: bloques compatibles de la categoría (cada par de comodines una vez)
+                for other_position, other in enumerate(key_list):
+                    if other_position == position or (None in other and other_position < position):
+                        continue
+                    if _keys_compatible(key, other):
+                        self._pairs_between(keys[key], keys[other], prices, pairs, same_block=False)
+
+        pairs.sort()
+        n = len(products)
+        brute_force = n * (n - 1) // 2 - sum(c * (c - 1) // 2 for c in retailer_counts.values())
+        self.last_stats = {
+            'products': n,
+            'blocks': sum(len(keys) for keys in blocks.values()),
+            'candidate_pairs': len(pairs),
+            'brute_force_pairs': brute_force,
+            'reduction': round(1 - len(pairs) / brute_force, 4) if brute_force else 0.0,
+        }
+        logger.debug(f"🧱 Blocking: {self.last_stats}")
+        return pairs
+
+    def _pairs_between(self, bands_a: Dict, bands_b: Dict, prices: List[Optional[float]],
+                       out: List[Tuple[int, int]], same_block: bool):
+        band_list_a = list(bands_a)
+        band_list_b = list(bands_b)
+        for position_a, band_a in enumerate(band_list_a):
+            for position_b, band_b in enumerate(band_list_b):
+                if same_block and position_b < position_a:
+                    continue
+                if not _bands_close(band_a, band_b):
+                    continue
+                self._cross_retailer(bands_a[band_a], bands_b[band_b], prices, out,
+                                     same_group=same_block and position_a == position_b)
+
+    def _cross_retailer(self, group_a: Dict[str, List[int]], group_b: Dict[str, List[int]],
+                        prices: List[Optional[float]], out: List[Tuple[int, int]], same_group: bool):
+        max_ratio = self.max_price_ratio if self._log_ratio is not None else None
+        for retailer_a, indexes_a in group_a.items():
+            for retailer_b, indexes_b in group_b.items():
+                if retailer_a == retailer_b or (same_group and retailer_a > retailer_b):
+                    continue
+                for i in indexes_a:
+                    price_i = prices[i]
+                    for j in indexes_b:
+                        price_j = prices[j]
+                        if max_ratio and price_i and price_j and \
+                                max(price_i, price_j) > max_ratio * min(price_i, price_j):
+                            continue
+                        out.append((i, j) if i < j else (j, i))
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+🌙 Closure Pipeline - Cierre diario como DAG de pasos paralelos
+===============================================================
+
+Ejecuta los pasos del cierre de medianoche en un pool de workers: cada
+paso arranca apenas terminan sus dependencias, así los pasos
+independientes (persistir productos, extremos, rollups, tablas del bot)
+corren en paralelo en lugar de uno tras otro.
+
+- Si un paso falla, sus dependientes se marcan como `skipped`; el resto
+  del DAG sigue.
+- Métricas por paso (estado, duración) y del cierre completo, con un
+  tiempo objetivo (`target_seconds`) para detectar cierres lentos.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+PENDING, RUNNING, DONE, FAILED, SKIPPED = 'pending', 'running', 'done', 'failed', 'skipped'
+
+
+@dataclass
+class ClosureStep:
+    """
+    Paso del cierre: función sin argumentos y sus dependencias
+
+    El paso falla si la función lanza una excepción o devuelve False
+    (métodos que registran el error y no lo propagan).
+    """
+    name: str
+    func: Callable[[], Any]
+    depends_on: Sequence[str] = ()
+
+    # Estado de ejecución
+    status: str = PENDING
+    duration: float = 0.0
+    error: Optional[str] = None
+    result: Any = None
+    started_at: Optional[datetime] = field(default=None, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'status': self.status,
+            'duration_seconds': round(self.duration, 3),
+            'depends_on': list(self.depends_on),
+            'error': self.error,
+        }
+
+
+class ClosurePipeline:
+    """
+    🌙 Ejecutor del DAG de cierre
+    """
+
+    def __init__(self, steps: List[ClosureStep], max_workers: int = 4, target_seconds: float = 120.0):
+        """
+        Args:
+            steps: Pasos del cierre (nombres únicos, dependencias existentes, sin ciclos)
+            max_workers: Pasos concurrentes como máximo
+            target_seconds: Tiempo objetivo del cierre completo
+        """
+        self.steps: Dict[str, ClosureStep] = {}
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError(f"Paso de cierre duplicado: {step.name}")
+            self.steps[step.name] = step
+        self._validate()
+
+        self.max_workers = max_workers
+        self.target_seconds = target_seconds
+        self.started_at: Optional[datetime] = None
+        self.duration = 0.0
+        self._lock = threading.Lock()
+
+    def _validate(self):
+        """Dependencias conocidas y sin ciclos"""
+        for step in self.steps.values():
+            missing = [d for d in step.depends_on if d not in self.steps]
+            if missing:
+                raise ValueError(f"Paso '{step.name}' depende de pasos inexistentes: {missing}")
+
+        visiting, visited = set(), set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Ciclo en el DAG de cierre en '{name}'")
+            visiting.add(name)
+            for dep in self.steps[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.steps:
+            visit(name)
+
+    def _ready_steps(self) -> List[ClosureStep]:
+        ready = []
+        for step in self.steps.values():
+            if step.status != PENDING:
+                continue
+            deps = [self.steps[d].status for d in step.depends_on]
+            if any(s in (FAILED, SKIPPED) for s in deps):
+                step.status = SKIPPED
+                step.error = "dependencia fallida"
+                logger.warning(f"⏭️ Paso de cierre '{step.name}' omitido (dependencia fallida)")
+            elif all(s == DONE for s in deps):
+                ready.append(step)
+        return ready
+
+    def _run_step(self, step: ClosureStep):
+        start = time.perf_counter()
+        try:
+            step.result = step.func()
+            if step.result is False:
+                raise RuntimeError("el paso reportó error")
+            step.status = DONE
+            logger.info(f"✅ Paso de cierre '{step.name}' completado")
+        except Exception as e:
+            step.status = FAILED
+            step.error = str(e)
+            logger.error(f"❌ Paso de cierre '{step.name}' falló: {e}")
+        finally:
+            step.duration = time.perf_counter() - start
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Ejecutar el DAG (bloqueante)
+
+        Returns:
+            Métricas del cierre (ver get_metrics)
+        """
+        self.started_at = datetime.now()
+        start = time.perf_counter()
+        running: Dict[Future, ClosureStep] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="closure") as pool:
+            while True:
+                with self._lock:
+                    for step in self._ready_steps():
+                        step.status = RUNNING
+                        step.started_at = datetime.now()
+                        running[pool.submit(self._run_step, step)] = step
+                if not running:
+                    break
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+
+            # Pasos aún pendientes tras un fallo se resuelven como omitidos
+            with self._lock:
+                self._ready_steps()
+
+        self.duration = time.perf_counter() - start
+        metrics = self.get_metrics()
+        if not metrics['met_target']:
+            logger.warning(f"⚠️ Cierre diario tardó {self.duration:.1f}s (objetivo {self.target_seconds:.0f}s)")
+        logger.info(f"🌙 Cierre diario: {metrics['completed']}/{metrics['total']} pasos en {self.duration:.2f}s")
+        return metrics
+
+    async def run_async(self) -> Dict[str, Any]:
+        """Ejecutar el DAG sin bloquear el event loop"""
+        return await asyncio.to_thread(self.run)
+
+    def progress(self) -> Dict[str, Any]:
+        """Progreso en curso: pasos terminados y en ejecución"""
+        with self._lock:
+            statuses = [step.status for step in self.steps.values()]
+            running = [step.name for step in self.steps.values() if step.status == RUNNING]
+        finished = sum(s in (DONE, FAILED, SKIPPED) for s in statuses)
+        return {
+            'finished': finished,
+            'total': len(statuses),
+            'percent': round(finished / len(statuses) * 100, 1) if statuses else 100.0,
+            'running': running,
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Métricas del cierre: por paso y totales"""
+        steps = {name: step.to_dict() for name, step in self.steps.items()}
+        # Ruta crítica: la cadena de dependencias más lenta
+        finish: Dict[str, float] = {}
+        for name in self.steps:
+            self._critical_time(name, finish)
+        return {
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'duration_seconds': round(self.duration, 3),
+            'serial_seconds': round(sum(step.duration for step in self.steps.values()), 3),
+            'critical_path_seconds': round(max(finish.values(), default=0.0), 3),
+            'target_seconds': self.target_seconds,
+            'met_target': self.duration <= self.target_seconds,
+            'total': len(self.steps),
+            'completed': sum(step.status == DONE for step in self.steps.values()),
+            'failed': [name for name, step in self.steps.items() if step.status == FAILED],
+            'skipped': [name for name, step in self.steps.items() if step.status == SKIPPED],
+            'steps': steps,
+        }
+
+    def _critical_time(self, name: str, memo: Dict[str, float]) -> float:
+        if name not in memo:
+            step = self.steps[name]
+            memo[name] = step.duration + max((self._critical_time(d, memo) for d in step.depends_on), default=0.0)
+        return memo[name]
@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+"""
+🔌 Connection Manager - Conexiones de larga vida para DuckDB y Redis
+=====================================================================
+
+Un solo punto de acceso a las bases de datos del proceso:
+
+- DuckDB: UNA conexión escritora por archivo (serializada con lock) y un
+  cursor por thread para lecturas. Los cursores comparten la misma
+  instancia de base de datos, por lo que ven los commits del escritor
+  sin reabrir el archivo.
+- Setup e init: `setup_statements` (INSTALL/LOAD de extensiones, settings
+  globales) corren una vez sobre la conexión escritora; `init_statements`
+  (SET de sesión) corren en la escritora y en cada cursor. Registrar
+  sentencias nuevas sobre una conexión ya abierta las agrega.
+- Sentencias con nombre: el SQL se registra una vez por base de datos y
+  se ejecuta sobre el cursor del thread actual.
+- Health checks con reconexión automática.
+- Redis: un ConnectionPool por URL compartido por todos los clientes.
+
+Uso:
+    from core.connection_manager import get_duckdb_connection
+
+    conn = get_duckdb_connection(db_path)          # cursor del thread
+    rows = conn.execute("SELECT ...", [param]).fetchall()
+
+    db = ConnectionManager.get_instance().duckdb(db_path)
+    with db.transaction() as writer:               # escritor único
+        writer.execute("INSERT ...")
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+    duckdb = None
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+
+class ConnectionHealthError(Exception):
+    """La conexión no respondió al health check ni pudo reabrirse"""
+
+
+class DuckDBConnection:
+    """
+    🦆 Conexión de larga vida a un archivo DuckDB
+
+    - `writer`: conexión única usada para escrituras (bajo `write_lock`)
+    - `cursor()`: cursor propio del thread actual para lecturas
+    """
+
+    def __init__(self, db_path: PathLike, init_statements: Optional[Sequence[str]] = None,
+                 setup_statements: Optional[Sequence[str]] = None):
+        """
+        Abre la conexión escritora
+
+        Args:
+            db_path: Archivo DuckDB (':memory:' para base en memoria)
+            init_statements: SQL de sesión a ejecutar en la conexión
+                escritora y en cada cursor nuevo (SET)
+            setup_statements: SQL a ejecutar una sola vez sobre la
+                conexión escritora (INSTALL/LOAD de extensiones, PRAGMA)
+        """
+        if not DUCKDB_AVAILABLE:
+            raise ImportError("duckdb es requerido para DuckDBConnection")
+
+        self.db_path = str(db_path)
+        self.init_statements: List[str] = list(dict.fromkeys(init_statements or []))
+        self.setup_statements: List[str] = list(dict.fromkeys(setup_statements or []))
+        self.write_lock = threading.RLock()
+
+        self._local = threading.local()
+        self._cursors_lock = threading.Lock()
+        self._cursors: List[Any] = []
+        self._statements: Dict[str, str] = {}
+        self._generation = 0
+
+        self.stats = {
+            'cursors_created': 0,
+            'statements_executed': 0,
+            'transactions': 0,
+            'reconnects': 0,
+        }
+
+        self.writer = self._open()
+
+    def _open(self):
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = duckdb.connect(self.db_path)
+        for sql in self.setup_statements + self.init_statements:
+            conn.execute(sql)
+        return conn
+
+    def add_statements(self, init_statements: Optional[Sequence[str]] = None,
+                       setup_statements: Optional[Sequence[str]] = None):
+        """
+        Agrega sentencias de otra registración sobre la conexión ya abierta
+
+        Las nuevas se ejecutan ahora en la conexión escritora; los cursores
+        existentes aplican las init nuevas la próxima vez que su thread los pida.
+        """
+        with self.write_lock:
+            for sql in setup_statements or []:
+                if sql not in self.setup_statements:
+                    self.writer.execute(sql)
+                    self.setup_statements.append(sql)
+            for sql in init_statements or []:
+                if sql not in self.init_statements:
+                    self.writer.execute(sql)
+                    self.init_statements.append(sql)
+
+    # ---------- lecturas ----------
+
+    def cursor(self):
+        """Cursor del thread actual (se crea la primera vez)"""
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is not None and getattr(self._local, 'generation', -1) == self._generation:
+            self._apply_init(cursor)
+            return cursor
+
+        cursor = self.writer.cursor()
+        self._local.cursor = cursor
+        self._local.generation = self._generation
+        self._local.applied = 0
+        self._apply_init(cursor)
+        with self._cursors_lock:
+            self._cursors.append(cursor)
+        self.stats['cursors_created'] += 1
+        return cursor
+
+    def _apply_init(self, cursor):
+        """Ejecuta en el cursor del thread las init_statements que aún no corrió"""
+        pending = self.init_statements[self._local.applied:]
+        for sql in pending:
+            cursor.execute(sql)
+        self._local.applied += len(pending)
+
+    def release_cursor(self):
+        """Cierra el cursor del thread actual (p.ej. al terminar un worker)"""
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            return
+        self._local.cursor = None
+        with self._cursors_lock:
+            if cursor in self._cursors:
+                self._cursors.remove(cursor)
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+    def execute(self, sql: str, params: Optional[Sequence[Any]] = None):
+        """Ejecuta una consulta en el cursor del thread actual"""
+        self.stats['statements_executed'] += 1
+        cursor = self.cursor()
+        return cursor.execute(sql, params) if params is not None else cursor.execute(sql)
+
+    # ---------- sentencias con nombre ----------
+
+    def register_statement(self, name: str, sql: str):
+        """Registra una sentencia reutilizable (idempotente)"""
+        self._statements.setdefault(name, sql)
+
+    def run(self, name: str, params: Optional[Sequence[Any]] = None):
+        """Ejecuta una sentencia registrada con `register_statement`"""
+        try:
+            sql = self._statements[name]
+        except KeyError:
+            raise KeyError(f"Sentencia no registrada: {name}") from None
+        return self.execute(sql, params)
+
+    # ---------- escrituras ----------
+
+    @contextmanager
+    def transaction(self) -> Iterator[Any]:
+        """
+        Transacción sobre la conexión escritora única
+
+        Hace COMMIT al salir y ROLLBACK si hay excepción.
+        """
+        with self.write_lock:
+            self.writer.execute("BEGIN")
+            try:
+                yield self.writer
+                self.writer.execute("COMMIT")
+            except Exception:
+                self.writer.execute("ROLLBACK")
+                raise
+            self.stats['transactions'] += 1
+
+    def write(self, sql: str, params: Optional[Sequence[Any]] = None):
+        """Ejecuta una sentencia de escritura fuera de transacción explícita"""
+        with self.write_lock:
+            self.stats['statements_executed'] += 1
+            return self.writer.execute(sql, params) if params is not None else self.writer.execute(sql)
+
+    # ---------- salud ----------
+
+    def health_check(self, reconnect: bool = True) -> bool:
+        """
+        Verifica la conexión escritora con `SELECT 1`
+
+        Args:
+            reconnect: Reabrir la conexión si no responde
+
+        Raises:
+            ConnectionHealthError: Si no responde y no se pudo reabrir
+        """
+        try:
+            with self.write_lock:
+                self.writer.execute("SELECT 1").fetchone()
+            return True
+        except Exception as e:
+            if not reconnect:
+                raise ConnectionHealthError(f"DuckDB {self.db_path} no responde: {e}") from e
+            logger.warning(f"⚠️ DuckDB {self.db_path} no responde ({e}), reconectando")
+
+        try:
+            self._reconnect()
+            with self.write_lock:
+                self.writer.execute("SELECT 1").fetchone()
+            return True
+        except Exception as e:
+            raise ConnectionHealthError(f"No se pudo reconectar a DuckDB {self.db_path}: {e}") from e
+
+    def _reconnect(self):
+        with self.write_lock:
+            self._close_all()
+            self.writer = self._open()
+            self._generation += 1
+            self.stats['reconnects'] += 1
+
+    def _close_all(self):
+        with self._cursors_lock:
+            cursors, self._cursors = self._cursors, []
+        for cursor in cursors:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Cierra cursores y conexión escritora"""
+        with self.write_lock:
+            self._close_all()
+            self._generation += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cursors_lock:
+            open_cursors = len(self._cursors)
+        return {
+            'db_path': self.db_path,
+            'open_cursors': open_cursors,
+            'registered_statements': len(self._statements),
+            **self.stats,
+        }
+
+
+class ConnectionManager:
+    """
+    🔌 Registro de conexiones del proceso
+
+    Singleton: una DuckDBConnection por archivo y un pool Redis por URL.
+    """
+
+    _instance: Optional['ConnectionManager'] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._duckdb: Dict[str, DuckDBConnection] = {}
+        self._redis_pools: Dict[str, Any] = {}
+
+    @classmethod
+    def get_instance(cls) -> 'ConnectionManager':
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def _key(db_path: PathLike) -> str:
+        path = str(db_path)
+        return path if path == ':memory:' else str(Path(path).resolve())
+
+    # ---------- DuckDB ----------
+
+    def duckdb(self, db_path: PathLike, init_statements: Optional[Sequence[str]] = None,
+               setup_statements: Optional[Sequence[str]] = None) -> DuckDBConnection:
+        """
+        Conexión de larga vida para `db_path` (se abre la primera vez)
+
+        Si ya está abierta, las sentencias de esta registración que aún no
+        tenga se agregan (ver DuckDBConnection.add_statements).
+        """
+        key = self._key(db_path)
+        db = self._duckdb.get(key)
+        if db is None:
+            with self._lock:
+                db = self._duckdb.get(key)
+                if db is None:
+                    db = DuckDBConnection(key, init_statements=init_statements,
+                                          setup_statements=setup_statements)
+                    self._duckdb[key] = db
+                    logger.debug(f"🦆 Conexión DuckDB abierta: {key}")
+                    return db
+        if init_statements or setup_statements:
+            db.add_statements(init_statements, setup_statements)
+        return db
+
+    def release_duckdb(self, db_path: PathLike):
+        """Libera el cursor del thread actual para `db_path`"""
+        db = self._duckdb.get(self._key(db_path))
+        if db is not None:
+            db.release_cursor()
+
+    def close_duckdb(self, db_path: PathLike):
+        """Cierra y olvida la conexión de `db_path`"""
+        with self._lock:
+            db = self._duckdb.pop(self._key(db_path), None)
+        if db is not None:
+            db.close()
+
+    # ---------- Redis ----------
+
+    def redis(self, url: str = "redis://localhost:6379/0", **client_kwargs):
+        """
+        Cliente Redis sobre el pool compartido de `url`
+
+        Returns:
+            redis.Redis o None si la librería no está instalada
+        """
+        if not REDIS_AVAILABLE:
+            return None
+
+        pool_key = f"{url}|{sorted(client_kwargs.items())}"
+        pool = self._redis_pools.get(pool_key)
+        if pool is None:
+            with self._lock:
+                pool = self._redis_pools.get(pool_key)
+                if pool is None:
+                    pool = redis.ConnectionPool.from_url(url, **client_kwargs)
+                    self._redis_pools[pool_key] = pool
+        return redis.Redis(connection_pool=pool)
+
+    # ---------- salud / cierre ----------
+
+    def health_check(self) -> Dict[str, bool]:
+        """Health check de todas las conexiones registradas"""
+        results = {}
+        for key, db in list(self._duckdb.items()):
+            try:
+                results[f"duckdb:{key}"] = db.health_check()
+            except ConnectionHealthError as e:
+                logger.error(f"❌ {e}")
+                results[f"duckdb:{key}"] = False
+
+        for pool_key, pool in list(self._redis_pools.items()):
+            try:
+                results[f"redis:{pool_key.split('|')[0]}"] = bool(redis.Redis(connection_pool=pool).ping())
+            except Exception as e:
+                logger.error(f"❌ Redis no responde: {e}")
+                results[f"redis:{pool_key.split('|')[0]}"] = False
+        return results
+
+    def close_all(self):
+        """Cierra todas las conexiones (shutdown del proceso)"""
+        with self._lock:
+            dbs, self._duckdb = list(self._duckdb.values()), {}
+            pools, self._redis_pools = list(self._redis_pools.values()), {}
+        for db in dbs:
+            db.close()
+        for pool in pools:
+            try:
+                pool.disconnect()
+            except Exception:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'duckdb': [db.get_stats() for db in self._duckdb.values()],
+            'redis_pools': len(self._redis_pools),
+        }
+
+
+# ---------- Funciones de conveniencia ----------
+
+def get_duckdb_connection(db_path: PathLike):
+    """Cursor DuckDB del thread actual para `db_path`"""
+    return ConnectionManager.get_instance().duckdb(db_path).cursor()
+
+
+def release_duckdb_connection(db_path: PathLike):
+    """Libera el cursor del thread actual para `db_path`"""
+    ConnectionManager.get_instance().release_duckdb(db_path)
+
+
+def get_redis_client(url: str = "redis://localhost:6379/0", **client_kwargs):
+    """Cliente Redis sobre el pool compartido del proceso"""
+    return ConnectionManager.get_instance().redis(url, **client_kwargs)
+
+
+def initialize_connections(duckdb_paths: Optional[Iterable[PathLike]] = None,
+                           redis_url: Optional[str] = None) -> ConnectionManager:
+    """
+    Abre por adelantado las conexiones del proceso y verifica su salud
+
+    Raises:
+        ConnectionHealthError: Si alguna conexión no responde
+    """
+    manager = ConnectionManager.get_instance()
+    for path in duckdb_paths or []:
+        manager.duckdb(path).health_check()
+    if redis_url:
+        client = manager.redis(redis_url)
+        if client is not None:
+            try:
+                client.ping()
+            except Exception as e:
+                raise ConnectionHealthError(f"Redis {redis_url} no responde: {e}") from e
+    logger.info("🔌 Conexiones inicializadas")
+    return manager
@@ -11,17 +11,27 @@ Scraping → Código Interno → Master Productos → Master Precios → Alertas
 
 import asyncio
 import logging
-from datetime import datetime, date, time
+import os
+from datetime import datetime, date, time, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 import threading
 import time as time_module
 
 from .master_products_system import MasterProductsManager, process_scraping_batch
-from .master_prices_system import MasterPricesManager, setup_telegram_alerts_integration, process_price_update_from_scraping
+from .master_prices_system import MasterPricesManager, setup_telegram_alerts_integration, process_price_updates_from_scraping
+from .closure_pipeline import ClosurePipeline, ClosureStep
 
 logger = logging.getLogger(__name__)
 
+# Refresco de tablas bot.* (PostgreSQL) como paso del cierre, si está disponible
+try:
+    from alerts_bot.maintenance import refresh_bot_tables
+    BOT_REFRESH_AVAILABLE = True
+except ImportError:
+    refresh_bot_tables = None
+    BOT_REFRESH_AVAILABLE = False
+
 
 class IntegratedMasterSystem:
     """Sistema integrado de Masters con automatización completa"""
@@ -40,6 +50,12 @@ class IntegratedMasterSystem:
         self.scheduler_thread = None
         self.running = False
         
+        # Cierre diario como DAG paralelo
+        self.closure_max_workers = 4
+        self.closure_target_seconds = 120.0
+        self._closure_pipeline: Optional[ClosurePipeline] = None
+        self.last_closure_metrics: Optional[Dict[str, Any]] = None
+        
         logger.info("Integrated Master System initialized")
     
     async def initialize(self):
@@ -67,9 +83,8 @@ class IntegratedMasterSystem:
                     
                     # Verificar si es medianoche (00:00 - 00:05)
                     if now.hour == 0 and now.minute < 5:
-                        # Ejecutar cierre de medianoche
-                        asyncio.run(self.prices_manager.midnight_closure())
-                        self.products_manager.save_to_storage()
+                        # Ejecutar cierre de medianoche (el scraping sigue en paralelo)
+                        self.run_midnight_closure()
                         
                         logger.info("Scheduled midnight closure completed")
                         
@@ -90,6 +105,64 @@ class IntegratedMasterSystem:
         
         logger.info("Simple midnight scheduler configured")
     
+    def _build_closure_pipeline(self, closed_date: date) -> ClosurePipeline:
+        """
+        DAG del cierre diario
+        
+        cache_reset ─→ snapshot_persist ─┬→ extremes_update
+                                         ├→ retailer_rollups
+                                         └→ bot_refresh (si hay PostgreSQL)
+        products_persist (independiente)
+        """
+        prices = self.prices_manager
+        closed: Dict[str, Any] = {}
+        
+        def cache_reset():
+            # Swap del cache: el scraping escribe en el día nuevo desde aquí
+            closed['day'] = prices.detach_closed_day(closed_date)
+        
+        steps = [
+            ClosureStep('cache_reset', cache_reset),
+            ClosureStep('snapshot_persist', lambda: prices.persist_closed_day(closed_date, closed.get('day')),
+                        depends_on=('cache_reset',)),
+            ClosureStep('products_persist', self.products_manager.save_to_storage),
+            ClosureStep('extremes_update', lambda: prices.update_historical_flags(closed_date),
+                        depends_on=('snapshot_persist',)),
+            ClosureStep('retailer_rollups', lambda: prices.refresh_retailer_rollups(closed_date),
+                        depends_on=('snapshot_persist',)),
+        ]
+        
+        bot_dsn = os.getenv('DATABASE_URL') or os.getenv('PG_DSN')
+        if BOT_REFRESH_AVAILABLE and bot_dsn:
+            steps.append(ClosureStep('bot_refresh', lambda: refresh_bot_tables(bot_dsn),
+                                     depends_on=('snapshot_persist',)))
+        
+        return ClosurePipeline(steps, max_workers=self.closure_max_workers,
+                               target_seconds=self.closure_target_seconds)
+    
+    def run_midnight_closure(self, closed_date: date = None) -> Dict[str, Any]:
+        """
+        Ejecutar el cierre diario (bloqueante, pensado para el thread del scheduler)
+        
+        Args:
+            closed_date: Día a cerrar (default: ayer)
+        
+        Returns:
+            Métricas del cierre
+        """
+        closed_date = closed_date or date.today() - timedelta(days=1)
+        logger.info(f"Starting midnight closure for {closed_date}...")
+        
+        self._closure_pipeline = self._build_closure_pipeline(closed_date)
+        self.last_closure_metrics = self._closure_pipeline.run()
+        return self.last_closure_metrics
+    
+    def get_closure_progress(self) -> Dict[str, Any]:
+        """Progreso del cierre en curso (o del último ejecutado)"""
+        if self._closure_pipeline is None:
+            return {'finished': 0, 'total': 0, 'percent': 0.0, 'running': []}
+        return self._closure_pipeline.progress()
+    
     async def process_scraping_results(self, scraping_results: List[Dict[str, Any]], 
                                      retailer: str = None) -> Dict[str, Any]:
         """
@@ -128,33 +201,27 @@ class IntegratedMasterSystem:
                 'errors': products_result['errors'].copy()
             })
             
-            # FASE 2: Procesar Master de Precios (para cada producto)
+            # FASE 2: Procesar Master de Precios (un solo batch para todos los productos)
+            price_items = []
             for scraping_data in scraping_results:
-                try:
-                    # Obtener producto del master (debe existir después de Fase 1)
-                    link = scraping_data.get('link', scraping_data.get('product_url', ''))
-                    product = self.products_manager.get_product_by_link(link)
-                    
-                    if not product:
-                        processing_stats['errors'].append(f"Product not found in master: {link}")
-                        continue
-                    
-                    # Procesar precio
-                    price_result = await process_price_update_from_scraping(
-                        codigo_interno=product.codigo_interno,
-                        retailer=product.retailer,
-                        scraping_data=scraping_data,
-                        prices_manager=self.prices_manager
-                    )
-                    
-                    if price_result['updated']:
-                        processing_stats['prices_updated'] += 1
-                        processing_stats['alerts_generated'] += price_result['alerts_generated']
-                    
-                except Exception as e:
-                    error_msg = f"Error processing price for {scraping_data.get('link', 'unknown')}: {e}"
-                    logger.error(error_msg)
-                    processing_stats['errors'].append(error_msg)
+                # Obtener producto del master (debe existir después de Fase 1)
+                link = scraping_data.get('link', scraping_data.get('product_url', ''))
+                product = self.products_manager.get_product_by_link(link)
+                
+                if not product:
+                    processing_stats['errors'].append(f"Product not found in master: {link}")
+                    continue
+                
+                price_items.append((product.codigo_interno, product.retailer, scraping_data))
+            
+            try:
+                price_result = await process_price_updates_from_scraping(price_items, self.prices_manager)
+                processing_stats['prices_updated'] += price_result['updated']
+                processing_stats['alerts_generated'] += price_result['alerts_generated']
+            except Exception as e:
+                error_msg = f"Error processing price batch ({len(price_items)} products): {e}"
+                logger.error(error_msg)
+                processing_stats['errors'].append(error_msg)
             
             # FASE 3: Guardar cambios
             await self._save_all_changes()
@@ -193,12 +260,14 @@ class IntegratedMasterSystem:
         # Información de precios
         current_price = self.prices_manager.get_snapshot_today(codigo_interno)
         historical_stats = self.prices_manager.get_historical_price_stats(codigo_interno)
+        price_extremes = self.prices_manager.get_price_extremes(codigo_interno)
         price_evolution = self.prices_manager.get_daily_price_evolution(codigo_interno)
         
         return {
             'product_info': product.to_dict(),
             'current_price': current_price.to_dict() if current_price else None,
             'historical_stats': historical_stats,
+            'price_extremes': price_extremes,
             'price_evolution': price_evolution,
             'complete_info_retrieved_at': datetime.now().isoformat()
         }
@@ -247,8 +316,7 @@ class IntegratedMasterSystem:
             target_date = date.today()
         
         try:
-            import duckdb
-            conn = duckdb.connect(str(self.prices_manager.duckdb_path))
+            self.prices_manager._ensure_table_exists()
             
             # Estadísticas de alertas del día
             query = """
@@ -264,8 +332,7 @@ class IntegratedMasterSystem:
             WHERE fecha = ?
             """
             
-            result = conn.execute(query, [target_date.isoformat()]).fetchone()
-            conn.close()
+            result = self.prices_manager._db.execute(query, [target_date.isoformat()]).fetchone()
             
             if result:
                 return {
@@ -299,16 +366,17 @@ class IntegratedMasterSystem:
                 'scheduler_running': self.running,
                 'scheduler_thread_alive': self.scheduler_thread.is_alive() if self.scheduler_thread else False,
                 'base_path': str(self.base_path),
-                'next_midnight_closure': '00:00 daily'
+                'next_midnight_closure': '00:00 daily',
+                'last_closure': self.last_closure_metrics
             }
         }
     
     async def manual_midnight_closure(self):
         """Ejecutar cierre de medianoche manualmente (para testing)"""
         logger.info("Manual midnight closure initiated")
-        await self.prices_manager.midnight_closure()
-        self.products_manager.save_to_storage()
+        metrics = await asyncio.to_thread(self.run_midnight_closure)
         logger.info("Manual midnight closure completed")
+        return metrics
     
     async def shutdown(self):
         """Apagar sistema limpiamente (async)"""
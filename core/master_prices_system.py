@@ -11,19 +11,31 @@ Características:
 - Alertas automáticas integradas con Telegram
 - Histórico completo para análisis min/max
 - Cierre automático a medianoche
+- Persistencia incremental: solo snapshots modificados (deltas + compactación)
+- WAL intradía con group commit: recuperación del día tras una caída
 """
 
 import logging
 import os
+import threading
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field, asdict
 from pathlib import Path
+import numpy as np
 import pandas as pd
-import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
 import asyncio
 import json
 
+from .connection_manager import ConnectionManager
+from .price_history import PriceHistoryStore, daily_parquet_file, write_daily_parquet
+from .price_snapshot_store import PriceSnapshotStore, SnapshotRow
+from .price_wal import PriceWriteAheadLog
+
+logger = logging.getLogger(__name__)
+
 # Importar sistemas usando adapters V5 (mantiene ML V5 avanzado)
 try:
     from ..utils.ml_adapters import GlitchDetectionAdapter as GlitchDetectionSystem
@@ -50,7 +62,25 @@ try:
 except ImportError:
     ALERTS_CONFIG_AVAILABLE = False
 
-logger = logging.getLogger(__name__)
+
+def _chunk_timestamp(records: Dict[str, Dict[str, Any]]) -> Optional[datetime]:
+    """Timestamp más reciente de un grupo de registros del WAL"""
+    timestamps = [r['ts'] for r in records.values() if r.get('ts') is not None]
+    return max(timestamps) if timestamps else None
+
+
+def _get_alert_thresholds(retailer: str, prices_manager=None) -> Dict[str, float]:
+    """Umbrales de alerta por retailer (configuración dinámica o valores por defecto)"""
+    config = getattr(prices_manager, 'alerts_config', None) if ALERTS_CONFIG_AVAILABLE else None
+    if config:
+        return {
+            'flash_sale': get_price_threshold('flash_sale', retailer),
+            'price_drop': get_price_threshold('price_drop', retailer),
+            'price_increase': get_price_threshold('price_increase', retailer),
+            'volatility': get_price_threshold('volatility', retailer),
+        }
+    # Fallback a valores hardcoded
+    return {'flash_sale': -15.0, 'price_drop': -10.0, 'price_increase': 15.0, 'volatility': 8.0}
 
 
 @dataclass
@@ -80,6 +110,10 @@ class DailyPriceSnapshot:
     
     # === CONTROL DE ALERTAS ===
     alertas_enviadas: int = 0         # Contador para evitar spam
+    tipos_alertas: List[str] = field(default_factory=list)  # Tipos de alertas enviadas
+    
+    # === CONTROL DE PERSISTENCIA ===
+    dirty: bool = field(default=True, repr=False, compare=False)  # Pendiente de guardar
     
     def __post_init__(self):
         """Cálculos automáticos"""
@@ -136,6 +170,7 @@ class DailyPriceSnapshot:
             price_change_pct = abs(self.precio_min_dia - old_min) / old_min * 100
             self.volatilidad_dia = max(self.volatilidad_dia, price_change_pct)
         
+        self.dirty = True
         return True
     
     async def send_price_alert_if_significant(self, nombre_producto: str = None) -> bool:
@@ -210,18 +245,11 @@ class DailyPriceSnapshot:
             return alerts  # No hay precio anterior para comparar o precio actual es 0 (promoción agotada)
         
         # Obtener umbrales dinámicos desde configuración
-        if ALERTS_CONFIG_AVAILABLE and hasattr(self, '_master_prices_manager'):
-            config = getattr(self._master_prices_manager, 'alerts_config', None)
-            flash_sale_threshold = get_price_threshold('flash_sale', self.retailer) if config else -15.0
-            price_drop_threshold = get_price_threshold('price_drop', self.retailer) if config else -10.0
-            price_increase_threshold = get_price_threshold('price_increase', self.retailer) if config else 15.0
-            volatility_threshold = get_price_threshold('volatility', self.retailer) if config else 8.0
-        else:
-            # Fallback a valores hardcoded
-            flash_sale_threshold = -15.0
-            price_drop_threshold = -10.0
-            price_increase_threshold = 15.0
-            volatility_threshold = 8.0
+        thresholds = _get_alert_thresholds(self.retailer, getattr(self, '_master_prices_manager', None))
+        flash_sale_threshold = thresholds['flash_sale']
+        price_drop_threshold = thresholds['price_drop']
+        price_increase_threshold = thresholds['price_increase']
+        volatility_threshold = thresholds['volatility']
         
         # Calcular cambio porcentual
         change_pct = abs(self.cambio_porcentaje)
@@ -343,7 +371,7 @@ class DailyPriceSnapshot:
             
             # Control de alertas
             'alertas_enviadas': self.alertas_enviadas,
-            'tipos_alertas': getattr(self, 'tipos_alertas', '[]'),
+            'tipos_alertas': json.dumps(list(self.tipos_alertas)),
             
             # Flags de precio histórico
             'es_precio_historico_min': getattr(self, 'es_precio_historico_min', False),
@@ -367,20 +395,71 @@ class DailyPriceSnapshot:
         return 0.0
 
 
+class PriceSnapshotView(SnapshotRow):
+    """Vista por SKU del PriceSnapshotStore con la misma API que DailyPriceSnapshot"""
+    
+    __slots__ = ()
+    
+    _calculate_precio_min = DailyPriceSnapshot._calculate_precio_min
+    update_prices = DailyPriceSnapshot.update_prices
+    send_price_alert_if_significant = DailyPriceSnapshot.send_price_alert_if_significant
+    check_alert_conditions = DailyPriceSnapshot.check_alert_conditions
+    to_dict = DailyPriceSnapshot.to_dict
+    _calculate_discount_percentage = DailyPriceSnapshot._calculate_discount_percentage
+
+
+# Columnas de la tabla master_precios en DuckDB (subconjunto de to_dict)
+PRICE_TABLE_COLUMNS = [
+    'codigo_interno', 'fecha', 'retailer',
+    'precio_normal', 'precio_oferta', 'precio_tarjeta', 'precio_min_dia',
+    'cambios_en_dia', 'precio_anterior_dia', 'cambio_porcentaje', 'cambio_absoluto',
+    'timestamp_creacion', 'timestamp_ultima_actualizacion',
+    'alertas_enviadas', 'tipos_alertas',
+    'es_precio_historico_min', 'es_precio_historico_max',
+    'volatilidad_dia'
+]
+
+
 class MasterPricesManager:
     """Gestor del Master de Precios con snapshot diario y alertas"""
     
     def __init__(self, base_path: str = "./data"):
         self.base_path = Path(base_path)
         self.parquet_path = self.base_path / "master" / "precios"  # Particionado por mes
+        self.deltas_path = self.base_path / "master" / "precios_deltas"  # Deltas intradía por fecha
+        self.wal_path = self.base_path / "master" / "precios_wal"  # WAL de actualizaciones por fecha
         self.duckdb_path = self.base_path / "warehouse_master.duckdb"
         
         # Asegurar directorios
         self.parquet_path.mkdir(parents=True, exist_ok=True)
+        self.deltas_path.mkdir(parents=True, exist_ok=True)
         
-        # Cache para el día actual (para evitar lecturas constantes)
-        self._today_cache: Dict[str, DailyPriceSnapshot] = {}  # codigo_interno -> snapshot
+        # Cache columnar del día actual: codigo_interno -> PriceSnapshotView
         self._cache_date = date.today()
+        self._today_cache = PriceSnapshotStore(self._cache_date, view_class=PriceSnapshotView)
+        self._today_cache.manager = self
+        self._cache_loaded = False  # Cache de _cache_date ya cargado desde disco/WAL
+        
+        # Swap de día (cierre) vs escrituras: cache y WAL se leen/cambian juntos
+        self._day_lock = threading.RLock()
+        # Días en cierre: su WAL lo persiste el cierre, no la recuperación
+        self._closing_dates: set = set()
+        # Un guardado/compactación a la vez por fecha
+        self._date_locks: Dict[date, threading.RLock] = {}
+        self._date_locks_guard = threading.Lock()
+        
+        # Persistencia incremental: deltas por día antes de compactar
+        self.delta_compaction_threshold = 20  # Deltas por día antes de compactar
+        
+        # WAL del día en cache (se abre y reproduce al cargar el cache)
+        self.wal_enabled = True
+        self._wal: Optional[PriceWriteAheadLog] = None
+        
+        # DuckDB vía ConnectionManager: tabla verificada una vez por instancia
+        self._table_ready = False
+        
+        # Consultas de histórico directo sobre los Parquet diarios
+        self.history = PriceHistoryStore(self.parquet_path, self.deltas_path)
         
         # Para integrar alertas
         self.alert_callbacks: List[callable] = []
@@ -452,11 +531,16 @@ class MasterPricesManager:
         
         return alert
     
+    @property
+    def _db(self):
+        """Conexión DuckDB de larga vida (compartida por el proceso)"""
+        return ConnectionManager.get_instance().duckdb(self.duckdb_path)
+    
     def _ensure_table_exists(self):
         """Asegurar que la tabla de precios existe en DuckDB"""
+        if self._table_ready:
+            return
         try:
-            conn = duckdb.connect(str(self.duckdb_path))
-            
             create_table_sql = """
             CREATE TABLE IF NOT EXISTS master_precios (
                 codigo_interno VARCHAR,
@@ -481,7 +565,7 @@ class MasterPricesManager:
             )
             """
             
-            conn.execute(create_table_sql)
+            self._db.write(create_table_sql)
             
             # Índices para queries comunes
             indexes = [
@@ -494,65 +578,169 @@ class MasterPricesManager:
             
             for index_sql in indexes:
                 try:
-                    conn.execute(index_sql)
+                    self._db.write(index_sql)
                 except Exception as e:
                     logger.warning(f"Could not create index: {e}")
             
-            conn.close()
+            # Extremos históricos por SKU, mantenidos incrementalmente en cada cierre
+            self._db.write("""
+            CREATE TABLE IF NOT EXISTS price_extremes (
+                codigo_interno VARCHAR PRIMARY KEY,
+                precio_historico_min INTEGER,
+                fecha_historico_min DATE,
+                precio_historico_max INTEGER,
+                fecha_historico_max DATE,
+                ultima_fecha DATE
+            )
+            """)
+            
+            # Resumen diario por retailer (recalculado en el cierre)
+            self._db.write("""
+            CREATE TABLE IF NOT EXISTS master_precios_retailer_diario (
+                fecha DATE,
+                retailer VARCHAR,
+                productos INTEGER,
+                precio_promedio DOUBLE,
+                productos_con_cambios INTEGER,
+                bajadas INTEGER,
+                subidas INTEGER,
+                cambio_promedio_pct DOUBLE,
+                alertas_enviadas INTEGER
+            )
+            """)
+            
+            self._db.register_statement(
+                'previous_day_price',
+                "SELECT precio_min_dia FROM master_precios WHERE codigo_interno = ? AND fecha = ?"
+            )
+            self._db.register_statement(
+                'price_extremes',
+                "SELECT precio_historico_min, fecha_historico_min, precio_historico_max, "
+                "fecha_historico_max, ultima_fecha FROM price_extremes WHERE codigo_interno = ?"
+            )
+            self._table_ready = True
             
         except Exception as e:
             logger.error(f"Error ensuring prices table exists: {e}")
     
+    def _date_lock(self, target_date: date) -> threading.RLock:
+        """Lock de guardado/compactación de una fecha"""
+        with self._date_locks_guard:
+            return self._date_locks.setdefault(target_date, threading.RLock())
+    
     def _load_today_cache(self):
-        """Cargar snapshots del día actual en cache"""
+        """Cargar snapshots del día actual en cache (vectorizado)"""
         today = date.today()
         
         # Si ya tenemos el cache del día actual, no recargar
-        if self._cache_date == today and self._today_cache:
+        if self._cache_date == today and self._cache_loaded:
             return
         
+        with self._day_lock:
+            if self._cache_date == today and self._cache_loaded:
+                return
+            self._load_today_cache_locked(today)
+    
+    def _load_today_cache_locked(self, today: date):
+        if self._wal is not None and self._cache_date != today:
+            self._wal.close()
+            self._wal = None
+        
         self._today_cache.clear()
+        self._today_cache.fecha = today
         self._cache_date = today
         
         try:
-            # Intentar cargar desde Parquet particionado
-            month_path = self.parquet_path / f"year={today.year}" / f"month={today.month:02d}"
-            parquet_file = month_path / f"precios_{today.strftime('%Y%m%d')}.parquet"
+            # WAL de días anteriores que no llegaron al cierre: persistirlos primero
+            if self.wal_enabled:
+                self._recover_stale_wal(today)
             
-            if parquet_file.exists():
-                df = pd.read_parquet(parquet_file)
-                df_today = df[df['fecha'] == today.isoformat()]
-                
-                for _, row in df_today.iterrows():
-                    snapshot_dict = row.to_dict()
-                    
-                    # Convertir strings a tipos correctos
-                    if isinstance(snapshot_dict['fecha'], str):
-                        snapshot_dict['fecha'] = datetime.fromisoformat(snapshot_dict['fecha']).date()
-                    if isinstance(snapshot_dict['timestamp_creacion'], str):
-                        snapshot_dict['timestamp_creacion'] = datetime.fromisoformat(snapshot_dict['timestamp_creacion'])
-                    if isinstance(snapshot_dict['timestamp_ultima_actualizacion'], str):
-                        snapshot_dict['timestamp_ultima_actualizacion'] = datetime.fromisoformat(snapshot_dict['timestamp_ultima_actualizacion'])
-                    if isinstance(snapshot_dict['tipos_alertas'], str):
-                        snapshot_dict['tipos_alertas'] = json.loads(snapshot_dict['tipos_alertas']) if snapshot_dict['tipos_alertas'] else []
-                    
-                    # Filtrar campos que no son del constructor
-                    constructor_fields = {
-                        'codigo_interno', 'fecha', 'retailer', 
-                        'precio_normal', 'precio_oferta', 'precio_tarjeta',
-                        'precio_anterior_dia'
-                    }
-                    filtered_dict = {k: v for k, v in snapshot_dict.items() if k in constructor_fields}
-                    
-                    snapshot = DailyPriceSnapshot(**filtered_dict)
-                    self._today_cache[snapshot.codigo_interno] = snapshot
-                
+            # Cargar desde Parquet particionado + deltas pendientes de compactar
+            self._today_cache = self._load_day_store(today)
+            
+            if self._today_cache:
                 logger.info(f"Loaded {len(self._today_cache)} price snapshots for today")
             
+            # Reproducir el WAL del día (actualizaciones aún no guardadas)
+            if self.wal_enabled and self._wal is None:
+                self._wal = PriceWriteAheadLog(self._wal_dir(today))
+                replayed = self._replay_wal(self._today_cache, self._wal, today)
+                if replayed:
+                    logger.info(f"📝 Replayed {replayed} price updates from WAL "
+                                f"({len(self._today_cache)} snapshots in cache)")
+            
+            self._cache_loaded = True
+            
         except Exception as e:
             logger.error(f"Error loading today's price cache: {e}")
     
-    def get_snapshot_today(self, codigo_interno: str) -> Optional[DailyPriceSnapshot]:
+    def _load_day_store(self, target_date: date) -> PriceSnapshotStore:
+        """Store columnar de un día desde Parquet base + deltas"""
+        df = self._read_daily_frame(target_date)
+        if df is not None:
+            df_day = df[df['fecha'] == target_date.isoformat()]
+            store = PriceSnapshotStore.from_frame(df_day, target_date, view_class=PriceSnapshotView)
+        else:
+            store = PriceSnapshotStore(target_date, view_class=PriceSnapshotView)
+        store.manager = self
+        return store
+    
+    def _wal_dir(self, target_date: date) -> Path:
+        """Directorio del WAL de un día"""
+        return self.wal_path / target_date.strftime('%Y%m%d')
+    
+    def _replay_wal(self, store: PriceSnapshotStore, wal: PriceWriteAheadLog, target_date: date) -> int:
+        """
+        Reaplicar las actualizaciones registradas en el WAL sobre `store`
+        
+        Registros consecutivos se agrupan en batches mientras no repitan SKU,
+        preservando el orden (y por lo tanto cambios_en_dia y volatilidad).
+        
+        Returns:
+            Número de registros reaplicados
+        """
+        replayed = 0
+        chunk: Dict[str, Dict[str, Any]] = {}
+        for batch in wal.replay():
+            for record in batch.to_pylist():
+                if record['codigo_interno'] in chunk:
+                    self._apply_price_records(store, chunk, _chunk_timestamp(chunk), target_date)
+                    chunk = {}
+                chunk[record['codigo_interno']] = record
+                replayed += 1
+        if chunk:
+            self._apply_price_records(store, chunk, _chunk_timestamp(chunk), target_date)
+        return replayed
+    
+    def _recover_stale_wal(self, today: date):
+        """Persistir el WAL de días anteriores (caída antes del cierre diario)"""
+        if not self.wal_path.exists():
+            return
+        
+        for wal_dir in sorted(self.wal_path.iterdir()):
+            try:
+                wal_date = datetime.strptime(wal_dir.name, '%Y%m%d').date()
+            except ValueError:
+                continue
+            if wal_date >= today or wal_date in self._closing_dates:
+                continue
+            
+            with self._date_lock(wal_date):
+                if not wal_dir.exists():
+                    continue
+                wal = PriceWriteAheadLog(wal_dir)
+                store = self._load_day_store(wal_date)
+                replayed = self._replay_wal(store, wal, wal_date)
+                wal.close()
+                dirty_rows = store.dirty_rows()
+                if len(dirty_rows):
+                    self._persist_snapshot_batch(store.to_record_batch(dirty_rows), wal_date)
+                    self.compact_daily_deltas(wal_date)
+                wal.checkpoint()
+                wal.close(remove=True)
+            logger.info(f"📝 Recovered {replayed} price updates from WAL of {wal_date}")
+    
+    def get_snapshot_today(self, codigo_interno: str) -> Optional[PriceSnapshotView]:
         """Obtener snapshot del día actual para un producto"""
         self._load_today_cache()
         return self._today_cache.get(codigo_interno)
@@ -562,15 +750,8 @@ class MasterPricesManager:
         try:
             yesterday = date.today() - timedelta(days=1)
             
-            conn = duckdb.connect(str(self.duckdb_path))
-            query = """
-            SELECT precio_min_dia 
-            FROM master_precios 
-            WHERE codigo_interno = ? AND fecha = ?
-            """
-            
-            result = conn.execute(query, [codigo_interno, yesterday.isoformat()]).fetchone()
-            conn.close()
+            self._ensure_table_exists()
+            result = self._db.run('previous_day_price', [codigo_interno, yesterday.isoformat()]).fetchone()
             
             return result[0] if result else 0
             
@@ -578,6 +759,56 @@ class MasterPricesManager:
             logger.error(f"Error getting previous day price: {e}")
             return 0
     
+    def get_previous_day_prices(self, codigos: List[str], target_date: date = None) -> Dict[str, int]:
+        """
+        Precio mínimo del día anterior para varios SKUs en una sola lectura
+        
+        Usa la partición Parquet de ayer (base + deltas); si no existe,
+        una única query DuckDB con join contra la lista de SKUs.
+        
+        Args:
+            target_date: Día de referencia (default: hoy)
+        
+        Returns:
+            codigo_interno -> precio_min_dia (solo SKUs con dato)
+        """
+        if not codigos:
+            return {}
+        
+        yesterday = (target_date or date.today()) - timedelta(days=1)
+        codigos_df = pd.DataFrame({'codigo_interno': list(codigos)})
+        
+        try:
+            df = self._read_daily_frame(yesterday)
+            if df is not None:
+                df = df[df['codigo_interno'].isin(codigos_df['codigo_interno'])]
+                return dict(zip(df['codigo_interno'], df['precio_min_dia'].fillna(0).astype(int)))
+            
+            if not self.duckdb_path.exists():
+                return {}
+            
+            self._ensure_table_exists()
+            conn = self._db.cursor()
+            conn.register("codigos_df", codigos_df)
+            try:
+                rows = conn.execute(
+                    """
+                    SELECT p.codigo_interno, p.precio_min_dia
+                    FROM master_precios p
+                    JOIN codigos_df c ON c.codigo_interno = p.codigo_interno
+                    WHERE p.fecha = ?
+                    """,
+                    [yesterday.isoformat()]
+                ).fetchall()
+            finally:
+                conn.unregister("codigos_df")
+            
+            return {codigo: int(precio or 0) for codigo, precio in rows}
+            
+        except Exception as e:
+            logger.error(f"Error getting previous day prices: {e}")
+            return {}
+    
     async def update_price(self, codigo_interno: str, retailer: str,
                           precio_normal: int = None, precio_oferta: int = None, 
                           precio_tarjeta: int = None) -> Tuple[bool, List[Dict[str, Any]]]:
@@ -587,66 +818,81 @@ class MasterPricesManager:
         Returns:
             (updated, alerts): Si se actualizó y lista de alertas generadas
         """
-        self._load_today_cache()
+        updated, alerts = await self.update_prices_batch([{
+            'codigo_interno': codigo_interno,
+            'retailer': retailer,
+            'precio_normal': precio_normal,
+            'precio_oferta': precio_oferta,
+            'precio_tarjeta': precio_tarjeta,
+        }])
+        return bool(updated), alerts
+    
+    async def update_prices_batch(self, records: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Actualizar precios de muchos SKUs con snapshot diario inteligente
+        
+        Los precios de ayer se cargan en una sola lectura, los snapshots nuevos
+        y existentes se actualizan en bloque sobre el store columnar y las
+        condiciones de alerta se pre-filtran vectorizadas; solo los candidatos
+        pasan por `check_alert_conditions`.
+        
+        Args:
+            records: Dicts con codigo_interno, retailer, precio_normal,
+                precio_oferta, precio_tarjeta (None mantiene el precio actual).
+                Si un SKU se repite, prevalece el último registro.
+        
+        Returns:
+            (updated_skus, alerts): SKUs creados/modificados y alertas generadas
+        """
+        by_codigo: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            codigo = record.get('codigo_interno')
+            if codigo:
+                by_codigo[codigo] = record
+        if not by_codigo:
+            return [], []
+        
+        # WAL y cache del mismo día: el cierre no puede separarlos entre medio
+        with self._day_lock:
+            self._load_today_cache()
+            store = self._today_cache
+            now = datetime.now()
+            durable = self._log_price_records(by_codigo, now)
+            new_rows, changed_rows = self._apply_price_records(store, by_codigo, now)
+        
+        # Group commit: esperar a que el WAL sea durable antes de emitir alertas
+        if durable is not None:
+            try:
+                await asyncio.wrap_future(durable)
+            except Exception as e:
+                logger.error(f"Error persisting price WAL: {e}")
+        
+        touched = np.concatenate([new_rows, changed_rows])
+        if len(touched) == 0:
+            return [], []
         
-        today = date.today()
-        existing_snapshot = self.get_snapshot_today(codigo_interno)
         alerts_generated = []
+        alert_rows = self._alert_candidate_rows(touched)
+        for row in alert_rows:
+            snapshot = store.view(row)
+            row_alerts = await snapshot.check_alert_conditions(self.glitch_detector)
+            alerts_generated.extend((row, alert) for alert in row_alerts)
         
-        if existing_snapshot:
-            # Actualizar snapshot existente del día
-            price_updated = existing_snapshot.update_prices(precio_normal, precio_oferta, precio_tarjeta)
-            
-            if not price_updated:
-                return False, []  # No hubo cambio, no hacer nada
-            
-            # Pasar referencia del manager para acceso a configuración
-            existing_snapshot._master_prices_manager = self
-            # Verificar alertas con ML integration
-            alerts_generated = await existing_snapshot.check_alert_conditions(self.glitch_detector)
-            
-            # 🔔 INTEGRACIÓN SISTEMA DE ALERTAS: Enviar alerta si cambio significativo
-            if ALERTS_SYSTEM_AVAILABLE and abs(existing_snapshot.cambio_porcentaje) >= 5.0:
-                try:
-                    # Obtener nombre del producto si está disponible
-                    producto_nombre = self._get_product_name(codigo_interno)
-                    await existing_snapshot.send_price_alert_if_significant(producto_nombre)
-                except Exception as e:
-                    logger.warning(f"⚠️ Error enviando alerta integrada: {e}")
-            
-        else:
-            # Crear nuevo snapshot para el día
-            precio_anterior = self.get_previous_day_price(codigo_interno)
-            
-            snapshot = DailyPriceSnapshot(
-                codigo_interno=codigo_interno,
-                fecha=today,
-                retailer=retailer,
-                precio_normal=precio_normal or 0,
-                precio_oferta=precio_oferta or 0,
-                precio_tarjeta=precio_tarjeta or 0,
-                precio_anterior_dia=precio_anterior
-            )
-            
-            # Pasar referencia del manager para acceso a configuración
-            snapshot._master_prices_manager = self
-            # Verificar alertas para nuevo snapshot con ML integration
-            alerts_generated = await snapshot.check_alert_conditions(self.glitch_detector)
-            
-            # 🔔 INTEGRACIÓN SISTEMA DE ALERTAS: Enviar alerta para nuevo snapshot si es significativo
-            if ALERTS_SYSTEM_AVAILABLE and abs(snapshot.cambio_porcentaje) >= 5.0:
+        # 🔔 INTEGRACIÓN SISTEMA DE ALERTAS: Enviar alerta si cambio significativo
+        if ALERTS_SYSTEM_AVAILABLE:
+            significant = touched[np.abs(store.column('cambio_porcentaje')[touched]) >= 5.0]
+            for row in significant:
+                snapshot = store.view(row)
                 try:
-                    # Obtener nombre del producto si está disponible
-                    producto_nombre = self._get_product_name(codigo_interno)
+                    producto_nombre = self._get_product_name(snapshot.codigo_interno)
                     await snapshot.send_price_alert_if_significant(producto_nombre)
                 except Exception as e:
                     logger.warning(f"⚠️ Error enviando alerta integrada: {e}")
-            
-            self._today_cache[codigo_interno] = snapshot
         
         # Enviar alertas si existen callbacks registrados
         if alerts_generated and self.alert_callbacks:
-            for alert in alerts_generated:
+            existing_rows = set(changed_rows.tolist())
+            for row, alert in alerts_generated:
                 # Enriquecer alerta con datos del producto
                 enriched_alert = await self._enrich_alert_with_product_data(alert)
                 
@@ -656,162 +902,276 @@ class MasterPricesManager:
                     except Exception as e:
                         logger.error(f"Error in alert callback: {e}")
                 
-                # Marcar alerta como enviada
-                if existing_snapshot:
-                    existing_snapshot.alertas_enviadas += 1
-                    existing_snapshot.tipos_alertas.append(alert['type'])
+                # Marcar alerta como enviada (snapshots que ya existían)
+                if row in existing_rows:
+                    snapshot = store.view(row)
+                    snapshot.alertas_enviadas += 1
+                    snapshot.tipos_alertas.append(alert['type'])
         
-        return True, alerts_generated
+        return store.codigos_of(touched), [alert for _, alert in alerts_generated]
     
-    def save_daily_snapshots(self, target_date: date = None):
-        """Guardar snapshots del día a storage permanente"""
+    def _log_price_records(self, by_codigo: Dict[str, Dict[str, Any]], timestamp: datetime):
+        """Encolar las actualizaciones en el WAL del día (None si está deshabilitado)"""
+        if self._wal is None:
+            return None
+        records = list(by_codigo.values())
+        try:
+            return self._wal.append(
+                list(by_codigo),
+                [r.get('retailer') or '' for r in records],
+                [r.get('precio_normal') for r in records],
+                [r.get('precio_oferta') for r in records],
+                [r.get('precio_tarjeta') for r in records],
+                timestamp,
+            )
+        except Exception as e:
+            logger.error(f"Error appending to price WAL: {e}")
+            return None
+    
+    def _apply_price_records(self, store: PriceSnapshotStore, by_codigo: Dict[str, Dict[str, Any]],
+                             timestamp: datetime = None, target_date: date = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Aplicar registros (un SKU por registro) sobre el store del día
+        
+        Returns:
+            (new_rows, changed_rows): filas creadas y filas existentes que cambiaron
+        """
+        existing = [c for c in by_codigo if c in store]
+        new = [c for c in by_codigo if c not in store]
+        
+        # Snapshots nuevos: precio de ayer precargado para todo el batch
+        new_rows = np.empty(0, dtype=np.int64)
+        if new:
+            previous = self.get_previous_day_prices(new, target_date)
+            new_records = [by_codigo[c] for c in new]
+            new_rows = store.append(
+                new,
+                [r.get('retailer', '') for r in new_records],
+                [r.get('precio_normal') or 0 for r in new_records],
+                [r.get('precio_oferta') or 0 for r in new_records],
+                [r.get('precio_tarjeta') or 0 for r in new_records],
+                [previous.get(c, 0) for c in new],
+                timestamp=timestamp,
+            )
+        
+        # Snapshots existentes: solo cuentan los que cambiaron
+        changed_rows = np.empty(0, dtype=np.int64)
+        if existing:
+            existing_records = [by_codigo[c] for c in existing]
+            changed = store.update_prices(
+                existing,
+                [r.get('precio_normal') for r in existing_records],
+                [r.get('precio_oferta') for r in existing_records],
+                [r.get('precio_tarjeta') for r in existing_records],
+                timestamp=timestamp,
+            )
+            changed_rows = store.rows_for(existing)[changed]
+        
+        return new_rows, changed_rows
+    
+    def _alert_candidate_rows(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Pre-filtro vectorizado de filas que pueden generar alertas
+        
+        Aplica los mismos umbrales que `check_alert_conditions`; con detector
+        ML activo todas las filas con precio anterior válido son candidatas.
+        """
+        store = self._today_cache
+        anterior = store.column('precio_anterior_dia')[rows]
+        minimo = store.column('precio_min_dia')[rows]
+        has_base = (anterior > 0) & (minimo > 0)
+        
+        if self.glitch_detector and GLITCH_DETECTION_AVAILABLE:
+            return rows[has_base]
+        
+        retailers = store.retailers_of(rows)
+        thresholds = {r: _get_alert_thresholds(r, self) for r in set(retailers.tolist())}
+        drop_threshold = np.array([thresholds[r]['price_drop'] for r in retailers], dtype=np.float64)
+        volatility_threshold = np.array([thresholds[r]['volatility'] for r in retailers], dtype=np.float64)
+        
+        price_drop = store.column('cambio_porcentaje')[rows] <= drop_threshold
+        volatile = ((store.column('volatilidad_dia')[rows] >= volatility_threshold)
+                    & (store.column('cambios_en_dia')[rows] >= 3))
+        
+        return rows[has_base & (price_drop | volatile)]
+    
+    def _daily_parquet_file(self, target_date: date) -> Path:
+        """Ruta del Parquet base (compactado) de un día"""
+        return daily_parquet_file(self.parquet_path, target_date)
+    
+    def _delta_dir(self, target_date: date) -> Path:
+        """Directorio de deltas intradía de un día"""
+        return self.deltas_path / target_date.strftime('%Y%m%d')
+    
+    def _list_deltas(self, target_date: date) -> List[Path]:
+        """Deltas del día en orden de escritura"""
+        delta_dir = self._delta_dir(target_date)
+        if not delta_dir.exists():
+            return []
+        return sorted(delta_dir.glob("delta_*.parquet"))
+    
+    def _read_daily_frame(self, target_date: date) -> Optional[pd.DataFrame]:
+        """
+        Leer snapshots de un día (merge-on-read): Parquet base + deltas,
+        conservando la última versión de cada codigo_interno
+        """
+        frames = []
+        parquet_file = self._daily_parquet_file(target_date)
+        if parquet_file.exists():
+            frames.append(pd.read_parquet(parquet_file))
+        frames.extend(pd.read_parquet(delta) for delta in self._list_deltas(target_date))
+        
+        if not frames:
+            return None
+        if len(frames) == 1:
+            return frames[0]
+        
+        df = pd.concat(frames, ignore_index=True)
+        return df.drop_duplicates(subset=['codigo_interno'], keep='last').reset_index(drop=True)
+    
+    def compact_daily_deltas(self, target_date: date = None) -> int:
+        """
+        Fusionar los deltas del día en el Parquet base
+        
+        Returns:
+            Número de deltas compactados
+        """
         if not target_date:
             target_date = date.today()
         
-        # Si no es el día actual, no tenemos nada que guardar
-        if target_date != self._cache_date or not self._today_cache:
-            return
+        with self._date_lock(target_date):
+            return self._compact_daily_deltas_locked(target_date)
+    
+    def _compact_daily_deltas_locked(self, target_date: date) -> int:
+        deltas = self._list_deltas(target_date)
+        if not deltas:
+            return 0
+        
+        df = self._read_daily_frame(target_date)
+        parquet_file = self._daily_parquet_file(target_date)
+        parquet_file.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Escritura atómica y ordenada por codigo_interno (zone maps para el histórico)
+        tmp_file = parquet_file.with_suffix('.parquet.tmp')
+        write_daily_parquet(df, tmp_file)
+        os.replace(tmp_file, parquet_file)
+        
+        for delta in deltas:
+            delta.unlink()
+        self.history.invalidate()
+        
+        logger.info(f"Compacted {len(deltas)} price deltas into {parquet_file.name} ({len(df)} snapshots)")
+        return len(deltas)
+    
+    def save_daily_snapshots(self, target_date: date = None, compact: bool = False):
+        """
+        Guardar snapshots modificados del día a storage permanente
+        
+        Solo se escriben los snapshots sucios: un delta Parquet append-only y un
+        merge en DuckDB de esas claves. El costo escala con los cambios, no con
+        el tamaño del catálogo.
+        
+        Args:
+            target_date: Día a guardar (default: hoy)
+            compact: Forzar compactación de deltas del día (cierre diario)
+        """
+        if not target_date:
+            target_date = date.today()
         
         try:
-            # Preparar datos para guardar
-            snapshots_data = []
-            for snapshot in self._today_cache.values():
-                snapshots_data.append(snapshot.to_dict())
-            
-            if not snapshots_data:
-                return
-            
-            # Crear DataFrame
-            df = pd.DataFrame(snapshots_data)
-            
-            # Debug: Ver columnas del DataFrame
-            logger.info(f"DataFrame columns before save: {df.columns.tolist()}")
-            logger.info(f"DataFrame shape: {df.shape}")
-            if len(df) > 0:
-                logger.info(f"First row: {df.iloc[0].to_dict()}")
-            
-            # Guardar a Parquet particionado por año/mes
-            month_path = self.parquet_path / f"year={target_date.year}" / f"month={target_date.month:02d}"
-            month_path.mkdir(parents=True, exist_ok=True)
-            
-            parquet_file = month_path / f"precios_{target_date.strftime('%Y%m%d')}.parquet"
-            df.to_parquet(parquet_file, compression='snappy')
-            
-            # Guardar a DuckDB
-            self._ensure_table_exists()
-            conn = duckdb.connect(str(self.duckdb_path))
-            
-            # Registrar el DataFrame y ejecutar operación atómica
-            try:
-                conn.register("df", df)
-            except Exception:
-                # Algunos bindings de DuckDB permiten pasar DF sin register, pero garantizamos registro
-                pass
-            
-            # Usar transacción para consistencia del día
-            logger.info(f"Starting transaction to save {len(df)} price snapshots")
-            conn.execute("BEGIN")
-            try:
-                # Eliminar registros existentes del día (idempotente)
-                conn.execute("DELETE FROM master_precios WHERE fecha = ?", [target_date.isoformat()])
-                
-                # Obtener el máximo ID actual
-                max_id_result = conn.execute("SELECT COALESCE(MAX(id), 0) FROM master_precios").fetchone()
-                max_id = max_id_result[0] if max_id_result else 0
-                
-                # Eliminar columna id si existe con valores None
-                if 'id' in df.columns:
-                    logger.info(f"Dropping existing 'id' column with values: {df['id'].tolist()[:5]}")
-                    df = df.drop('id', axis=1)
-                
-                # Asignar IDs secuenciales al DataFrame
-                new_ids = list(range(max_id + 1, max_id + 1 + len(df)))
-                logger.info(f"Assigning new IDs: {new_ids[:5]}... (total: {len(new_ids)})")
-                df['id'] = new_ids
-                logger.info(f"DataFrame 'id' column after assignment: {df['id'].tolist()[:5]}")
-                
-                # Verificar que el ID realmente está asignado
-                if 'id' not in df.columns:
-                    logger.error("'id' column missing after assignment!")
-                elif df['id'].isna().any():
-                    logger.error(f"Found NaN values in 'id' column: {df['id'].isna().sum()}")
-                else:
-                    logger.info(f"ID column OK: min={df['id'].min()}, max={df['id'].max()}")
-                
-                # Reordenar columnas para que coincidan con el esquema de la tabla
-                column_order = [
-                    'id', 'codigo_interno', 'fecha', 'retailer',
-                    'precio_normal', 'precio_oferta', 'precio_tarjeta', 'precio_min_dia',
-                    'cambios_en_dia', 'precio_anterior_dia', 'cambio_porcentaje', 'cambio_absoluto',
-                    'timestamp_creacion', 'timestamp_ultima_actualizacion',
-                    'alertas_enviadas', 'tipos_alertas',
-                    'es_precio_historico_min', 'es_precio_historico_max',
-                    'volatilidad_dia', 'fecha_captura', 'internal_sku',
-                    'metadata', 'descuento_porcentaje'
-                ]
-                df = df[column_order]
+            with self._day_lock:
+                store, wal = self._today_cache, self._wal
+                same_day = target_date == self._cache_date
                 
-                # Verificar DataFrame final antes de insertar
-                logger.info(f"Final DataFrame columns: {df.columns.tolist()}")
-                logger.info(f"Final DataFrame shape: {df.shape}")
-                logger.info(f"First row 'id' value: {df.iloc[0]['id'] if len(df) > 0 else 'N/A'}")
+                # Sellar el WAL antes de leer los sucios: lo sellado queda cubierto por este guardado
+                sealed = wal.rotate() if wal is not None and same_day else None
                 
-                # Re-registrar el DataFrame actualizado
-                conn.unregister("df")
-                conn.register("df", df)
+                # Si no es el día en cache, no hay snapshots sucios que guardar
+                dirty_rows = store.dirty_rows() if same_day else []
                 
-                # Insertar nuevos registros con columnas explícitas (excluyendo id para que use autoincrement)
-                columns_without_id = [col for col in column_order if col != 'id']
-                columns_str = ', '.join(columns_without_id)
-                
-                # Crear DataFrame sin la columna id para que DuckDB use autoincrement
-                df_without_id = df[columns_without_id]
-                conn.unregister("df")
-                conn.register("df_insert", df_without_id)
-                
-                insert_query = f"""
-                INSERT INTO master_precios ({columns_str})
-                SELECT {columns_str} FROM df_insert
-                """
-                
-                logger.info(f"Executing INSERT with {len(df_without_id)} rows")
-                conn.execute(insert_query)
-                conn.execute("COMMIT")
-            except Exception:
-                conn.execute("ROLLBACK")
-                raise
-            finally:
-                conn.close()
+                if len(dirty_rows):
+                    with self._date_lock(target_date):
+                        self._persist_snapshot_batch(store.to_record_batch(dirty_rows), target_date)
+                    store.mark_clean(dirty_rows)
+                    
+                    logger.info(f"Saved {len(dirty_rows)} changed price snapshots for {target_date} "
+                                f"({len(store)} in cache)")
+            
+            # Los segmentos sellados ya están en los deltas guardados
+            if sealed is not None:
+                wal.checkpoint(sealed)
             
-            logger.info(f"Saved {len(snapshots_data)} price snapshots for {target_date}")
+            if compact or len(self._list_deltas(target_date)) >= self.delta_compaction_threshold:
+                self.compact_daily_deltas(target_date)
             
         except Exception as e:
             logger.error(f"Error saving daily snapshots: {e}")
     
+    def _persist_snapshot_batch(self, batch: pa.RecordBatch, target_date: date):
+        """Escribir snapshots como delta append-only y mergearlos en DuckDB"""
+        table = pa.Table.from_batches([batch])
+        # Delta append-only (nombre ordenable por tiempo de escritura)
+        delta_dir = self._delta_dir(target_date)
+        delta_dir.mkdir(parents=True, exist_ok=True)
+        delta_file = delta_dir / f"delta_{datetime.now().strftime('%H%M%S_%f')}.parquet"
+        pq.write_table(table, delta_file, compression='snappy')
+        self.history.invalidate()
+        
+        # Merge en DuckDB solo de las claves modificadas
+        self._merge_snapshots_duckdb(table, target_date)
+    
+    def _merge_snapshots_duckdb(self, table: pa.Table, target_date: date):
+        """
+        Upsert de snapshots en DuckDB por (codigo_interno, fecha)
+        
+        Se usa DELETE + INSERT de las claves del delta dentro de una transacción:
+        INSERT OR REPLACE de DuckDB no actualiza de forma confiable columnas
+        indexadas (precio_min_dia, cambio_porcentaje).
+        """
+        self._ensure_table_exists()
+        columns_str = ', '.join(PRICE_TABLE_COLUMNS)
+        
+        with self._db.transaction() as conn:
+            conn.register("delta_df", table.select(PRICE_TABLE_COLUMNS))
+            try:
+                conn.execute(
+                    "DELETE FROM master_precios WHERE fecha = ? "
+                    "AND codigo_interno IN (SELECT codigo_interno FROM delta_df)",
+                    [target_date.isoformat()]
+                )
+                conn.execute(f"INSERT INTO master_precios ({columns_str}) SELECT {columns_str} FROM delta_df")
+            finally:
+                conn.unregister("delta_df")
+    
     def get_historical_price_stats(self, codigo_interno: str, days_back: int = 30) -> Dict[str, Any]:
         """Obtener estadísticas históricas de precio"""
         try:
-            conn = duckdb.connect(str(self.duckdb_path))
-            
             end_date = date.today()
             start_date = end_date - timedelta(days=days_back)
             
-            query = """
-            SELECT 
-                MIN(precio_min_dia) as precio_historico_min,
-                MAX(precio_min_dia) as precio_historico_max,
-                AVG(precio_min_dia) as precio_promedio,
-                COUNT(*) as dias_con_datos,
-                SUM(cambios_en_dia) as total_cambios,
-                AVG(ABS(cambio_porcentaje)) as volatilidad_promedio
-            FROM master_precios 
-            WHERE codigo_interno = ? 
-            AND fecha BETWEEN ? AND ?
-            AND precio_min_dia > 0
-            """
-            
-            result = conn.execute(query, [codigo_interno, start_date.isoformat(), end_date.isoformat()]).fetchone()
-            conn.close()
+            # Histórico desde Parquet (poda por día y row group); DuckDB si no hay archivos
+            table = self.history.stats_for([codigo_interno], start_date, end_date)
+            if table is not None:
+                rows = table.to_pylist()
+                result = [rows[0][k] for k in ('precio_historico_min', 'precio_historico_max', 'precio_promedio',
+                                               'dias_con_datos', 'total_cambios', 'volatilidad_promedio')] \
+                    if rows else (None, None, None, 0, None, None)
+            else:
+                self._ensure_table_exists()
+                query = """
+                SELECT 
+                    MIN(precio_min_dia) as precio_historico_min,
+                    MAX(precio_min_dia) as precio_historico_max,
+                    AVG(precio_min_dia) as precio_promedio,
+                    COUNT(*) as dias_con_datos,
+                    SUM(cambios_en_dia) as total_cambios,
+                    AVG(ABS(cambio_porcentaje)) as volatilidad_promedio
+                FROM master_precios 
+                WHERE codigo_interno = ? 
+                AND fecha BETWEEN ? AND ?
+                AND precio_min_dia > 0
+                """
+                result = self._db.execute(query, [codigo_interno, start_date.isoformat(), end_date.isoformat()]).fetchone()
             
             if result:
                 return {
@@ -833,21 +1193,24 @@ class MasterPricesManager:
     def get_daily_price_evolution(self, codigo_interno: str, days_back: int = 7) -> List[Dict[str, Any]]:
         """Obtener evolución de precios últimos N días"""
         try:
-            conn = duckdb.connect(str(self.duckdb_path))
-            
             end_date = date.today()
             start_date = end_date - timedelta(days=days_back)
             
-            query = """
-            SELECT fecha, precio_min_dia, cambio_porcentaje, cambios_en_dia
-            FROM master_precios 
-            WHERE codigo_interno = ? 
-            AND fecha BETWEEN ? AND ?
-            ORDER BY fecha DESC
-            """
-            
-            results = conn.execute(query, [codigo_interno, start_date.isoformat(), end_date.isoformat()]).fetchall()
-            conn.close()
+            # Histórico desde Parquet (poda por día y row group); DuckDB si no hay archivos
+            columns = ['fecha', 'precio_min_dia', 'cambio_porcentaje', 'cambios_en_dia']
+            table = self.history.query([codigo_interno], start_date, end_date, columns=columns)
+            if table is not None:
+                results = list(zip(*table.select(columns).to_pydict().values()))[::-1]
+            else:
+                self._ensure_table_exists()
+                query = """
+                SELECT fecha, precio_min_dia, cambio_porcentaje, cambios_en_dia
+                FROM master_precios 
+                WHERE codigo_interno = ? 
+                AND fecha BETWEEN ? AND ?
+                ORDER BY fecha DESC
+                """
+                results = self._db.execute(query, [codigo_interno, start_date.isoformat(), end_date.isoformat()]).fetchall()
             
             evolution = []
             for row in results:
@@ -864,64 +1227,249 @@ class MasterPricesManager:
             logger.error(f"Error getting price evolution: {e}")
             return []
     
+    def get_price_history_batch(self, codigos: List[str], days_back: int = 30):
+        """
+        Histórico diario de varios SKUs en una sola consulta
+        
+        Returns:
+            pyarrow.Table (codigo_interno, fecha, precios...) o None si no hay archivos
+        """
+        end_date = date.today()
+        return self.history.query(codigos, end_date - timedelta(days=days_back), end_date)
+    
     async def midnight_closure(self):
         """Proceso automático de cierre diario a medianoche"""
         logger.info("Starting midnight closure process...")
         
         try:
-            # Guardar snapshots del día que termina
+            # Separar el cache del día que termina y guardarlo
             yesterday = date.today() - timedelta(days=1)
-            self.save_daily_snapshots(yesterday)
+            closed = self.detach_closed_day(yesterday)
+            self.persist_closed_day(yesterday, closed)
             
-            # Limpiar cache para el nuevo día
-            self._today_cache.clear()
-            self._cache_date = date.today()
-            
-            # Actualizar flags de precios históricos min/max
-            await self._update_historical_flags()
+            # Actualizar extremos históricos, flags y rollups del día cerrado
+            self.update_historical_flags(yesterday)
+            self.refresh_retailer_rollups(yesterday)
             
             logger.info("Midnight closure completed successfully")
             
         except Exception as e:
             logger.error(f"Error in midnight closure: {e}")
     
-    async def _update_historical_flags(self):
-        """Actualizar flags de precios históricos mínimos/máximos"""
+    def detach_closed_day(self, target_date: date) -> Optional[Tuple[PriceSnapshotStore, Optional[PriceWriteAheadLog]]]:
+        """
+        Separar el cache (y WAL) del día que se cierra e iniciar el del día nuevo
+        
+        Es un swap de referencias: el scraping sigue escribiendo en el cache
+        (y WAL) nuevo mientras el día cerrado se persiste en segundo plano.
+        Hasta que persist_closed_day termina, la fecha queda fuera de la
+        recuperación de WAL pendientes.
+        
+        Returns:
+            (store, wal) del día cerrado, o None si el cache ya es de otro día
+        """
+        with self._day_lock:
+            if self._cache_date != target_date:
+                return None
+            
+            closed = (self._today_cache, self._wal)
+            self._closing_dates.add(target_date)
+            today = date.today()
+            self._today_cache = PriceSnapshotStore(today, view_class=PriceSnapshotView)
+            self._today_cache.manager = self
+            self._wal = PriceWriteAheadLog(self._wal_dir(today)) if self.wal_enabled else None
+            self._cache_date = today
+            # El día nuevo empieza vacío: no recargar (ni recuperar el WAL en cierre)
+            self._cache_loaded = True
+            return closed
+    
+    def persist_closed_day(self, target_date: date,
+                           closed: Optional[Tuple[PriceSnapshotStore, Optional[PriceWriteAheadLog]]] = None):
+        """
+        Persistir un día cerrado: snapshots sucios, compactación y descarte del WAL
+        
+        Args:
+            closed: Resultado de detach_closed_day (None: solo compactar deltas)
+        """
+        store, wal = closed if closed else (None, None)
+        
         try:
-            conn = duckdb.connect(str(self.duckdb_path))
-            
-            # Actualizar flags de precio histórico mínimo
-            update_min_sql = """
-            UPDATE master_precios 
-            SET es_precio_historico_min = TRUE
-            WHERE (codigo_interno, precio_min_dia) IN (
-                SELECT codigo_interno, MIN(precio_min_dia)
-                FROM master_precios 
-                WHERE precio_min_dia > 0
-                GROUP BY codigo_interno
-            )
-            """
-            
-            # Actualizar flags de precio histórico máximo
-            update_max_sql = """
-            UPDATE master_precios 
-            SET es_precio_historico_max = TRUE
-            WHERE (codigo_interno, precio_min_dia) IN (
-                SELECT codigo_interno, MAX(precio_min_dia)
-                FROM master_precios 
-                WHERE precio_min_dia > 0
-                GROUP BY codigo_interno
-            )
-            """
-            
-            conn.execute(update_min_sql)
-            conn.execute(update_max_sql)
-            conn.close()
+            with self._date_lock(target_date):
+                # Todo lo encolado en el WAL del día cerrado debe ser durable antes de guardar
+                if wal is not None:
+                    wal.close()
+                
+                if store is not None:
+                    dirty_rows = store.dirty_rows()
+                    if len(dirty_rows):
+                        self._persist_snapshot_batch(store.to_record_batch(dirty_rows), target_date)
+                        store.mark_clean(dirty_rows)
+                        logger.info(f"Saved {len(dirty_rows)} changed price snapshots for {target_date}")
+                
+                self.compact_daily_deltas(target_date)
+                
+                # El WAL del día cerrado ya quedó en el Parquet compactado
+                if wal is not None:
+                    wal.checkpoint()
+                    wal.close(remove=True)
+        finally:
+            with self._day_lock:
+                self._closing_dates.discard(target_date)
+    
+    async def _update_historical_flags(self, target_date: date = None):
+        """Versión async de update_historical_flags (compatibilidad)"""
+        self.update_historical_flags(target_date)
+    
+    def update_historical_flags(self, target_date: date = None) -> bool:
+        """
+        Actualizar extremos históricos y flags min/max del día cerrado
+        
+        Solo procesa los snapshots de `target_date`: compara contra
+        `price_extremes` (estado previo), marca es_precio_historico_min/max
+        en esas filas y luego incorpora el día a la tabla. Es idempotente,
+        por lo que re-cerrar un día no altera el resultado.
+        
+        Returns:
+            True si se actualizó
+        """
+        if not target_date:
+            target_date = date.today() - timedelta(days=1)
+        
+        try:
+            self._ensure_table_exists()
+            self._bootstrap_price_extremes(before=target_date)
+            
+            fecha = target_date.isoformat()
+            with self._db.transaction() as conn:
+                # Flags solo para el día que se cierra (empates cuentan como extremo)
+                conn.execute("""
+                UPDATE master_precios
+                SET es_precio_historico_min = precio_min_dia <= COALESCE(
+                        (SELECT e.precio_historico_min FROM price_extremes e
+                         WHERE e.codigo_interno = master_precios.codigo_interno), precio_min_dia),
+                    es_precio_historico_max = precio_min_dia >= COALESCE(
+                        (SELECT e.precio_historico_max FROM price_extremes e
+                         WHERE e.codigo_interno = master_precios.codigo_interno), precio_min_dia)
+                WHERE fecha = ? AND precio_min_dia > 0
+                """, [fecha])
+                
+                self._merge_price_extremes(conn, "fecha = ?", [fecha])
             
-            logger.info("Historical price flags updated")
+            logger.info(f"Historical price extremes updated for {target_date}")
+            return True
             
         except Exception as e:
             logger.error(f"Error updating historical flags: {e}")
+            return False
+    
+    def refresh_retailer_rollups(self, target_date: date = None) -> bool:
+        """
+        Recalcular el resumen diario por retailer de `target_date`
+        
+        Una fila por (fecha, retailer) en master_precios_retailer_diario;
+        re-ejecutarlo reemplaza las filas del día.
+        
+        Returns:
+            True si se actualizó
+        """
+        if not target_date:
+            target_date = date.today() - timedelta(days=1)
+        
+        try:
+            self._ensure_table_exists()
+            fecha = target_date.isoformat()
+            with self._db.transaction() as conn:
+                conn.execute("DELETE FROM master_precios_retailer_diario WHERE fecha = ?", [fecha])
+                conn.execute("""
+                INSERT INTO master_precios_retailer_diario
+                SELECT fecha, retailer,
+                       COUNT(*) AS productos,
+                       AVG(precio_min_dia) AS precio_promedio,
+                       COUNT(*) FILTER (WHERE cambios_en_dia > 0) AS productos_con_cambios,
+                       COUNT(*) FILTER (WHERE cambio_porcentaje < 0) AS bajadas,
+                       COUNT(*) FILTER (WHERE cambio_porcentaje > 0) AS subidas,
+                       AVG(cambio_porcentaje) AS cambio_promedio_pct,
+                       SUM(alertas_enviadas) AS alertas_enviadas
+                FROM master_precios
+                WHERE fecha = ? AND precio_min_dia > 0
+                GROUP BY fecha, retailer
+                """, [fecha])
+            
+            logger.info(f"Retailer rollups refreshed for {target_date}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error refreshing retailer rollups: {e}")
+            return False
+    
+    def _merge_price_extremes(self, conn, where_sql: str, params: List[Any]):
+        """
+        Incorporar a price_extremes el min/max de los snapshots filtrados
+        
+        Ante empates se conserva la fecha más antigua del extremo.
+        """
+        conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE extremes_update AS
+        WITH dia AS (
+            SELECT codigo_interno,
+                   MIN(precio_min_dia) AS dia_min, arg_min(fecha, precio_min_dia) AS dia_fecha_min,
+                   MAX(precio_min_dia) AS dia_max, arg_max(fecha, precio_min_dia) AS dia_fecha_max,
+                   MAX(fecha) AS dia_ultima
+            FROM master_precios
+            WHERE {where_sql} AND precio_min_dia > 0
+            GROUP BY codigo_interno
+        )
+        SELECT d.codigo_interno,
+               CASE WHEN e.precio_historico_min IS NULL OR d.dia_min < e.precio_historico_min
+                    THEN d.dia_min ELSE e.precio_historico_min END AS precio_historico_min,
+               CASE WHEN e.precio_historico_min IS NULL OR d.dia_min < e.precio_historico_min
+                    THEN d.dia_fecha_min ELSE e.fecha_historico_min END AS fecha_historico_min,
+               CASE WHEN e.precio_historico_max IS NULL OR d.dia_max > e.precio_historico_max
+                    THEN d.dia_max ELSE e.precio_historico_max END AS precio_historico_max,
+               CASE WHEN e.precio_historico_max IS NULL OR d.dia_max > e.precio_historico_max
+                    THEN d.dia_fecha_max ELSE e.fecha_historico_max END AS fecha_historico_max,
+               GREATEST(d.dia_ultima, COALESCE(e.ultima_fecha, d.dia_ultima)) AS ultima_fecha
+        FROM dia d
+        LEFT JOIN price_extremes e ON e.codigo_interno = d.codigo_interno
+        """, params)
+        conn.execute("DELETE FROM price_extremes WHERE codigo_interno IN (SELECT codigo_interno FROM extremes_update)")
+        conn.execute("INSERT INTO price_extremes SELECT * FROM extremes_update")
+        conn.execute("DROP TABLE extremes_update")
+    
+    def _bootstrap_price_extremes(self, before: date):
+        """
+        Poblar price_extremes desde el histórico una única vez (migración)
+        
+        Solo corre si la tabla está vacía y existen snapshots anteriores a
+        `before`; desde ahí la tabla se mantiene por día cerrado.
+        """
+        if self._db.execute("SELECT 1 FROM price_extremes LIMIT 1").fetchone():
+            return
+        if not self._db.execute("SELECT 1 FROM master_precios WHERE fecha < ? LIMIT 1",
+                                [before.isoformat()]).fetchone():
+            return
+        
+        with self._db.transaction() as conn:
+            self._merge_price_extremes(conn, "fecha < ?", [before.isoformat()])
+        logger.info("price_extremes bootstrapped from master_precios history")
+    
+    def get_price_extremes(self, codigo_interno: str) -> Dict[str, Any]:
+        """Mínimo y máximo histórico (días cerrados) de un SKU"""
+        try:
+            self._ensure_table_exists()
+            result = self._db.run('price_extremes', [codigo_interno]).fetchone()
+            if not result:
+                return {}
+            return {
+                'precio_historico_min': int(result[0]),
+                'fecha_historico_min': result[1],
+                'precio_historico_max': int(result[2]),
+                'fecha_historico_max': result[3],
+                'ultima_fecha': result[4],
+            }
+        except Exception as e:
+            logger.error(f"Error getting price extremes: {e}")
+            return {}
     
     def _get_product_name(self, codigo_interno: str) -> str:
         """
@@ -957,7 +1505,7 @@ class MasterPricesManager:
     def get_stats(self) -> Dict[str, Any]:
         """Obtener estadísticas del master de precios"""
         try:
-            conn = duckdb.connect(str(self.duckdb_path))
+            self._ensure_table_exists()
             
             # Estadísticas generales
             stats_query = """
@@ -972,8 +1520,7 @@ class MasterPricesManager:
             FROM master_precios
             """
             
-            result = conn.execute(stats_query).fetchone()
-            conn.close()
+            result = self._db.execute(stats_query).fetchone()
             
             if result:
                 return {
@@ -985,7 +1532,8 @@ class MasterPricesManager:
                     'total_alerts_sent': int(result[5] or 0),
                     'avg_changes_per_day': float(result[6] or 0),
                     'today_cache_size': len(self._today_cache),
-                    'cache_date': self._cache_date.isoformat()
+                    'cache_date': self._cache_date.isoformat(),
+                    'wal': self._wal.get_stats() if self._wal is not None else None
                 }
             
             return {}
@@ -1056,31 +1604,71 @@ async def setup_telegram_alerts_integration(prices_manager: MasterPricesManager)
 
 
 # Función para integración con scrapers
+def _extract_scraping_prices(scraping_data: Dict[str, Any]) -> Tuple[int, int, int]:
+    """Extraer los 3 precios de los datos de scraping"""
+    return (
+        int(scraping_data.get('precio_normal_num', 0) or 0),
+        int(scraping_data.get('precio_oferta_num', 0) or 0),
+        int(scraping_data.get('precio_tarjeta_num', 0) or 0),
+    )
+
+
+async def process_price_updates_from_scraping(price_items: List[Tuple[str, str, Dict[str, Any]]],
+                                              prices_manager: MasterPricesManager) -> Dict[str, Any]:
+    """
+    Procesar en bloque actualizaciones de precio desde datos de scraping
+    
+    Args:
+        price_items: Tuplas (codigo_interno, retailer, scraping_data)
+        prices_manager: Manager de precios
+        
+    Returns:
+        Resumen con SKUs actualizados, sin precio y alertas generadas
+    """
+    records = []
+    skipped = []
+    for codigo_interno, retailer, scraping_data in price_items:
+        precio_normal, precio_oferta, precio_tarjeta = _extract_scraping_prices(scraping_data)
+        
+        # Si no hay precios, no procesar
+        if not any([precio_normal, precio_oferta, precio_tarjeta]):
+            skipped.append(codigo_interno)
+            continue
+        
+        records.append({
+            'codigo_interno': codigo_interno,
+            'retailer': retailer,
+            'precio_normal': precio_normal,
+            'precio_oferta': precio_oferta,
+            'precio_tarjeta': precio_tarjeta,
+        })
+    
+    updated_skus, alerts = await prices_manager.update_prices_batch(records)
+    
+    return {
+        'updated': len(updated_skus),
+        'updated_skus': updated_skus,
+        'skipped_no_prices': skipped,
+        'alerts_generated': len(alerts),
+        'alerts': alerts
+    }
+
+
 async def process_price_update_from_scraping(codigo_interno: str, retailer: str,
                                            scraping_data: Dict[str, Any],
                                            prices_manager: MasterPricesManager) -> Dict[str, Any]:
     """Procesar actualización de precio desde datos de scraping"""
     
-    # Extraer precios de los datos de scraping
-    precio_normal = int(scraping_data.get('precio_normal_num', 0) or 0)
-    precio_oferta = int(scraping_data.get('precio_oferta_num', 0) or 0) 
-    precio_tarjeta = int(scraping_data.get('precio_tarjeta_num', 0) or 0)
-    
     # Si no hay precios, no procesar
-    if not any([precio_normal, precio_oferta, precio_tarjeta]):
+    if not any(_extract_scraping_prices(scraping_data)):
         return {'updated': False, 'reason': 'no_prices_found'}
     
-    # Actualizar en master de precios
-    updated, alerts = await prices_manager.update_price(
-        codigo_interno=codigo_interno,
-        retailer=retailer,
-        precio_normal=precio_normal,
-        precio_oferta=precio_oferta,
-        precio_tarjeta=precio_tarjeta
+    result = await process_price_updates_from_scraping(
+        [(codigo_interno, retailer, scraping_data)], prices_manager
     )
     
     return {
-        'updated': updated,
-        'alerts_generated': len(alerts),
-        'alerts': alerts
+        'updated': result['updated'] > 0,
+        'alerts_generated': result['alerts_generated'],
+        'alerts': result['alerts']
     }
@@ -12,16 +12,24 @@ Arquitectura:
 """
 
 import hashlib
+import os
 import re
 import logging
+import threading
+from collections.abc import MutableMapping
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, date
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field, asdict
 from pathlib import Path
+import numpy as np
 import pandas as pd
-import duckdb
+import pyarrow.parquet as pq
 import json
 
+from .arrow_schemas import RecordBatchBuilder
+from .connection_manager import ConnectionManager
+
 logger = logging.getLogger(__name__)
 
 
@@ -476,26 +484,175 @@ class MasterProduct:
         return product
 
 
+DATE_FIELDS = ['fecha_primera_captura', 'fecha_ultima_actualizacion', 'ultimo_visto']
+LIST_FIELDS = ['colors', 'badges', 'emblems', 'shipping_options', 'included_accessories']
+
+
+def _decode_json_list(value: str) -> Any:
+    """Decodifica un campo lista serializado (mismo criterio que la carga fila a fila)"""
+    try:
+        return json.loads(value) if value else []
+    except Exception:
+        return []
+
+
+def _string_mask(series: pd.Series) -> np.ndarray:
+    """Máscara de valores str en una columna object"""
+    if series.dtype != object:
+        return np.zeros(len(series), dtype=bool)
+    return series.map(type).to_numpy() == str
+
+
+class LazyProductCache(MutableMapping):
+    """
+    📦 Cache link -> MasterProduct con materialización perezosa
+    
+    Al cargar se guardan las columnas ya parseadas (fechas, listas JSON) y
+    cada link apunta a su fila; el MasterProduct se construye recién en el
+    primer acceso. Los productos insertados después se guardan tal cual.
+    """
+    
+    def __init__(self):
+        self._columns: Dict[str, np.ndarray] = {}
+        self._slots: Dict[str, Any] = {}  # link -> int (fila sin materializar) | MasterProduct
+        self.materialized = 0
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'LazyProductCache':
+        """
+        Construye el cache desde el frame del master (solo productos activos)
+        
+        Fechas y listas JSON se convierten por columna, decodificando cada
+        valor distinto una sola vez.
+        """
+        cache = cls()
+        if 'activo' in df.columns:
+            df = df[df['activo'].fillna(True).astype(bool).to_numpy()]
+        df = df.reset_index(drop=True)
+        
+        today = date.today()
+        
+        def parse_date(raw: str) -> date:
+            parsed = pd.to_datetime(raw, errors='coerce', format='ISO8601')
+            return today if pd.isna(parsed) else parsed.date()
+        
+        for name in df.columns:
+            series = df[name]
+            decoder = parse_date if name in DATE_FIELDS else _decode_json_list if name in LIST_FIELDS else None
+            is_str = _string_mask(series) if decoder else None
+            
+            if decoder and is_str.any():
+                # Cada valor distinto se decodifica una sola vez (fechas y JSON se repiten)
+                values = series.to_numpy(dtype=object, copy=True)
+                decoded = {raw: decoder(raw) for raw in pd.unique(series[is_str])}
+                values[is_str] = series[is_str].map(decoded).to_numpy(dtype=object)
+            else:
+                values = series.to_numpy()
+            
+            cache._columns[name] = values
+        
+        links = cache._columns.get('link')
+        if links is not None:
+            cache._slots = dict(zip(links.tolist(), range(len(links))))
+        return cache
+    
+    def column(self, name: str) -> Optional[np.ndarray]:
+        """Columna cargada (filas activas del frame, sin materializar)"""
+        return self._columns.get(name)
+    
+    def pending_links(self) -> List[str]:
+        """Links cuyo MasterProduct aún no se construyó"""
+        return [link for link, slot in self._slots.items() if type(slot) is int]
+    
+    def _materialize(self, link: str, row: int) -> MasterProduct:
+        data = {}
+        for name, values in self._columns.items():
+            value = values[row]
+            if isinstance(value, np.generic):
+                value = value.item()
+            elif isinstance(value, list):
+                value = list(value)  # Listas decodificadas se comparten entre filas
+            data[name] = value
+        
+        product = MasterProduct(**data)
+        self._slots[link] = product
+        self.materialized += 1
+        return product
+    
+    def __getitem__(self, link: str) -> MasterProduct:
+        slot = self._slots[link]
+        if type(slot) is int:
+            return self._materialize(link, slot)
+        return slot
+    
+    def get(self, link: str, default: Any = None) -> Any:
+        slot = self._slots.get(link)
+        if slot is None:
+            return default
+        if type(slot) is int:
+            return self._materialize(link, slot)
+        return slot
+    
+    def __setitem__(self, link: str, product: MasterProduct):
+        self._slots[link] = product
+    
+    def __delitem__(self, link: str):
+        del self._slots[link]
+    
+    def __contains__(self, link: object) -> bool:
+        return link in self._slots
+    
+    def __iter__(self):
+        return iter(self._slots)
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
 class MasterProductsManager:
     """Gestor del Master de Productos con storage en Parquet + DuckDB"""
     
     def __init__(self, base_path: str = "./data"):
         self.base_path = Path(base_path)
         self.parquet_path = self.base_path / "master" / "productos.parquet"
+        self.deltas_path = self.base_path / "master" / "productos_deltas"  # Deltas append-only por ciclo
         self.duckdb_path = self.base_path / "warehouse_master.duckdb"
         
         # Asegurar directorios
         self.parquet_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # Cache en memoria para productos activos
-        self._products_cache: Dict[str, MasterProduct] = {}
+        # Cache en memoria para productos activos (store primario: link -> producto)
+        self._products_cache: LazyProductCache = LazyProductCache()
         self._cache_loaded = False
+        
+        # Índices secundarios sobre el cache (mantenidos en upsert/inactivación)
+        self._by_codigo: Dict[str, str] = {}                 # codigo_interno -> link
+        self._by_retailer: Dict[str, Dict[str, None]] = {}   # retailer -> links activos
+        self._by_categoria: Dict[str, Dict[str, None]] = {}  # categoria -> links activos
+        self._by_marca: Dict[str, Dict[str, None]] = {}      # marca -> links activos
+        self._index_keys: Dict[str, Tuple[str, str, str, str, bool]] = {}  # link -> claves indexadas
+        
+        # Persistencia incremental: links modificados desde el último save
+        self._dirty_links: Dict[str, None] = {}
+        self.delta_compaction_threshold = 20  # Deltas acumulados antes de compactar en background
+        self._compaction_lock = threading.Lock()
+        self._compaction_executor: Optional[ThreadPoolExecutor] = None
+        self._compaction_future: Optional[Future] = None
+        self._record_builder = RecordBatchBuilder('master_product')
+        
+        # DuckDB vía ConnectionManager: tabla verificada una vez por instancia
+        self._table_ready = False
+    
+    @property
+    def _db(self):
+        """Conexión DuckDB de larga vida (compartida por el proceso)"""
+        return ConnectionManager.get_instance().duckdb(self.duckdb_path)
     
     def _ensure_table_exists(self):
         """Asegurar que la tabla existe en DuckDB"""
+        if self._table_ready:
+            return
         try:
-            conn = duckdb.connect(str(self.duckdb_path))
-            
             # Crear tabla master_productos con esquema limpio
             create_table_sql = """
             CREATE TABLE IF NOT EXISTS master_productos (
@@ -540,7 +697,7 @@ class MasterProductsManager:
             )
             """
             
-            conn.execute(create_table_sql)
+            self._db.write(create_table_sql)
             
             # Índices optimizados
             indexes = [
@@ -554,11 +711,11 @@ class MasterProductsManager:
             
             for index_sql in indexes:
                 try:
-                    conn.execute(index_sql)
+                    self._db.write(index_sql)
                 except Exception as e:
                     logger.warning(f"Could not create index: {e}")
             
-            conn.close()
+            self._table_ready = True
             
         except Exception as e:
             logger.error(f"Error ensuring table exists: {e}")
@@ -569,31 +726,11 @@ class MasterProductsManager:
             return
         
         try:
-            if self.parquet_path.exists():
-                df = pd.read_parquet(self.parquet_path)
-                
-                for _, row in df.iterrows():
-                    if row.get('activo', True):
-                        product_dict = row.to_dict()
-                        
-                        # Convertir strings de fechas a date objects
-                        for date_field in ['fecha_primera_captura', 'fecha_ultima_actualizacion', 'ultimo_visto']:
-                            if date_field in product_dict and isinstance(product_dict[date_field], str):
-                                try:
-                                    product_dict[date_field] = datetime.fromisoformat(product_dict[date_field]).date()
-                                except:
-                                    product_dict[date_field] = date.today()
-                        
-                        # Convertir JSON strings a listas
-                        for list_field in ['colors', 'badges', 'emblems', 'shipping_options', 'included_accessories']:
-                            if list_field in product_dict and isinstance(product_dict[list_field], str):
-                                try:
-                                    product_dict[list_field] = json.loads(product_dict[list_field]) if product_dict[list_field] else []
-                                except:
-                                    product_dict[list_field] = []
-                        
-                        product = MasterProduct(**product_dict)
-                        self._products_cache[product.link] = product
+            df = self._read_products_frame()
+            if df is not None:
+                # Parseo por columnas; los MasterProduct se construyen al primer acceso
+                self._products_cache = LazyProductCache.from_frame(df)
+                self._index_loaded_products()
                 
                 logger.info(f"Loaded {len(self._products_cache)} products into cache")
             
@@ -603,6 +740,94 @@ class MasterProductsManager:
             logger.error(f"Error loading cache: {e}")
             self._cache_loaded = True
     
+    def _index_product(self, product: MasterProduct):
+        """
+        Sincroniza los índices secundarios con el estado actual del producto
+        
+        Solo toca los índices cuyas claves cambiaron desde la última
+        indexación; los índices por atributo contienen solo productos activos.
+        """
+        link = product.link
+        new_keys = (product.codigo_interno, product.retailer, product.categoria, product.marca, product.activo)
+        old_keys = self._index_keys.get(link)
+        if old_keys == new_keys:
+            return
+        
+        if old_keys is not None:
+            old_codigo, old_retailer, old_categoria, old_marca, old_activo = old_keys
+            if self._by_codigo.get(old_codigo) == link:
+                del self._by_codigo[old_codigo]
+            if old_activo:
+                for index, key in ((self._by_retailer, old_retailer),
+                                   (self._by_categoria, old_categoria),
+                                   (self._by_marca, old_marca)):
+                    links = index.get(key)
+                    if links is not None:
+                        links.pop(link, None)
+                        if not links:
+                            del index[key]
+        
+        if product.codigo_interno:
+            self._by_codigo[product.codigo_interno] = link
+        if product.activo:
+            self._by_retailer.setdefault(product.retailer, {})[link] = None
+            self._by_categoria.setdefault(product.categoria, {})[link] = None
+            self._by_marca.setdefault(product.marca, {})[link] = None
+        self._index_keys[link] = new_keys
+    
+    def _index_loaded_products(self):
+        """
+        Construye los índices secundarios desde las columnas cargadas,
+        sin materializar productos
+        """
+        cache = self._products_cache
+        links = cache.column('link')
+        if links is None or not len(links):
+            return
+        
+        # Deduplicar por link (gana la última fila, como en el cache)
+        rows = np.fromiter(
+            (slot for slot in cache._slots.values() if type(slot) is int), dtype=np.int64
+        )
+        
+        def column(name: str) -> np.ndarray:
+            values = cache.column(name)
+            return values[rows] if values is not None else np.full(len(rows), "", dtype=object)
+        
+        links = links[rows]
+        codigos = column('codigo_interno')
+        
+        # Sin código interno se genera al construir el producto: indexar materializado
+        missing = pd.isna(codigos) | (codigos == "")
+        for link in links[missing]:
+            self._index_product(cache[link])
+        
+        keep = ~missing
+        links, codigos = links[keep], codigos[keep]
+        attributes = {name: column(name)[keep] for name in ('retailer', 'categoria', 'marca')}
+        
+        self._by_codigo.update(zip(codigos.tolist(), links.tolist()))
+        for index, name in ((self._by_retailer, 'retailer'),
+                            (self._by_categoria, 'categoria'),
+                            (self._by_marca, 'marca')):
+            codes, uniques = pd.factorize(attributes[name], use_na_sentinel=False)
+            order = np.argsort(codes, kind='stable')
+            bounds = np.flatnonzero(np.diff(codes[order])) + 1
+            for key, group in zip(uniques, np.split(links[order], bounds)):
+                index.setdefault(key, {}).update(dict.fromkeys(group.tolist()))
+        
+        self._index_keys.update(zip(
+            links.tolist(),
+            zip(codigos.tolist(), attributes['retailer'].tolist(),
+                attributes['categoria'].tolist(), attributes['marca'].tolist(),
+                [True] * len(links))
+        ))
+    
+    def _products_for(self, index: Dict[str, Dict[str, None]], key: str) -> List[MasterProduct]:
+        """Materializa los productos de una entrada de índice secundario"""
+        cache = self._products_cache
+        return [cache[link] for link in index.get(key, ())]
+    
     def get_product_by_link(self, link: str) -> Optional[MasterProduct]:
         """Obtener producto por link"""
         self._load_cache()
@@ -611,10 +836,11 @@ class MasterProductsManager:
     def get_product_by_codigo(self, codigo_interno: str) -> Optional[MasterProduct]:
         """Obtener producto por código interno"""
         self._load_cache()
-        for product in self._products_cache.values():
-            if product.codigo_interno == codigo_interno:
-                return product
-        return None
+        link = self._by_codigo.get(codigo_interno)
+        return self._products_cache.get(link) if link is not None else None
+    
+    # Alias usado por MasterPricesManager
+    get_product_by_code = get_product_by_codigo
     
     def upsert_product(self, scraping_data: Dict[str, Any]) -> Tuple[MasterProduct, bool]:
         """
@@ -655,49 +881,136 @@ class MasterProductsManager:
             product = MasterProduct.from_scraping_data(scraping_data)
             self._products_cache[link] = product
         
+        self._index_product(product)
+        self._dirty_links[link] = None
         return product, is_new
     
-    def save_to_storage(self):
-        """Guardar cache a Parquet y DuckDB"""
-        try:
-            if not self._products_cache:
-                logger.info("No products to save")
-                return
-            
-            # Preparar DataFrame
-            products_data = []
-            for product in self._products_cache.values():
-                product_dict = product.to_dict()
-                
-                # Convertir listas a JSON strings para Parquet
-                for list_field in ['colors', 'badges', 'emblems', 'shipping_options', 'included_accessories']:
-                    if isinstance(product_dict[list_field], list):
-                        product_dict[list_field] = json.dumps(product_dict[list_field])
-                
-                products_data.append(product_dict)
+    def _list_deltas(self) -> List[Path]:
+        """Deltas de productos en orden de escritura"""
+        if not self.deltas_path.exists():
+            return []
+        return sorted(self.deltas_path.glob("delta_*.parquet"))
+    
+    def _read_products_frame(self, deltas: Optional[List[Path]] = None) -> Optional[pd.DataFrame]:
+        """
+        Leer el master de productos (merge-on-read): Parquet base + deltas,
+        conservando la última versión de cada link
+        """
+        if deltas is None:
+            deltas = self._list_deltas()
+        
+        frames = []
+        if self.parquet_path.exists():
+            frames.append(pd.read_parquet(self.parquet_path))
+        frames.extend(pd.read_parquet(delta) for delta in deltas)
+        
+        if not frames:
+            return None
+        if len(frames) == 1:
+            return frames[0]
+        
+        df = pd.concat(frames, ignore_index=True)
+        return df.drop_duplicates(subset=['link'], keep='last').reset_index(drop=True)
+    
+    def compact_deltas(self) -> int:
+        """
+        Fusionar los deltas en el Parquet base
+        
+        Solo se eliminan los deltas leídos; los escritos durante la
+        compactación quedan para la siguiente.
+        
+        Returns:
+            Número de deltas compactados
+        """
+        with self._compaction_lock:
+            deltas = self._list_deltas()
+            if not deltas:
+                return 0
             
-            df = pd.DataFrame(products_data)
+            df = self._read_products_frame(deltas)
             
-            # Guardar a Parquet
-            df.to_parquet(self.parquet_path, compression='snappy')
-            logger.info(f"Saved {len(products_data)} products to Parquet")
+            # Escritura atómica: nunca dejar el base a medio escribir
+            tmp_file = self.parquet_path.with_suffix('.parquet.tmp')
+            df.to_parquet(tmp_file, compression='snappy')
+            os.replace(tmp_file, self.parquet_path)
             
-            # Guardar a DuckDB
-            self._ensure_table_exists()
-            conn = duckdb.connect(str(self.duckdb_path))
+            for delta in deltas:
+                delta.unlink()
+        
+        logger.info(f"Compacted {len(deltas)} product deltas into {self.parquet_path.name} ({len(df)} products)")
+        return len(deltas)
+    
+    def schedule_compaction(self) -> Optional[Future]:
+        """Lanzar la compactación en el thread de fondo (si no hay una en curso)"""
+        if self._compaction_future is not None and not self._compaction_future.done():
+            return self._compaction_future
+        
+        if self._compaction_executor is None:
+            self._compaction_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="products_compactor"
+            )
+        self._compaction_future = self._compaction_executor.submit(self._compact_in_background)
+        return self._compaction_future
+    
+    def _compact_in_background(self) -> int:
+        try:
+            return self.compact_deltas()
+        except Exception as e:
+            logger.error(f"Error compacting product deltas: {e}")
+            return 0
+    
+    def wait_for_compaction(self):
+        """Esperar la compactación en curso (shutdown / tests)"""
+        if self._compaction_future is not None:
+            self._compaction_future.result()
+    
+    def save_to_storage(self, compact: bool = False):
+        """
+        Guardar productos modificados a Parquet y DuckDB
+        
+        Solo se escriben los productos tocados desde el último save: un delta
+        Parquet append-only y un upsert en DuckDB de esas claves. El costo
+        escala con los cambios del ciclo, no con el tamaño del catálogo.
+        
+        Args:
+            compact: Compactar los deltas de forma síncrona
+        """
+        try:
+            dirty_links = [link for link in self._dirty_links if link in self._products_cache]
             
-            # Truncate y reload para simplicidad (en producción usar UPSERT)
-            try:
-                conn.register('df', df)
-            except Exception:
-                pass
-            conn.execute("BEGIN")
-            conn.execute("DELETE FROM master_productos WHERE codigo_interno IN (SELECT codigo_interno FROM df)")
-            conn.execute("INSERT INTO master_productos SELECT * FROM df")
-            conn.execute("COMMIT")
+            if not dirty_links:
+                logger.info("No products to save")
+            else:
+                # RecordBatch tipado (schema 'master_product') solo con los productos modificados
+                products_data = [self._products_cache[link].to_dict() for link in dirty_links]
+                table = self._record_builder.build_table(products_data)
+                
+                # Delta append-only (nombre ordenable por tiempo de escritura)
+                self.deltas_path.mkdir(parents=True, exist_ok=True)
+                delta_file = self.deltas_path / f"delta_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.parquet"
+                pq.write_table(table, delta_file, compression='snappy')
+                logger.info(f"Saved {len(products_data)} changed products to {delta_file.name}")
+                
+                # Guardar a DuckDB
+                self._ensure_table_exists()
+                # Upsert por codigo_interno en la conexión escritora única
+                with self._db.transaction() as conn:
+                    conn.register('df', table)
+                    try:
+                        conn.execute("DELETE FROM master_productos WHERE codigo_interno IN (SELECT codigo_interno FROM df)")
+                        conn.execute("INSERT INTO master_productos SELECT * FROM df")
+                    finally:
+                        conn.unregister('df')
+                
+                for link in dirty_links:
+                    self._dirty_links.pop(link, None)
+                
+                logger.info(f"Saved {len(products_data)} products to DuckDB (upsert)")
             
-            conn.close()
-            logger.info(f"Saved {len(products_data)} products to DuckDB (upsert)")
+            if compact:
+                self.compact_deltas()
+            elif len(self._list_deltas()) >= self.delta_compaction_threshold:
+                self.schedule_compaction()
             
         except Exception as e:
             logger.error(f"Error saving products: {e}")
@@ -705,12 +1018,17 @@ class MasterProductsManager:
     def get_products_by_retailer(self, retailer: str) -> List[MasterProduct]:
         """Obtener productos por retailer"""
         self._load_cache()
-        return [p for p in self._products_cache.values() if p.retailer == retailer and p.activo]
+        return self._products_for(self._by_retailer, retailer)
     
     def get_products_by_categoria(self, categoria: str) -> List[MasterProduct]:
         """Obtener productos por categoría"""  
         self._load_cache()
-        return [p for p in self._products_cache.values() if p.categoria == categoria and p.activo]
+        return self._products_for(self._by_categoria, categoria)
+    
+    def get_products_by_marca(self, marca: str) -> List[MasterProduct]:
+        """Obtener productos por marca"""
+        self._load_cache()
+        return self._products_for(self._by_marca, marca)
     
     def mark_products_as_inactive(self, links_to_deactivate: List[str]):
         """Marcar productos como inactivos (ya no aparecen en scraping)"""
@@ -718,8 +1036,11 @@ class MasterProductsManager:
         count = 0
         
         for link in links_to_deactivate:
-            if link in self._products_cache:
-                self._products_cache[link].activo = False
+            product = self._products_cache.get(link)
+            if product is not None:
+                product.activo = False
+                self._index_product(product)
+                self._dirty_links[link] = None
                 count += 1
         
         if count > 0:
@@ -731,25 +1052,11 @@ class MasterProductsManager:
         self._load_cache()
         
         total_products = len(self._products_cache)
-        active_products = sum(1 for p in self._products_cache.values() if p.activo)
-        
-        # Por retailer
-        by_retailer = {}
-        for product in self._products_cache.values():
-            if product.activo:
-                retailer = product.retailer
-                if retailer not in by_retailer:
-                    by_retailer[retailer] = 0
-                by_retailer[retailer] += 1
-        
-        # Por categoría
-        by_categoria = {}
-        for product in self._products_cache.values():
-            if product.activo:
-                categoria = product.categoria
-                if categoria not in by_categoria:
-                    by_categoria[categoria] = 0
-                by_categoria[categoria] += 1
+        active_products = sum(1 for keys in self._index_keys.values() if keys[4])
+        
+        # Por retailer / categoría (tamaño de cada entrada de índice)
+        by_retailer = {retailer: len(links) for retailer, links in self._by_retailer.items()}
+        by_categoria = {categoria: len(links) for categoria, links in self._by_categoria.items()}
         
         return {
             'total_products': total_products,
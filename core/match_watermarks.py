@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+🔖 Match Watermarks - Matching incremental entre ciclos de arbitraje
+====================================================================
+
+Cada ciclo de arbitraje re-lee la misma ventana de productos, pero la
+mayoría no cambió desde la hora anterior. Este módulo guarda una marca de
+agua por producto:
+
+- Hash de identidad (nombre, marca, modelo, categoría, specs y retailer)
+- Precio con el que se puntuó (el scoring usa proximidad de precio)
+- Último matching y última vez visto
+
+En cada ciclo `plan()` marca como "sucios" solo los productos nuevos, con
+identidad cambiada, con precio movido más que `price_tolerance` o cuyo
+matching venció (`max_age`). Se puntúan únicamente los pares que tocan un
+producto sucio (contra toda la ventana) y los matches guardados entre
+productos limpios se reutilizan: el costo del ciclo escala con el churn y
+no con el tamaño del catálogo.
+
+Uso:
+    plan = watermarks.plan(productos)
+    pares = plan.filter_pairs(blocker.candidate_pairs(productos))
+    nuevos = puntuar(pares)
+    vigentes = watermarks.kept_matches(productos, plan)
+    watermarks.commit(productos, plan, nuevos)
+"""
+
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Campos que definen la identidad de un producto para el matching
+IDENTITY_FIELDS = ('nombre', 'marca', 'modelo', 'categoria', 'storage', 'ram', 'screen', 'retailer')
+
+# Campos de precio en orden de preferencia (mismo criterio que el scoring)
+PRICE_FIELDS = ('precio_oferta', 'precio_normal', 'precio_actual')
+
+PairKey = Tuple[str, str]
+
+
+def identity_hash(product: Any) -> str:
+    """Hash estable de los campos de identidad (minúsculas, sin espacios extremos)"""
+    parts = []
+    for name in IDENTITY_FIELDS:
+        value = product.get(name)
+        parts.append('' if value is None else str(value).lower().strip())
+    return hashlib.blake2b('\x1f'.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def product_key(product: Any) -> str:
+    return str(product.get('codigo_interno') or product.get('sku') or '')
+
+
+def _product_price(product: Any) -> Optional[float]:
+    for name in PRICE_FIELDS:
+        value = product.get(name)
+        try:
+            if value and float(value) > 0:
+                return float(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+@dataclass
+class Watermark:
+    """Estado de matching de un producto"""
+    identity: str
+    price: Optional[float]
+    last_matched: datetime
+    last_seen: datetime
+
+
+@dataclass
+class MatchPlan:
+    """Productos a re-puntuar en este ciclo"""
+    keys: List[str]
+    dirty: List[bool]
+    reasons: Dict[str, int] = field(default_factory=dict)
+    created_at: datetime = field(default_factory=datetime.now)
+
+    @property
+    def dirty_count(self) -> int:
+        return sum(self.dirty)
+
+    def filter_pairs(self, pairs: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Solo pares (i, j) donde al menos un producto está sucio"""
+        dirty = self.dirty
+        return [(i, j) for i, j in pairs if dirty[i] or dirty[j]]
+
+
+class MatchWatermarkStore:
+    """
+    🔖 Marcas de agua por producto y matches vigentes entre ciclos
+    """
+
+    def __init__(self, max_age: timedelta = timedelta(hours=24), price_tolerance: float = 0.2,
+                 retention: timedelta = timedelta(days=7)):
+        """
+        Args:
+            max_age: Re-puntuar un producto aunque no cambie pasado este tiempo
+            price_tolerance: Variación relativa de precio que obliga a re-puntuar
+            retention: Olvidar productos no vistos en este tiempo
+        """
+        self.max_age = max_age
+        self.price_tolerance = price_tolerance
+        self.retention = retention
+        self._watermarks: Dict[str, Watermark] = {}
+        self._matches: Dict[PairKey, Dict[str, Any]] = {}
+        self._pairs_by_code: Dict[str, Set[PairKey]] = {}
+        self.last_stats: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._watermarks)
+
+    @property
+    def stored_matches(self) -> int:
+        return len(self._matches)
+
+    def plan(self, products: Sequence[Any], now: Optional[datetime] = None) -> MatchPlan:
+        """Clasifica la ventana de productos en sucios (a puntuar) y limpios"""
+        now = now or datetime.now()
+        reasons = {'new': 0, 'changed': 0, 'repriced': 0, 'expired': 0}
+        keys, dirty = [], []
+
+        for product in products:
+            key = product_key(product)
+            watermark = self._watermarks.get(key)
+            reason = self._dirty_reason(product, watermark, now)
+            if reason:
+                reasons[reason] += 1
+            elif watermark:
+                watermark.last_seen = now
+            keys.append(key)
+            dirty.append(reason is not None)
+
+        plan = MatchPlan(keys=keys, dirty=dirty, reasons=reasons, created_at=now)
+        self.last_stats = {
+            'products': len(keys),
+            'dirty': plan.dirty_count,
+            'clean': len(keys) - plan.dirty_count,
+            **reasons,
+        }
+        logger.info(f"🔖 Matching incremental: {plan.dirty_count}/{len(keys)} productos a re-puntuar {reasons}")
+        return plan
+
+    def _dirty_reason(self, product: Any, watermark: Optional[Watermark], now: datetime) -> Optional[str]:
+        if watermark is None:
+            return 'new'
+        if watermark.identity != identity_hash(product):
+            return 'changed'
+        price = _product_price(product)
+        if self._price_moved(watermark.price, price):
+            return 'repriced'
+        if now - watermark.last_matched > self.max_age:
+            return 'expired'
+        return None
+
+    def _price_moved(self, old: Optional[float], new: Optional[float]) -> bool:
+        if old is None or new is None:
+            return old != new
+        return abs(new - old) > self.price_tolerance * old
+
+    def kept_matches(self, products: Sequence[Any], plan: MatchPlan) -> List[Tuple[Dict[str, Any], int, int]]:
+        """
+        Matches guardados entre productos limpios presentes en la ventana
+
+        Returns:
+            Lista de (match, índice producto base, índice producto match)
+        """
+        positions = {key: index for index, key in enumerate(plan.keys)}
+        kept = []
+        for (code_a, code_b), match in self._matches.items():
+            index_a = positions.get(code_a)
+            index_b = positions.get(code_b)
+            if index_a is None or index_b is None or plan.dirty[index_a] or plan.dirty[index_b]:
+                continue
+            kept.append((match, index_a, index_b))
+        return kept
+
+    def commit(self, products: Sequence[Any], plan: MatchPlan, matches: Iterable[Dict[str, Any]]):
+        """
+        Registra el resultado del ciclo: invalida los matches de productos
+        sucios, guarda los nuevos y avanza sus marcas de agua
+        """
+        now = plan.created_at
+        for index, product in enumerate(products):
+            if not plan.dirty[index]:
+                continue
+            key = plan.keys[index]
+            for pair in self._pairs_by_code.pop(key, set()):
+                self._drop_pair(pair, keep=key)
+            self._watermarks[key] = Watermark(identity_hash(product), _product_price(product), now, now)
+
+        for match in matches:
+            pair = (str(match.get('codigo_base')), str(match.get('codigo_match')))
+            self._matches[pair] = match
+            for code in pair:
+                self._pairs_by_code.setdefault(code, set()).add(pair)
+
+        self._prune(now)
+        self.last_stats['stored_matches'] = len(self._matches)
+
+    def _drop_pair(self, pair: PairKey, keep: str):
+        self._matches.pop(pair, None)
+        for code in pair:
+            if code != keep and code in self._pairs_by_code:
+                self._pairs_by_code[code].discard(pair)
+
+    def _prune(self, now: datetime):
+        """Olvida productos no vistos dentro de `retention`"""
+        stale = [key for key, watermark in self._watermarks.items() if now - watermark.last_seen > self.retention]
+        for key in stale:
+            del self._watermarks[key]
+            for pair in self._pairs_by_code.pop(key, set()):
+                self._drop_pair(pair, keep=key)
+        if stale:
+            logger.debug(f"🔖 {len(stale)} marcas de agua vencidas eliminadas")
+
+    def reset(self):
+        """Fuerza un re-matching completo en el próximo ciclo"""
+        self._watermarks.clear()
+        self._matches.clear()
+        self._pairs_by_code.clear()
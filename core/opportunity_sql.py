@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+💰 Opportunity SQL - Detección de oportunidades en una sola consulta
+====================================================================
+
+En vez de unir `product_matching` con todo el historial de `master_precios`
+(una fila por día y por SKU) y calcular métricas fila a fila en Python, la
+detección se expresa como una consulta por conjuntos:
+
+1. `latest_prices`: último precio de oferta por SKU dentro de
+   `max_price_age_days` (DISTINCT ON sobre la PK codigo_interno, fecha)
+2. Orientación barato/caro de cada match activo
+3. Margen, %, ganancia neta (8% de costos), ROI, opportunity score y nivel
+   de riesgo calculados en SQL
+4. Filtros de margen y porcentaje mínimos, ranking y LIMIT
+
+El SQL es válido en PostgreSQL y en DuckDB; solo cambia el estilo de
+parámetros ($1 para asyncpg/DuckDB, %s para psycopg2).
+
+Uso:
+    sql = build_opportunity_query(paramstyle='pyformat')
+    cur.execute(sql, opportunity_params(config, limit=20))
+    oportunidades = [row_to_opportunity(row) for row in cur.fetchall()]
+"""
+
+import logging
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tablas de matching permitidas (se interpolan como identificador)
+MATCHING_TABLES = ('product_matching', 'product_matching_v5')
+
+DEFAULT_MAX_PRICE_AGE_DAYS = 3
+
+# Costos estimados sobre el precio de compra (mismo 8% que el cálculo previo en Python)
+COST_RATE = 0.08
+
+_OPPORTUNITY_SQL = """
+    WITH latest_prices AS (
+        SELECT DISTINCT ON (codigo_interno)
+            codigo_interno,
+            precio_oferta
+        FROM master_precios
+        WHERE fecha >= CURRENT_DATE - CAST({p_max_age} AS INTEGER)
+          AND precio_oferta > 0
+        ORDER BY codigo_interno, fecha DESC
+    ),
+    oriented AS (
+        SELECT
+            pm.id AS matching_id,
+            pm.similarity_score,
+            pm.match_confidence,
+            CASE WHEN lp1.precio_oferta <= lp2.precio_oferta THEN pm.codigo_base ELSE pm.codigo_match END AS codigo_barato,
+            CASE WHEN lp1.precio_oferta <= lp2.precio_oferta THEN pm.codigo_match ELSE pm.codigo_base END AS codigo_caro,
+            LEAST(lp1.precio_oferta, lp2.precio_oferta) AS precio_barato,
+            GREATEST(lp1.precio_oferta, lp2.precio_oferta) AS precio_caro
+        FROM {matching_table} pm
+        JOIN latest_prices lp1 ON lp1.codigo_interno = pm.codigo_base
+        JOIN latest_prices lp2 ON lp2.codigo_interno = pm.codigo_match
+        WHERE pm.is_active = TRUE
+          AND pm.similarity_score >= CAST({p_min_similarity} AS DOUBLE PRECISION)
+          AND lp1.precio_oferta <> lp2.precio_oferta
+    ),
+    metrics AS (
+        SELECT
+            o.*,
+            precio_caro - precio_barato AS diferencia,
+            (precio_caro - precio_barato) * 100.0 / precio_barato AS diferencia_porcentaje,
+            (precio_caro - precio_barato) - FLOOR(precio_barato * {cost_rate}) AS ganancia_neta
+        FROM oriented o
+    ),
+    scored AS (
+        SELECT
+            m.*,
+            ganancia_neta * 100.0 / precio_barato AS roi_estimado,
+            0.5 + 0.5 * (
+                LEAST(diferencia_porcentaje / 100.0, 1.0) * 0.4
+                + similarity_score * 0.3
+                + LEAST(diferencia / 100000.0, 1.0) * 0.3
+            ) AS opportunity_score
+        FROM metrics m
+        WHERE diferencia >= CAST({p_min_margin} AS DOUBLE PRECISION)
+          AND diferencia_porcentaje >= CAST({p_min_percentage} AS DOUBLE PRECISION)
+    )
+    SELECT
+        s.*,
+        CASE
+            WHEN s.match_confidence = 'high' AND s.roi_estimado > 30 THEN 'low'
+            WHEN s.match_confidence = 'medium' AND s.roi_estimado > 20 THEN 'medium'
+            WHEN s.roi_estimado > 10 THEN 'medium'
+            ELSE 'high'
+        END AS risk_level,
+        pb.retailer AS retailer_compra,
+        pc.retailer AS retailer_venta,
+        pb.nombre AS nombre_barato,
+        pc.nombre AS nombre_caro
+    FROM scored s
+    JOIN master_productos pb ON pb.codigo_interno = s.codigo_barato
+    JOIN master_productos pc ON pc.codigo_interno = s.codigo_caro
+    ORDER BY s.diferencia DESC, s.diferencia_porcentaje DESC, s.matching_id
+    LIMIT CAST({p_limit} AS INTEGER)
+"""
+
+# Orden de parámetros = orden de aparición en el SQL (necesario para %s posicional)
+_PARAM_NAMES = ('p_max_age', 'p_min_similarity', 'p_min_margin', 'p_min_percentage', 'p_limit')
+
+
+def build_opportunity_query(matching_table: str = 'product_matching', paramstyle: str = 'numeric') -> str:
+    """
+    SQL de detección por conjuntos
+
+    Args:
+        matching_table: Tabla de matches (product_matching o product_matching_v5)
+        paramstyle: 'numeric' ($1..$5: asyncpg, DuckDB) o 'pyformat' (%s: psycopg2)
+
+    Parámetros: ver opportunity_params()
+    """
+    if matching_table not in MATCHING_TABLES:
+        raise ValueError(f"Tabla de matching no permitida: {matching_table}")
+    if paramstyle == 'numeric':
+        placeholders = {name: f"${position}" for position, name in enumerate(_PARAM_NAMES, start=1)}
+    elif paramstyle == 'pyformat':
+        placeholders = {name: '%s' for name in _PARAM_NAMES}
+    else:
+        raise ValueError(f"paramstyle no soportado: {paramstyle}")
+    return _OPPORTUNITY_SQL.format(matching_table=matching_table, cost_rate=COST_RATE, **placeholders)
+
+
+def opportunity_params(config: Dict[str, Any], limit: int = 100) -> Tuple[Any, ...]:
+    """Parámetros en el orden de _PARAM_NAMES desde el dict de configuración de arbitraje"""
+    return (
+        int(config.get('max_price_age_days', DEFAULT_MAX_PRICE_AGE_DAYS)),
+        float(config['min_similarity_score']),
+        float(config['min_margin_clp']),
+        float(config['min_percentage']),
+        int(limit),
+    )
+
+
+def row_to_opportunity(row: Any, name_keys: Tuple[str, str] = ('nombre_barato', 'nombre_caro')) -> Dict[str, Any]:
+    """
+    Fila de la consulta → dict de oportunidad (mismo formato que la detección previa)
+
+    Args:
+        row: Fila con acceso por nombre de columna (DictCursor, asyncpg.Record, dict)
+        name_keys: Claves de metadata para los nombres barato/caro (el flujo
+            async usa 'producto_barato_nombre' / 'producto_caro_nombre')
+    """
+    diferencia = int(row['diferencia'])
+    similarity = float(row['similarity_score'])
+    return {
+        'matching_id': row['matching_id'],
+        'producto_barato_codigo': row['codigo_barato'],
+        'producto_caro_codigo': row['codigo_caro'],
+        'retailer_compra': row['retailer_compra'],
+        'retailer_venta': row['retailer_venta'],
+        'precio_compra': int(row['precio_barato']),
+        'precio_venta': int(row['precio_caro']),
+        'diferencia_absoluta': diferencia,
+        'diferencia_porcentaje': float(row['diferencia_porcentaje']),
+        'margen_bruto': diferencia,
+        'roi_estimado': float(row['roi_estimado']),
+        'opportunity_score': float(row['opportunity_score']),
+        'risk_level': row['risk_level'],
+        'detection_method': 'ml_price_difference',
+        'metadata': {
+            'similarity_score': similarity,
+            'match_confidence': row['match_confidence'],
+            name_keys[0]: row['nombre_barato'],
+            name_keys[1]: row['nombre_caro'],
+        },
+    }
+
+
+def detect_opportunities_duckdb(conn: Any, config: Dict[str, Any], limit: int = 100,
+                                matching_table: str = 'product_matching') -> List[Dict[str, Any]]:
+    """Misma detección sobre una conexión DuckDB (tablas locales o vistas sobre Parquet)"""
+    cursor = conn.execute(build_opportunity_query(matching_table, 'numeric'), list(opportunity_params(config, limit)))
+    columns = [description[0] for description in cursor.description]
+    return [row_to_opportunity(dict(zip(columns, values))) for values in cursor.fetchall()]
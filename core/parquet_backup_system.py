@@ -8,11 +8,11 @@ organizados por retailer y fecha para respaldo completo.
 
 Estructura:
 data/parquet/
+├── backup_catalog.sqlite          (catálogo indexado de respaldos)
 ├── falabella/
 │   ├── 2025-09-03/
 │   │   ├── smartphones_20250903_143022.parquet
-│   │   ├── laptops_20250903_144511.parquet
-│   │   └── metadata_20250903.json
+│   │   └── laptops_20250903_144511.parquet
 │   └── 2025-09-04/
 ├── ripley/
 └── paris/
@@ -21,8 +21,9 @@ Features:
 - 🗂️ Organización por retailer/fecha/categoría
 - 📊 Formato Parquet optimizado para analytics
 - 🔄 Compresión automática (snappy)
-- 📝 Metadata completa en JSON
+- 📝 Metadata completa en catálogo SQLite append-only (indexado por retailer/categoría/fecha)
 - 🧹 Limpieza automática de archivos antiguos
+- 🗜️ Compactación diaria: muchos archivos chicos → pocos archivos ordenados (zstd)
 - 📈 Estadísticas de respaldo
 """
 
@@ -31,20 +32,35 @@ import json
 import logging
 import pandas as pd
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Union
 from dataclasses import dataclass, asdict
 import hashlib
 import gzip
 
+logger = logging.getLogger("parquet_backup")
+
+
+def _setup_logging():
+    """Handlers de logs/system al crear el primer ParquetBackupSystem (no al importar el módulo)"""
+    try:
+        from core.logging_config import get_system_logger
+        get_system_logger("parquet_backup")
+    except ImportError:
+        logging.basicConfig(level=logging.INFO)
+
 try:
-    from core.logging_config import get_system_logger
-    logger = get_system_logger("parquet_backup")
+    from .backup_catalog import BackupCatalog, COMPACTED_PREFIX
+    from .arrow_schemas import RecordBatchBuilder
 except ImportError:
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger("parquet_backup")
+    from core.backup_catalog import BackupCatalog, COMPACTED_PREFIX
+    from core.arrow_schemas import RecordBatchBuilder
+
+# Columnas candidatas (en orden) para ordenar dentro de cada categoría
+SORT_SKU_COLUMNS = ['sku', 'sku_original', 'link']
 
 @dataclass
 class BackupMetadata:
@@ -70,6 +86,7 @@ class ParquetBackupSystem:
     
     def __init__(self, base_path: Optional[str] = None):
         """Inicializar sistema de respaldo Parquet"""
+        _setup_logging()
         self.base_path = Path(base_path) if base_path else Path("data/parquet")
         self.base_path.mkdir(parents=True, exist_ok=True)
         
@@ -78,8 +95,31 @@ class ParquetBackupSystem:
         self.max_file_size_mb = 100  # Dividir archivos grandes
         self.max_age_days = 30       # Mantener respaldos por 30 días
         
+        # Compactación diaria de archivos chicos
+        self.compaction_compression = 'zstd'
+        self.compaction_row_group_size = 131_072   # Filas por row group
+        self.compaction_max_rows = 1_000_000       # Filas por archivo compactado
+        
+        self._catalog: Optional[BackupCatalog] = None
+        self._record_builder = RecordBatchBuilder('scraped_product')
+        
         logger.info(f"📦 ParquetBackupSystem inicializado en: {self.base_path}")
     
+    @property
+    def catalog(self) -> BackupCatalog:
+        """Catálogo de respaldos (se abre al primer uso)"""
+        if self._catalog is None:
+            self._catalog = BackupCatalog(self.base_path)
+        return self._catalog
+    
+    @staticmethod
+    def _first_kept_date(cutoff: datetime) -> str:
+        """Primera fecha (YYYY-MM-DD) cuya carpeta no es anterior a `cutoff`"""
+        first = cutoff.date()
+        if cutoff.time() != time():
+            first += timedelta(days=1)
+        return first.isoformat()
+    
     def _get_retailer_path(self, retailer: str, date: Optional[datetime] = None) -> Path:
         """Obtener ruta del retailer para una fecha específica"""
         if date is None:
@@ -96,37 +136,21 @@ class ParquetBackupSystem:
         timestamp_str = timestamp.strftime("%Y%m%d_%H%M%S")
         return f"{category}_{timestamp_str}.parquet"
     
-    def _prepare_dataframe(self, products: List[Dict[str, Any]]) -> pd.DataFrame:
-        """Preparar DataFrame para Parquet con tipos optimizados"""
-        if not products:
-            return pd.DataFrame()
-        
-        df = pd.DataFrame(products)
-        
-        # Optimizar tipos de datos para Parquet
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                # Intentar convertir strings numéricas
-                if col in ['precio_normal', 'precio_oferta', 'precio_tarjeta', 'reviews_count']:
-                    df[col] = pd.to_numeric(df[col], errors='ignore')
-                elif col == 'rating':
-                    df[col] = pd.to_numeric(df[col], errors='ignore', downcast='float')
-                elif col in ['out_of_stock', 'is_sponsored', 'is_promoted']:
-                    df[col] = df[col].astype('boolean')
-                else:
-                    # Mantener como string pero optimizar
-                    df[col] = df[col].astype('string')
-        
-        # Agregar columnas técnicas
-        df['backup_timestamp'] = datetime.now()
-        df['backup_id'] = hashlib.md5(str(datetime.now()).encode()).hexdigest()[:8]
-        
-        return df
+    def _build_record_batch(self, products: List[Any], timestamp: datetime) -> pa.RecordBatch:
+        """
+        RecordBatch con el schema 'scraped_product' (tipos fijos entre archivos)
+
+        Acepta dicts o dataclasses; claves fuera del schema van a la columna JSON `extra`.
+        """
+        return self._record_builder.build(products, constants={
+            'backup_timestamp': timestamp,
+            'backup_id': hashlib.md5(str(timestamp).encode()).hexdigest()[:8],
+        })
     
     def save_scraped_data(self, 
                          retailer: str,
                          category: str,
-                         products: List[Dict[str, Any]],
+                         products: List[Union[Dict[str, Any], Any]],
                          metadata: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Guardar datos scrapeados en Parquet
@@ -134,7 +158,7 @@ class ParquetBackupSystem:
         Args:
             retailer: Nombre del retailer (falabella, ripley, etc.)
             category: Categoría de productos (smartphones, laptops, etc.) 
-            products: Lista de productos scrapeados
+            products: Lista de productos scrapeados (dicts o dataclasses)
             metadata: Metadata adicional del scraping
             
         Returns:
@@ -143,10 +167,7 @@ class ParquetBackupSystem:
         timestamp = datetime.now()
         
         try:
-            # Preparar datos
-            df = self._prepare_dataframe(products)
-            
-            if df.empty:
+            if not products:
                 logger.warning(f"⚠️ No hay productos para respaldar: {retailer}/{category}")
                 return {"success": False, "error": "No products to backup"}
             
@@ -155,10 +176,10 @@ class ParquetBackupSystem:
             filename = self._generate_filename(retailer, category, timestamp)
             file_path = retailer_path / filename
             
-            # Guardar en Parquet con compresión
-            table = pa.Table.from_pandas(df)
+            # Guardar en Parquet con compresión (schema registrado, sin pandas)
+            batch = self._build_record_batch(products, timestamp)
             pq.write_table(
-                table, 
+                pa.Table.from_batches([batch]), 
                 file_path,
                 compression=self.compression,
                 use_dictionary=True,  # Optimizar strings repetidos
@@ -185,9 +206,8 @@ class ParquetBackupSystem:
                 warnings=metadata.get('warnings', []) if metadata else []
             )
             
-            # Guardar metadata en JSON
-            metadata_file = retailer_path / f"metadata_{timestamp.strftime('%Y%m%d')}.json"
-            self._append_metadata(metadata_file, backup_metadata)
+            # Registrar en el catálogo (append O(1))
+            self._record_backup(backup_metadata)
             
             logger.info(f"📦 Respaldo guardado: {file_path}")
             logger.info(f"📊 {products_count} productos, {file_size_mb:.2f}MB")
@@ -206,27 +226,10 @@ class ParquetBackupSystem:
             logger.error(f"❌ Error guardando respaldo Parquet: {e}")
             return {"success": False, "error": str(e)}
     
-    def _append_metadata(self, metadata_file: Path, backup_metadata: BackupMetadata):
-        """Agregar metadata al archivo JSON diario"""
+    def _record_backup(self, backup_metadata: BackupMetadata):
+        """Agregar metadata del respaldo al catálogo"""
         try:
-            # Leer metadata existente
-            if metadata_file.exists():
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    daily_metadata = json.load(f)
-            else:
-                daily_metadata = {
-                    "date": backup_metadata.timestamp.strftime("%Y-%m-%d"),
-                    "retailer": backup_metadata.retailer,
-                    "backups": []
-                }
-            
-            # Agregar nuevo respaldo
-            daily_metadata["backups"].append(asdict(backup_metadata))
-            
-            # Guardar metadata actualizada
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(daily_metadata, f, indent=2, ensure_ascii=False, default=str)
-                
+            self.catalog.add(asdict(backup_metadata))
         except Exception as e:
             logger.warning(f"⚠️ Error guardando metadata: {e}")
     
@@ -240,109 +243,204 @@ class ParquetBackupSystem:
             logger.error(f"❌ Error leyendo respaldo: {e}")
             return pd.DataFrame()
     
-    def list_backups(self, retailer: str = None, days_back: int = 7) -> List[Dict[str, Any]]:
-        """Listar respaldos disponibles"""
-        backups = []
+    def list_backups(self, retailer: str = None, days_back: int = 7,
+                     category: str = None) -> List[Dict[str, Any]]:
+        """Listar respaldos disponibles (query indexada sobre el catálogo)"""
         cutoff_date = datetime.now() - timedelta(days=days_back)
         
         try:
-            if retailer:
-                retailers = [retailer]
-            else:
-                retailers = [d.name for d in self.base_path.iterdir() if d.is_dir()]
-            
-            for retailer_name in retailers:
-                retailer_path = self.base_path / retailer_name
-                if not retailer_path.exists():
-                    continue
-                
-                for date_dir in retailer_path.iterdir():
-                    if not date_dir.is_dir():
-                        continue
-                    
-                    try:
-                        date_obj = datetime.strptime(date_dir.name, "%Y-%m-%d")
-                        if date_obj < cutoff_date:
-                            continue
-                    except ValueError:
-                        continue
-                    
-                    # Buscar archivos Parquet
-                    for parquet_file in date_dir.glob("*.parquet"):
-                        file_size = parquet_file.stat().st_size / (1024 * 1024)
-                        backups.append({
-                            "retailer": retailer_name,
-                            "date": date_dir.name,
-                            "file": parquet_file.name,
-                            "path": str(parquet_file),
-                            "size_mb": round(file_size, 2),
-                            "modified": datetime.fromtimestamp(parquet_file.stat().st_mtime)
-                        })
-            
-            return sorted(backups, key=lambda x: x['modified'], reverse=True)
+            entries = self.catalog.list(retailer=retailer, category=category,
+                                        since_date=self._first_kept_date(cutoff_date))
+            return [
+                {
+                    "retailer": entry["retailer"],
+                    "category": entry["category"],
+                    "date": entry["backup_date"],
+                    "file": entry["file_name"],
+                    "path": entry["file_path"],
+                    "size_mb": round(entry["file_size_mb"], 2),
+                    "products_count": entry["products_count"],
+                    "modified": datetime.fromisoformat(entry["timestamp"])
+                }
+                for entry in entries
+            ]
             
         except Exception as e:
             logger.error(f"❌ Error listando respaldos: {e}")
             return []
     
     def get_backup_stats(self) -> Dict[str, Any]:
-        """Obtener estadísticas de respaldos"""
+        """Obtener estadísticas de respaldos (agregados del catálogo)"""
         try:
-            stats = {
-                "total_retailers": 0,
-                "total_files": 0,
-                "total_size_mb": 0,
-                "retailers": {},
-                "oldest_backup": None,
-                "newest_backup": None
+            catalog_stats = self.catalog.stats()
+            retailers = {
+                name: {
+                    "files": r["files"],
+                    "size_mb": round(r["size_mb"], 2),
+                    "dates": r["dates"]
+                }
+                for name, r in catalog_stats["retailers"].items()
+            }
+            
+            return {
+                "total_retailers": len(retailers),
+                "total_files": sum(r["files"] for r in retailers.values()),
+                "total_size_mb": round(sum(r["size_mb"] for r in catalog_stats["retailers"].values()), 2),
+                "retailers": retailers,
+                "oldest_backup": catalog_stats["oldest_backup"],
+                "newest_backup": catalog_stats["newest_backup"]
             }
             
-            if not self.base_path.exists():
-                return stats
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo estadísticas: {e}")
+            return {"error": str(e)}
+    
+    @staticmethod
+    def _unify_tables(tables: List[pa.Table]) -> pa.Table:
+        """
+        Concatenar tablas con schemas distintos (columnas faltantes → null)
+        
+        Columnas con tipos incompatibles entre páginas se guardan como string.
+        """
+        tables = [t.replace_schema_metadata(None) for t in tables]
+        try:
+            return pa.concat_tables(tables, promote_options='permissive')
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+        
+        types: Dict[str, set] = {}
+        for table in tables:
+            for field in table.schema:
+                if not pa.types.is_null(field.type):
+                    types.setdefault(field.name, set()).add(field.type)
+        conflicting = {name for name, found in types.items() if len(found) > 1}
+        
+        normalized = []
+        for table in tables:
+            for name in conflicting & set(table.column_names):
+                index = table.column_names.index(name)
+                table = table.set_column(index, name, table.column(name).cast(pa.string()))
+            normalized.append(table)
+        return pa.concat_tables(normalized, promote_options='permissive')
+    
+    def compact_day(self, retailer: str, backup_date: str) -> Dict[str, Any]:
+        """
+        Compactar los respaldos de un retailer/día en pocos archivos grandes
+        
+        Los datos se ordenan por (category, sku) y se escriben con zstd,
+        diccionario y row groups grandes; el catálogo se actualiza en una
+        sola transacción y recién después se borran los archivos origen.
+        
+        Args:
+            retailer: Retailer a compactar
+            backup_date: Día (YYYY-MM-DD)
+        
+        Returns:
+            Resumen de la compactación
+        """
+        entries = self.catalog.files_for_day(retailer, backup_date)
+        sources: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in entries:
+            sources.setdefault(entry['file_path'], []).append(entry)
+        
+        if len(sources) < 2:
+            return {"success": True, "retailer": retailer, "date": backup_date, "compacted_files": 0}
+        
+        try:
+            tables = []
+            bytes_before = 0
+            for path, file_entries in sources.items():
+                table = pq.read_table(path)
+                file_category = pa.array([file_entries[0]['category']] * table.num_rows, type=pa.string())
+                if 'category' not in table.column_names:
+                    table = table.append_column('category', file_category)
+                elif table.column('category').null_count:
+                    # Schema 'scraped_product': category solo viene poblada desde ProductData
+                    index = table.column_names.index('category')
+                    filled = pc.coalesce(table.column('category').cast(pa.string()), file_category)
+                    table = table.set_column(index, 'category', filled)
+                tables.append(table)
+                bytes_before += Path(path).stat().st_size
             
-            oldest_time = None
-            newest_time = None
+            merged = self._unify_tables(tables)
+            sku_column = next((c for c in SORT_SKU_COLUMNS if c in merged.column_names), None)
+            sort_keys = [('category', 'ascending')] + ([(sku_column, 'ascending')] if sku_column else [])
+            merged = merged.sort_by(sort_keys)
             
-            for retailer_dir in self.base_path.iterdir():
-                if not retailer_dir.is_dir():
-                    continue
-                
-                stats["total_retailers"] += 1
-                retailer_stats = {"files": 0, "size_mb": 0, "dates": []}
-                
-                for date_dir in retailer_dir.iterdir():
-                    if not date_dir.is_dir():
-                        continue
-                    
-                    retailer_stats["dates"].append(date_dir.name)
-                    
-                    for parquet_file in date_dir.glob("*.parquet"):
-                        file_size = parquet_file.stat().st_size / (1024 * 1024)
-                        file_time = datetime.fromtimestamp(parquet_file.stat().st_mtime)
-                        
-                        retailer_stats["files"] += 1
-                        retailer_stats["size_mb"] += file_size
-                        stats["total_files"] += 1
-                        stats["total_size_mb"] += file_size
-                        
-                        if oldest_time is None or file_time < oldest_time:
-                            oldest_time = file_time
-                            stats["oldest_backup"] = str(parquet_file)
-                        
-                        if newest_time is None or file_time > newest_time:
-                            newest_time = file_time
-                            stats["newest_backup"] = str(parquet_file)
+            # Escribir archivos nuevos (tmp + rename) antes de tocar el catálogo
+            day_path = self.base_path / retailer / backup_date
+            timestamp = max(datetime.fromisoformat(e['timestamp']) for e in entries)
+            new_entries, new_paths = [], []
+            bytes_after = 0
+            for i, offset in enumerate(range(0, merged.num_rows, self.compaction_max_rows)):
+                chunk = merged.slice(offset, self.compaction_max_rows)
+                file_path = day_path / f"{COMPACTED_PREFIX}{backup_date.replace('-', '')}_{i:03d}.parquet"
+                tmp_path = file_path.with_suffix('.parquet.tmp')
+                pq.write_table(
+                    chunk,
+                    tmp_path,
+                    compression=self.compaction_compression,
+                    use_dictionary=True,
+                    row_group_size=self.compaction_row_group_size,
+                    write_statistics=True
+                )
+                os.replace(tmp_path, file_path)
+                new_paths.append(str(file_path))
                 
-                retailer_stats["size_mb"] = round(retailer_stats["size_mb"], 2)
-                stats["retailers"][retailer_dir.name] = retailer_stats
+                file_size_mb = file_path.stat().st_size / (1024 * 1024)
+                bytes_after += file_path.stat().st_size
+                for item in chunk.column('category').value_counts():
+                    count = item['counts'].as_py()
+                    new_entries.append({
+                        'retailer': retailer,
+                        'category': item['values'].as_py(),
+                        'timestamp': timestamp,
+                        'file_path': str(file_path),
+                        'products_count': count,
+                        'file_size_mb': file_size_mb * count / chunk.num_rows,
+                    })
+            
+            self.catalog.replace_files(list(sources), new_entries)
             
-            stats["total_size_mb"] = round(stats["total_size_mb"], 2)
+            for path in sources:
+                if path not in new_paths:
+                    Path(path).unlink(missing_ok=True)
             
-            return stats
+            logger.info(f"🗜️ Compactado {retailer}/{backup_date}: {len(sources)} → {len(new_paths)} archivos, "
+                        f"{merged.num_rows} filas ({bytes_before / 1048576:.2f}MB → {bytes_after / 1048576:.2f}MB)")
+            
+            return {
+                "success": True,
+                "retailer": retailer,
+                "date": backup_date,
+                "compacted_files": len(sources),
+                "output_files": len(new_paths),
+                "rows": merged.num_rows,
+                "size_before_mb": round(bytes_before / 1048576, 2),
+                "size_after_mb": round(bytes_after / 1048576, 2)
+            }
             
         except Exception as e:
-            logger.error(f"❌ Error obteniendo estadísticas: {e}")
-            return {"error": str(e)}
+            logger.error(f"❌ Error compactando {retailer}/{backup_date}: {e}")
+            return {"success": False, "retailer": retailer, "date": backup_date, "error": str(e)}
+    
+    def compact_backups(self, before_date: Optional[str] = None, min_files: int = 2) -> Dict[str, Any]:
+        """
+        Compactar todos los días cerrados (anteriores a `before_date`, default hoy)
+        
+        Args:
+            min_files: Compactar solo días con al menos esta cantidad de archivos
+        """
+        before_date = before_date or datetime.now().strftime("%Y-%m-%d")
+        results = [self.compact_day(retailer, day)
+                   for retailer, day in self.catalog.days_with_files(before_date, min_files)]
+        
+        return {
+            "success": all(r["success"] for r in results),
+            "days_compacted": sum(1 for r in results if r.get("compacted_files")),
+            "files_compacted": sum(r.get("compacted_files", 0) for r in results),
+            "results": results
+        }
     
     def cleanup_old_backups(self, max_age_days: Optional[int] = None) -> Dict[str, Any]:
         """Limpiar respaldos antiguos"""
@@ -377,6 +475,9 @@ class ParquetBackupSystem:
                     except ValueError:
                         continue
             
+            # Mismo corte en el catálogo
+            self.catalog.remove_before(self._first_kept_date(cutoff_date))
+            
             logger.info(f"🧹 Limpieza completada: {len(deleted_files)} carpetas eliminadas, {deleted_size_mb:.2f}MB liberados")
             
             return {
@@ -390,20 +491,31 @@ class ParquetBackupSystem:
             logger.error(f"❌ Error en limpieza: {e}")
             return {"success": False, "error": str(e)}
 
-# Instancia global del sistema
-parquet_backup_system = ParquetBackupSystem()
+# Instancia global del sistema (se crea al primer uso, no al importar)
+_parquet_backup_system: Optional[ParquetBackupSystem] = None
+
+def get_parquet_backup_system() -> ParquetBackupSystem:
+    """Instancia global de ParquetBackupSystem en data/parquet"""
+    global _parquet_backup_system
+    if _parquet_backup_system is None:
+        _parquet_backup_system = ParquetBackupSystem()
+    return _parquet_backup_system
 
 def save_scraper_backup(retailer: str, category: str, products: List[Dict], metadata: Dict = None) -> Dict:
     """Función helper para guardar respaldo desde scrapers"""
-    return parquet_backup_system.save_scraped_data(retailer, category, products, metadata)
+    return get_parquet_backup_system().save_scraped_data(retailer, category, products, metadata)
 
 def get_backup_stats() -> Dict:
     """Función helper para obtener estadísticas"""
-    return parquet_backup_system.get_backup_stats()
+    return get_parquet_backup_system().get_backup_stats()
 
 def list_recent_backups(retailer: str = None, days: int = 7) -> List[Dict]:
     """Función helper para listar respaldos recientes"""
-    return parquet_backup_system.list_backups(retailer, days)
+    return get_parquet_backup_system().list_backups(retailer, days)
+
+def compact_backups(before_date: str = None) -> Dict:
+    """Función helper para compactar respaldos de días cerrados"""
+    return get_parquet_backup_system().compact_backups(before_date)
 
 if __name__ == "__main__":
     # Test del sistema
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+📈 Price History - Consultas de histórico sobre Parquet particionado
+=====================================================================
+
+Capa de lectura del histórico de precios directamente desde los Parquet
+diarios (data/master/precios/year=YYYY/month=MM/precios_YYYYMMDD.parquet):
+
+- Poda de particiones: solo se abren los archivos de los días del rango
+  (más los deltas intradía aún no compactados).
+- Poda de row groups: los archivos diarios se escriben ordenados por
+  codigo_interno, así los filtros por SKU descartan row groups por sus
+  estadísticas min/max (zone maps).
+- Consultas multi-SKU en una sola pasada, devolviendo tablas Arrow.
+- LRU pequeño de resultados recientes, invalidado al escribir snapshots.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from .connection_manager import ConnectionManager, DuckDBConnection
+
+logger = logging.getLogger(__name__)
+
+# Filas por row group de los Parquet diarios (granularidad de los zone maps)
+PRICE_ROW_GROUP_SIZE = 16_384
+
+HISTORY_COLUMNS = [
+    'codigo_interno', 'fecha', 'retailer', 'precio_normal', 'precio_oferta', 'precio_tarjeta',
+    'precio_min_dia', 'cambios_en_dia', 'precio_anterior_dia', 'cambio_porcentaje', 'volatilidad_dia',
+]
+
+
+def daily_parquet_file(parquet_root: Path, target_date: date) -> Path:
+    """Ruta del Parquet base (compactado) de un día en el layout Hive"""
+    month_path = parquet_root / f"year={target_date.year}" / f"month={target_date.month:02d}"
+    return month_path / f"precios_{target_date.strftime('%Y%m%d')}.parquet"
+
+
+def write_daily_parquet(df: pd.DataFrame, path: Path):
+    """Escribe un Parquet diario ordenado por codigo_interno (habilita zone maps)"""
+    df = df.sort_values('codigo_interno', kind='stable')
+    df.to_parquet(path, compression='snappy', index=False, row_group_size=PRICE_ROW_GROUP_SIZE)
+
+
+class PriceHistoryStore:
+    """
+    📈 Consultas de histórico de precios sobre Parquet vía DuckDB
+    """
+
+    def __init__(self, parquet_root: Path, deltas_root: Path,
+                 connection: Optional[DuckDBConnection] = None,
+                 cache_size: int = 128):
+        """
+        Args:
+            parquet_root: Raíz Hive de los Parquet diarios (master/precios)
+            deltas_root: Raíz de deltas intradía (master/precios_deltas)
+            connection: Conexión DuckDB a usar (default: DuckDB en memoria compartido)
+            cache_size: Resultados recientes a mantener en el LRU
+        """
+        self.parquet_root = Path(parquet_root)
+        self.deltas_root = Path(deltas_root)
+        self._connection = connection
+        self.cache_size = cache_size
+
+        self._cache: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.stats = {'queries': 0, 'cache_hits': 0, 'files_scanned': 0}
+
+    @property
+    def db(self) -> DuckDBConnection:
+        if self._connection is None:
+            self._connection = ConnectionManager.get_instance().duckdb(':memory:')
+        return self._connection
+
+    # ---------- archivos ----------
+
+    def files_for_range(self, start_date: date, end_date: date) -> Tuple[List[str], bool]:
+        """
+        Archivos del rango (poda por partición de día)
+
+        Returns:
+            (archivos, hay_deltas): base de cada día y luego sus deltas en orden
+        """
+        files: List[str] = []
+        has_deltas = False
+        current = start_date
+        while current <= end_date:
+            base = daily_parquet_file(self.parquet_root, current)
+            if base.exists():
+                files.append(str(base))
+            delta_dir = self.deltas_root / current.strftime('%Y%m%d')
+            if delta_dir.exists():
+                deltas = sorted(delta_dir.glob("delta_*.parquet"))
+                if deltas:
+                    has_deltas = True
+                    files.extend(str(delta) for delta in deltas)
+            current += timedelta(days=1)
+        return files, has_deltas
+
+    def _source_sql(self, files: List[str], has_deltas: bool) -> str:
+        """
+        Relación de snapshots del rango; con deltas se aplica merge-on-read
+        (última versión por codigo_interno y fecha)
+        """
+        file_list = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+        if not has_deltas:
+            return (f"SELECT * REPLACE (CAST(fecha AS DATE) AS fecha) "
+                    f"FROM read_parquet([{file_list}], union_by_name = true, hive_partitioning = false)")
+        
+        # Merge-on-read: el orden de los archivos define la versión (base primero, deltas por timestamp)
+        order = ", ".join(f"('{f.replace(chr(39), chr(39) * 2)}', {i})" for i, f in enumerate(files))
+        return (f"SELECT s.* EXCLUDE (filename) REPLACE (CAST(s.fecha AS DATE) AS fecha) "
+                f"FROM read_parquet([{file_list}], union_by_name = true, filename = true, "
+                f"hive_partitioning = false) s "
+                f"JOIN (VALUES {order}) AS o(filename, seq) USING (filename) "
+                f"QUALIFY row_number() OVER (PARTITION BY s.codigo_interno, s.fecha ORDER BY o.seq DESC) = 1")
+
+    # ---------- cache ----------
+
+    def _cached(self, key: Tuple, compute):
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats['cache_hits'] += 1
+                return self._cache[key]
+
+        result = compute()
+        with self._cache_lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def invalidate(self):
+        """Vaciar el LRU (llamar tras escribir snapshots o compactar)"""
+        with self._cache_lock:
+            self._cache.clear()
+
+    # ---------- consultas ----------
+
+    def _run(self, codigos: Sequence[str], start_date: date, end_date: date, select_sql: str,
+             condition: Optional[str] = None):
+        """
+        Ejecuta `select_sql` sobre los snapshots de `codigos` en el rango
+
+        `select_sql` recibe `{source}` (relación + WHERE) ya filtrada por SKU.
+        """
+        files, has_deltas = self.files_for_range(start_date, end_date)
+        if not files:
+            return None
+
+        self.stats['queries'] += 1
+        self.stats['files_scanned'] += len(files)
+        cursor = self.db.cursor()
+        # Cada archivo es un día del rango: no hace falta filtrar por fecha
+        source = self._source_sql(files, has_deltas)
+
+        conditions = [condition] if condition else []
+
+        if len(codigos) == 1:
+            where = " AND ".join(["codigo_interno = ?", *conditions])
+            sql = select_sql.format(source=f"({source}) WHERE {where}")
+            return cursor.execute(sql, [codigos[0]]).arrow()
+
+        # Multi-SKU: join contra la lista (el filtro min/max del join llega al scan)
+        skus = pd.DataFrame({'codigo_interno': list(dict.fromkeys(codigos))})
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor.register('history_skus', skus)
+        try:
+            sql = select_sql.format(source=f"({source}) JOIN history_skus USING (codigo_interno){where}")
+            return cursor.execute(sql).arrow()
+        finally:
+            cursor.unregister('history_skus')
+
+    def query(self, codigos: Iterable[str], start_date: date, end_date: date,
+              columns: Optional[Sequence[str]] = None):
+        """
+        Snapshots diarios de varios SKUs en el rango
+
+        Args:
+            columns: Columnas a leer (default: HISTORY_COLUMNS); menos columnas, menos I/O
+
+        Returns:
+            pyarrow.Table ordenada por codigo_interno, fecha (None si no hay archivos)
+        """
+        codigos = tuple(codigos)
+        columns = tuple(dict.fromkeys(['codigo_interno', 'fecha', *(columns or HISTORY_COLUMNS)]))
+        select = ", ".join(columns)
+        return self._cached(
+            ('query', codigos, start_date, end_date, columns),
+            lambda: self._run(codigos, start_date, end_date,
+                              f"SELECT {select} FROM {{source}} ORDER BY codigo_interno, fecha")
+        )
+
+    def stats_for(self, codigos: Iterable[str], start_date: date, end_date: date):
+        """
+        Estadísticas por SKU en el rango (mismas métricas que get_historical_price_stats)
+
+        Returns:
+            pyarrow.Table con una fila por SKU (None si no hay archivos)
+        """
+        codigos = tuple(codigos)
+        return self._cached(
+            ('stats', codigos, start_date, end_date),
+            lambda: self._run(codigos, start_date, end_date, """
+                SELECT codigo_interno,
+                       MIN(precio_min_dia) AS precio_historico_min,
+                       MAX(precio_min_dia) AS precio_historico_max,
+                       AVG(precio_min_dia) AS precio_promedio,
+                       COUNT(*) AS dias_con_datos,
+                       SUM(cambios_en_dia) AS total_cambios,
+                       AVG(ABS(cambio_porcentaje)) AS volatilidad_promedio
+                FROM {source}
+                GROUP BY codigo_interno
+                ORDER BY codigo_interno
+            """, condition="precio_min_dia > 0")
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'cached_results': len(self._cache)}
@@ -0,0 +1,537 @@
+# -*- coding: utf-8 -*-
+"""
+Price Snapshot Store
+====================
+Almacén columnar en memoria para los snapshots de precios del día.
+
+En vez de un `DailyPriceSnapshot` (dataclass con ~20 atributos, lista de
+alertas y datetimes) por SKU, los datos viven en arrays NumPy indexados por
+un dict `codigo_interno -> fila`. El acceso por SKU devuelve una vista con
+`__slots__` que lee/escribe directamente en las columnas, con la misma API
+que `DailyPriceSnapshot`.
+
+Características:
+- Carga vectorizada desde DataFrame (sin iterrows)
+- Actualización batch de precios (`update_prices`)
+- Estado dirty por fila para persistencia incremental
+- Interfaz tipo dict compatible con el antiguo `_today_cache`
+"""
+
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .arrow_schemas import RecordBatchBuilder
+
+logger = logging.getLogger(__name__)
+
+INT_COLUMNS = [
+    'precio_normal', 'precio_oferta', 'precio_tarjeta', 'precio_min_dia',
+    'precio_anterior_dia', 'cambio_absoluto', 'cambios_en_dia', 'alertas_enviadas'
+]
+FLOAT_COLUMNS = ['cambio_porcentaje', 'volatilidad_dia']
+TIME_COLUMNS = ['timestamp_creacion', 'timestamp_ultima_actualizacion']
+
+_INT_MAX = np.iinfo(np.int64).max
+
+
+def _min_positive(*price_arrays: np.ndarray) -> np.ndarray:
+    """Mínimo fila a fila considerando solo precios > 0 (0 si ninguno)"""
+    stacked = np.stack(price_arrays)
+    masked = np.where(stacked > 0, stacked, _INT_MAX).min(axis=0)
+    return np.where(masked == _INT_MAX, 0, masked)
+
+
+def _resolve_prices(new_values: Optional[Sequence], current: np.ndarray) -> np.ndarray:
+    """Nuevos precios del batch; None/NaN mantiene el valor actual"""
+    if new_values is None:
+        return current.copy()
+    values = pd.to_numeric(pd.Series(list(new_values), dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+    return np.where(np.isnan(values), current, values).astype(np.int64)
+
+
+class SnapshotRow:
+    """
+    Vista por SKU sobre una fila del store
+
+    Solo guarda referencia al store y el número de fila; todos los atributos
+    son propiedades que leen/escriben en las columnas.
+    """
+
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store: 'PriceSnapshotStore', row: int):
+        self._store = store
+        self._row = row
+
+    @property
+    def codigo_interno(self) -> str:
+        return self._store._codigos[self._row]
+
+    @property
+    def fecha(self) -> date:
+        return self._store.fecha
+
+    @property
+    def retailer(self) -> str:
+        return self._store._retailers[self._store._retailer_codes[self._row]]
+
+    @retailer.setter
+    def retailer(self, value: str):
+        self._store._retailer_codes[self._row] = self._store._retailer_code(value)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._store._dirty[self._row])
+
+    @dirty.setter
+    def dirty(self, value: bool):
+        self._store._dirty[self._row] = value
+
+    @property
+    def tipos_alertas(self) -> List[str]:
+        # Disperso: solo las filas con alertas tienen lista
+        return self._store._tipos_alertas.setdefault(self._row, [])
+
+    @tipos_alertas.setter
+    def tipos_alertas(self, value: List[str]):
+        self._store._tipos_alertas[self._row] = list(value)
+
+    @property
+    def _master_prices_manager(self):
+        return self._store.manager
+
+    @_master_prices_manager.setter
+    def _master_prices_manager(self, manager):
+        self._store.manager = manager
+
+    def __repr__(self) -> str:
+        return (f"{type(self).__name__}(codigo_interno={self.codigo_interno!r}, "
+                f"retailer={self.retailer!r}, precio_min_dia={self.precio_min_dia})")
+
+
+def _int_property(name: str):
+    def getter(self):
+        return int(self._store._columns[name][self._row])
+
+    def setter(self, value):
+        self._store._columns[name][self._row] = int(value or 0)
+
+    return property(getter, setter)
+
+
+def _float_property(name: str):
+    def getter(self):
+        return float(self._store._columns[name][self._row])
+
+    def setter(self, value):
+        self._store._columns[name][self._row] = float(value or 0.0)
+
+    return property(getter, setter)
+
+
+def _time_property(name: str):
+    def getter(self):
+        return pd.Timestamp(self._store._columns[name][self._row]).to_pydatetime()
+
+    def setter(self, value):
+        self._store._columns[name][self._row] = np.datetime64(value, 'us')
+
+    return property(getter, setter)
+
+
+for _name in INT_COLUMNS:
+    setattr(SnapshotRow, _name, _int_property(_name))
+for _name in FLOAT_COLUMNS:
+    setattr(SnapshotRow, _name, _float_property(_name))
+for _name in TIME_COLUMNS:
+    setattr(SnapshotRow, _name, _time_property(_name))
+
+
+class PriceSnapshotStore:
+    """
+    Store columnar de snapshots de un día
+
+    Se comporta como `Dict[str, snapshot]` (get, [], in, len, keys, values,
+    clear) para mantener compatibilidad con el código existente.
+    """
+
+    def __init__(self, fecha: date = None, view_class: type = SnapshotRow,
+                 initial_capacity: int = 1024):
+        self.fecha = fecha or date.today()
+        self.view_class = view_class
+        self.manager = None  # MasterPricesManager (acceso a configuración de alertas)
+
+        self._index: Dict[str, int] = {}
+        self._size = 0
+        self._capacity = 0
+        self._codigos = np.empty(0, dtype=object)
+        self._retailer_codes = np.empty(0, dtype=np.int16)
+        self._retailers: List[str] = []
+        self._retailer_lookup: Dict[str, int] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._dirty = np.empty(0, dtype=bool)
+        self._tipos_alertas: Dict[int, List[str]] = {}
+
+        self._allocate(initial_capacity)
+
+    # ------------------------------------------------------------------
+    # Gestión de memoria
+    # ------------------------------------------------------------------
+    def _allocate(self, capacity: int):
+        """Crea o amplía las columnas a la capacidad indicada"""
+        def grow(array: np.ndarray, dtype, fill=0) -> np.ndarray:
+            new = np.full(capacity, fill, dtype=dtype)
+            new[:self._size] = array[:self._size]
+            return new
+
+        self._codigos = grow(self._codigos, object, None)
+        self._retailer_codes = grow(self._retailer_codes, np.int16)
+        self._dirty = grow(self._dirty, bool, False)
+        for name in INT_COLUMNS:
+            self._columns[name] = grow(self._columns.get(name, np.empty(0, np.int64)), np.int64)
+        for name in FLOAT_COLUMNS:
+            self._columns[name] = grow(self._columns.get(name, np.empty(0, np.float64)), np.float64)
+        for name in TIME_COLUMNS:
+            self._columns[name] = grow(
+                self._columns.get(name, np.empty(0, 'datetime64[us]')), 'datetime64[us]', np.datetime64('NaT')
+            )
+        self._capacity = capacity
+
+    def _ensure_capacity(self, extra: int):
+        needed = self._size + extra
+        if needed > self._capacity:
+            self._allocate(max(needed, self._capacity * 2))
+
+    def _retailer_code(self, retailer: str) -> int:
+        retailer = retailer or ''
+        code = self._retailer_lookup.get(retailer)
+        if code is None:
+            code = len(self._retailers)
+            self._retailers.append(retailer)
+            self._retailer_lookup[retailer] = code
+        return code
+
+    def memory_bytes(self) -> int:
+        """Memoria aproximada de las columnas (sin contar los strings del índice)"""
+        arrays = [self._codigos, self._retailer_codes, self._dirty, *self._columns.values()]
+        return sum(a.nbytes for a in arrays)
+
+    # ------------------------------------------------------------------
+    # Interfaz tipo dict
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __contains__(self, codigo_interno: str) -> bool:
+        return codigo_interno in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __getitem__(self, codigo_interno: str):
+        return self.view_class(self, self._index[codigo_interno])
+
+    def __setitem__(self, codigo_interno: str, snapshot: Any):
+        """Copia un snapshot (dataclass o vista) a su fila"""
+        row = self._index.get(codigo_interno)
+        if row is None:
+            self._ensure_capacity(1)
+            row = self._size
+            self._size += 1
+            self._index[codigo_interno] = row
+            self._codigos[row] = codigo_interno
+
+        self._retailer_codes[row] = self._retailer_code(getattr(snapshot, 'retailer', ''))
+        for name in INT_COLUMNS:
+            self._columns[name][row] = int(getattr(snapshot, name, 0) or 0)
+        for name in FLOAT_COLUMNS:
+            self._columns[name][row] = float(getattr(snapshot, name, 0.0) or 0.0)
+        for name in TIME_COLUMNS:
+            self._columns[name][row] = np.datetime64(getattr(snapshot, name, None) or datetime.now(), 'us')
+        self._dirty[row] = bool(getattr(snapshot, 'dirty', True))
+        tipos = list(getattr(snapshot, 'tipos_alertas', None) or [])
+        if tipos:
+            self._tipos_alertas[row] = tipos
+        else:
+            self._tipos_alertas.pop(row, None)
+
+    def get(self, codigo_interno: str, default=None):
+        row = self._index.get(codigo_interno)
+        return default if row is None else self.view_class(self, row)
+
+    def keys(self):
+        return self._index.keys()
+
+    def values(self) -> Iterator[Any]:
+        return (self.view_class(self, row) for row in range(self._size))
+
+    def items(self) -> Iterator:
+        return ((codigo, self.view_class(self, row)) for codigo, row in self._index.items())
+
+    def clear(self):
+        self._index.clear()
+        self._tipos_alertas.clear()
+        self._retailers.clear()
+        self._retailer_lookup.clear()
+        self._size = 0
+        self._allocate(min(self._capacity, 1024) or 1024)
+
+    # ------------------------------------------------------------------
+    # Operaciones batch
+    # ------------------------------------------------------------------
+    def view(self, row: int):
+        """Vista de una fila"""
+        return self.view_class(self, int(row))
+
+    def column(self, name: str) -> np.ndarray:
+        """Columna numérica de las filas activas (vista, sin copia)"""
+        return self._columns[name][:self._size]
+
+    def codigos_of(self, rows: np.ndarray) -> List[str]:
+        return self._codigos[rows].tolist()
+
+    def retailers_of(self, rows: np.ndarray) -> np.ndarray:
+        """Nombre de retailer por fila"""
+        return np.asarray(self._retailers + [''], dtype=object)[self._retailer_codes[rows]]
+
+    def rows_for(self, codigos: Iterable[str]) -> np.ndarray:
+        """Filas de los SKUs indicados (KeyError si alguno no existe)"""
+        index = self._index
+        return np.fromiter((index[c] for c in codigos), dtype=np.int64)
+
+    def append(self, codigos: Sequence[str], retailers: Sequence[str],
+               precio_normal: Sequence[int], precio_oferta: Sequence[int],
+               precio_tarjeta: Sequence[int], precio_anterior_dia: Sequence[int] = None,
+               timestamp: datetime = None) -> np.ndarray:
+        """
+        Agregar snapshots nuevos en bloque (mismos cálculos que DailyPriceSnapshot.__post_init__)
+
+        Returns:
+            Filas asignadas
+        """
+        n = len(codigos)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        duplicated = [c for c in codigos if c in self._index]
+        if duplicated or len(set(codigos)) != n:
+            raise ValueError(f"SKUs ya existentes o duplicados en append: {duplicated[:5]}")
+
+        self._ensure_capacity(n)
+        rows = np.arange(self._size, self._size + n)
+        self._size += n
+        self._index.update(zip(codigos, rows.tolist()))
+        self._codigos[rows] = list(codigos)
+        self._retailer_codes[rows] = [self._retailer_code(r) for r in retailers]
+
+        normal = np.asarray(precio_normal, dtype=np.int64)
+        oferta = np.asarray(precio_oferta, dtype=np.int64)
+        tarjeta = np.asarray(precio_tarjeta, dtype=np.int64)
+        anterior = (np.zeros(n, dtype=np.int64) if precio_anterior_dia is None
+                    else np.asarray(precio_anterior_dia, dtype=np.int64))
+        minimo = _min_positive(normal, oferta, tarjeta)
+
+        cols = self._columns
+        cols['precio_normal'][rows] = normal
+        cols['precio_oferta'][rows] = oferta
+        cols['precio_tarjeta'][rows] = tarjeta
+        cols['precio_min_dia'][rows] = minimo
+        cols['precio_anterior_dia'][rows] = anterior
+        cols['cambios_en_dia'][rows] = 0
+        cols['alertas_enviadas'][rows] = 0
+        cols['volatilidad_dia'][rows] = 0.0
+
+        has_previous = anterior > 0
+        cambio_abs = np.where(has_previous, minimo - anterior, 0)
+        cols['cambio_absoluto'][rows] = cambio_abs
+        cols['cambio_porcentaje'][rows] = np.where(
+            has_previous, cambio_abs / np.where(has_previous, anterior, 1) * 100, 0.0
+        )
+
+        now = np.datetime64(timestamp or datetime.now(), 'us')
+        cols['timestamp_creacion'][rows] = now
+        cols['timestamp_ultima_actualizacion'][rows] = now
+        self._dirty[rows] = True
+        return rows
+
+    def update_prices(self, codigos: Sequence[str], precio_normal: Sequence = None,
+                      precio_oferta: Sequence = None, precio_tarjeta: Sequence = None,
+                      timestamp: datetime = None) -> np.ndarray:
+        """
+        Actualización batch con la semántica de DailyPriceSnapshot.update_prices
+
+        Los SKUs deben existir en el store. None/NaN mantiene el precio actual.
+
+        Returns:
+            Máscara booleana (alineada con `codigos`) de los SKUs que cambiaron
+        """
+        if len(codigos) == 0:
+            return np.zeros(0, dtype=bool)
+        if len(set(codigos)) != len(codigos):
+            raise ValueError("update_prices requiere SKUs únicos por batch")
+
+        rows = self.rows_for(codigos)
+        cols = self._columns
+        cur_normal = cols['precio_normal'][rows]
+        cur_oferta = cols['precio_oferta'][rows]
+        cur_tarjeta = cols['precio_tarjeta'][rows]
+
+        new_normal = _resolve_prices(precio_normal, cur_normal)
+        new_oferta = _resolve_prices(precio_oferta, cur_oferta)
+        new_tarjeta = _resolve_prices(precio_tarjeta, cur_tarjeta)
+
+        changed = (new_normal != cur_normal) | (new_oferta != cur_oferta) | (new_tarjeta != cur_tarjeta)
+        if not changed.any():
+            return changed
+
+        r = rows[changed]
+        old_min = cols['precio_min_dia'][r]
+        cols['precio_normal'][r] = new_normal[changed]
+        cols['precio_oferta'][r] = new_oferta[changed]
+        cols['precio_tarjeta'][r] = new_tarjeta[changed]
+        new_min = _min_positive(new_normal[changed], new_oferta[changed], new_tarjeta[changed])
+        cols['precio_min_dia'][r] = new_min
+
+        cols['cambios_en_dia'][r] += 1
+        cols['timestamp_ultima_actualizacion'][r] = np.datetime64(timestamp or datetime.now(), 'us')
+
+        # Volatilidad solo con múltiples cambios en el día
+        track = (cols['cambios_en_dia'][r] > 1) & (old_min > 0)
+        pct = np.abs(new_min - old_min) / np.where(old_min > 0, old_min, 1) * 100
+        cols['volatilidad_dia'][r] = np.where(track, np.maximum(cols['volatilidad_dia'][r], pct),
+                                              cols['volatilidad_dia'][r])
+
+        self._dirty[r] = True
+        return changed
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    def dirty_rows(self) -> np.ndarray:
+        return np.flatnonzero(self._dirty[:self._size])
+
+    def mark_clean(self, rows: np.ndarray = None):
+        if rows is None:
+            self._dirty[:self._size] = False
+        else:
+            self._dirty[rows] = False
+
+    def _export_columns(self, rows: np.ndarray) -> Dict[str, Any]:
+        """Columnas de DailyPriceSnapshot.to_dict para las filas dadas (vectorizado)"""
+        cols = self._columns
+        codigos = self._codigos[rows]
+        normal = cols['precio_normal'][rows]
+        minimo = cols['precio_min_dia'][rows]
+        descuento = np.where(
+            (normal > 0) & (minimo < normal),
+            np.round((normal - minimo) / np.where(normal > 0, normal, 1) * 100, 2),
+            0.0
+        )
+        retailers = self.retailers_of(rows)
+
+        return {
+            'id': [None] * len(rows),
+            'codigo_interno': codigos,
+            'fecha': self.fecha.isoformat(),
+            'retailer': retailers,
+            'precio_normal': normal,
+            'precio_oferta': cols['precio_oferta'][rows],
+            'precio_tarjeta': cols['precio_tarjeta'][rows],
+            'precio_min_dia': minimo,
+            'cambios_en_dia': cols['cambios_en_dia'][rows],
+            'precio_anterior_dia': cols['precio_anterior_dia'][rows],
+            'cambio_porcentaje': cols['cambio_porcentaje'][rows],
+            'cambio_absoluto': cols['cambio_absoluto'][rows],
+            'timestamp_creacion': np.datetime_as_string(cols['timestamp_creacion'][rows], unit='us'),
+            'timestamp_ultima_actualizacion': np.datetime_as_string(
+                cols['timestamp_ultima_actualizacion'][rows], unit='us'),
+            'alertas_enviadas': cols['alertas_enviadas'][rows],
+            'tipos_alertas': [json.dumps(self._tipos_alertas.get(int(r), [])) for r in rows],
+            'es_precio_historico_min': False,
+            'es_precio_historico_max': False,
+            'volatilidad_dia': cols['volatilidad_dia'][rows],
+            'fecha_captura': datetime.now().isoformat(),
+            'internal_sku': codigos,
+            'metadata': '{}',
+            'descuento_porcentaje': descuento,
+        }
+
+    def to_frame(self, rows: np.ndarray = None) -> pd.DataFrame:
+        """
+        DataFrame con las mismas columnas que DailyPriceSnapshot.to_dict
+        (vectorizado; por defecto todas las filas)
+        """
+        if rows is None:
+            rows = np.arange(self._size)
+        return pd.DataFrame(self._export_columns(rows))
+
+    def to_record_batch(self, rows: np.ndarray = None) -> 'pa.RecordBatch':
+        """
+        RecordBatch con el schema 'price_snapshot' directo desde las columnas
+        NumPy (sin DataFrame intermedio); por defecto todas las filas
+        """
+        if rows is None:
+            rows = np.arange(self._size)
+        columns = self._export_columns(rows)
+        constants = {name: value for name, value in columns.items() if np.isscalar(value)}
+        return RecordBatchBuilder('price_snapshot').build_columns(columns, len(rows), constants)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, fecha: date = None, view_class: type = SnapshotRow) -> 'PriceSnapshotStore':
+        """
+        Construir el store desde un DataFrame de snapshots (Parquet diario)
+        con operaciones de columna, sin iterar filas
+        """
+        n = len(df)
+        store = cls(fecha, view_class=view_class, initial_capacity=max(1024, n))
+        if n == 0:
+            return store
+
+        df = df.drop_duplicates(subset=['codigo_interno'], keep='last')
+        n = len(df)
+        codigos = df['codigo_interno'].astype(str).to_numpy(dtype=object)
+        store._codigos[:n] = codigos
+        store._index = dict(zip(codigos.tolist(), range(n)))
+        store._size = n
+
+        retailer_cat = pd.Categorical(df['retailer'].fillna('').astype(str))
+        store._retailers = list(retailer_cat.categories)
+        store._retailer_lookup = {r: i for i, r in enumerate(store._retailers)}
+        store._retailer_codes[:n] = retailer_cat.codes
+
+        for name in INT_COLUMNS:
+            if name in df.columns:
+                store._columns[name][:n] = pd.to_numeric(df[name], errors='coerce').fillna(0).to_numpy(np.int64)
+        for name in FLOAT_COLUMNS:
+            if name in df.columns:
+                store._columns[name][:n] = pd.to_numeric(df[name], errors='coerce').fillna(0.0).to_numpy(np.float64)
+        for name in TIME_COLUMNS:
+            if name in df.columns:
+                parsed = pd.to_datetime(df[name], errors='coerce', format='ISO8601')
+                store._columns[name][:n] = parsed.to_numpy(dtype='datetime64[us]')
+
+        # Snapshots guardados sin mínimo: recalcular como __post_init__
+        minimo = store._columns['precio_min_dia'][:n]
+        missing = minimo == 0
+        if missing.any():
+            minimo[missing] = _min_positive(
+                store._columns['precio_normal'][:n][missing],
+                store._columns['precio_oferta'][:n][missing],
+                store._columns['precio_tarjeta'][:n][missing],
+            )
+
+        if 'tipos_alertas' in df.columns:
+            tipos = df['tipos_alertas'].to_numpy(dtype=object)
+            for row in np.flatnonzero(pd.notna(tipos) & (tipos != '[]') & (tipos != '')):
+                value = tipos[row]
+                store._tipos_alertas[int(row)] = json.loads(value) if isinstance(value, str) else list(value)
+
+        store._dirty[:n] = False  # Recién cargado = persistido
+        return store
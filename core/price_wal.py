@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+📝 Price WAL - Write-ahead log de actualizaciones de precio intradía
+====================================================================
+
+Log append-only de las actualizaciones que recibe MasterPricesManager,
+para reconstruir el cache del día tras una caída sin re-scrapear:
+
+- Registros Arrow IPC (un RecordBatch por grupo de commit).
+- Group commit: un hilo escritor junta todo lo encolado mientras corre el
+  fsync anterior (más una breve ventana `commit_delay`) y lo persiste con
+  un único write + fsync.
+- `append` devuelve un Future que se resuelve cuando el registro es durable.
+- `rotate` hace durable lo encolado y sella el segmento actual;
+  `checkpoint` borra solo segmentos sellados (nunca registros pendientes)
+  una vez que los snapshots que los contienen se guardaron.
+
+Layout: <wal_root>/YYYYMMDD/wal_<ns>.arrow (un directorio por día).
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+WAL_SCHEMA = pa.schema([
+    ('ts', pa.timestamp('us')),
+    ('codigo_interno', pa.string()),
+    ('retailer', pa.string()),
+    ('precio_normal', pa.int64()),
+    ('precio_oferta', pa.int64()),
+    ('precio_tarjeta', pa.int64()),
+])
+
+
+def _price_or_none(value) -> Optional[int]:
+    """None/NaN se conservan como null (mantener precio actual)"""
+    if value is None or value != value:
+        return None
+    return int(value)
+
+
+class PriceWriteAheadLog:
+    """
+    📝 WAL de un día con group commit (thread-safe)
+    """
+
+    def __init__(self, directory: Path, fsync: bool = True, commit_delay: float = 0.002):
+        """
+        Args:
+            directory: Directorio del día (<wal_root>/YYYYMMDD)
+            fsync: fsync por grupo de commit (False solo para tests/benchmarks)
+            commit_delay: Segundos que el escritor espera para agrupar más registros
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self.commit_delay = commit_delay
+
+        self._lock = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._pending: List[pa.RecordBatch] = []
+        self._waiters: List[Future] = []
+        self._writer_thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._last_future: Optional[Future] = None
+
+        self._file = None
+        self._stream = None
+        self._segment: Optional[Path] = None
+        # Segmentos completos y durables de este log (incluye los de una sesión anterior)
+        self._sealed: List[Path] = self.segments()
+
+        self.stats = {'appends': 0, 'records': 0, 'group_commits': 0, 'bytes_written': 0, 'checkpoints': 0}
+
+    # ---------- lectura ----------
+
+    def segments(self) -> List[Path]:
+        """Segmentos del log en orden de escritura"""
+        return sorted(self.directory.glob("wal_*.arrow"))
+
+    def replay(self) -> Iterator[pa.RecordBatch]:
+        """
+        Registros del log en orden de escritura
+
+        Un segmento cortado a mitad de escritura (caída durante el write)
+        se lee hasta el último RecordBatch completo.
+        """
+        for segment in self.segments():
+            try:
+                with pa.OSFile(str(segment), 'rb') as source:
+                    reader = pa.ipc.open_stream(source)
+                    while True:
+                        try:
+                            yield reader.read_next_batch()
+                        except StopIteration:
+                            break
+            except (pa.ArrowInvalid, OSError) as e:
+                logger.warning(f"⚠️ WAL {segment.name} truncado, se ignora el resto: {e}")
+
+    # ---------- escritura ----------
+
+    def append(self, codigos: Sequence[str], retailers: Sequence[str],
+               precio_normal: Sequence, precio_oferta: Sequence, precio_tarjeta: Sequence,
+               timestamp: datetime = None) -> Future:
+        """
+        Encolar actualizaciones (None = mantener precio actual)
+
+        Returns:
+            Future resuelto cuando el grupo que contiene el registro está en disco
+        """
+        n = len(codigos)
+        batch = pa.record_batch([
+            pa.array([timestamp or datetime.now()] * n, type=pa.timestamp('us')),
+            pa.array(list(codigos), type=pa.string()),
+            pa.array(list(retailers), type=pa.string()),
+            pa.array([_price_or_none(v) for v in precio_normal], type=pa.int64()),
+            pa.array([_price_or_none(v) for v in precio_oferta], type=pa.int64()),
+            pa.array([_price_or_none(v) for v in precio_tarjeta], type=pa.int64()),
+        ], schema=WAL_SCHEMA)
+
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"WAL cerrado: {self.directory}")
+            self._pending.append(batch)
+            self._waiters.append(future)
+            self._last_future = future
+            self.stats['appends'] += 1
+            self.stats['records'] += n
+            if self._writer_thread is None:
+                self._writer_thread = threading.Thread(target=self._writer_loop, name="price-wal", daemon=True)
+                self._writer_thread.start()
+            self._lock.notify()
+        return future
+
+    def _writer_loop(self):
+        """Group commit: un write + fsync por todo lo encolado desde el último"""
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._lock.wait()
+                if not self._pending and self._closed:
+                    return
+                # Ventana de agrupación: los append siguientes se suman al grupo
+                deadline = time.monotonic() + self.commit_delay
+                remaining = self.commit_delay
+                while not self._closed and remaining > 0:
+                    self._lock.wait(remaining)
+                    remaining = deadline - time.monotonic()
+                batches, self._pending = self._pending, []
+                waiters, self._waiters = self._waiters, []
+
+            try:
+                with self._io_lock:
+                    self._write_group(batches)
+            except Exception as e:
+                logger.error(f"❌ Error escribiendo WAL de precios: {e}")
+                for future in waiters:
+                    future.set_exception(e)
+                continue
+
+            for future in waiters:
+                future.set_result(None)
+
+    def _write_group(self, batches: List[pa.RecordBatch]):
+        if self._stream is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._segment = self.directory / f"wal_{time.time_ns()}.arrow"
+            self._file = open(self._segment, 'ab')
+            self._stream = pa.ipc.new_stream(self._file, WAL_SCHEMA)
+
+        group = batches[0] if len(batches) == 1 else pa.Table.from_batches(batches).combine_chunks().to_batches()[0]
+        before = self._file.tell()
+        self._stream.write_batch(group)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.stats['group_commits'] += 1
+        self.stats['bytes_written'] += self._file.tell() - before
+
+    def flush(self, timeout: float = None):
+        """Esperar a que todo lo encolado sea durable"""
+        # Los grupos se escriben en orden: basta esperar el último append
+        future = self._last_future
+        if future is not None:
+            future.result(timeout)
+
+    def _close_segment(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._file.close()
+            self._sealed.append(self._segment)
+        self._stream = None
+        self._file = None
+        self._segment = None
+
+    def rotate(self) -> List[Path]:
+        """
+        Hacer durable lo encolado y sellar el segmento actual
+
+        Los append posteriores van a un segmento nuevo. El llamador debe
+        impedir nuevos append entre `rotate` y la lectura del estado que
+        va a guardar (así los segmentos sellados quedan cubiertos por él).
+
+        Returns:
+            Segmentos sellados, para pasarlos a `checkpoint`
+        """
+        self.flush()
+        with self._io_lock:
+            self._close_segment()
+            return list(self._sealed)
+
+    def checkpoint(self, segments: Optional[List[Path]] = None):
+        """
+        Descartar segmentos sellados cuyos registros ya están en snapshots guardados
+
+        Lo encolado después de `rotate` se conserva en segmentos nuevos.
+
+        Args:
+            segments: Resultado de `rotate` (None: rotar ahora y descartar todo lo escrito)
+        """
+        if segments is None:
+            segments = self.rotate()
+        with self._io_lock:
+            for segment in segments:
+                if segment in self._sealed:
+                    self._sealed.remove(segment)
+                try:
+                    segment.unlink()
+                except FileNotFoundError:
+                    pass
+        self.stats['checkpoints'] += 1
+
+    def close(self, remove: bool = False):
+        """
+        Persistir lo pendiente y cerrar el segmento
+
+        Args:
+            remove: Borrar el directorio del día (solo si ya no hay segmentos)
+        """
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+        if self._writer_thread is not None:
+            self._writer_thread.join()
+        with self._io_lock:
+            self._close_segment()
+        if remove and not self.segments():
+            try:
+                self.directory.rmdir()
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'segments': len(self.segments())}
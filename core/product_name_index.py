@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+🔎 Product Name Index - Vecinos más cercanos por nombre entre retailers
+=======================================================================
+
+Índice TF-IDF disperso de n-gramas de caracteres sobre `master_productos.nombre`,
+particionado por retailer. Responde "top-k productos más parecidos en otros
+retailers" con productos de matrices dispersas, sin enumerar pares:
+
+- N-gramas `char_wb` hasheados (HashingVectorizer): sin vocabulario, por lo
+  que agregar productos nuevos no obliga a re-vectorizar el índice
+- IDF global recalculado desde las frecuencias de documento mantenidas
+  incrementalmente (agregar / reemplazar / eliminar productos)
+- Una matriz TF por retailer; las consultas a un retailer se responden con
+  todas las demás particiones
+- Persistente: `save()` escribe una matriz `.npz` por partición y `meta.json`;
+  `load()` lo recupera al arrancar
+
+Uso:
+    index = ProductNameIndex.load_or_create('data/name_index')
+    index.add(productos)                       # dicts con codigo_interno, retailer, nombre
+    index.retain(codigos_vigentes)             # bajas de master_productos
+    index.most_similar('CL-SAMS-GAL-256-RIP-001', k=5)
+    index.save('data/name_index')
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from scipy import sparse
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.preprocessing import normalize
+    NAME_INDEX_AVAILABLE = True
+except ImportError:
+    NAME_INDEX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+# (codigo_interno, retailer, score)
+Neighbour = Tuple[str, str, float]
+
+
+class _Partition:
+    """Filas de un retailer: códigos, nombres, TF disperso y máscara de vigentes"""
+
+    def __init__(self, n_features: int):
+        self.codes: List[str] = []
+        self.names: List[str] = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.tf = sparse.csr_matrix((0, n_features), dtype=np.float64)
+        self._pending: List[Any] = []
+
+    def append(self, codes: List[str], names: List[str], tf) -> int:
+        first_row = len(self.codes)
+        self.codes.extend(codes)
+        self.names.extend(names)
+        self.alive = np.concatenate([self.alive, np.ones(len(codes), dtype=bool)])
+        self._pending.append(tf)
+        return first_row
+
+    def matrix(self):
+        """TF de todas las filas (apila los bloques agregados desde la última consulta)"""
+        if self._pending:
+            self.tf = sparse.vstack([self.tf, *self._pending], format='csr')
+            self._pending = []
+        return self.tf
+
+    @property
+    def dead_rows(self) -> int:
+        return int((~self.alive).sum())
+
+
+class ProductNameIndex:
+    """
+    🔎 Índice TF-IDF de nombres de productos particionado por retailer
+    """
+
+    def __init__(self, ngram_range: Tuple[int, int] = (3, 4), n_features: int = 2 ** 20):
+        """
+        Args:
+            ngram_range: Largo mínimo/máximo de los n-gramas de caracteres
+            n_features: Tamaño del espacio hasheado
+        """
+        if not NAME_INDEX_AVAILABLE:
+            raise ImportError("ProductNameIndex requiere scikit-learn y scipy: pip install scikit-learn scipy")
+
+        self.ngram_range = tuple(ngram_range)
+        self.n_features = n_features
+        self._vectorizer = HashingVectorizer(
+            analyzer='char_wb', ngram_range=self.ngram_range, n_features=n_features,
+            lowercase=True, strip_accents='unicode', alternate_sign=False, norm=None,
+        )
+        self._partitions: Dict[str, _Partition] = {}
+        self._locations: Dict[str, Tuple[str, int]] = {}
+        self._doc_freq = np.zeros(n_features, dtype=np.int64)
+        self._weighted: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def __contains__(self, codigo: str) -> bool:
+        return codigo in self._locations
+
+    @property
+    def retailers(self) -> List[str]:
+        return sorted(self._partitions)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'products': len(self),
+            'retailers': {r: int(p.alive.sum()) for r, p in sorted(self._partitions.items())},
+            'dead_rows': sum(p.dead_rows for p in self._partitions.values()),
+            'ngram_range': list(self.ngram_range),
+            'n_features': self.n_features,
+        }
+
+    # ------------------------------------------------------------------
+    # Altas, cambios y bajas
+    # ------------------------------------------------------------------
+
+    def add(self, products: Iterable[Any]) -> int:
+        """
+        Agrega productos nuevos o con nombre cambiado (los iguales se ignoran)
+
+        Args:
+            products: Dicts o filas con `codigo_interno`, `retailer` y `nombre`
+
+        Returns:
+            Cantidad de filas agregadas
+        """
+        by_retailer: Dict[str, Tuple[List[str], List[str]]] = {}
+        replaced: List[str] = []
+        seen = set()
+
+        for product in products:
+            codigo = product['codigo_interno']
+            nombre = str(product.get('nombre') or '').strip()
+            retailer = str(product.get('retailer') or '')
+            if not codigo or not nombre or codigo in seen:
+                continue
+            seen.add(codigo)
+
+            location = self._locations.get(codigo)
+            if location:
+                partition = self._partitions[location[0]]
+                if location[0] == retailer and partition.names[location[1]] == nombre:
+                    continue
+                replaced.append(codigo)
+
+            codes, names = by_retailer.setdefault(retailer, ([], []))
+            codes.append(codigo)
+            names.append(nombre)
+
+        if replaced:
+            self.remove(replaced)
+
+        added = 0
+        for retailer, (codes, names) in by_retailer.items():
+            tf = self._vectorizer.transform(names).tocsr()
+            partition = self._partitions.get(retailer)
+            if partition is None:
+                partition = self._partitions[retailer] = _Partition(self.n_features)
+            first_row = partition.append(codes, names, tf)
+            for offset, codigo in enumerate(codes):
+                self._locations[codigo] = (retailer, first_row + offset)
+            self._doc_freq += np.bincount(tf.indices, minlength=self.n_features)
+            added += len(codes)
+
+        if added:
+            self._weighted.clear()
+            logger.debug(f"🔎 Índice de nombres: +{added} productos ({len(replaced)} reemplazados)")
+        return added
+
+    def remove(self, codigos: Iterable[str]) -> int:
+        """Marca productos como eliminados (se compactan al guardar)"""
+        removed = 0
+        for codigo in codigos:
+            location = self._locations.pop(codigo, None)
+            if location is None:
+                continue
+            partition = self._partitions[location[0]]
+            row = partition.matrix()[location[1]]
+            self._doc_freq[row.indices] -= 1
+            partition.alive[location[1]] = False
+            removed += 1
+        if removed:
+            self._weighted.clear()
+        return removed
+
+    def retain(self, codigos: Iterable[str]) -> int:
+        """Elimina los productos indexados que no están en `codigos` (bajas del catálogo)"""
+        vigentes = set(codigos)
+        return self.remove([codigo for codigo in self._locations if codigo not in vigentes])
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def most_similar(self, codigo: str, k: int = 5, min_score: float = 0.0) -> List[Neighbour]:
+        """Top-k productos de otros retailers más parecidos a un producto indexado"""
+        return self.most_similar_batch([codigo], k=k, min_score=min_score)[0]
+
+    def most_similar_batch(self, codigos: Sequence[str], k: int = 5,
+                           min_score: float = 0.0) -> List[List[Neighbour]]:
+        """most_similar para varios productos indexados (desconocidos → lista vacía)"""
+        nombres, retailers, positions = [], [], []
+        for position, codigo in enumerate(codigos):
+            location = self._locations.get(codigo)
+            if location:
+                nombres.append(self._partitions[location[0]].names[location[1]])
+                retailers.append(location[0])
+                positions.append(position)
+
+        results: List[List[Neighbour]] = [[] for _ in codigos]
+        for position, neighbours in zip(positions, self.query(nombres, retailers, k=k, min_score=min_score)):
+            results[position] = neighbours
+        return results
+
+    def query(self, nombres: Sequence[str], retailers: Sequence[Optional[str]], k: int = 5,
+              min_score: float = 0.0, chunk_size: int = 512) -> List[List[Neighbour]]:
+        """
+        Top-k por nombre en retailers distintos al de cada consulta
+
+        Args:
+            nombres: Nombres a buscar
+            retailers: Retailer de cada consulta (None = buscar en todos)
+            k: Vecinos por consulta
+            min_score: Similitud coseno mínima
+            chunk_size: Consultas por producto matricial (acota memoria)
+        """
+        results: List[List[Neighbour]] = [[] for _ in nombres]
+        if not nombres or not self._locations:
+            return results
+
+        idf = self._idf()
+        queries = normalize(self._vectorizer.transform(list(nombres)).multiply(idf).tocsr())
+        query_retailers = np.array([r if r is not None else '' for r in retailers], dtype=object)
+
+        for retailer in self._partitions:
+            weighted = self._weighted_matrix(retailer, idf)
+            if weighted.shape[0] == 0:
+                continue
+            partition = self._partitions[retailer]
+            targets = np.flatnonzero(query_retailers != retailer)
+            for start in range(0, targets.size, chunk_size):
+                rows = targets[start:start + chunk_size]
+                scores = (queries[rows] @ weighted.T).tocsr()
+                for offset, position in enumerate(rows):
+                    results[position].extend(self._row_top_k(scores, offset, partition, retailer, k, min_score))
+
+        # Mezcla de particiones: mejor score primero, empate por código
+        for position, neighbours in enumerate(results):
+            neighbours.sort(key=lambda item: (-item[2], item[0]))
+            results[position] = neighbours[:k]
+        return results
+
+    @staticmethod
+    def _row_top_k(scores, row: int, partition: _Partition, retailer: str,
+                   k: int, min_score: float) -> List[Neighbour]:
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        if start == end:
+            return []
+        columns = scores.indices[start:end]
+        values = scores.data[start:end]
+        keep = partition.alive[columns] & (values >= min_score) & (values > 0)
+        columns, values = columns[keep], values[keep]
+        if columns.size > k:
+            best = np.argpartition(-values, k - 1)[:k]
+            columns, values = columns[best], values[best]
+        return [(partition.codes[c], retailer, float(v)) for c, v in zip(columns, values)]
+
+    def _idf(self) -> np.ndarray:
+        n_docs = len(self._locations)
+        return np.log((1.0 + n_docs) / (1.0 + self._doc_freq)) + 1.0
+
+    def _weighted_matrix(self, retailer: str, idf: np.ndarray):
+        """TF-IDF normalizado de una partición (cache hasta el próximo add/remove)"""
+        weighted = self._weighted.get(retailer)
+        if weighted is None:
+            tf = self._partitions[retailer].matrix()
+            weighted = normalize(tf.multiply(idf).tocsr()) if tf.shape[0] else tf
+            self._weighted[retailer] = weighted
+        return weighted
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+
+    def save(self, path: str) -> Path:
+        """Guarda el índice (compacta filas eliminadas); meta.json se escribe al final"""
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._compact()
+
+        partitions = []
+        for number, retailer in enumerate(self.retailers):
+            partition = self._partitions[retailer]
+            file_name = f"partition_{number:03d}.npz"
+            sparse.save_npz(directory / file_name, partition.matrix(), compressed=True)
+            partitions.append({'retailer': retailer, 'file': file_name,
+                               'codes': partition.codes, 'names': partition.names})
+
+        meta = {
+            'version': INDEX_FORMAT_VERSION,
+            'ngram_range': list(self.ngram_range),
+            'n_features': self.n_features,
+            'products': len(self),
+            'partitions': partitions,
+        }
+        tmp_path = directory / f"{META_FILE}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(meta, handle, ensure_ascii=False)
+        os.replace(tmp_path, directory / META_FILE)
+
+        logger.info(f"💾 Índice de nombres guardado: {len(self)} productos en {len(partitions)} retailers")
+        return directory
+
+    @classmethod
+    def load(cls, path: str) -> 'ProductNameIndex':
+        directory = Path(path)
+        with open(directory / META_FILE, encoding='utf-8') as handle:
+            meta = json.load(handle)
+        if meta.get('version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Versión de índice no soportada: {meta.get('version')}")
+
+        index = cls(ngram_range=tuple(meta['ngram_range']), n_features=meta['n_features'])
+        for entry in meta['partitions']:
+            tf = sparse.load_npz(directory / entry['file']).tocsr()
+            partition = index._partitions[entry['retailer']] = _Partition(index.n_features)
+            partition.append(entry['codes'], entry['names'], tf)
+            for row, codigo in enumerate(entry['codes']):
+                index._locations[codigo] = (entry['retailer'], row)
+            index._doc_freq += np.bincount(tf.indices, minlength=index.n_features)
+
+        logger.info(f"📂 Índice de nombres cargado: {len(index)} productos")
+        return index
+
+    @classmethod
+    def load_or_create(cls, path: str, **kwargs) -> 'ProductNameIndex':
+        """Carga el índice si existe en disco; si no (o está corrupto), uno vacío"""
+        if (Path(path) / META_FILE).exists():
+            try:
+                return cls.load(path)
+            except Exception as e:
+                logger.warning(f"⚠️ Índice de nombres inválido en {path}, se reconstruye: {e}")
+        return cls(**kwargs)
+
+    def _compact(self):
+        """Elimina filas marcadas como borradas y reasigna posiciones"""
+        for retailer, partition in list(self._partitions.items()):
+            if partition.dead_rows == 0:
+                continue
+            keep = np.flatnonzero(partition.alive)
+            compacted = _Partition(self.n_features)
+            compacted.append([partition.codes[r] for r in keep], [partition.names[r] for r in keep],
+                             partition.matrix()[keep])
+            if keep.size:
+                self._partitions[retailer] = compacted
+                for row, codigo in enumerate(compacted.codes):
+                    self._locations[codigo] = (retailer, row)
+            else:
+                del self._partitions[retailer]
+            self._weighted.pop(retailer, None)
@@ -5,13 +5,13 @@
 ===================================================================
 
 Procesa productos desde scrapers directamente a la base de datos,
-con deduplicación automática y backup opcional en Excel.
+con deduplicación automática y backup opcional.
 
 Características:
 - Inserción directa a PostgreSQL
 - Deduplicación por SKU único
 - Cache en memoria para sesión
-- Backup automático en Excel
+- Backup automático en Parquet (un archivo por ejecución, Excel a demanda)
 - Gestión de precios con lógica diaria
 - Batch processing para optimización
 
@@ -43,6 +43,11 @@ import json
 from pathlib import Path
 
 from .sku_generator import SKUGenerator
+from .backup_stream_writer import (
+    StreamingBackupWriter,
+    export_backup_to_excel,
+    PYARROW_AVAILABLE,
+)
 try:
     from .price_manager import PriceManager
 except ImportError:
@@ -135,11 +140,17 @@ class ProductProcessor:
         self.product_batch = []
         self.price_batch = []
         
-        # Excel backup
+        # Backup de productos (Parquet por ejecución, Excel a demanda)
         self.enable_excel_backup = enable_excel_backup
-        self.excel_buffer = []
         self.excel_output_dir = Path("data/excel_backup")
         self.excel_output_dir.mkdir(parents=True, exist_ok=True)
+        self.backup_writer = None
+        if self.enable_excel_backup:
+            if PYARROW_AVAILABLE:
+                self.backup_writer = StreamingBackupWriter(self.excel_output_dir)
+            else:
+                logger.warning("⚠️ pyarrow no disponible - backup deshabilitado")
+                self.enable_excel_backup = False
         
         # Configuración
         self.batch_size = batch_size
@@ -630,15 +641,20 @@ class ProductProcessor:
     
     def _add_to_excel_buffer(self, sku: str, product_data: Dict, retailer: str):
         """
-        Agrega producto al buffer de Excel
+        Agrega producto al respaldo de la ejecución
         
         Args:
             sku: SKU único generado
             product_data: Datos del producto
             retailer: Nombre del retailer
         """
-        # Preparar registro para Excel
-        excel_record = {
+        if self.backup_writer is None:
+            return
+        
+        additional = product_data.get('additional_info', {})
+        
+        # El writer escribe en background cada batch_size registros
+        self.backup_writer.append({
             'sku_unico': sku,
             'retailer': retailer,
             'nombre': product_data.get('nombre') or product_data.get('title', ''),
@@ -650,66 +666,49 @@ class ProductProcessor:
             'precio_tarjeta': product_data.get('card_price', 0),
             'rating': product_data.get('rating', 0),
             'reviews': product_data.get('reviews_count', 0),
-            'timestamp': datetime.now()
-        }
-        
-        # Agregar specs si existen
-        additional = product_data.get('additional_info', {})
-        excel_record.update({
+            'timestamp': datetime.now(),
             'storage': additional.get('storage', ''),
             'ram': additional.get('ram', ''),
             'color': additional.get('color', '')
         })
-        
-        self.excel_buffer.append(excel_record)
-        
-        # Flush si buffer está lleno
-        if len(self.excel_buffer) >= 1000:
-            self.flush_excel_backup()
     
     def flush_excel_backup(self):
-        """Guarda buffer de Excel a archivo"""
-        if not self.excel_buffer:
+        """Cierra el respaldo Parquet de la ejecución (escribe lo pendiente)"""
+        if self.backup_writer is None:
             return
         
         try:
-            # Generar nombre de archivo
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            
-            if PANDAS_AVAILABLE:
-                # Usar pandas si está disponible
-                import pandas as pd
-                df = pd.DataFrame(self.excel_buffer)
-                filename = self.excel_output_dir / f"backup_{timestamp}.xlsx"
-                df.to_excel(filename, index=False, engine='openpyxl')
-            else:
-                # Fallback a CSV
-                import csv
-                filename = self.excel_output_dir / f"backup_{timestamp}.csv"
-                
-                if self.excel_buffer:
-                    keys = self.excel_buffer[0].keys()
-                    with open(filename, 'w', newline='', encoding='utf-8') as f:
-                        writer = csv.DictWriter(f, fieldnames=keys)
-                        writer.writeheader()
-                        writer.writerows(self.excel_buffer)
-            
-            logger.info(f"💾 Backup guardado: {filename} ({len(self.excel_buffer)} productos)")
-            
-            # Limpiar buffer
-            self.excel_buffer.clear()
-            
+            self.backup_writer.close()
         except Exception as e:
             logger.error(f"❌ Error guardando backup: {e}")
     
+    def export_excel_backup(self, excel_path: Optional[str] = None) -> Optional[Path]:
+        """
+        Genera el Excel del respaldo a demanda desde el Parquet de la ejecución
+        
+        Args:
+            excel_path: Ruta de salida (default: junto al Parquet)
+            
+        Returns:
+            Ruta del Excel o None si no hay respaldo
+        """
+        if self.backup_writer is None:
+            return None
+        
+        self.backup_writer.close()
+        if not self.backup_writer.rows_written:
+            return None
+        
+        return export_backup_to_excel(self.backup_writer.file_path, excel_path)
+    
     async def finish_processing(self):
         """Finaliza el procesamiento y limpia recursos"""
         # Procesar batches pendientes
         await self.flush_batch()
         
-        # Guardar Excel pendiente
+        # Cerrar respaldo Parquet sin bloquear el event loop
         if self.enable_excel_backup:
-            self.flush_excel_backup()
+            await asyncio.get_running_loop().run_in_executor(None, self.flush_excel_backup)
         
         # Mostrar estadísticas
         stats = self.stats.get_summary()
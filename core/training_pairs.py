@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+🎯 Training Pairs - Muestreo estratificado de pares para reentrenamiento ML
+==========================================================================
+
+En vez de recorrer pares en orden hasta un tope fijo (sesgado hacia los
+retailers que se ordenan primero), los pares se toman de tres estratos:
+
+- Positivos: pares con label 1 dentro de los bloques de `CandidateBlocker`
+  (categoría, marca, capacidad). En vez de enumerar todos los pares de un
+  bloque, cada producto se empareja con sus `window` vecinos al ordenar el
+  bloque por nombre (sorted neighbourhood): O(n · window) y con alta
+  proporción de positivos
+- Negativos difíciles: pares del mismo bloque con label 0 y pares
+  "casi match" (misma categoría, distinta marca o capacidad)
+- Negativos fáciles: pares cross-retailer al azar de distinta categoría
+
+Cada estrato se recorta a su cuota repartiéndola en partes iguales entre
+pares de retailers. El resultado son arrays de índices (i, j) para calcular
+features en forma columnar; el label siempre lo define `label_fn`, los
+estratos solo determinan qué pares entran.
+
+Uso:
+    sampler = TrainingPairSampler(positive_quota=50_000)
+    i, j, labels, strata = sampler.sample(productos, label_fn)
+"""
+
+import logging
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.candidate_blocking import CandidateBlocker
+
+logger = logging.getLogger(__name__)
+
+# Códigos de estrato en el array `strata`
+STRATUM_BLOCK = 0
+STRATUM_NEAR_MISS = 1
+STRATUM_EASY = 2
+
+LabelFn = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+def allocate_quota(counts: np.ndarray, quota: int) -> np.ndarray:
+    """
+    Repartir `quota` entre grupos en partes iguales (water-filling): los
+    grupos chicos se toman completos y el resto se reparte entre los grandes
+    """
+    allocation = np.zeros(len(counts), dtype=np.int64)
+    remaining = int(quota)
+    order = np.argsort(counts, kind='stable')
+    for position, group in enumerate(order):
+        left = len(order) - position
+        share = -(-remaining // left)
+        take = min(int(counts[group]), share)
+        allocation[group] = take
+        remaining -= take
+    return allocation
+
+
+def stratified_take(groups: np.ndarray, quota: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Posiciones a conservar: hasta `quota` en total, repartidas por grupo y
+    elegidas al azar dentro de cada grupo
+    """
+    total = len(groups)
+    if total <= quota:
+        return np.arange(total)
+
+    _, inverse, counts = np.unique(groups, return_inverse=True, return_counts=True)
+    allocation = allocate_quota(counts, quota)
+
+    order = rng.permutation(total)
+    order = order[np.argsort(inverse[order], kind='stable')]
+    starts = np.cumsum(counts) - counts
+    rank = np.arange(total) - starts[inverse[order]]
+    return np.sort(order[rank < allocation[inverse[order]]])
+
+
+class TrainingPairSampler:
+    """
+    🎯 Generador de pares de entrenamiento por estratos y cuotas
+    """
+
+    def __init__(self, positive_quota: int = 50000, hard_negative_quota: int = 100000,
+                 easy_negative_quota: int = 25000, window: int = 10,
+                 near_miss_per_product: int = 4, seed: Optional[int] = 42):
+        """
+        Args:
+            positive_quota: Máximo de pares con label 1
+            hard_negative_quota: Máximo de negativos del mismo bloque o casi match
+            easy_negative_quota: Máximo de negativos al azar de distinta categoría
+            window: Vecinos por producto dentro de su bloque ordenado por nombre
+            near_miss_per_product: Parejas casi match sorteadas por producto
+            seed: Semilla para que el muestreo sea reproducible
+        """
+        self.positive_quota = positive_quota
+        self.hard_negative_quota = hard_negative_quota
+        self.easy_negative_quota = easy_negative_quota
+        self.window = window
+        self.near_miss_per_product = near_miss_per_product
+        self.blocker = CandidateBlocker()
+        self.seed = seed
+        self.last_stats: Dict[str, Any] = {}
+
+    def sample(self, products: Sequence[Any],
+               label_fn: LabelFn) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Muestrear pares cross-retailer
+
+        Args:
+            products: Dicts o filas con `.get()`
+            label_fn: label_fn(i, j) -> array 0/1 para arrays de índices
+
+        Returns:
+            (i, j, labels, strata) con i < j, sin pares repetidos
+        """
+        rng = np.random.default_rng(self.seed)
+        n = len(products)
+        empty = np.zeros(0, dtype=np.int64)
+        if n < 2:
+            return empty, empty, empty, empty
+
+        retailers = np.unique([str(p.get('retailer') or '') for p in products], return_inverse=True)[1]
+        keyed = [self.blocker.block_key(p) for p in products]
+        categories = np.unique([category for category, _ in keyed], return_inverse=True)[1]
+        block_keys = np.unique([repr(key) for key in keyed], return_inverse=True)[1]
+        names = np.unique([str(p.get('nombre') or '').lower() for p in products], return_inverse=True)[1]
+
+        # Estrato 1: vecinos por nombre dentro de cada bloque
+        block_i, block_j = self._block_window_pairs(block_keys, names, retailers)
+
+        # Estrato 2: casi match (misma categoría, otro bloque)
+        near_i, near_j = self._near_miss_pairs(categories, block_keys, retailers, rng)
+
+        # Estrato 3: negativos fáciles (otra categoría)
+        easy_i, easy_j = self._random_pairs(n, self.easy_negative_quota * 2, rng)
+        keep = (retailers[easy_i] != retailers[easy_j]) & (categories[easy_i] != categories[easy_j])
+        easy_i, easy_j = easy_i[keep], easy_j[keep]
+
+        pair_i = np.concatenate([block_i, near_i, easy_i])
+        pair_j = np.concatenate([block_j, near_j, easy_j])
+        strata = np.concatenate([
+            np.full(len(block_i), STRATUM_BLOCK, dtype=np.int64),
+            np.full(len(near_i), STRATUM_NEAR_MISS, dtype=np.int64),
+            np.full(len(easy_i), STRATUM_EASY, dtype=np.int64),
+        ])
+        # El primer estrato gana si un par aparece en varios
+        _, first = np.unique(pair_i * n + pair_j, return_index=True)
+        pair_i, pair_j, strata = pair_i[first], pair_j[first], strata[first]
+
+        labels = np.asarray(label_fn(pair_i, pair_j), dtype=np.int64)
+
+        # Cuotas repartidas por par de retailers
+        retailer_pairs = np.minimum(retailers[pair_i], retailers[pair_j]) * (retailers.max() + 1) + \
+            np.maximum(retailers[pair_i], retailers[pair_j])
+        selected = []
+        pools = (
+            ('positives', labels == 1, self.positive_quota),
+            ('hard_negatives', (labels == 0) & (strata != STRATUM_EASY), self.hard_negative_quota),
+            ('easy_negatives', (labels == 0) & (strata == STRATUM_EASY), self.easy_negative_quota),
+        )
+        self.last_stats = {'products': n, 'block_pairs': int((strata == STRATUM_BLOCK).sum()),
+                           'near_miss_pairs': int((strata == STRATUM_NEAR_MISS).sum())}
+        for name, mask, quota in pools:
+            positions = np.flatnonzero(mask)
+            taken = positions[stratified_take(retailer_pairs[positions], quota, rng)]
+            selected.append(taken)
+            self.last_stats[f'{name}_available'] = len(positions)
+            self.last_stats[name] = len(taken)
+
+        selected = np.sort(np.concatenate(selected))
+        self.last_stats['retailer_pairs'] = len(np.unique(retailer_pairs[selected]))
+        logger.info(f"🎯 Pares de entrenamiento: {self.last_stats}")
+        return pair_i[selected], pair_j[selected], labels[selected], strata[selected]
+
+    def _block_window_pairs(self, block_keys: np.ndarray, names: np.ndarray,
+                            retailers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Pares (bloque igual, retailer distinto) a distancia <= window en orden (bloque, nombre)"""
+        order = np.lexsort((retailers, names, block_keys))
+        firsts, seconds = [], []
+        for offset in range(1, min(self.window, len(order) - 1) + 1):
+            first, second = order[:-offset], order[offset:]
+            keep = (block_keys[first] == block_keys[second]) & (retailers[first] != retailers[second])
+            firsts.append(first[keep])
+            seconds.append(second[keep])
+        if not firsts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        first, second = np.concatenate(firsts), np.concatenate(seconds)
+        return np.minimum(first, second), np.maximum(first, second)
+
+    def _near_miss_pairs(self, categories: np.ndarray, block_keys: np.ndarray, retailers: np.ndarray,
+                         rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """Parejas al azar dentro de la misma categoría, de otro retailer y otro bloque"""
+        if self.near_miss_per_product <= 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+
+        order = np.argsort(categories, kind='stable')
+        counts = np.bincount(categories)
+        starts = np.cumsum(counts) - counts
+
+        first = np.repeat(np.arange(len(categories)), self.near_miss_per_product)
+        group = categories[first]
+        offsets = (rng.random(len(first)) * counts[group]).astype(np.int64)
+        second = order[starts[group] + offsets]
+
+        keep = (retailers[first] != retailers[second]) & (block_keys[first] != block_keys[second])
+        first, second = first[keep], second[keep]
+        return np.minimum(first, second), np.maximum(first, second)
+
+    @staticmethod
+    def _random_pairs(n: int, size: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        first = rng.integers(0, n, size=size)
+        second = rng.integers(0, n, size=size)
+        keep = first != second
+        first, second = first[keep], second[keep]
+        return np.minimum(first, second), np.maximum(first, second)
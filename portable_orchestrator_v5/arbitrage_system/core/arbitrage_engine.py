@@ -28,6 +28,7 @@ from ..database.db_manager import DatabaseManagerV5, get_db_manager
 from ..config.arbitrage_config import ArbitrageConfigV5, get_config
 from .ml_integration import MLIntegrationV5, create_ml_integration_v5
 from .opportunity_detector import OpportunityDetectorV5
+from .profile_cache import profile_key
 from ..schedulers.arbitrage_scheduler import ArbitrageSchedulerV5
 
 # Importar sistema de alertas integrado con path correcto
@@ -486,6 +487,7 @@ class ArbitrageEngineV5:
             'opportunities_detected': 0,
             'opportunities_saved': 0,
             'products_analyzed': 0,
+            'products_rematched': 0,
             'duration_seconds': 0,
             'errors': [],
             'intelligence_metrics': {}
@@ -499,6 +501,10 @@ class ArbitrageEngineV5:
             self.metrics['total_cycles'] += 1
             self.last_cycle_time = cycle_start
             
+            # Perfiles V5 fallidos en el ciclo anterior se reintentan en este
+            if self.ml_integration:
+                self.ml_integration.profile_cache.start_cycle()
+            
             # Fase 1: Obtener productos para análisis
             logger.info("🔍 Fase 1: Obteniendo productos para análisis...")
             products = await self._get_products_for_analysis()
@@ -522,6 +528,12 @@ class ArbitrageEngineV5:
             cycle_result['matches_found'] = len(matches)
             self.metrics['total_matches_processed'] += len(matches)
             
+            # Matching incremental: productos realmente re-puntuados (nuevos o cambiados)
+            incremental_stats = self.ml_integration.last_incremental_stats
+            cycle_result['products_rematched'] = incremental_stats.get('dirty', len(products))
+            logger.info(f"🔖 Re-puntuados {cycle_result['products_rematched']}/{len(products)} productos, "
+                        f"{incremental_stats.get('kept_matches', 0)} matches reutilizados")
+            
             if matches:
                 logger.info(f"🎯 Matches detectados: {len(matches)} con ML V5")
             else:
@@ -639,8 +651,14 @@ class ArbitrageEngineV5:
                 
                 products = [dict(row) for row in rows]
                 
-                # Enriquecer con análisis V5 si está disponible
-                if self.master_integrator:
+                # Enriquecer con análisis V5: perfiles memoizados compartidos con el scoring de pares
+                if self.ml_integration and self.ml_integration.master_integrator:
+                    profiles = await self.ml_integration.profile_cache.prefetch(products)
+                    for product in products:
+                        analysis = profiles.get(profile_key(product))
+                        if analysis is not None:
+                            product['v5_analysis'] = analysis
+                elif self.master_integrator:
                     for product in products:
                         try:
                             # Análisis rápido para clasificación
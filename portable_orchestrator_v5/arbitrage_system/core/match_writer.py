@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+💾 MatchWriter V5 - Persistencia de matches por lotes
+====================================================
+Los matches encontrados durante el scoring se encolan sin esperar a la BD
+ni a Redis. Una tarea en segundo plano los guarda por lotes (INSERT
+multi-fila vía DatabaseManagerV5.save_product_matches) y escribe el cache
+en pipeline; los `match_id` se asignan al completar cada flush.
+
+Uso:
+    writer = MatchWriter(db_manager, cache_manager)
+    writer.start()
+    writer.add(match_data, cache_key, ttl)   # no bloquea el scoring
+    await writer.flush()                      # ids resueltos
+    await writer.close()
+"""
+
+import logging
+import asyncio
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MatchWriter:
+    """
+    Buffer de matches con flush en segundo plano 💾
+
+    - 📦 Flush al llegar a `batch_size` o cada `flush_interval` segundos
+    - 🗄️ Un round-trip a PostgreSQL por lote
+    - ⚡ Cache en pipeline (set_many) o escrituras concurrentes
+    """
+
+    def __init__(self, db_manager, cache_manager=None, batch_size: int = 500,
+                 flush_interval: float = 1.0, cache_tags: Optional[List[str]] = None):
+        """
+        Args:
+            db_manager: DatabaseManagerV5 (save_product_matches)
+            cache_manager: IntelligentCacheManager opcional
+            batch_size: Matches por lote
+            flush_interval: Segundos máximos que un match espera en el buffer
+            cache_tags: Tags para las entradas de cache
+        """
+        self.db_manager = db_manager
+        self.cache_manager = cache_manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_tags = cache_tags or ['match', 'ml', 'v5']
+
+        self._pending: List[Tuple[Dict[str, Any], str, Optional[int]]] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.stats = {
+            'queued': 0,
+            'saved': 0,
+            'failed': 0,
+            'cached': 0,
+            'flushes': 0,
+            'last_flush_ms': 0.0
+        }
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        """Iniciar tarea de flush en segundo plano 🚀"""
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    def add(self, match_data: Dict[str, Any], cache_key: Optional[str] = None, ttl: Optional[int] = None):
+        """Encolar match (no bloquea). `match_id` se asigna al guardarse"""
+        self._pending.append((match_data, cache_key, ttl))
+        self.stats['queued'] += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Guardar todo lo pendiente y esperar el resultado 📦"""
+        saved = 0
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                saved += await self._write_batch(batch)
+        return saved
+
+    async def close(self):
+        """Vaciar el buffer y detener la tarea 🔚"""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        """Bucle de flush: por tamaño de lote o por intervalo"""
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._pending:
+                await self.flush()
+
+    async def _write_batch(self, batch: List[Tuple[Dict[str, Any], str, Optional[int]]]) -> int:
+        """Guardar un lote en BD y cache; asigna match_id a cada match"""
+        start = time.perf_counter()
+        matches = [match_data for match_data, _, _ in batch]
+        cache_items = [(key, match_data, ttl) for match_data, key, ttl in batch if key]
+
+        db_result, cache_result = await asyncio.gather(
+            self.db_manager.save_product_matches(matches),
+            self._write_cache(cache_items),
+            return_exceptions=True
+        )
+
+        saved = 0
+        if isinstance(db_result, Exception):
+            self.stats['failed'] += len(batch)
+            logger.error(f"❌ Error guardando lote de {len(batch)} matches: {db_result}")
+        else:
+            for match_data in matches:
+                match_id = db_result.get((match_data['codigo_base'], match_data['codigo_match']))
+                if match_id is not None:
+                    match_data['match_id'] = match_id
+                    saved += 1
+            self.stats['saved'] += saved
+
+        if isinstance(cache_result, Exception):
+            logger.debug(f"⚠️ Error guardando lote en cache: {cache_result}")
+        else:
+            self.stats['cached'] += cache_result
+
+        self.stats['flushes'] += 1
+        self.stats['last_flush_ms'] = (time.perf_counter() - start) * 1000
+        logger.debug(f"💾 Lote de {len(batch)} matches guardado en {self.stats['last_flush_ms']:.1f}ms")
+        return saved
+
+    async def _write_cache(self, items: List[Tuple[str, Dict[str, Any], Optional[int]]]) -> int:
+        """Cache del lote: pipeline si el cache manager lo soporta"""
+        if not self.cache_manager or not items:
+            return 0
+        if hasattr(self.cache_manager, 'set_many'):
+            return await self.cache_manager.set_many(items, tags=self.cache_tags)
+        results = await asyncio.gather(
+            *(self.cache_manager.set(key, data, ttl=ttl, tags=self.cache_tags) for key, data, ttl in items),
+            return_exceptions=True
+        )
+        return sum(1 for result in results if result is True)
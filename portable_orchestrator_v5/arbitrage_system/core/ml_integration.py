@@ -22,9 +22,30 @@ from ...core.scraping_frequency_optimizer import ScrapingFrequencyOptimizer
 from ..database.db_manager import DatabaseManagerV5, get_db_manager
 from ..config.arbitrage_config import ArbitrageConfigV5, get_config
 from ..ml.adapters import MatchScoringAdapter, GlitchDetectionAdapter, NormalizationHubAdapter
+from .match_writer import MatchWriter
+from .profile_cache import ProductProfileCache
 
 logger = logging.getLogger(__name__)
 
+# Blocking de candidatos compartido (core/ en la raíz del proyecto)
+try:
+    import sys
+    project_root = Path(__file__).parent.parent.parent.parent
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+    
+    from core.candidate_blocking import CandidateBlocker
+    BLOCKING_AVAILABLE = True
+except ImportError as e:
+    BLOCKING_AVAILABLE = False
+    logger.warning(f"⚠️ Blocking de candidatos no disponible, matching todos contra todos: {e}")
+
+try:
+    from core.match_watermarks import MatchWatermarkStore
+    WATERMARKS_AVAILABLE = True
+except ImportError:
+    WATERMARKS_AVAILABLE = False
+
 class MLIntegrationV5:
     """
     Integración ML V5 con inteligencia avanzada completa 🚀
@@ -59,6 +80,21 @@ class MLIntegrationV5:
         self.cache_hits = {'l1': 0, 'l2': 0, 'l3': 0, 'l4': 0}
         self.ml_predictions = 0
         
+        # Generación de candidatos por bloques (False = todos contra todos)
+        self.use_blocking = True
+        self.last_blocking_stats: Dict[str, Any] = {}
+        
+        # Matching incremental: solo productos nuevos o cambiados desde el ciclo anterior
+        self.incremental = True
+        self.watermarks = MatchWatermarkStore() if WATERMARKS_AVAILABLE else None
+        self.last_incremental_stats: Dict[str, Any] = {}
+        
+        # Persistencia de matches por lotes en segundo plano (BD + cache)
+        self.match_writer = MatchWriter(self.db_manager)
+        
+        # Perfiles V5 memoizados por (código, versión de precio)
+        self.profile_cache = ProductProfileCache(self._analyze_product_profile)
+        
         logger.info("🧠 MLIntegration V5 inicializando con inteligencia avanzada...")
     
     async def initialize(self):
@@ -75,6 +111,10 @@ class MLIntegrationV5:
             # Inicializar componentes V5
             await self._initialize_v5_components()
             
+            # Flush de matches en segundo plano
+            self.match_writer.cache_manager = self.cache_manager
+            self.match_writer.start()
+            
             # Inicializar ML components
             self._initialize_ml_components()
             
@@ -159,39 +199,56 @@ class MLIntegrationV5:
         try:
             logger.info(f"🔍 Analizando {len(products)} productos para matching...")
             
-            # Procesar por pares
-            for i, product1 in enumerate(products):
-                for j, product2 in enumerate(products[i+1:], i+1):
-                    
-                    # Evitar mismo retailer
-                    if product1.get('retailer') == product2.get('retailer'):
-                        continue
-                    
-                    # Buscar en cache inteligente primero
-                    cache_key = self._generate_match_cache_key(product1, product2)
-                    cached_result = await self._get_cached_match(cache_key)
-                    
-                    if cached_result:
-                        self.cache_hits['l2'] += 1
-                        matches.append(cached_result)
-                        continue
+            # Procesar solo pares candidatos (mismo bloque, distinto retailer); en modo
+            # incremental, solo los que tocan un producto nuevo o cambiado
+            plan = self.watermarks.plan(products) if self.incremental and self.watermarks is not None else None
+            pairs = self._candidate_pairs(products)
+            if plan is not None:
+                pairs = plan.filter_pairs(pairs)
+            base_scores = self._batch_match_scores(products, pairs)
+            
+            # Perfiles V5 una vez por ciclo: el scoring de pares solo hace lookups
+            if self.master_integrator and pairs:
+                await self.profile_cache.prefetch(products)
+            
+            for (i, j), base_score in zip(pairs, base_scores):
+                product1, product2 = products[i], products[j]
+                
+                # Buscar en cache inteligente primero
+                cache_key = self._generate_match_cache_key(product1, product2)
+                cached_result = await self._get_cached_match(cache_key)
+                
+                if cached_result:
+                    self.cache_hits['l2'] += 1
+                    matches.append(cached_result)
+                    continue
+                
+                # Calcular similaridad con ML V5
+                similarity_score = await self._calculate_v5_similarity(product1, product2, base_score)
+                
+                if similarity_score >= min_sim:
+                    # Crear match con análisis V5 completo
+                    match_data = await self._create_v5_match(product1, product2, similarity_score)
+                    matches.append(match_data)
                     
-                    # Calcular similaridad con ML V5
-                    similarity_score = await self._calculate_v5_similarity(product1, product2)
+                    # Encolar para BD + cache (flush por lotes, no bloquea el scoring)
+                    self.match_writer.add(match_data, cache_key, self._match_cache_ttl(match_data))
                     
-                    if similarity_score >= min_sim:
-                        # Crear match con análisis V5 completo
-                        match_data = await self._create_v5_match(product1, product2, similarity_score)
-                        matches.append(match_data)
-                        
-                        # Guardar en cache
-                        await self._cache_match_result(cache_key, match_data)
-                        
-                        # Guardar en BD
-                        match_id = await self.db_manager.save_product_match(match_data)
-                        match_data['match_id'] = match_id
-                        
-                        self.matches_processed += 1
+                    self.matches_processed += 1
+            
+            # Resolver match_id de los matches del ciclo
+            await self.match_writer.flush()
+            
+            if plan is not None:
+                kept = [
+                    {**match, 'product1': products[i], 'product2': products[j]}
+                    for match, i, j in self.watermarks.kept_matches(products, plan)
+                ]
+                self.watermarks.commit(products, plan, matches)
+                self.last_incremental_stats = {**self.watermarks.last_stats,
+                                               'scored_pairs': len(pairs), 'kept_matches': len(kept)}
+                logger.info(f"🔖 {len(matches)} matches nuevos + {len(kept)} vigentes sin re-puntuar")
+                matches.extend(kept)
             
             logger.info(f"🎯 Detectados {len(matches)} matches con V5 intelligence")
             return matches
@@ -200,20 +257,58 @@ class MLIntegrationV5:
             logger.error(f"❌ Error en find_product_matches: {e}")
             return matches
     
-    async def _calculate_v5_similarity(self, product1: Dict[str, Any], product2: Dict[str, Any]) -> float:
+    def _candidate_pairs(self, products: List[Dict[str, Any]]) -> List[Tuple[int, int]]:
+        """
+        Pares (i, j) a puntuar: bloques por categoría/marca/capacidad/banda de
+        precio o, sin blocking, todos los pares de retailers distintos 🧱
+        """
+        if self.use_blocking and BLOCKING_AVAILABLE:
+            blocker = CandidateBlocker(max_price_ratio=self.config.max_price_ratio)
+            pairs = blocker.candidate_pairs(products)
+            self.last_blocking_stats = blocker.last_stats
+            logger.info(f"🧱 {len(pairs)} pares candidatos de {blocker.last_stats['brute_force_pairs']} "
+                        f"posibles ({blocker.last_stats['blocks']} bloques)")
+            return pairs
+        
+        return [
+            (i, j)
+            for i in range(len(products))
+            for j in range(i + 1, len(products))
+            if products[i].get('retailer') != products[j].get('retailer')
+        ]
+    
+    def _batch_match_scores(self, products: List[Dict[str, Any]],
+                            pairs: List[Tuple[int, int]]) -> List[Optional[float]]:
+        """
+        Scores base de todos los pares en una sola llamada vectorizada 🔢
+        
+        None por par si el scorer no tiene API batch (se puntúa par a par).
+        """
+        if self.match_scorer and hasattr(self.match_scorer, 'calculate_match_scores'):
+            try:
+                return self.match_scorer.calculate_match_scores(products, pairs).tolist()
+            except Exception as e:
+                logger.warning(f"⚠️ Scoring batch falló, usando scoring por par: {e}")
+        return [None] * len(pairs)
+    
+    async def _calculate_v5_similarity(self, product1: Dict[str, Any], product2: Dict[str, Any],
+                                       base_score: Optional[float] = None) -> float:
         """Calcular similaridad usando inteligencia V5 🧠"""
         try:
             if not self.match_scorer:
                 return 0.0
             
-            # Usar adapter que conecta con V5
-            similarity, details = self.match_scorer.calculate_match_score(product1, product2)
+            # Score base precalculado en batch o, si no hay, adapter par a par
+            if base_score is not None:
+                similarity = base_score
+            else:
+                similarity, details = self.match_scorer.calculate_match_score(product1, product2)
             
             # Si tenemos inteligencia V5, enriquecer análisis
             if self.master_integrator:
                 # Análisis inteligente de productos
-                analysis1 = await self.master_integrator.analyze_product_profile(product1)
-                analysis2 = await self.master_integrator.analyze_product_profile(product2)
+                analysis1 = await self.profile_cache.get(product1)
+                analysis2 = await self.profile_cache.get(product2)
                 
                 # Aplicar boost inteligente basado en análisis V5
                 intelligence_boost = self._calculate_intelligence_boost(analysis1, analysis2)
@@ -226,6 +321,10 @@ class MLIntegrationV5:
             logger.error(f"❌ Error calculando similaridad V5: {e}")
             return 0.0
     
+    async def _analyze_product_profile(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        """Loader del cache de perfiles: análisis V5 del master integrator 🧠"""
+        return await self.master_integrator.analyze_product_profile(product)
+    
     def _calculate_intelligence_boost(self, analysis1: Dict[str, Any], analysis2: Dict[str, Any]) -> float:
         """Calcular boost inteligente basado en análisis V5 📈"""
         boost = 0.0
@@ -271,8 +370,8 @@ class MLIntegrationV5:
             
             if self.master_integrator:
                 # Análisis completo de ambos productos
-                analysis1 = await self.master_integrator.analyze_product_profile(product1)
-                analysis2 = await self.master_integrator.analyze_product_profile(product2)
+                analysis1 = await self.profile_cache.get(product1)
+                analysis2 = await self.profile_cache.get(product2)
                 
                 v5_analysis = {
                     'product1_analysis': analysis1,
@@ -532,20 +631,22 @@ class MLIntegrationV5:
         """Guardar resultado en cache inteligente 💾"""
         try:
             if self.cache_manager:
-                # Cache con TTL basado en confidence
-                confidence = match_data.get('match_confidence', 'medium')
-                ttl_multiplier = {'very_high': 2.0, 'high': 1.5, 'medium': 1.0, 'low': 0.5}.get(confidence, 1.0)
-                
                 await self.cache_manager.set(
                     cache_key, 
                     match_data,
-                    ttl=int(self.config.cache_l2_ttl * ttl_multiplier),
+                    ttl=self._match_cache_ttl(match_data),
                     tags=['match', 'ml', 'v5']
                 )
                 
         except Exception as e:
             logger.debug(f"⚠️ Error guardando en cache: {e}")
     
+    def _match_cache_ttl(self, match_data: Dict[str, Any]) -> int:
+        """TTL de cache basado en confidence del match ⏱️"""
+        confidence = match_data.get('match_confidence', 'medium')
+        ttl_multiplier = {'very_high': 2.0, 'high': 1.5, 'medium': 1.0, 'low': 0.5}.get(confidence, 1.0)
+        return int(self.config.cache_l2_ttl * ttl_multiplier)
+    
     async def detect_arbitrage_opportunities(self, matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Detectar oportunidades de arbitraje usando inteligencia V5 💰
@@ -1046,6 +1147,10 @@ class MLIntegrationV5:
                 level: hits / max(self.ml_predictions, 1) 
                 for level, hits in self.cache_hits.items()
             },
+            'blocking': self.last_blocking_stats,
+            'incremental': self.last_incremental_stats,
+            'persistence': dict(self.match_writer.stats, pending=len(self.match_writer)),
+            'profile_cache': self.profile_cache.summary(),
             'v5_components_active': {
                 'redis_intelligence': self.redis_intelligence is not None,
                 'cache_manager': self.cache_manager is not None, 
@@ -1058,6 +1163,9 @@ class MLIntegrationV5:
     async def close(self):
         """Cerrar conexiones y liberar recursos 🔚"""
         try:
+            # Vaciar matches pendientes antes de cerrar BD y cache
+            await self.match_writer.close()
+            
             # Cerrar componentes V5
             if self.redis_intelligence:
                 await self.redis_intelligence.close()
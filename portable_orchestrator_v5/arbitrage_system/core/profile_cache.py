@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+🧠 ProfileCache V5 - Perfiles de inteligencia memoizados por ciclo
+==================================================================
+`analyze_product_profile` se llamaba al obtener productos y otra vez para
+ambos productos de cada par candidato. Este cache guarda un perfil por
+código de producto junto con su versión de precio:
+
+- `prefetch(products)` calcula en lotes concurrentes solo los perfiles
+  faltantes, vencidos o con precio cambiado (una vez por ciclo)
+- `get(product)` durante el scoring de pares es un lookup en memoria
+- Un cambio de precio invalida el perfil del producto
+- Los errores del loader también se guardan por versión de precio: durante
+  el resto del ciclo (hasta `start_cycle()` o `failure_ttl_seconds`) el
+  producto no se vuelve a calcular en cada par
+
+Uso:
+    cache = ProductProfileCache(integrator.analyze_product_profile)
+    cache.start_cycle()
+    await cache.prefetch(products)
+    profile = await cache.get(product)
+"""
+
+import logging
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Campos de precio que definen la versión de un perfil
+PRICE_VERSION_FIELDS = (
+    'precio_actual', 'precio_oferta', 'precio_normal', 'precio_tarjeta',
+    'precio_min_num', 'precio_oferta_num', 'precio_normal_num', 'precio_tarjeta_num'
+)
+
+
+def profile_key(product: Dict[str, Any]) -> str:
+    """Código estable del producto"""
+    return str(product.get('codigo_interno') or product.get('sku') or '')
+
+
+def price_version(product: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Versión de precio: cualquier cambio invalida el perfil"""
+    return tuple(product.get(field) for field in PRICE_VERSION_FIELDS)
+
+
+class ProductProfileCache:
+    """
+    Cache de perfiles V5 por (código, versión de precio) 🧠
+
+    - ⚡ Lookups O(1) durante el scoring de pares
+    - 🔄 Invalidación por cambio de precio y por antigüedad
+    - 📦 Cómputo concurrente por lotes en prefetch
+    - 📊 Hit rate y tiempo de cómputo para métricas
+    """
+
+    def __init__(self, loader: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 concurrency: int = 32, max_entries: int = 20000, max_age_seconds: float = 3600,
+                 failure_ttl_seconds: float = 600):
+        """
+        Args:
+            loader: Corrutina que calcula el perfil de un producto
+            concurrency: Perfiles calculados en paralelo por lote
+            max_entries: Máximo de perfiles en memoria (LRU)
+            max_age_seconds: Recalcular perfiles más antiguos aunque el precio no cambie
+            failure_ttl_seconds: Reintentar un perfil fallido pasado este tiempo
+                aunque no haya empezado otro ciclo
+        """
+        self.loader = loader
+        self.concurrency = concurrency
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.failure_ttl_seconds = failure_ttl_seconds
+
+        # código → (versión de precio, perfil, timestamp)
+        self._entries: OrderedDict[str, Tuple[Tuple[Any, ...], Dict[str, Any], float]] = OrderedDict()
+        # código → (versión de precio, error del loader, timestamp)
+        self._failures: Dict[str, Tuple[Tuple[Any, ...], Exception, float]] = {}
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'invalidated': 0,
+            'expired': 0,
+            'computed': 0,
+            'errors': 0,
+            'failure_hits': 0,
+            'compute_seconds': 0.0
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, product: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Perfil vigente o None (sin calcular) 🔍"""
+        key = profile_key(product)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        version, profile, computed_at = entry
+        if version != price_version(product):
+            del self._entries[key]
+            self.stats['invalidated'] += 1
+            return None
+        if time.time() - computed_at > self.max_age_seconds:
+            del self._entries[key]
+            self.stats['expired'] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return profile
+
+    def lookup_failure(self, product: Dict[str, Any]) -> Optional[Exception]:
+        """Error guardado del loader para esta versión de precio, o None ⚠️"""
+        key = profile_key(product)
+        entry = self._failures.get(key)
+        if entry is None:
+            return None
+
+        version, error, failed_at = entry
+        if version != price_version(product) or time.time() - failed_at > self.failure_ttl_seconds:
+            del self._failures[key]
+            return None
+        return error
+
+    async def get(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Perfil del producto: lookup o cómputo
+
+        Los errores del loader se propagan; un producto que ya falló con la
+        misma versión de precio re-lanza el error guardado sin recalcular.
+        """
+        profile = self.lookup(product)
+        if profile is not None:
+            self.stats['hits'] += 1
+            return profile
+
+        error = self.lookup_failure(product)
+        if error is not None:
+            self.stats['failure_hits'] += 1
+            raise error.with_traceback(None)
+
+        self.stats['misses'] += 1
+        return await self._compute(product)
+
+    async def prefetch(self, products: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Calcular en lotes concurrentes los perfiles faltantes 📦
+
+        Returns:
+            Dict código → perfil para los productos con perfil disponible
+        """
+        profiles: Dict[str, Dict[str, Any]] = {}
+        missing: Dict[str, Dict[str, Any]] = {}
+
+        for product in products:
+            key = profile_key(product)
+            if key in profiles or key in missing:
+                continue
+            profile = self.lookup(product)
+            if profile is not None:
+                self.stats['hits'] += 1
+                profiles[key] = profile
+            elif self.lookup_failure(product) is not None:
+                self.stats['failure_hits'] += 1
+            else:
+                self.stats['misses'] += 1
+                missing[key] = product
+
+        pending = list(missing.items())
+        for start in range(0, len(pending), self.concurrency):
+            chunk = pending[start:start + self.concurrency]
+            results = await asyncio.gather(
+                *(self._compute(product) for _, product in chunk),
+                return_exceptions=True
+            )
+            for (key, _), result in zip(chunk, results):
+                if isinstance(result, Exception):
+                    logger.debug(f"⚠️ Error análisis V5 para {key}: {result}")
+                else:
+                    profiles[key] = result
+
+        if pending:
+            logger.info(f"🧠 Perfiles V5: {len(pending)} calculados, {len(profiles) - len(pending)} desde cache")
+        return profiles
+
+    async def _compute(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        """Calcular y guardar el perfil de un producto"""
+        start = time.perf_counter()
+        key = profile_key(product)
+        try:
+            profile = await self.loader(product)
+        except Exception as e:
+            self.stats['errors'] += 1
+            self._failures[key] = (price_version(product), e, time.time())
+            raise
+        finally:
+            self.stats['compute_seconds'] += time.perf_counter() - start
+
+        self.stats['computed'] += 1
+        self._failures.pop(key, None)
+        self._entries[key] = (price_version(product), profile, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return profile
+
+    def start_cycle(self):
+        """Nuevo ciclo: los perfiles fallidos se vuelven a intentar 🔄"""
+        self._failures.clear()
+
+    def clear(self):
+        """Olvidar todos los perfiles (y errores guardados)"""
+        self._entries.clear()
+        self._failures.clear()
+
+    def summary(self) -> Dict[str, Any]:
+        """Métricas para get_metrics_summary 📊"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        computed = self.stats['computed'] + self.stats['errors']
+        return {
+            **self.stats,
+            'entries': len(self._entries),
+            'failed_entries': len(self._failures),
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+            'avg_compute_ms': self.stats['compute_seconds'] * 1000 / computed if computed else 0.0
+        }
@@ -12,7 +12,7 @@ import asyncpg
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from contextlib import asynccontextmanager, contextmanager
-from typing import Dict, List, Any, Optional, AsyncGenerator, Generator, Union
+from typing import Dict, List, Any, Optional, AsyncGenerator, Generator, Union, Tuple
 import json
 from datetime import datetime, date
 from pathlib import Path
@@ -351,6 +351,65 @@ class DatabaseManagerV5:
             logger.error(f"❌ Error guardando match: {e}")
             raise
     
+    async def save_product_matches(self, matches: List[Dict[str, Any]]) -> Dict[Tuple[str, str], int]:
+        """
+        Guardar un lote de matches en un solo INSERT multi-fila 🎯
+        
+        Mismo upsert que save_product_match, pero con un round-trip por lote
+        (arrays + unnest). Si el lote repite un par (codigo_base, codigo_match)
+        se guarda la última versión.
+        
+        Returns:
+            Dict (codigo_base, codigo_match) → id en product_matching_v5
+        """
+        if not matches:
+            return {}
+        
+        latest = {(m['codigo_base'], m['codigo_match']): m for m in matches}
+        batch = list(latest.values())
+        
+        try:
+            async with self.get_async_connection() as conn:
+                rows = await conn.fetch("""
+                    INSERT INTO product_matching_v5 
+                    (codigo_base, codigo_match, similarity_score, v5_intelligence_score,
+                     brand_match_score, model_match_score, specs_match_score, semantic_similarity,
+                     match_type, match_confidence, match_reason, match_features, v5_analysis,
+                     ml_model_version, redis_cache_key)
+                    SELECT base, match, similarity, intelligence, brand, model, specs, semantic,
+                           mtype, confidence, reason, features::jsonb, analysis::jsonb, version, cache_key
+                    FROM unnest($1::varchar[], $2::varchar[], $3::float8[], $4::float8[],
+                                $5::float8[], $6::float8[], $7::float8[], $8::float8[],
+                                $9::varchar[], $10::varchar[], $11::text[], $12::text[], $13::text[],
+                                $14::varchar[], $15::varchar[])
+                         AS t(base, match, similarity, intelligence, brand, model, specs, semantic,
+                              mtype, confidence, reason, features, analysis, version, cache_key)
+                    ON CONFLICT (codigo_base, codigo_match)
+                    DO UPDATE SET
+                        similarity_score = EXCLUDED.similarity_score,
+                        v5_intelligence_score = EXCLUDED.v5_intelligence_score,
+                        updated_at = NOW()
+                    RETURNING id, codigo_base, codigo_match
+                """,
+                [m['codigo_base'] for m in batch], [m['codigo_match'] for m in batch],
+                [m['similarity_score'] for m in batch], [m.get('v5_intelligence_score') for m in batch],
+                [m.get('brand_match_score') for m in batch], [m.get('model_match_score') for m in batch],
+                [m.get('specs_match_score') for m in batch], [m.get('semantic_similarity') for m in batch],
+                [m['match_type'] for m in batch], [m['match_confidence'] for m in batch],
+                [m.get('match_reason') for m in batch],
+                [json.dumps(m.get('match_features', {})) for m in batch],
+                [json.dumps(m.get('v5_analysis', {})) for m in batch],
+                [m.get('ml_model_version', 'v5.0.0') for m in batch],
+                [m.get('redis_cache_key') for m in batch]
+                )
+                
+                logger.debug(f"🎯 Lote de {len(rows)} matches guardado")
+                return {(row['codigo_base'], row['codigo_match']): row['id'] for row in rows}
+                
+        except Exception as e:
+            logger.error(f"❌ Error guardando lote de matches: {e}")
+            raise
+    
     async def get_product_matches(self, product_code: str, min_similarity: float = 0.7) -> List[Dict[str, Any]]:
         """Obtener matches de un producto 📋"""
         try:
@@ -7,12 +7,46 @@ Compatible con emojis y optimizado para operación continua no supervisada.
 """
 
 import logging
-from typing import Dict, Any, List, Tuple, Optional
+import math
+from dataclasses import dataclass
+from typing import Dict, Any, List, Tuple, Optional, Sequence
 import numpy as np
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+try:
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+# Campos de especificaciones comparados por el scoring
+SPEC_FIELDS = ('storage', 'ram', 'screen')
+
+
+@dataclass
+class _TextColumn:
+    """Strings normalizados de un campo: id por producto (-1 = vacío) y tokens por valor distinto"""
+    ids: np.ndarray
+    values: List[str]
+    token_sets: List[frozenset]
+    token_counts: np.ndarray
+    token_matrix: Any = None  # CSR binaria (valores distintos × vocabulario) si hay scipy
+
+
+@dataclass
+class MatchFeatures:
+    """Features por producto precomputados una vez para el scoring batch"""
+    size: int
+    brand: _TextColumn
+    model: _TextColumn
+    category_ids: np.ndarray
+    prices: np.ndarray
+    spec_ids: np.ndarray       # (n, len(SPEC_FIELDS)), -1 = vacío
+    exact_fallback: np.ndarray  # productos que se puntúan con el camino por par
+    products: Sequence[Dict[str, Any]] = ()
+
 class MatchScoringAdapter:
     """
     Adaptador para scoring de matching V5 🎯
@@ -165,6 +199,191 @@ class MatchScoringAdapter:
         
         return matches / total_specs
 
+    # ------------------------------------------------------------------
+    # Scoring batch: mismos scores que calculate_match_score, en arrays
+    # ------------------------------------------------------------------
+
+    def extract_features(self, products: Sequence[Dict[str, Any]]) -> MatchFeatures:
+        """
+        Precomputa features por producto (marca, modelo, categoría, precio y
+        specs normalizados con las mismas reglas que calculate_match_score)
+
+        Args:
+            products: Dicts o filas con `.get()`
+        """
+        n = len(products)
+        brands, models, categories = [], [], []
+        prices = np.zeros(n, dtype=np.float64)
+        exact_fallback = np.zeros(n, dtype=bool)
+        spec_values: List[List[str]] = [[] for _ in SPEC_FIELDS]
+
+        for index, product in enumerate(products):
+            brands.append(str(product.get('marca', '')).lower().strip())
+            models.append(str(product.get('modelo', '')).lower().strip())
+            categories.append(str(product.get('categoria', '')).lower().strip())
+            for column, key in enumerate(SPEC_FIELDS):
+                spec_values[column].append(str(product.get(key, '')).lower().strip())
+
+            price = product.get('precio_oferta') or product.get('precio_normal') or product.get('precio_actual') or 0
+            try:
+                price = float(price) if price is not None else 0.0
+            except (TypeError, ValueError):
+                price = 0.0
+                exact_fallback[index] = True
+            if math.isnan(price):
+                # min/max de Python con NaN dependen del orden: se deja al camino por par
+                exact_fallback[index] = True
+            prices[index] = price
+
+        spec_ids = np.full((n, len(SPEC_FIELDS)), -1, dtype=np.int64)
+        for column, values in enumerate(spec_values):
+            spec_ids[:, column] = self._encode_strings(values, empty_as_missing=True)[0]
+
+        return MatchFeatures(
+            size=n,
+            brand=self._text_column(brands),
+            model=self._text_column(models),
+            category_ids=self._encode_strings(categories, empty_as_missing=False)[0],
+            prices=prices,
+            spec_ids=spec_ids,
+            exact_fallback=exact_fallback,
+            products=products,
+        )
+
+    def score_pairs(self, features: MatchFeatures, left: Sequence[int], right: Sequence[int]) -> np.ndarray:
+        """
+        Score de matching para miles de pares (left[k], right[k]) en una llamada 🔢
+
+        Devuelve exactamente los mismos floats que calculate_match_score: los
+        componentes se suman en el mismo orden que el camino por par.
+        """
+        left = np.asarray(left, dtype=np.int64)
+        right = np.asarray(right, dtype=np.int64)
+        if left.size == 0:
+            return np.zeros(0, dtype=np.float64)
+
+        components = {
+            'brand_similarity': self._string_similarity_batch(features.brand, left, right),
+            'model_similarity': self._string_similarity_batch(features.model, left, right),
+            'price_proximity': self._price_proximity_batch(features.prices[left], features.prices[right]),
+            'category_match': np.where(features.category_ids[left] == features.category_ids[right], 1.0, 0.3),
+            'specifications': self._specs_similarity_batch(features.spec_ids[left], features.spec_ids[right]),
+        }
+
+        # sum() de Python parte de 0 y suma en el orden de los scores
+        final_scores = np.zeros(left.size, dtype=np.float64)
+        for key, score in components.items():
+            final_scores = final_scores + score * self.scoring_weights[key]
+
+        fallback = features.exact_fallback[left] | features.exact_fallback[right]
+        for position in np.flatnonzero(fallback):
+            final_scores[position] = self.calculate_match_score(
+                features.products[left[position]], features.products[right[position]])[0]
+
+        return final_scores
+
+    def calculate_match_scores(self, products: Sequence[Dict[str, Any]],
+                               pairs: Sequence[Tuple[int, int]]) -> np.ndarray:
+        """Atajo: extract_features + score_pairs para pares de índices (i, j)"""
+        if not pairs:
+            return np.zeros(0, dtype=np.float64)
+        index = np.asarray(pairs, dtype=np.int64)
+        return self.score_pairs(self.extract_features(products), index[:, 0], index[:, 1])
+
+    @staticmethod
+    def _encode_strings(values: List[str], empty_as_missing: bool) -> Tuple[np.ndarray, List[str]]:
+        """Id entero por string distinto (-1 para vacío si empty_as_missing)"""
+        vocabulary: Dict[str, int] = {}
+        ids = np.empty(len(values), dtype=np.int64)
+        for index, value in enumerate(values):
+            if empty_as_missing and not value:
+                ids[index] = -1
+            else:
+                ids[index] = vocabulary.setdefault(value, len(vocabulary))
+        return ids, list(vocabulary)
+
+    def _text_column(self, values: List[str]) -> _TextColumn:
+        ids, distinct = self._encode_strings(values, empty_as_missing=True)
+        token_sets = [frozenset(value.split()) for value in distinct]
+        token_counts = np.fromiter((len(tokens) for tokens in token_sets), dtype=np.int64, count=len(token_sets))
+
+        token_matrix = None
+        if SCIPY_AVAILABLE and token_sets:
+            token_ids: Dict[str, int] = {}
+            rows, cols = [], []
+            for row, tokens in enumerate(token_sets):
+                for token in tokens:
+                    rows.append(row)
+                    cols.append(token_ids.setdefault(token, len(token_ids)))
+            token_matrix = sparse.csr_matrix(
+                (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                shape=(len(token_sets), max(len(token_ids), 1)))
+
+        return _TextColumn(ids, distinct, token_sets, token_counts, token_matrix)
+
+    def _string_similarity_batch(self, column: _TextColumn, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        """Versión vectorizada de _calculate_string_similarity sobre ids de strings"""
+        ids_left = column.ids[left]
+        ids_right = column.ids[right]
+        result = np.zeros(left.size, dtype=np.float64)
+
+        present = (ids_left >= 0) & (ids_right >= 0)
+        equal = present & (ids_left == ids_right)
+        result[equal] = 1.0
+
+        rest = np.flatnonzero(present & ~equal)
+        if rest.size == 0:
+            return result
+
+        # Substring y Jaccard solo una vez por par de valores distintos
+        n_values = len(column.values)
+        codes = ids_left[rest] * n_values + ids_right[rest]
+        unique_codes, inverse = np.unique(codes, return_inverse=True)
+        value_left = unique_codes // n_values
+        value_right = unique_codes % n_values
+
+        if column.token_matrix is not None:
+            intersection = np.asarray(
+                column.token_matrix[value_left].multiply(column.token_matrix[value_right]).sum(axis=1)
+            ).ravel().astype(np.int64)
+        else:
+            intersection = np.fromiter(
+                (len(column.token_sets[a] & column.token_sets[b]) for a, b in zip(value_left, value_right)),
+                dtype=np.int64, count=unique_codes.size)
+        union = column.token_counts[value_left] + column.token_counts[value_right] - intersection
+
+        unique_scores = np.full(unique_codes.size, 0.1, dtype=np.float64)
+        overlap = intersection > 0
+        unique_scores[overlap] = intersection[overlap] / union[overlap]
+
+        values = column.values
+        substring = np.fromiter(
+            (values[a] in values[b] or values[b] in values[a] for a, b in zip(value_left, value_right)),
+            dtype=bool, count=unique_codes.size)
+        unique_scores[substring] = 0.8
+
+        result[rest] = unique_scores[inverse]
+        return result
+
+    @staticmethod
+    def _price_proximity_batch(prices_left: np.ndarray, prices_right: np.ndarray) -> np.ndarray:
+        """Versión vectorizada de _calculate_price_proximity"""
+        valid = (prices_left > 0) & (prices_right > 0)
+        min_price = np.minimum(prices_left, prices_right)
+        max_price = np.maximum(prices_left, prices_right)
+        ratio = np.divide(min_price, max_price, out=np.zeros_like(min_price), where=valid)
+        return np.select(
+            [~valid, min_price == max_price, ratio >= 0.8, ratio >= 0.6, ratio >= 0.4],
+            [0.0, 1.0, 1.0, 0.7, 0.4],
+            default=0.1,
+        )
+
+    @staticmethod
+    def _specs_similarity_batch(specs_left: np.ndarray, specs_right: np.ndarray) -> np.ndarray:
+        """Versión vectorizada de _calculate_specs_similarity (fracción de specs iguales)"""
+        matches = ((specs_left >= 0) & (specs_left == specs_right)).sum(axis=1)
+        return matches / len(SPEC_FIELDS)
+
 
 class GlitchDetectionAdapter:
     """
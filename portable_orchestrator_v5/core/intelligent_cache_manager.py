@@ -355,6 +355,67 @@ class IntelligentCacheManager:
             logger.error(f"❌ Error en cache set: {e}")
             return False
     
+    async def set_many(self, items: List[Tuple[str, Any, Optional[int]]],
+                       volatility_score: float = 1.0, tags: List[str] = None) -> int:
+        """
+        💾 Almacenar varios datos con un solo round-trip a Redis
+        
+        Mismos niveles que set(); las escrituras L2/L3/L4 de todo el lote
+        van en un pipeline sin transacción.
+        
+        Args:
+            items: Lista de (clave, datos, ttl) con ttl None = TTL inteligente
+            volatility_score: Score de volatilidad 0-1
+            tags: Tags para categorización
+            
+        Returns:
+            Número de entradas almacenadas
+        """
+        if not items:
+            return 0
+        
+        try:
+            tags = tags or []
+            current_time = time.time()
+            pipe = self.redis_client.pipeline(transaction=False)
+            
+            for key, data, ttl in items:
+                if ttl is None:
+                    ttl = self._calculate_intelligent_ttl(key, volatility_score)
+                
+                entry = CacheEntry(
+                    key=key,
+                    data=data,
+                    created_at=current_time,
+                    accessed_at=current_time,
+                    ttl_seconds=ttl,
+                    size_bytes=self._estimate_data_size(data),
+                    volatility_score=volatility_score,
+                    tags=tags
+                )
+                levels = self._determine_storage_levels(entry)
+                
+                if 'L1' in levels:
+                    await self._set_in_l1(entry)
+                
+                if 'L2' in levels:
+                    await self._set_in_l2(entry, pipe)
+                
+                if 'L3' in levels:
+                    await self._set_in_l3(entry, pipe)
+                
+                if 'L4' in levels:
+                    await self._set_in_l4(entry, pipe)
+                
+                await self._update_prediction_models(key, data, tags)
+            
+            await pipe.execute()
+            return len(items)
+            
+        except Exception as e:
+            logger.error(f"❌ Error en cache set_many: {e}")
+            return 0
+    
     async def _get_from_l1(self, key: str) -> Optional[Any]:
         """🟢 Obtener desde L1 Memory Cache"""
         with self.l1_lock:
@@ -459,23 +520,14 @@ class IntelligentCacheManager:
             logger.error(f"❌ Error L1 set: {e}")
             return False
     
-    async def _set_in_l2(self, entry: CacheEntry) -> bool:
-        """🔵 Almacenar en L2 Redis Cache"""
+    async def _set_in_l2(self, entry: CacheEntry, pipe=None) -> bool:
+        """🔵 Almacenar en L2 Redis Cache (encolado en `pipe` si se entrega)"""
         try:
             # Serializar y comprimir datos
             serialized = pickle.dumps(entry.data)
             compressed = gzip.compress(serialized, compresslevel=6)
             
-            redis_key = f"cache:l2:{entry.key}"
-            
-            # Almacenar con TTL
-            await self.redis_client.setex(
-                redis_key, 
-                int(entry.ttl_seconds),
-                compressed
-            )
-            
-            # Almacenar metadatos
+            # Metadatos
             metadata = {
                 'created_at': entry.created_at,
                 'volatility_score': entry.volatility_score,
@@ -483,11 +535,12 @@ class IntelligentCacheManager:
                 'size_bytes': entry.size_bytes
             }
             
-            await self.redis_client.setex(
-                f"cache:l2:meta:{entry.key}",
-                int(entry.ttl_seconds),
-                json.dumps(metadata)
-            )
+            # Almacenar con TTL
+            target = pipe if pipe is not None else self.redis_client.pipeline(transaction=False)
+            target.setex(f"cache:l2:{entry.key}", int(entry.ttl_seconds), compressed)
+            target.setex(f"cache:l2:meta:{entry.key}", int(entry.ttl_seconds), json.dumps(metadata))
+            if pipe is None:
+                await target.execute()
             
             return True
             
@@ -495,8 +548,8 @@ class IntelligentCacheManager:
             logger.error(f"❌ Error L2 set: {e}")
             return False
     
-    async def _set_in_l3(self, entry: CacheEntry) -> bool:
-        """🟡 Almacenar en L3 Predictive Cache"""
+    async def _set_in_l3(self, entry: CacheEntry, pipe=None) -> bool:
+        """🟡 Almacenar en L3 Predictive Cache (encolado en `pipe` si se entrega)"""
         try:
             # Actualizar patrones para predicción futura
             pattern_key = f"cache:l3:patterns:{entry.key}"
@@ -507,9 +560,12 @@ class IntelligentCacheManager:
                 'size': entry.size_bytes
             }
             
-            await self.redis_client.lpush(pattern_key, json.dumps(pattern_data))
-            await self.redis_client.ltrim(pattern_key, 0, 99)  # Mantener últimos 100
-            await self.redis_client.expire(pattern_key, 86400)  # TTL 24h
+            target = pipe if pipe is not None else self.redis_client.pipeline(transaction=False)
+            target.lpush(pattern_key, json.dumps(pattern_data))
+            target.ltrim(pattern_key, 0, 99)  # Mantener últimos 100
+            target.expire(pattern_key, 86400)  # TTL 24h
+            if pipe is None:
+                await target.execute()
             
             return True
             
@@ -517,17 +573,19 @@ class IntelligentCacheManager:
             logger.error(f"❌ Error L3 set: {e}")
             return False
     
-    async def _set_in_l4(self, entry: CacheEntry) -> bool:
-        """🟠 Almacenar en L4 Analytics Cache"""
+    async def _set_in_l4(self, entry: CacheEntry, pipe=None) -> bool:
+        """🟠 Almacenar en L4 Analytics Cache (encolado en `pipe` si se entrega)"""
         try:
             # Solo para datos de análisis/agregaciones
             if 'analytics' in entry.tags or 'aggregation' in entry.tags:
-                redis_key = f"cache:l4:analytics:{entry.key}"
-                await self.redis_client.setex(
-                    redis_key,
+                target = pipe if pipe is not None else self.redis_client.pipeline(transaction=False)
+                target.setex(
+                    f"cache:l4:analytics:{entry.key}",
                     self.config['l4_analytics_ttl'],
                     json.dumps(entry.data, default=str)
                 )
+                if pipe is None:
+                    await target.execute()
             
             return True
             
@@ -535,6 +593,10 @@ class IntelligentCacheManager:
             logger.error(f"❌ Error L4 set: {e}")
             return False
     
+    async def _update_prediction_models(self, key: str, data: Any, tags: List[str]):
+        """🧠 Registrar la escritura en los patrones de acceso usados para predecir y precargar"""
+        self._record_access_pattern(key, time.time())
+    
     def _calculate_intelligent_ttl(self, key: str, volatility_score: float) -> int:
         """🧠 Calcular TTL inteligente basado en patrones"""
         base_ttl = self.config['l2_default_ttl']
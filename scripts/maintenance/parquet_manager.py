@@ -207,6 +207,22 @@ class ParquetManager:
         else:
             logger.error(f"❌ Error en limpieza: {result.get('error')}")
     
+    def compact(self, before_date=None):
+        """Compactar respaldos de días cerrados"""
+        logger.info("🗜️ COMPACTANDO RESPALDOS")
+        logger.info("=" * 50)
+        
+        result = self.system.compact_backups(before_date)
+        
+        for day in result['results']:
+            if day['success'] and day.get('compacted_files'):
+                logger.info(f"  📦 {day['retailer']}/{day['date']}: {day['compacted_files']} → {day['output_files']} "
+                            f"archivos ({day['size_before_mb']:.2f} MB → {day['size_after_mb']:.2f} MB)")
+            elif not day['success']:
+                logger.error(f"  ❌ {day['retailer']}/{day['date']}: {day.get('error')}")
+        
+        logger.info(f"✅ Días compactados: {result['days_compacted']}, archivos: {result['files_compacted']}")
+    
     def backup_info(self, retailer, date=None):
         """Información de respaldos de un retailer en una fecha"""
         if date is None:
@@ -271,6 +287,10 @@ def main():
     cleanup_parser = subparsers.add_parser('cleanup', help='Limpiar archivos antiguos')
     cleanup_parser.add_argument('--days', type=int, default=30, help='Días a mantener (default: 30)')
     
+    # Compact command
+    compact_parser = subparsers.add_parser('compact', help='Compactar respaldos de días cerrados')
+    compact_parser.add_argument('--before', help='Compactar días anteriores a esta fecha (YYYY-MM-DD, default: hoy)')
+    
     # Info command
     info_parser = subparsers.add_parser('info', help='Información de respaldos')
     info_parser.add_argument('retailer', help='Nombre del retailer')
@@ -297,6 +317,8 @@ def main():
         manager.analyze_file(args.parquet_file)
     elif args.command == 'cleanup':
         manager.cleanup_old(args.days)
+    elif args.command == 'compact':
+        manager.compact(args.before)
     elif args.command == 'info':
         manager.backup_info(args.retailer, args.date)
 
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+⚡ Benchmark: compactación de respaldos Parquet
+===============================================
+
+Genera un día de respaldos como los escribe save_scraped_data (un archivo
+chico por página) y mide la lectura antes y después de compact_day:
+- Día completo: leer todos los archivos del día (scripts de análisis)
+- Una categoría: archivos de esa categoría vs filtro sobre el compactado
+
+Uso:
+    python tests/performance/benchmark_backup_compaction.py [archivos] [filas_por_archivo]
+"""
+
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.parquet_backup_system import ParquetBackupSystem
+
+CATEGORIAS = ['smartphones', 'tablets', 'notebooks', 'smartwatches', 'televisores']
+DAY = "2025-09-03"
+
+
+def build_day(system: ParquetBackupSystem, n_files: int, rows: int):
+    """Un archivo por página con el mismo pipeline de tipos que save_scraped_data"""
+    rng = np.random.default_rng(42)
+    day_dir = system.base_path / "ripley" / DAY
+    day_dir.mkdir(parents=True)
+    for i in range(n_files):
+        category = CATEGORIAS[i % len(CATEGORIAS)]
+        ids = rng.integers(0, 1_000_000, rows)
+        batch = system._build_record_batch([
+            {
+                'sku': f"RIP{sku:07d}",
+                'nombre': f"Producto {category} {sku}",
+                'marca': 'SAMSUNG',
+                'link': f"https://ripley.cl/p/{sku}",
+                'precio_normal': int(sku % 900_000 + 10_000),
+                'precio_oferta': int(sku % 800_000 + 9_000),
+                'rating': 4.5,
+                'reviews_count': int(sku % 500),
+            }
+            for sku in ids
+        ], datetime.now())
+        path = day_dir / f"{category}_20250903_{i:06d}.parquet"
+        pq.write_table(pa.Table.from_batches([batch]), path, compression='snappy', use_dictionary=True)
+        system.catalog.add({'retailer': 'ripley', 'category': category, 'products_count': rows,
+                            'timestamp': f"{DAY}T10:00:00", 'file_path': str(path),
+                            'file_size_mb': path.stat().st_size / 1048576})
+
+
+def read_day(system: ParquetBackupSystem, category: str = None) -> int:
+    """Lectura como la haría un script de análisis: archivos del catálogo"""
+    entries = system.catalog.files_for_day('ripley', DAY)
+    paths = list(dict.fromkeys(e['file_path'] for e in entries if category is None or e['category'] == category))
+    filters = [('category', '=', category)] if category and all('compacted_' in p for p in paths) else None
+    tables = [pq.read_table(p, filters=filters) for p in paths]
+    return sum(t.num_rows for t in tables)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with tempfile.TemporaryDirectory() as tmp:
+        system = ParquetBackupSystem(tmp)
+        print(f"Generando {n_files:,} archivos x {rows} filas ...")
+        build_day(system, n_files, rows)
+        day_dir = system.base_path / "ripley" / DAY
+        size_before = sum(f.stat().st_size for f in day_dir.glob("*.parquet")) / 1048576
+
+        before_day, total = timed(lambda: read_day(system))
+        before_cat, _ = timed(lambda: read_day(system, 'tablets'))
+        compact_seconds, result = timed(lambda: system.compact_day('ripley', DAY))
+        after_day, total_after = timed(lambda: read_day(system))
+        after_cat, _ = timed(lambda: read_day(system, 'tablets'))
+        assert total == total_after
+
+        print("=" * 66)
+        print(f"{'lectura':<18} | {'antes (s)':>10} | {'después (s)':>11} | {'filas/s después':>16}")
+        print("-" * 66)
+        print(f"{'día completo':<18} | {before_day:>10.3f} | {after_day:>11.3f} | {total / after_day:>16,.0f}")
+        print(f"{'una categoría':<18} | {before_cat:>10.3f} | {after_cat:>11.3f} | {'-':>16}")
+        print("-" * 66)
+        print(f"archivos: {n_files:,} → {result['output_files']}  |  "
+              f"tamaño: {size_before:.2f}MB → {result['size_after_mb']:.2f}MB  |  "
+              f"compactación: {compact_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
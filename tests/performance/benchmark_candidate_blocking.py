@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+⚡ Benchmark: blocking de candidatos vs matching todos contra todos
+===================================================================
+
+Genera un catálogo sintético (mismo modelo publicado en 1-4 retailers con
+nombres, categorías y precios distintos; marcas/capacidades faltantes) y
+puntúa pares con el MatchScoringAdapter V5:
+
+- Fuerza bruta: todos los pares de retailers distintos (baseline)
+- Blocking: solo pares de CandidateBlocker
+- Blocking + scoring batch: mismos pares con MatchScoringAdapter.calculate_match_scores
+
+Reporta pares puntuados, tiempo y recall de los matches del blocking
+respecto de los de fuerza bruta. Para catálogos grandes solo se mide el
+blocking (la fuerza bruta no termina en tiempo razonable).
+
+Uso:
+    python tests/performance/benchmark_candidate_blocking.py [productos_baseline] [productos_catalogo]
+"""
+
+import importlib.util
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from core.candidate_blocking import CandidateBlocker
+
+# El adapter se carga por archivo: el paquete V5 importa scrapers con playwright
+_spec = importlib.util.spec_from_file_location(
+    "v5_adapters", ROOT / "portable_orchestrator_v5" / "arbitrage_system" / "ml" / "adapters.py")
+_adapters = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_adapters)
+
+RETAILERS = ['ripley', 'paris', 'falabella', 'hites', 'abcdin']
+BRANDS = ['Samsung', 'Apple', 'Xiaomi', 'Motorola', 'Huawei', 'Lenovo', 'HP', 'Asus', 'LG', 'Sony',
+          'Oppo', 'Realme', 'Acer', 'Dell', 'TCL']
+CATEGORIES = {
+    'smartphones': ['Smartphones', 'Celulares', 'Telefonía Celulares'],
+    'notebooks': ['Notebooks', 'Computación Laptops'],
+    'tablets': ['Tablets', 'iPad y Tablets'],
+    'smartwatches': ['Smartwatch', 'Relojes Inteligentes'],
+    'televisores': ['Televisores', 'Smart TV'],
+}
+MAX_PRICE_RATIO = 4.0
+MIN_SIMILARITY = 0.80
+
+
+def build_catalog(n_products: int, seed: int = 7):
+    """Productos sintéticos: ~2.5 publicaciones por modelo"""
+    rng = np.random.default_rng(seed)
+    products = []
+    model_id = 0
+    while len(products) < n_products:
+        brand = BRANDS[rng.integers(len(BRANDS))]
+        family = list(CATEGORIES)[rng.integers(len(CATEGORIES))]
+        capacity = int(rng.choice([64, 128, 256, 512]))
+        line = f"{'ABCDEFGHJK'[rng.integers(10)]}{rng.integers(10, 99)}"
+        base_price = float(np.exp(rng.normal(12.5, 0.8)))
+        for retailer in rng.choice(RETAILERS, size=rng.integers(1, 5), replace=False):
+            names = CATEGORIES[family]
+            words = [brand, family.rstrip('s').title(), line]
+            if rng.random() > 0.1:
+                words.append(f"{capacity}{'GB' if rng.random() > 0.3 else ' GB'}")
+            if rng.random() > 0.5:
+                words.append(rng.choice(['Negro', 'Azul', 'Plata', 'Dual SIM', '5G']))
+            products.append({
+                'codigo_interno': f"{retailer[:3].upper()}{len(products):07d}",
+                'modelo_id': model_id,
+                'nombre': ' '.join(words),
+                'modelo': line.lower(),
+                'marca': '' if rng.random() < 0.08 else brand.upper() if rng.random() < 0.5 else brand,
+                'categoria': names[rng.integers(len(names))],
+                'retailer': str(retailer),
+                'storage': f"{capacity}GB" if rng.random() > 0.4 else None,
+                'precio_oferta': int(base_price * rng.uniform(0.75, 1.25)),
+                'precio_normal': int(base_price * 1.3),
+            })
+            if len(products) >= n_products:
+                break
+        model_id += 1
+    return products
+
+
+def score_pairs(products, pairs):
+    scorer = _adapters.MatchScoringAdapter()
+    matches = set()
+    for i, j in pairs:
+        score, _ = scorer.calculate_match_score(products[i], products[j])
+        if score >= MIN_SIMILARITY:
+            matches.add((i, j))
+    return matches
+
+
+def score_pairs_batch(products, pairs):
+    scorer = _adapters.MatchScoringAdapter()
+    scores = scorer.calculate_match_scores(products, pairs)
+    return {pair for pair, score in zip(pairs, scores) if score >= MIN_SIMILARITY}
+
+
+def brute_force_pairs(products):
+    return [(i, j) for i in range(len(products)) for j in range(i + 1, len(products))
+            if products[i]['retailer'] != products[j]['retailer']]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    n_baseline = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_catalog = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    blocker = CandidateBlocker(max_price_ratio=MAX_PRICE_RATIO)
+
+    products = build_catalog(n_baseline)
+    brute_seconds, brute = timed(lambda: score_pairs(products, brute_force_pairs(products)))
+    block_seconds, blocked = timed(lambda: score_pairs(products, blocker.candidate_pairs(products)))
+    stats = blocker.last_stats
+    recall = len(blocked & brute) / len(brute) if brute else 1.0
+
+    print("=" * 70)
+    print(f"{'modo':<14} | {'productos':>9} | {'pares puntuados':>15} | {'matches':>7} | {'tiempo (s)':>10}")
+    print("-" * 70)
+    print(f"{'fuerza bruta':<14} | {n_baseline:>9,} | {stats['brute_force_pairs']:>15,} | "
+          f"{len(brute):>7,} | {brute_seconds:>10.2f}")
+    print(f"{'blocking':<14} | {n_baseline:>9,} | {stats['candidate_pairs']:>15,} | "
+          f"{len(blocked):>7,} | {block_seconds:>10.2f}")
+
+    catalog = build_catalog(n_catalog, seed=11)
+    pairs_seconds, catalog_pairs = timed(lambda: blocker.candidate_pairs(catalog))
+    score_seconds, catalog_matches = timed(lambda: score_pairs(catalog, catalog_pairs))
+    batch_seconds, batch_matches = timed(lambda: score_pairs_batch(catalog, catalog_pairs))
+    assert batch_matches == catalog_matches, "scoring batch difiere del scoring por par"
+    print(f"{'blocking':<14} | {n_catalog:>9,} | {len(catalog_pairs):>15,} | "
+          f"{len(catalog_matches):>7,} | {pairs_seconds + score_seconds:>10.2f}")
+    print(f"{'blocking+batch':<14} | {n_catalog:>9,} | {len(catalog_pairs):>15,} | "
+          f"{len(batch_matches):>7,} | {pairs_seconds + batch_seconds:>10.2f}")
+    print("-" * 70)
+    print(f"recall vs fuerza bruta: {recall:.2%}  |  reducción de pares: {stats['reduction']:.2%}  |  "
+          f"speedup: {brute_seconds / block_seconds:.0f}x")
+    print(f"catálogo {n_catalog:,}: candidatos {pairs_seconds:.2f}s + scoring {score_seconds:.2f}s "
+          f"(reducción {blocker.last_stats['reduction']:.2%} de {blocker.last_stats['brute_force_pairs']:,} pares)")
+    print(f"scoring batch: {batch_seconds:.2f}s vs {score_seconds:.2f}s por par "
+          f"({score_seconds / batch_seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+⚡ Benchmark: arranque en frío de MasterProductsManager
+======================================================
+
+Compara la carga del cache de productos desde productos.parquet:
+- Legacy: iterrows() + parseo fila a fila + un MasterProduct por fila
+- Lazy: LazyProductCache.from_frame (columnas) + índices sin materializar
+
+Uso:
+    python tests/performance/benchmark_master_products_load.py [n_productos ...]
+
+El loader legacy solo se mide hasta --legacy-max productos (default 100k);
+a 1M tarda varios minutos.
+"""
+
+import json
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.master_products_system import MasterProduct, MasterProductsManager
+
+RETAILERS = np.array(['falabella', 'ripley', 'paris', 'hites', 'abcdin'], dtype=object)
+CATEGORIAS = np.array(['smartphones', 'tablets', 'notebooks', 'smartwatches', 'televisores'], dtype=object)
+MARCAS = np.array(['SAMSUNG', 'APPLE', 'XIAOMI', 'LENOVO', 'HUAWEI', 'MOTOROLA'], dtype=object)
+
+
+def build_frame(n: int) -> pd.DataFrame:
+    """Frame con las columnas que escribe save_to_storage"""
+    rng = np.random.default_rng(42)
+    ids = np.arange(n).astype(str)
+    retailer = RETAILERS[rng.integers(0, len(RETAILERS), n)]
+    marca = MARCAS[rng.integers(0, len(MARCAS), n)]
+    today = date.today().isoformat()
+    badges = np.array(['[]', json.dumps(['Envío gratis']), json.dumps(['Más vendido', 'Envío gratis'])], dtype=object)
+
+    return pd.DataFrame({
+        'codigo_interno': 'CL-' + marca + '-MOD' + ids + '-128GB-' + retailer,
+        'sku_hash': ids,
+        'link': 'https://' + retailer + '.cl/p/' + ids,
+        'nombre': 'Producto ' + ids,
+        'sku': ids,
+        'marca': marca,
+        'categoria': CATEGORIAS[rng.integers(0, len(CATEGORIAS), n)],
+        'retailer': retailer,
+        'storage': '128GB',
+        'ram': '8GB',
+        'screen_size': '6.1',
+        'camera': None,
+        'front_camera': None,
+        'color': 'Negro',
+        'colors': None,
+        'rating': rng.uniform(3, 5, n).round(1),
+        'reviews_count': rng.integers(0, 5000, n),
+        'badges': badges[rng.integers(0, len(badges), n)],
+        'emblems': None,
+        'out_of_stock': False,
+        'discount_percent': None,
+        'shipping_options': None,
+        'included_accessories': None,
+        'fecha_primera_captura': today,
+        'fecha_ultima_actualizacion': today,
+        'ultimo_visto': today,
+        'activo': True,
+        'veces_visto': 1,
+        'nombre_normalizado': 'producto ' + ids,
+        'specs_hash': ids,
+    })
+
+
+def load_legacy(parquet_path: Path) -> dict:
+    """Réplica del antiguo _load_cache (iterrows + MasterProduct por fila)"""
+    cache = {}
+    df = pd.read_parquet(parquet_path)
+    for _, row in df.iterrows():
+        if row.get('activo', True):
+            product_dict = row.to_dict()
+            for date_field in ['fecha_primera_captura', 'fecha_ultima_actualizacion', 'ultimo_visto']:
+                if isinstance(product_dict.get(date_field), str):
+                    try:
+                        product_dict[date_field] = datetime.fromisoformat(product_dict[date_field]).date()
+                    except ValueError:
+                        product_dict[date_field] = date.today()
+            for list_field in ['colors', 'badges', 'emblems', 'shipping_options', 'included_accessories']:
+                if isinstance(product_dict.get(list_field), str):
+                    try:
+                        product_dict[list_field] = json.loads(product_dict[list_field]) if product_dict[list_field] else []
+                    except ValueError:
+                        product_dict[list_field] = []
+            product = MasterProduct(**product_dict)
+            cache[product.link] = product
+    return cache
+
+
+def load_lazy(base_path: Path) -> MasterProductsManager:
+    manager = MasterProductsManager(str(base_path))
+    manager._load_cache()
+    return manager
+
+
+def main():
+    args = sys.argv[1:]
+    legacy_max = 100_000
+    if '--legacy-max' in args:
+        i = args.index('--legacy-max')
+        legacy_max = int(args[i + 1])
+        del args[i:i + 2]
+    sizes = [int(arg) for arg in args] or [100_000, 1_000_000]
+
+    print("=" * 72)
+    print(f"{'productos':>10} | {'loader':<8} | {'arranque (s)':>12} | {'1er lookup (ms)':>15}")
+    print("-" * 72)
+
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            base_path = Path(tmp)
+            parquet_path = base_path / "master" / "productos.parquet"
+            parquet_path.parent.mkdir(parents=True)
+            build_frame(n).to_parquet(parquet_path, compression='snappy')
+            probe_link = f"https://ripley.cl/p/{n // 2}"
+
+            if n <= legacy_max:
+                start = time.perf_counter()
+                cache = load_legacy(parquet_path)
+                elapsed = time.perf_counter() - start
+                start = time.perf_counter()
+                cache.get(probe_link)
+                lookup_ms = (time.perf_counter() - start) * 1000
+                print(f"{n:>10,} | {'legacy':<8} | {elapsed:>12.2f} | {lookup_ms:>15.3f}")
+                del cache
+            else:
+                print(f"{n:>10,} | {'legacy':<8} | {'(omitido)':>12} | {'-':>15}")
+
+            start = time.perf_counter()
+            manager = load_lazy(base_path)
+            elapsed = time.perf_counter() - start
+            start = time.perf_counter()
+            manager.get_product_by_link(probe_link)
+            lookup_ms = (time.perf_counter() - start) * 1000
+            print(f"{n:>10,} | {'lazy':<8} | {elapsed:>12.2f} | {lookup_ms:>15.3f}")
+            del manager
+        print("-" * 72)
+
+
+if __name__ == "__main__":
+    main()
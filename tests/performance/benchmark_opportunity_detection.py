@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+⚡ Benchmark: detección de oportunidades por conjuntos vs consulta previa
+========================================================================
+
+Genera en DuckDB (memoria) `master_productos`, `master_precios` con 7 días
+de historial por SKU y `product_matching` con N matches, y compara:
+
+- Previa: join de matches contra todo el historial de precios (una fila por
+  día y SKU en cada lado) + métricas/score/riesgo en Python
+- Por conjuntos: core.opportunity_sql (último precio por SKU, métricas y
+  ranking en una sola consulta)
+
+Uso:
+    python tests/performance/benchmark_opportunity_detection.py [10000 100000 1000000]
+"""
+
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from core.opportunity_sql import detect_opportunities_duckdb
+
+RETAILERS = np.array(['ripley', 'paris', 'falabella', 'hites', 'abcdin'])
+HISTORY_DAYS = 7
+LIMIT = 100
+CONFIG = {'min_similarity_score': 0.85, 'min_margin_clp': 5000, 'min_percentage': 15.0, 'max_price_age_days': 3}
+
+LEGACY_SQL = """
+    WITH price_differences AS (
+        SELECT pm.id as matching_id, pm.similarity_score, pm.match_confidence,
+               CASE WHEN pr1.precio_oferta <= pr2.precio_oferta THEN pm.codigo_base ELSE pm.codigo_match END as codigo_barato,
+               CASE WHEN pr1.precio_oferta <= pr2.precio_oferta THEN pm.codigo_match ELSE pm.codigo_base END as codigo_caro,
+               LEAST(pr1.precio_oferta, pr2.precio_oferta) as precio_barato,
+               GREATEST(pr1.precio_oferta, pr2.precio_oferta) as precio_caro,
+               CASE WHEN pr1.precio_oferta <= pr2.precio_oferta THEN p1.retailer ELSE p2.retailer END as retailer_compra,
+               CASE WHEN pr1.precio_oferta <= pr2.precio_oferta THEN p2.retailer ELSE p1.retailer END as retailer_venta,
+               GREATEST(pr1.precio_oferta, pr2.precio_oferta) - LEAST(pr1.precio_oferta, pr2.precio_oferta) as diferencia,
+               p1.nombre as nombre_1, p2.nombre as nombre_2
+        FROM product_matching pm
+        JOIN master_productos p1 ON pm.codigo_base = p1.codigo_interno
+        JOIN master_productos p2 ON pm.codigo_match = p2.codigo_interno
+        JOIN master_precios pr1 ON p1.codigo_interno = pr1.codigo_interno
+        JOIN master_precios pr2 ON p2.codigo_interno = pr2.codigo_interno
+        WHERE pm.is_active = TRUE AND pm.similarity_score >= $1
+          AND pr1.precio_oferta IS NOT NULL AND pr2.precio_oferta IS NOT NULL
+          AND pr1.precio_oferta != pr2.precio_oferta
+    )
+    SELECT *, (diferencia * 100.0 / precio_barato) as diferencia_porcentaje
+    FROM price_differences
+    WHERE diferencia >= $2 AND (diferencia * 100.0 / precio_barato) >= $3
+    ORDER BY diferencia DESC, diferencia_porcentaje DESC
+    LIMIT $4
+"""
+
+
+def build_database(n_matches: int, seed: int = 17):
+    rng = np.random.default_rng(seed)
+    n_products = max(int(n_matches * 0.8), 10)
+    codes = np.char.add('SKU', np.arange(n_products).astype(str))
+    base_price = np.exp(rng.normal(12.5, 0.8, n_products)).astype(np.int64)
+
+    conn = duckdb.connect()
+    productos = pd.DataFrame({
+        'codigo_interno': codes,
+        'nombre': np.char.add('Producto ', np.arange(n_products).astype(str)),
+        'retailer': RETAILERS[rng.integers(len(RETAILERS), size=n_products)],
+    })
+    today = date.today()
+    precios = pd.DataFrame({
+        'codigo_interno': np.repeat(codes, HISTORY_DAYS),
+        'fecha': np.tile([today - timedelta(days=d) for d in range(HISTORY_DAYS)], n_products),
+        'precio_oferta': (np.repeat(base_price, HISTORY_DAYS) *
+                          rng.uniform(0.8, 1.2, n_products * HISTORY_DAYS)).astype(np.int64),
+    })
+    left = rng.integers(n_products, size=n_matches)
+    right = (left + rng.integers(1, n_products, size=n_matches)) % n_products
+    matching = pd.DataFrame({
+        'id': np.arange(1, n_matches + 1),
+        'codigo_base': codes[left],
+        'codigo_match': codes[right],
+        'similarity_score': rng.uniform(0.75, 1.0, n_matches).round(4),
+        'match_confidence': np.where(rng.random(n_matches) > 0.5, 'high', 'medium'),
+        'is_active': rng.random(n_matches) > 0.05,
+    })
+    for name, frame in (('master_productos', productos), ('master_precios', precios), ('product_matching', matching)):
+        conn.register(f"{name}_df", frame)
+        conn.execute(f"CREATE TABLE {name} AS SELECT * FROM {name}_df")
+        conn.unregister(f"{name}_df")
+    return conn
+
+
+def legacy_detection(conn):
+    """Consulta previa + métricas fila a fila en Python"""
+    cursor = conn.execute(LEGACY_SQL, [CONFIG['min_similarity_score'], CONFIG['min_margin_clp'],
+                                       CONFIG['min_percentage'], LIMIT])
+    columns = [d[0] for d in cursor.description]
+    opportunities = []
+    for values in cursor.fetchall():
+        row = dict(zip(columns, values))
+        margen_bruto = row['diferencia']
+        ganancia_neta = margen_bruto - int(row['precio_barato'] * 0.08)
+        roi = ganancia_neta / row['precio_barato'] * 100
+        combined = (min(row['diferencia_porcentaje'] / 100.0, 1.0) * 0.4 + float(row['similarity_score']) * 0.3 +
+                    min(margen_bruto / 100000.0, 1.0) * 0.3)
+        opportunities.append({'matching_id': row['matching_id'], 'roi_estimado': roi,
+                              'opportunity_score': 0.5 + combined * 0.5})
+    return opportunities
+
+
+def timed(fn, repeat: int = 3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+
+    print("=" * 78)
+    print(f"{'matches':>10} | {'previa (s)':>10} | {'filas join':>12} | {'conjuntos (s)':>13} | "
+          f"{'speedup':>7} | {'top-{0}'.format(LIMIT):>7}")
+    print("-" * 78)
+    for n_matches in sizes:
+        conn = build_database(n_matches)
+        join_rows = conn.execute(
+            "SELECT COUNT(*) FROM product_matching pm JOIN master_precios a ON a.codigo_interno = pm.codigo_base "
+            "JOIN master_precios b ON b.codigo_interno = pm.codigo_match").fetchone()[0]
+        legacy_seconds, _ = timed(lambda: legacy_detection(conn))
+        set_seconds, opportunities = timed(lambda: detect_opportunities_duckdb(conn, CONFIG, limit=LIMIT))
+        print(f"{n_matches:>10,} | {legacy_seconds:>10.3f} | {join_rows:>12,} | {set_seconds:>13.3f} | "
+              f"{legacy_seconds / set_seconds:>6.1f}x | {len(opportunities):>7}")
+        conn.close()
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+⚡ Benchmark: consultas de histórico de precios
+===============================================
+
+Compara la latencia de consultas de histórico (últimos 30 días):
+- DuckDB: tabla master_precios, una consulta por SKU (como antes)
+- Parquet: PriceHistoryStore sobre los Parquet diarios ordenados
+  (poda por día + row groups), sin LRU
+
+Mide 1 SKU (promedio de varios) y 1000 SKUs: consultas por SKU en DuckDB
+contra una sola consulta batch sobre Parquet.
+
+Uso:
+    python tests/performance/benchmark_price_history.py [n_skus] [dias]
+"""
+
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.price_history import PriceHistoryStore, daily_parquet_file, write_daily_parquet
+
+
+def build_history(root: Path, n_skus: int, days: int) -> duckdb.DuckDBPyConnection:
+    """Escribe un Parquet por día y la misma data en una tabla DuckDB"""
+    rng = np.random.default_rng(42)
+    codigos = np.array([f"CL-BRND-MOD{i:07d}-RIP-{i % 999:03d}" for i in range(n_skus)], dtype=object)
+    base = rng.integers(10_000, 2_000_000, n_skus)
+    conn = duckdb.connect(str(root / "warehouse.duckdb"))
+    conn.execute("""
+        CREATE TABLE master_precios (codigo_interno VARCHAR, fecha DATE, retailer VARCHAR,
+            precio_min_dia INTEGER, cambios_en_dia INTEGER, cambio_porcentaje DOUBLE)
+    """)
+
+    today = date.today()
+    for offset in range(days):
+        d = today - timedelta(days=days - offset)
+        order = rng.permutation(n_skus)  # Orden de inserción aleatorio, como el scraping
+        precio = (base[order] * rng.uniform(0.8, 1.2, n_skus)).astype(int)
+        df = pd.DataFrame({
+            'codigo_interno': codigos[order],
+            'fecha': d.isoformat(),
+            'retailer': 'ripley',
+            'precio_normal': base[order],
+            'precio_oferta': precio,
+            'precio_tarjeta': 0,
+            'precio_min_dia': precio,
+            'cambios_en_dia': 1,
+            'precio_anterior_dia': base[order],
+            'cambio_porcentaje': rng.normal(0, 5, n_skus).round(2),
+            'volatilidad_dia': 0.0,
+        })
+        path = daily_parquet_file(root / "precios", d)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_daily_parquet(df, path)
+        conn.register('df', df)
+        conn.execute("INSERT INTO master_precios SELECT codigo_interno, CAST(fecha AS DATE), retailer, "
+                     "precio_min_dia, cambios_en_dia, cambio_porcentaje FROM df")
+        conn.unregister('df')
+    conn.execute("CREATE INDEX idx_precios_codigo ON master_precios(codigo_interno)")
+    return conn, list(codigos)
+
+
+def timed(fn, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    n_skus = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        print(f"Generando {days} días x {n_skus:,} SKUs ...")
+        conn, codigos = build_history(root, n_skus, days)
+        history = PriceHistoryStore(root / "precios", root / "deltas", cache_size=0)
+
+        end = date.today()
+        start = end - timedelta(days=30)
+        rng = np.random.default_rng(7)
+        singles = [codigos[i] for i in rng.choice(len(codigos), 20, replace=False)]
+        batch = [codigos[i] for i in rng.choice(len(codigos), 1000, replace=False)]
+
+        columns = ['fecha', 'precio_min_dia', 'cambio_porcentaje', 'cambios_en_dia']
+
+        def duckdb_per_sku(skus):
+            for codigo in skus:
+                conn.execute("SELECT fecha, precio_min_dia, cambio_porcentaje, cambios_en_dia FROM master_precios "
+                             "WHERE codigo_interno = ? AND fecha BETWEEN ? AND ? ORDER BY fecha DESC",
+                             [codigo, start, end]).fetchall()
+
+        def parquet_single():
+            for codigo in singles:
+                history.query([codigo], start, end, columns=columns)
+
+        print("=" * 60)
+        print(f"{'consulta':<22} | {'DuckDB (ms)':>14} | {'Parquet (ms)':>14}")
+        print("-" * 60)
+        print(f"{'1 SKU':<22} | {timed(lambda: duckdb_per_sku(singles), 3) / len(singles):>14.2f} | "
+              f"{timed(parquet_single, 3) / len(singles):>14.2f}")
+        print(f"{'1000 SKUs':<22} | {timed(lambda: duckdb_per_sku(batch)):>14.2f} | "
+              f"{timed(lambda: history.query(batch, start, end, columns=columns), 3):>14.2f}")
+
+        cached = PriceHistoryStore(root / "precios", root / "deltas")
+        cached.query(batch, start, end, columns=columns)
+        print(f"{'1000 SKUs (LRU hit)':<22} | {'-':>14} | "
+              f"{timed(lambda: cached.query(batch, start, end, columns=columns), 100):>14.3f}")
+        print("-" * 60)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
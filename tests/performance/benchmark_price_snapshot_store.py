@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+⚡ Benchmark: PriceSnapshotStore vs dict de DailyPriceSnapshot
+=============================================================
+
+Compara tiempo de carga y memoria del cache de precios del día:
+- Legacy: iterrows() + un DailyPriceSnapshot por SKU
+- Columnar: PriceSnapshotStore.from_frame (vectorizado)
+
+Uso:
+    python tests/performance/benchmark_price_snapshot_store.py [n_skus ...]
+"""
+
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.master_prices_system import DailyPriceSnapshot, PriceSnapshotView
+from core.price_snapshot_store import PriceSnapshotStore
+
+
+def build_frame(n: int) -> pd.DataFrame:
+    """Frame con el mismo formato que el Parquet diario"""
+    rng = np.random.default_rng(42)
+    normal = rng.integers(10_000, 2_000_000, n)
+    now = datetime.now().isoformat()
+    return pd.DataFrame({
+        'codigo_interno': [f"CL-BRND-MOD{i:07d}-128GB-RIP-{i % 999:03d}" for i in range(n)],
+        'fecha': date.today().isoformat(),
+        'retailer': rng.choice(['falabella', 'ripley', 'paris', 'hites', 'abcdin'], n),
+        'precio_normal': normal,
+        'precio_oferta': (normal * 0.9).astype(int),
+        'precio_tarjeta': (normal * 0.85).astype(int),
+        'precio_min_dia': (normal * 0.85).astype(int),
+        'precio_anterior_dia': normal,
+        'cambios_en_dia': 1,
+        'cambio_porcentaje': -15.0,
+        'cambio_absoluto': 0,
+        'volatilidad_dia': 0.0,
+        'alertas_enviadas': 0,
+        'tipos_alertas': '[]',
+        'timestamp_creacion': now,
+        'timestamp_ultima_actualizacion': now,
+    })
+
+
+def load_legacy(df: pd.DataFrame) -> dict:
+    """Réplica del antiguo _load_today_cache (iterrows + dataclass)"""
+    cache = {}
+    constructor_fields = {
+        'codigo_interno', 'fecha', 'retailer',
+        'precio_normal', 'precio_oferta', 'precio_tarjeta', 'precio_anterior_dia'
+    }
+    for _, row in df.iterrows():
+        snapshot_dict = row.to_dict()
+        snapshot_dict['fecha'] = datetime.fromisoformat(snapshot_dict['fecha']).date()
+        snapshot = DailyPriceSnapshot(**{k: v for k, v in snapshot_dict.items() if k in constructor_fields})
+        cache[snapshot.codigo_interno] = snapshot
+    return cache
+
+
+def load_columnar(df: pd.DataFrame) -> PriceSnapshotStore:
+    return PriceSnapshotStore.from_frame(df, date.today(), view_class=PriceSnapshotView)
+
+
+def measure(loader, df):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = loader(df)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current / 1024 / 1024, peak / 1024 / 1024
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+
+    print("=" * 78)
+    print(f"{'SKUs':>10} | {'loader':<10} | {'carga (s)':>10} | {'memoria (MB)':>12} | {'pico (MB)':>10}")
+    print("-" * 78)
+
+    for n in sizes:
+        df = build_frame(n)
+        for name, loader in (('legacy', load_legacy), ('columnar', load_columnar)):
+            result, elapsed, current_mb, peak_mb = measure(loader, df)
+            print(f"{n:>10,} | {name:<10} | {elapsed:>10.3f} | {current_mb:>12.1f} | {peak_mb:>10.1f}")
+            del result
+
+        # Batch update sobre el store columnar
+        store = load_columnar(df)
+        codigos = df['codigo_interno'].tolist()
+        nuevos = (df['precio_oferta'] * 0.95).astype(int).tolist()
+        start = time.perf_counter()
+        store.update_prices(codigos, precio_oferta=nuevos)
+        print(f"{n:>10,} | {'update':<10} | {time.perf_counter() - start:>10.3f} | "
+              f"{store.memory_bytes() / 1024 / 1024:>12.1f} | {'-':>10}")
+        print("-" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+⚡ Benchmark: pares de entrenamiento estratificados vs bucle par a par
+=====================================================================
+
+Genera un catálogo sintético de N productos (5 retailers, varias marcas,
+capacidades y categorías) y compara en MLRetrainingSystem:
+
+- Par a par: primeros 5000 pares cross-retailer con _extract_pair_features
+  y _determine_match_label sobre dicts
+- Estratificado: core.training_pairs + features/labels columnares con las
+  cuotas por defecto
+
+Reporta tiempo, pares/s, positivos y pares de retailers cubiertos.
+
+Uso:
+    python tests/performance/benchmark_training_pairs.py [5000 20000 50000]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'arbitrage'))
+
+import ml_retraining_system
+
+RETAILERS = np.array(['ripley', 'paris', 'falabella', 'hites', 'abcdin'])
+BRANDS = np.array(['SAMSUNG', 'XIAOMI', 'APPLE', 'MOTOROLA', 'HUAWEI', 'LENOVO', 'HP', 'ASUS'])
+CATEGORIES = np.array(['smartphones', 'notebooks', 'tablets', 'smartwatches'])
+STORAGE = np.array(['64GB', '128GB', '256GB', '512GB', '1TB'])
+
+
+def build_catalog(n_products: int, seed: int = 23) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # ~n/3 modelos distintos: cada modelo aparece en varios retailers
+    n_models = max(n_products // 3, 10)
+    model = rng.integers(n_models, size=n_products)
+    brand = BRANDS[model % len(BRANDS)]
+    storage = STORAGE[model % len(STORAGE)]
+    base_price = np.exp(rng.normal(12.5, 0.7, n_models))[model]
+    retailer = RETAILERS[np.argsort(rng.random(n_products)) % len(RETAILERS)]
+    return pd.DataFrame({
+        'codigo_interno': np.char.add('SKU', np.arange(n_products).astype(str)),
+        'retailer': retailer,
+        'nombre': [f"{b.title()} Modelo {m} {s}" for b, m, s in zip(brand, model, storage)],
+        'marca': brand,
+        'categoria': CATEGORIES[model % len(CATEGORIES)],
+        'storage': storage,
+        'ram': np.where(model % 2 == 0, '8GB', '12GB'),
+        'screen_size': np.round(6 + (model % 20) * 0.1, 1).astype(str),
+        'color': np.array(['negro', 'azul', 'blanco'])[rng.integers(3, size=n_products)],
+        'rating': np.round(rng.uniform(3, 5, n_products), 1),
+        'reviews_count': rng.integers(0, 500, n_products),
+        'out_of_stock': rng.random(n_products) < 0.1,
+        'precio_min_dia': (base_price * rng.uniform(0.85, 1.15, n_products)).round(),
+        'precio_oferta': (base_price * rng.uniform(0.85, 1.15, n_products)).round(),
+        'veces_visto': rng.integers(1, 30, n_products),
+    })
+
+
+def retailer_pairs(frame: pd.DataFrame, i: np.ndarray, j: np.ndarray) -> int:
+    a, b = frame['retailer'].values[i], frame['retailer'].values[j]
+    return len(set(zip(np.minimum(a, b), np.maximum(a, b))))
+
+
+def legacy_pairs(retrainer, frame: pd.DataFrame):
+    products = frame.to_dict('records')
+    pairs, labels = [], []
+    for i, prod_a in enumerate(products):
+        for j in range(i + 1, len(products)):
+            prod_b = products[j]
+            if prod_a['retailer'] != prod_b['retailer']:
+                retrainer._extract_pair_features(prod_a, prod_b)
+                labels.append(retrainer._determine_match_label(prod_a, prod_b))
+                pairs.append((i, j))
+                if len(pairs) >= 5000:
+                    break
+        if len(pairs) >= 5000:
+            break
+    i, j = (np.array(side) for side in zip(*pairs))
+    return i, j, np.array(labels)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [5_000, 20_000, 50_000]
+    ml_retraining_system.SentenceTransformer = None
+    retrainer = ml_retraining_system.MLRetrainingSystem({})
+
+    print("=" * 94)
+    print(f"{'productos':>10} | {'método':>14} | {'pares':>8} | {'tiempo (s)':>10} | {'pares/s':>10} | "
+          f"{'positivos':>9} | {'retailers':>9}")
+    print("-" * 94)
+    for n_products in sizes:
+        frame = build_catalog(n_products)
+        sorted_frame = frame.sort_values(['retailer', 'categoria']).reset_index(drop=True)
+
+        start = time.perf_counter()
+        i, j, labels = legacy_pairs(retrainer, sorted_frame)
+        seconds = time.perf_counter() - start
+        print(f"{n_products:>10,} | {'par a par':>14} | {len(labels):>8,} | {seconds:>10.3f} | "
+              f"{len(labels) / seconds:>10,.0f} | {int(labels.sum()):>9,} | {retailer_pairs(sorted_frame, i, j):>9}")
+
+        start = time.perf_counter()
+        products = frame.to_dict('records')
+        columns = retrainer._product_columns(products)
+        sampler = ml_retraining_system.TrainingPairSampler()
+        i, j, labels, _ = sampler.sample(products, lambda a, b: retrainer._match_labels_columnar(columns, a, b))
+        retrainer._pair_features_columnar(columns, i, j)
+        seconds = time.perf_counter() - start
+        print(f"{n_products:>10,} | {'estratificado':>14} | {len(labels):>8,} | {seconds:>10.3f} | "
+              f"{len(labels) / seconds:>10,.0f} | {int(labels.sum()):>9,} | {retailer_pairs(frame, i, j):>9}")
+    print("=" * 94)
+
+
+if __name__ == "__main__":
+    main()
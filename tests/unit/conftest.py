@@ -0,0 +1,12 @@
+import logging
+
+import pytest
+
+
+@pytest.fixture
+def backup_log_in_tmp(tmp_path, monkeypatch):
+    """Log de ParquetBackupSystem en tmp_path en vez de logs/system del repo"""
+    handler = logging.FileHandler(tmp_path / "parquet_backup.log", encoding="utf-8")
+    monkeypatch.setattr(logging.getLogger("parquet_backup"), "handlers", [handler])
+    yield
+    handler.close()
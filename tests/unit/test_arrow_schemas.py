@@ -0,0 +1,102 @@
+import json
+import logging
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.arrow_schemas import RecordBatchBuilder, _to_float, _to_int, get_schema
+
+from core.parquet_backup_system import ParquetBackupSystem
+from core.price_snapshot_store import PriceSnapshotStore
+
+
+pytestmark = pytest.mark.usefixtures("backup_log_in_tmp")
+
+
+@dataclass
+class _Product:
+    title: str
+    current_price: float = 0.0
+    rating: float = 0.0
+    image_urls: List[str] = field(default_factory=list)
+    warranty: str = ""
+
+
+def test_builder_coerces_mixed_values_and_keeps_unknown_keys():
+    batch = RecordBatchBuilder('scraped_product').build([
+        {"nombre": "A", "precio_normal": "$1.299.990", "rating": "4,5", "out_of_stock": "true", "vendedor": "X"},
+        {"nombre": 7, "precio_normal": 999.0, "rating": None},
+        _Product("B", current_price=10.5, image_urls=["u1"], warranty="12m"),
+    ])
+
+    assert batch.schema.equals(get_schema('scraped_product'))
+    rows = batch.to_pylist()
+    assert [r["precio_normal"] for r in rows] == [1299990, 999, None]
+    assert [r["rating"] for r in rows] == [4.5, None, 0.0]
+    assert rows[0]["out_of_stock"] is True and rows[1]["nombre"] == "7"
+    assert rows[2]["title"] == "B" and rows[2]["image_urls"] == ["u1"]
+    assert json.loads(rows[0]["extra"]) == {"vendedor": "X"}
+    assert json.loads(rows[2]["extra"]) == {"warranty": "12m"} and rows[1]["extra"] is None
+
+
+@pytest.mark.parametrize("text, as_int, as_float", [
+    ("$1.299.990", 1299990, 1299990.0),
+    ("1299.99", 1299, 1299.99),
+    ("$1299.99", 1299, 1299.99),
+    ("1.299,99", 1299, 1299.99),
+    ("1,299.99", 1299, 1299.99),
+    ("$ 1.299", 1299, 1299.0),
+    ("4,5", 4, 4.5),
+    ("15%", 15, 15.0),
+    ("consultar", None, None),
+])
+def test_int_and_float_parse_decimals_the_same_way(text, as_int, as_float):
+    assert _to_int(text) == as_int
+    assert _to_float(text) == as_float
+
+
+def test_unknown_keys_are_logged_once(caplog):
+    builder = RecordBatchBuilder('scraped_product')
+    with caplog.at_level(logging.INFO, logger="core.arrow_schemas"):
+        builder.build([{"nombre": "A", "clave_nueva_log": 1}])
+        builder.build([{"nombre": "B", "clave_nueva_log": 2}])
+    messages = [r.getMessage() for r in caplog.records if "clave_nueva_log" in r.getMessage()]
+    assert len(messages) == 1 and "extra" in messages[0]
+
+    no_extra = RecordBatchBuilder(pa.schema([('nombre', pa.string())], metadata={'record_type': 'sin_extra'}))
+    with caplog.at_level(logging.INFO, logger="core.arrow_schemas"):
+        batch = no_extra.build([{"nombre": "C", "descartada": 1}])
+    assert batch.column_names == ["nombre"]
+    assert any(r.levelno == logging.WARNING and "descartada" in r.getMessage() for r in caplog.records)
+
+
+def test_backup_files_share_schema_regardless_of_payload(tmp_path):
+    system = ParquetBackupSystem(str(tmp_path))
+    first = system.save_scraped_data("ripley", "smartphones", [{"nombre": "A", "precio_normal": 1000}])
+    second = system.save_scraped_data("ripley", "tablets", [_Product("B", current_price=5.0)])
+
+    schemas = [pq.read_schema(result["file_path"]) for result in (first, second)]
+    assert schemas[0].remove_metadata().equals(schemas[1].remove_metadata())
+    assert schemas[0].field("precio_normal").type == get_schema('scraped_product').field("precio_normal").type
+
+
+def test_price_snapshot_record_batch_matches_frame():
+    store = PriceSnapshotStore(date(2025, 9, 3))
+    store.append(["S1", "S2"], ["ripley", "paris"], [1000, 2000], [900, 0], [0, 1500],
+                 timestamp=datetime(2025, 9, 3, 10))
+
+    batch = store.to_record_batch()
+    frame = store.to_frame()
+
+    assert batch.schema.equals(get_schema('price_snapshot'))
+    assert batch.column('codigo_interno').to_pylist() == frame['codigo_interno'].tolist()
+    assert batch.column('precio_min_dia').to_pylist() == frame['precio_min_dia'].tolist()
+    assert batch.column('descuento_porcentaje').to_pylist() == frame['descuento_porcentaje'].tolist()
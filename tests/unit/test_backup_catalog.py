@@ -0,0 +1,81 @@
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.parquet_backup_system import ParquetBackupSystem
+
+
+pytestmark = pytest.mark.usefixtures("backup_log_in_tmp")
+
+
+def _products(n):
+    return [{"nombre": f"Producto {i}", "precio_normal": 1000 + i, "link": f"https://x.cl/{i}"} for i in range(n)]
+
+
+def test_catalog_lists_and_aggregates_without_scanning(tmp_path, monkeypatch):
+    system = ParquetBackupSystem(str(tmp_path))
+    system.save_scraped_data("ripley", "smartphones", _products(3), {"session_id": "s1"})
+    system.save_scraped_data("paris", "tablets", _products(2))
+    assert not list(tmp_path.rglob("metadata_*.json"))
+
+    # Listar y estadísticas no deben recorrer directorios
+    monkeypatch.setattr(Path, "iterdir", lambda self: (_ for _ in ()).throw(AssertionError("scan")))
+    ripley = system.list_backups(retailer="ripley", days_back=1)
+    assert [(b["category"], b["products_count"]) for b in ripley] == [("smartphones", 3)]
+    assert [b["retailer"] for b in system.list_backups(category="tablets")] == ["paris"]
+
+    stats = system.get_backup_stats()
+    assert stats["total_files"] == 2 and stats["total_retailers"] == 2
+    assert stats["retailers"]["ripley"]["dates"] == [datetime.now().strftime("%Y-%m-%d")]
+
+
+def test_catalog_rebuilds_from_legacy_layout(tmp_path):
+    day_dir = tmp_path / "falabella" / "2025-09-03"
+    day_dir.mkdir(parents=True)
+    parquet_file = day_dir / "smartphones_20250903_143022.parquet"
+    pd.DataFrame({"nombre": ["a", "b"]}).to_parquet(parquet_file)
+    with open(day_dir / "metadata_20250903.json", "w", encoding="utf-8") as f:
+        json.dump({"backups": [{
+            "retailer": "falabella", "category": "smartphones", "timestamp": "2025-09-03 14:30:22",
+            "products_count": 2, "file_size_mb": 0.01, "file_path": str(parquet_file),
+        }]}, f)
+
+    system = ParquetBackupSystem(str(tmp_path))
+    entries = system.catalog.list(retailer="falabella")
+    assert [(e["backup_date"], e["category"], e["products_count"]) for e in entries] == [
+        ("2025-09-03", "smartphones", 2)
+    ]
+    assert system.get_backup_stats()["oldest_backup"] == str(parquet_file)
+
+
+def test_compaction_merges_day_sorted_and_swaps_catalog(tmp_path):
+    system = ParquetBackupSystem(str(tmp_path))
+    day_dir = tmp_path / "ripley" / "2025-09-03"
+    day_dir.mkdir(parents=True)
+    pages = [("tablets", ["T2", "T1"]), ("smartphones", ["S3", "S1"]), ("smartphones", ["S2"])]
+    for i, (category, skus) in enumerate(pages):
+        path = day_dir / f"{category}_20250903_10000{i}.parquet"
+        # Páginas con tipos distintos para la misma columna
+        rating = [4.5] * len(skus) if i else ["4,5"] * len(skus)
+        pd.DataFrame({"sku": skus, "rating": rating}).to_parquet(path)
+        system.catalog.add({"retailer": "ripley", "category": category, "products_count": len(skus),
+                            "timestamp": f"2025-09-03T10:00:0{i}", "file_path": str(path)})
+
+    result = system.compact_backups()
+
+    assert result["success"] and result["files_compacted"] == 3
+    files = sorted(day_dir.glob("*.parquet"))
+    assert [f.name for f in files] == ["compacted_20250903_000.parquet"]
+    df = pd.read_parquet(files[0])
+    assert list(zip(df["category"], df["sku"])) == [
+        ("smartphones", "S1"), ("smartphones", "S2"), ("smartphones", "S3"), ("tablets", "T1"), ("tablets", "T2")
+    ]
+    entries = {e["category"]: e["products_count"] for e in system.catalog.files_for_day("ripley", "2025-09-03")}
+    assert entries == {"smartphones": 3, "tablets": 2}
+    assert system.get_backup_stats()["retailers"]["ripley"]["files"] == 1
@@ -0,0 +1,60 @@
+from datetime import datetime
+import sys
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.backup_stream_writer import StreamingBackupWriter, get_backup_schema
+
+
+def _record(i):
+    return {
+        "sku_unico": f"SKU{i}",
+        "retailer": "falabella",
+        "nombre": f"Producto {i}",
+        "precio_normal": "1.299.990" if i % 2 else 1299990,
+        "precio_oferta": 999990,
+        "precio_tarjeta": None,
+        "rating": "4.5",
+        "reviews": 10,
+        "timestamp": datetime(2025, 9, 3, 12, 0),
+    }
+
+
+def test_streams_batches_into_single_parquet_file(tmp_path):
+    writer = StreamingBackupWriter(tmp_path, run_id="test", batch_size=10)
+    for i in range(25):
+        writer.append(_record(i))
+
+    path = writer.close()
+
+    assert path == tmp_path / "backup_run_test.parquet"
+    assert list(tmp_path.glob("*.parquet")) == [path]
+
+    table = pq.read_table(path)
+    assert table.schema.equals(get_backup_schema())
+    assert table.num_rows == 25
+    assert pq.ParquetFile(path).metadata.num_row_groups == 3
+    assert pq.ParquetFile(path).metadata.row_group(0).column(0).compression == "ZSTD"
+    assert set(table.column("precio_normal").to_pylist()) == {1299990}
+    assert table.column("precio_tarjeta").null_count == 25
+
+
+def test_close_without_rows_creates_no_file(tmp_path):
+    writer = StreamingBackupWriter(tmp_path, run_id="empty")
+
+    assert writer.close() is None
+    assert not list(tmp_path.glob("*.parquet"))
+
+
+def test_decimal_strings_parse_like_arrow_schemas(tmp_path):
+    writer = StreamingBackupWriter(tmp_path, run_id="decimals")
+    for precio, rating in (("1299.99", "4,5"), ("1.299,50", "4.5"), ("$1.299.990", 4)):
+        writer.append({"sku_unico": "SKU", "precio_normal": precio, "rating": rating})
+
+    table = pq.read_table(writer.close())
+
+    assert table.column("precio_normal").to_pylist() == [1299, 1299, 1299990]
+    assert table.column("rating").to_pylist() == [4.5, 4.5, 4.0]
@@ -0,0 +1,65 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from arbitrage.ml_integration_sync import ArbitrageMLIntegration
+
+# El adapter se carga por archivo: el paquete V5 importa scrapers con playwright
+_spec = importlib.util.spec_from_file_location(
+    "v5_adapters", ROOT / "portable_orchestrator_v5" / "arbitrage_system" / "ml" / "adapters.py")
+_adapters = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_adapters)
+
+
+def _catalog(n, seed=3):
+    rng = np.random.default_rng(seed)
+    brands = ['Samsung', 'SAMSUNG', 'Samsung Electronics', 'Apple', '', None, ' lg ']
+    models = ['galaxy s23', 'galaxy s23 ultra', 's23', 'iphone 15 pro', 'iphone 15', '', None, 'a54 5g']
+    prices = [999_990, 1_049_990, 650_000, 0, None, '899990', 'consultar', float('nan'), 120_000]
+    products = []
+    for k in range(n):
+        product = {
+            'codigo_interno': f"P{k}",
+            'retailer': ['ripley', 'paris', 'falabella'][k % 3],
+            'marca': brands[rng.integers(len(brands))],
+            'modelo': models[rng.integers(len(models))],
+            'categoria': ['Smartphones', 'smartphones ', 'Tablets'][rng.integers(3)],
+            'precio_oferta': prices[rng.integers(len(prices))],
+            'precio_normal': [None, 1_100_000, 0][rng.integers(3)],
+            'storage': ['128GB', '128gb', '256GB', None][rng.integers(4)],
+        }
+        if rng.random() > 0.5:
+            product['ram'] = ['8GB', '12GB'][rng.integers(2)]
+        products.append(product)
+    return products
+
+
+def test_batch_scores_equal_per_pair_scores():
+    products = _catalog(60)
+    pairs = [(i, j) for i in range(len(products)) for j in range(i + 1, len(products))]
+    scorer = _adapters.MatchScoringAdapter()
+
+    batch = scorer.calculate_match_scores(products, pairs)
+    per_pair = [scorer.calculate_match_score(products[i], products[j])[0] for i, j in pairs]
+
+    assert batch.tolist() == per_pair
+    assert scorer.calculate_match_scores(products, []).size == 0
+
+
+def test_fallback_similarity_batch_equals_per_pair():
+    integration = ArbitrageMLIntegration({})
+    integration.match_scorer = None
+    productos = [
+        {'marca': marca, 'categoria': categoria}
+        for marca in ('Samsung', 'SAMSUNG', 'Apple') for categoria in ('Smartphones', 'Tablets')
+    ]
+    pairs = [(i, j) for i in range(len(productos)) for j in range(i + 1, len(productos))]
+
+    batch = integration._calculate_similarities(productos, pairs)
+
+    assert batch == [integration._calculate_similarity(productos[i], productos[j]) for i, j in pairs]
@@ -0,0 +1,195 @@
+import random
+import re
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from alerts_bot import maintenance
+
+WATERMARK = datetime(2026, 10, 18, 12, 0)
+MASTER_COLUMNS = [("codigo_interno",), ("fecha",), ("retailer",), ("precio_oferta",), ("precio_normal",),
+                  ("timestamp_ultima_actualizacion",)]
+
+
+class _Cursor:
+    rowcount = 0
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append((" ".join(sql.split()), params))
+        self.last = sql
+
+    def fetchall(self):
+        return self.conn.columns
+
+    def fetchone(self):
+        if "FROM bot.refresh_state" in self.last:
+            return self.conn.state
+        return (3, datetime(2026, 10, 18, 12, 5))
+
+    def close(self):
+        pass
+
+
+class _Conn:
+    def __init__(self, state, columns=MASTER_COLUMNS):
+        self.state, self.columns = state, columns
+        self.statements, self.commits = [], 0
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        pass
+
+
+def _refresh(monkeypatch, conn, **kwargs):
+    monkeypatch.setattr(maintenance.psycopg2, "connect", lambda dsn: conn)
+    return maintenance.refresh_bot_tables("postgresql://test", **kwargs)
+
+
+def test_refresh_mode():
+    today = (date(2026, 10, 18), WATERMARK, True)
+    assert maintenance._refresh_mode(today, "timestamp_ultima_actualizacion", False) == "incremental"
+    assert maintenance._refresh_mode(today, "timestamp_ultima_actualizacion", True) == "full"
+    assert maintenance._refresh_mode(today, None, False) == "full"
+    assert maintenance._refresh_mode((date(2026, 10, 17), WATERMARK, False), "updated_at", False) == "full"
+    assert maintenance._refresh_mode((None, None, None), "updated_at", False) == "full"
+    assert maintenance._change_column({"fecha", "timestamp_creacion"}) is None
+
+
+def test_incremental_refresh_upserts_changed_skus_in_one_transaction(monkeypatch):
+    conn = _Conn(state=(date(2026, 10, 18), WATERMARK, True))
+    result = _refresh(monkeypatch, conn)
+
+    assert result["success"] and result["mode"] == "incremental" and result["changed_skus"] == 3
+    assert conn.commits == 1
+    sqls = [sql for sql, _ in conn.statements]
+    assert not any("TRUNCATE" in sql for sql in sqls)
+
+    changed = next((sql, params) for sql, params in conn.statements if "CREATE TEMP TABLE _bot_changed" in sql)
+    assert "timestamp_ultima_actualizacion > %s" in changed[0]
+    assert changed[1] == (WATERMARK, maintenance.OVERLAP_SECONDS)
+
+    assert any("ON CONFLICT (internal_sku) DO UPDATE" in sql for sql in sqls)
+    assert any("ON CONFLICT (internal_sku, retailer) DO UPDATE" in sql for sql in sqls)
+    deletes = [sql for sql in sqls if sql.startswith("DELETE")]
+    assert len(deletes) == 2 and all("USING _bot_changed c" in sql for sql in deletes)
+
+    update = conn.statements[-1]
+    assert "UPDATE bot.refresh_state" in update[0] and update[1][2:4] == ("incremental", 3)
+
+
+def test_full_refresh_without_change_column(monkeypatch):
+    conn = _Conn(state=(date(2026, 10, 18), WATERMARK, True), columns=MASTER_COLUMNS[:-1])
+    result = _refresh(monkeypatch, conn)
+
+    assert result["mode"] == "full"
+    changed = next(sql for sql, _ in conn.statements if "CREATE TEMP TABLE _bot_changed" in sql)
+    assert "NULL::timestamp" in changed and "> %s" not in changed
+    deletes = [sql for sql, _ in conn.statements if sql.startswith("DELETE")]
+    assert len(deletes) == 2 and not any("USING" in sql for sql in deletes)
+
+
+class _DuckCursor:
+    """Traduce el SQL de PostgreSQL del refresco a DuckDB (fecha fija = 2026-10-18)"""
+
+    rowcount = -1
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, sql, params=None):
+        sql = sql.replace("FOR UPDATE", "").replace("ON COMMIT DROP", "")
+        sql = sql.replace("make_interval(secs => %s)", "to_seconds(%s)")
+        if "ALTER TABLE _bot_changed" in sql or sql.strip().startswith("ANALYZE"):
+            return
+        temp = re.search(r"CREATE TEMP TABLE (\w+)", sql)
+        if temp:
+            self.db.execute(f"DROP TABLE IF EXISTS {temp.group(1)}")
+        sql = sql.replace("table_schema='public'", "table_schema='main'").replace("%s", "?")
+        sql = sql.replace("CURRENT_DATE", "DATE '2026-10-18'").replace("NOW()", "now()::timestamp")
+        self.db.execute(sql, params or [])
+        if sql.lstrip().startswith(("INSERT", "DELETE")):
+            self.rowcount = self.db.fetchone()[0]
+
+    def fetchone(self):
+        return self.db.fetchone()
+
+    def fetchall(self):
+        return self.db.fetchall()
+
+    def close(self):
+        pass
+
+
+class _DuckConn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return _DuckCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_incremental_refresh_matches_full_rebuild(monkeypatch):
+    duckdb = pytest.importorskip("duckdb")
+    db = duckdb.connect()
+    db.execute("""
+        CREATE TABLE master_precios (codigo_interno VARCHAR, fecha DATE, retailer VARCHAR, precio_oferta INTEGER,
+                                     precio_normal INTEGER, timestamp_ultima_actualizacion TIMESTAMP,
+                                     PRIMARY KEY (codigo_interno, retailer, fecha))
+    """)
+    # SKU de ayer que quedó en la tabla: el primer refresco (full) lo borra
+    db.execute("""
+        INSERT INTO master_precios VALUES
+        ('OLD', DATE '2026-10-17', 'a', 100, 0, TIMESTAMP '2026-10-17 10:00'),
+        ('OLD', DATE '2026-10-17', 'b', 200, 0, TIMESTAMP '2026-10-17 10:00')
+    """)
+    monkeypatch.setattr(maintenance.psycopg2, "connect", lambda dsn: _DuckConn(db))
+
+    rng = random.Random(3)
+    clock = [datetime(2026, 10, 18, 8, 0)]
+
+    def write(n):
+        for _ in range(n):
+            clock[0] += timedelta(seconds=1)
+            db.execute("INSERT OR REPLACE INTO master_precios VALUES (?, DATE '2026-10-18', ?, ?, 0, ?)",
+                       [f"S{rng.randrange(300)}", rng.choice("abc"), rng.randrange(1, 1000) * 100, clock[0]])
+
+    def snapshot():
+        spread = db.execute("""
+            SELECT internal_sku, min_price, max_price, spread_pct, retailer_count FROM bot.current_spread ORDER BY 1
+        """).fetchall()
+        delta = db.execute("""
+            SELECT internal_sku, retailer, min_24h, max_24h, delta_abs, delta_pct FROM bot.intraday_delta ORDER BY 1, 2
+        """).fetchall()
+        return spread, delta
+
+    write(400)
+    assert maintenance.refresh_bot_tables("duckdb")["mode"] == "full"
+    for _ in range(5):
+        write(rng.randrange(1, 60))
+        result = maintenance.refresh_bot_tables("duckdb")
+        incremental = snapshot()
+        assert result["mode"] == "incremental" and 0 < result["changed_skus"] < 300
+
+        assert maintenance.refresh_bot_tables("duckdb", full=True)["mode"] == "full"
+        assert snapshot() == incremental
+    assert "OLD" not in {row[0] for row in incremental[0]} and len(incremental[0]) > 100
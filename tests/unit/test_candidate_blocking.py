@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.candidate_blocking import CandidateBlocker, capacity_token, normalize_category
+
+
+def _product(codigo, retailer, marca, categoria, nombre, precio, **extra):
+    return {"codigo_interno": codigo, "retailer": retailer, "marca": marca, "categoria": categoria,
+            "nombre": nombre, "precio_oferta": precio, **extra}
+
+
+def test_blocks_by_brand_category_capacity_and_price_band():
+    products = [
+        _product("R1", "ripley", "Samsung", "Celulares", "Galaxy S23 256GB", 500_000),
+        _product("P1", "paris", "SAMSUNG", "Smartphones", "Samsung Galaxy S23 256 GB", 550_000),
+        _product("P2", "paris", "Samsung", "Smartphones", "Galaxy S23 128GB", 450_000),
+        _product("F1", "falabella", "", "smartphones", "Galaxy S23", None),        # comodín marca/capacidad/precio
+        _product("F2", "falabella", "Samsung", "smartphones", "Funda Galaxy", 5_000),  # ratio de precio excesivo
+        _product("R2", "ripley", "Apple", "Smartphones", "iPhone 15 256GB", 900_000),
+        _product("P3", "paris", "Samsung", "Tablets", "Galaxy Tab", 300_000, storage="256GB"),
+    ]
+    blocker = CandidateBlocker(max_price_ratio=5.0)
+
+    pairs = blocker.candidate_pairs(products)
+    codes = {(products[i]["codigo_interno"], products[j]["codigo_interno"]) for i, j in pairs}
+
+    assert codes == {("R1", "P1"), ("R1", "F1"), ("P1", "F1"), ("P2", "F1"), ("F1", "R2")}
+    assert all(i < j for i, j in pairs) and len(pairs) == len(set(pairs))
+    assert blocker.last_stats["brute_force_pairs"] == 16
+    assert capacity_token({"nombre": "Notebook 16GB RAM 1TB SSD"}) == "1024gb"
+    assert normalize_category("Telefonía Celulares") == "smartphones"
+
+
+def test_category_aliases_match_whole_words():
+    assert normalize_category("Relojes Inteligentes") == "smartwatches"
+    assert normalize_category("Smart TV") == "televisores"
+    assert normalize_category("Portátiles") == "notebooks"
+    # Alias dentro de otra palabra no cuentan
+    assert normalize_category("Accesorios Automóvil") == "accesoriosautomovil"
+    assert normalize_category("Relojería") == "relojeria"
+
+
+def test_blocking_keeps_every_brute_force_pair_that_shares_a_block():
+    products = [
+        _product(f"{retailer}{n}", retailer, brand, "Notebooks", f"{brand} Book {n} 512GB", price)
+        for n, (brand, price) in enumerate([("Lenovo", 600_000), ("HP", 650_000), ("Asus", 700_000)])
+        for retailer in ("ripley", "paris", "hites")
+    ]
+    blocker = CandidateBlocker(max_price_ratio=4.0)
+    same_brand = {
+        (i, j) for i in range(len(products)) for j in range(i + 1, len(products))
+        if products[i]["retailer"] != products[j]["retailer"] and products[i]["marca"] == products[j]["marca"]
+    }
+
+    assert set(blocker.candidate_pairs(products)) == same_brand
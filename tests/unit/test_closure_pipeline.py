@@ -0,0 +1,146 @@
+import sys
+import threading
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.closure_pipeline import ClosurePipeline, ClosureStep
+from core.integrated_master_system import IntegratedMasterSystem
+
+
+def test_pipeline_runs_independent_steps_concurrently_and_skips_dependents():
+    barrier = threading.Barrier(2, timeout=5)
+    order = []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    pipeline = ClosurePipeline([
+        ClosureStep("root", lambda: order.append("root")),
+        ClosureStep("a", barrier.wait, depends_on=("root",)),
+        ClosureStep("b", barrier.wait, depends_on=("root",)),  # a y b deben correr a la vez
+        ClosureStep("broken", fail),
+        ClosureStep("after_broken", lambda: order.append("never"), depends_on=("broken",)),
+        ClosureStep("reported", lambda: False),
+    ], max_workers=4, target_seconds=60)
+
+    metrics = pipeline.run()
+
+    assert order == ["root"]
+    assert metrics["completed"] == 3 and metrics["met_target"]
+    assert sorted(metrics["failed"]) == ["broken", "reported"]
+    assert metrics["skipped"] == ["after_broken"]
+    assert pipeline.progress()["percent"] == 100.0
+
+    with pytest.raises(ValueError):
+        ClosurePipeline([ClosureStep("x", print, depends_on=("y",)), ClosureStep("y", print, depends_on=("x",))])
+
+
+@pytest.mark.asyncio
+async def test_midnight_closure_dag_persists_day_and_swaps_cache(tmp_path):
+    system = IntegratedMasterSystem(str(tmp_path))
+    prices = system.prices_manager
+    await prices.update_price("SKU1", "ripley", 1000, 900, 0)
+    await prices.update_price("SKU2", "paris", 500, 0, 0)
+    closed_cache = prices._today_cache
+
+    metrics = system.run_midnight_closure(closed_date=date.today())
+
+    assert metrics["completed"] == metrics["total"] and not metrics["failed"]
+    assert prices._today_cache is not closed_cache and len(prices._today_cache) == 0
+    assert prices._list_deltas(date.today()) == []
+    assert prices.get_price_extremes("SKU1")["precio_historico_min"] == 900
+
+    rollups = prices._db.execute(
+        "SELECT retailer, productos FROM master_precios_retailer_diario ORDER BY retailer"
+    ).fetchall()
+    assert rollups == [("paris", 1), ("ripley", 1)]
+    assert system.get_system_stats()["system"]["last_closure"] is metrics
+
+
+@pytest.mark.asyncio
+async def test_closure_concurrent_with_price_updates_persists_closed_day_once(tmp_path):
+    import asyncio
+    import time
+    from datetime import timedelta
+
+    import pandas as pd
+
+    from core.master_prices_system import MasterPricesManager
+    from core.price_wal import PriceWriteAheadLog
+
+    manager = MasterPricesManager(str(tmp_path))
+    yesterday = date.today() - timedelta(days=1)
+
+    # Cache y WAL del día que termina, con actualizaciones sin guardar
+    manager._cache_date = manager._today_cache.fecha = yesterday
+    manager._cache_loaded = True
+    manager._wal = PriceWriteAheadLog(manager._wal_dir(yesterday), fsync=False)
+    records = {f"OLD{i}": {"codigo_interno": f"OLD{i}", "retailer": "ripley", "precio_normal": 1000 + i}
+               for i in range(50)}
+    manager._log_price_records(records, None).result(timeout=5)
+    manager._apply_price_records(manager._today_cache, records, target_date=yesterday)
+
+    persisted = []
+    original_persist = manager._persist_snapshot_batch
+
+    def slow_persist(batch, target_date):
+        persisted.append((target_date, batch.num_rows))
+        time.sleep(0.2)  # ventana amplia para que el scraping escriba durante el cierre
+        original_persist(batch, target_date)
+
+    manager._persist_snapshot_batch = slow_persist
+
+    def closure():
+        closed = manager.detach_closed_day(yesterday)
+        manager.persist_closed_day(yesterday, closed)
+
+    closure_task = asyncio.create_task(asyncio.to_thread(closure))
+    while manager._cache_date != date.today():
+        await asyncio.sleep(0.005)
+    for i in range(20):
+        await manager.update_prices_batch([{"codigo_interno": f"NEW{i}", "retailer": "paris", "precio_normal": 500}])
+        await asyncio.sleep(0.01)
+    await closure_task
+
+    # Día cerrado: un solo guardado, compactado y WAL descartado
+    assert persisted == [(yesterday, 50)]
+    assert manager._list_deltas(yesterday) == []
+    assert len(pd.read_parquet(manager._daily_parquet_file(yesterday))) == 50
+    assert not manager._wal_dir(yesterday).exists()
+
+    # Día nuevo: en cache y en su propio WAL
+    assert len(manager._today_cache) == 20
+    manager._wal.flush()
+    assert sum(b.num_rows for b in PriceWriteAheadLog(manager._wal_dir(date.today())).replay()) == 20
+
+    # Compactaciones simultáneas de una fecha: una sola fusiona los deltas
+    manager._persist_snapshot_batch = original_persist
+    manager.save_daily_snapshots()
+    await manager.update_prices_batch([{"codigo_interno": "NEW0", "retailer": "paris", "precio_normal": 450}])
+    manager.save_daily_snapshots()
+    results = await asyncio.gather(*(asyncio.to_thread(manager.compact_daily_deltas) for _ in range(4)))
+    assert sorted(results) == [0, 0, 0, 2]
+
+
+def test_closure_dag_includes_bot_refresh_when_dsn_configured(tmp_path, monkeypatch):
+    from core import integrated_master_system
+
+    assert integrated_master_system.BOT_REFRESH_AVAILABLE
+    system = IntegratedMasterSystem(str(tmp_path))
+
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("PG_DSN", raising=False)
+    assert "bot_refresh" not in system._build_closure_pipeline(date.today()).steps
+
+    calls = []
+    monkeypatch.setenv("DATABASE_URL", "postgresql://bot@localhost/precios")
+    monkeypatch.setattr(integrated_master_system, "refresh_bot_tables", lambda dsn: calls.append(dsn))
+    pipeline = system._build_closure_pipeline(date.today())
+    assert pipeline.steps["bot_refresh"].depends_on == ("snapshot_persist",)
+
+    metrics = system.run_midnight_closure(closed_date=date.today())
+    assert not metrics["failed"] and calls == ["postgresql://bot@localhost/precios"]
@@ -0,0 +1,89 @@
+import threading
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.connection_manager import ConnectionManager, get_duckdb_connection
+
+
+def test_single_writer_and_cursor_per_thread(tmp_path):
+    manager = ConnectionManager.get_instance()
+    db_path = tmp_path / "warehouse.duckdb"
+    db = manager.duckdb(db_path)
+    assert manager.duckdb(str(db_path)) is db
+
+    with db.transaction() as writer:
+        writer.execute("CREATE TABLE t (a INTEGER, b VARCHAR)")
+        writer.execute("INSERT INTO t VALUES (1, 'x'), (2, 'y')")
+
+    with pytest.raises(RuntimeError):
+        with db.transaction() as writer:
+            writer.execute("INSERT INTO t VALUES (3, 'z')")
+            raise RuntimeError("fallo")
+
+    db.register_statement("b_por_a", "SELECT b FROM t WHERE a = ?")
+    assert get_duckdb_connection(db_path) is db.cursor()
+    assert db.run("b_por_a", [2]).fetchone() == ("y",)
+
+    seen = {}
+
+    def reader():
+        seen["cursor"] = db.cursor()
+        seen["count"] = db.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    thread.join()
+
+    assert seen["cursor"] is not db.cursor()
+    assert seen["count"] == 2
+    manager.close_duckdb(db_path)
+
+
+def test_health_check_reopens_closed_connection(tmp_path):
+    manager = ConnectionManager.get_instance()
+    db_path = tmp_path / "health.duckdb"
+    db = manager.duckdb(db_path)
+    db.write("CREATE TABLE t AS SELECT 1 AS a")
+    old_cursor = db.cursor()
+
+    db.writer.close()
+
+    assert db.health_check() is True
+    assert db.stats["reconnects"] == 1
+    assert db.cursor() is not old_cursor
+    assert db.execute("SELECT a FROM t").fetchone() == (1,)
+    manager.close_duckdb(db_path)
+
+
+def test_setup_runs_once_and_later_init_statements_are_merged(tmp_path):
+    manager = ConnectionManager.get_instance()
+    db_path = tmp_path / "init.duckdb"
+    # Si el setup corriera por cursor, el CREATE fallaría en el segundo
+    db = manager.duckdb(db_path, setup_statements=["CREATE TABLE setup_marker AS SELECT 1 AS a"],
+                        init_statements=[f"SET home_directory='{tmp_path / 'a'}'"])
+    cursor = db.cursor()
+    setting = "SELECT current_setting('home_directory')"
+    assert cursor.execute(setting).fetchone() == (str(tmp_path / "a"),)
+
+    again = manager.duckdb(db_path, setup_statements=["CREATE TABLE setup_marker AS SELECT 1 AS a"],
+                           init_statements=[f"SET home_directory='{tmp_path / 'b'}'"])
+    assert again is db
+    assert db.cursor() is cursor and cursor.execute(setting).fetchone() == (str(tmp_path / "b"),)
+
+    seen = {}
+
+    def reader():
+        seen["home"] = db.execute(setting).fetchone()[0]
+        seen["marker"] = db.execute("SELECT a FROM setup_marker").fetchone()[0]
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    thread.join()
+
+    assert seen == {"home": str(tmp_path / "b"), "marker": 1}
+    assert db.setup_statements == ["CREATE TABLE setup_marker AS SELECT 1 AS a"]
+    manager.close_duckdb(db_path)
@@ -0,0 +1,65 @@
+import asyncio
+import importlib.util
+import sys
+import types
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parents[2] / "portable_orchestrator_v5" / "core"
+
+# Paquete mínimo para el import relativo (.emoji_support) sin ejecutar core/__init__.py
+_package = types.ModuleType("cache_core_v5")
+_package.__path__ = [str(CORE_DIR)]
+sys.modules.setdefault("cache_core_v5", _package)
+spec = importlib.util.spec_from_file_location("cache_core_v5.intelligent_cache_manager",
+                                              CORE_DIR / "intelligent_cache_manager.py")
+cache_manager = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(cache_manager)
+
+
+class _Pipeline:
+    def __init__(self, client):
+        self.client, self.commands = client, []
+
+    def __getattr__(self, command):
+        return lambda *args: self.commands.append((command, *args))
+
+    async def execute(self):
+        self.client.executes.append(self.commands)
+        return [True] * len(self.commands)
+
+
+class _Redis:
+    def __init__(self):
+        self.executes = []
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+
+def _manager(monkeypatch):
+    monkeypatch.setattr(cache_manager.time, "time", lambda: 1_000.0)
+    manager = cache_manager.IntelligentCacheManager()
+    manager.redis_client = _Redis()
+    return manager
+
+
+def _commands(redis):
+    return [command for batch in redis.executes for command in batch]
+
+
+def test_set_many_writes_same_levels_as_set_in_one_round_trip(monkeypatch):
+    items = [("match:v5:A", {"score": 0.9}, 60), ("match:v5:B", {"score": 0.8}, None)]
+    tags = ["analytics"]
+
+    single = _manager(monkeypatch)
+    for key, data, ttl in items:
+        assert asyncio.run(single.set(key, data, ttl=ttl, volatility_score=0.4, tags=tags))
+
+    batched = _manager(monkeypatch)
+    assert asyncio.run(batched.set_many(items, volatility_score=0.4, tags=tags)) == 2
+
+    assert len(batched.redis_client.executes) == 1
+    assert _commands(batched.redis_client) == _commands(single.redis_client)
+    assert {command[0] for command in _commands(batched.redis_client)} == {"setex", "lpush", "ltrim", "expire"}
+    assert list(batched.l1_cache) == list(single.l1_cache) == ["match:v5:A", "match:v5:B"]
+    assert batched.access_patterns == single.access_patterns == {"match:v5:A": [1_000.0], "match:v5:B": [1_000.0]}
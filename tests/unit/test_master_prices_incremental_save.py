@@ -0,0 +1,125 @@
+import pytest
+from datetime import date, timedelta
+import sys
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.master_prices_system import MasterPricesManager
+
+
+@pytest.mark.asyncio
+async def test_save_writes_only_dirty_snapshots_as_deltas(tmp_path):
+    manager = MasterPricesManager(str(tmp_path))
+    for i in range(5):
+        await manager.update_price(f"SKU{i}", "ripley", 1000 + i, 900, 0)
+    manager.save_daily_snapshots()
+
+    await manager.update_price("SKU1", "ripley", 1000, 800, 0)
+    manager.save_daily_snapshots()
+    manager.save_daily_snapshots()  # Sin cambios: no escribe delta
+
+    deltas = manager._list_deltas(date.today())
+    assert [len(pd.read_parquet(d)) for d in deltas] == [5, 1]
+
+    conn = duckdb.connect(str(manager.duckdb_path))
+    rows = dict(conn.execute("SELECT codigo_interno, precio_min_dia FROM master_precios").fetchall())
+    conn.close()
+    assert rows == {"SKU0": 900, "SKU1": 800, "SKU2": 900, "SKU3": 900, "SKU4": 900}
+
+    reloaded = MasterPricesManager(str(tmp_path))
+    assert reloaded.get_snapshot_today("SKU1").precio_oferta == 800
+
+
+@pytest.mark.asyncio
+async def test_compaction_folds_deltas_into_daily_file(tmp_path):
+    manager = MasterPricesManager(str(tmp_path))
+    await manager.update_price("SKU1", "paris", 1000, 900, 0)
+    manager.save_daily_snapshots()
+    await manager.update_price("SKU1", "paris", 1000, 850, 0)
+    manager.save_daily_snapshots(compact=True)
+
+    assert manager._list_deltas(date.today()) == []
+    df = pd.read_parquet(manager._daily_parquet_file(date.today()))
+    assert df["precio_oferta"].tolist() == [850]
+
+
+def _write_yesterday(manager, prices):
+    yesterday = date.today() - timedelta(days=1)
+    yesterday_file = manager._daily_parquet_file(yesterday)
+    yesterday_file.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({
+        "codigo_interno": list(prices),
+        "fecha": yesterday.isoformat(),
+        "precio_min_dia": list(prices.values()),
+    }).to_parquet(yesterday_file)
+
+
+@pytest.mark.asyncio
+async def test_update_prices_batch_matches_per_sku_path(tmp_path):
+    records = [
+        {"codigo_interno": "SKU1", "retailer": "ripley", "precio_normal": 1000, "precio_oferta": 700},
+        {"codigo_interno": "SKU2", "retailer": "paris", "precio_normal": 1000, "precio_oferta": 990},
+        {"codigo_interno": "SKU3", "retailer": "ripley", "precio_normal": 500},
+    ]
+    batch_manager = MasterPricesManager(str(tmp_path / "batch"))
+    single_manager = MasterPricesManager(str(tmp_path / "single"))
+    for manager in (batch_manager, single_manager):
+        _write_yesterday(manager, {"SKU1": 1000, "SKU2": 1000})
+
+    updated, batch_alerts = await batch_manager.update_prices_batch(records)
+    single_alerts = []
+    for record in records:
+        _, alerts = await single_manager.update_price(**record)
+        single_alerts.extend(alerts)
+
+    assert sorted(updated) == ["SKU1", "SKU2", "SKU3"]
+    assert batch_manager.get_snapshot_today("SKU1").precio_anterior_dia == 1000
+    assert batch_manager.get_snapshot_today("SKU3").precio_anterior_dia == 0
+    assert "SKU1" in {a["codigo_interno"] for a in batch_alerts}
+    assert batch_alerts == single_alerts
+
+    updated, alerts = await batch_manager.update_prices_batch(records[1:2])
+    assert updated == [] and alerts == []
+
+
+@pytest.mark.asyncio
+async def test_closure_updates_price_extremes_and_flags_only_closed_day(tmp_path):
+    manager = MasterPricesManager(str(tmp_path))
+    manager._ensure_table_exists()
+    day1, day2, day3 = (date.today() - timedelta(days=n) for n in (3, 2, 1))
+    rows = [("SKU1", day1, 1000), ("SKU2", day1, 500),
+            ("SKU1", day2, 900), ("SKU2", day2, 600),
+            ("SKU1", day3, 900), ("SKU2", day3, 550)]
+    with manager._db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO master_precios (codigo_interno, fecha, retailer, precio_min_dia) VALUES (?, ?, 'ripley', ?)",
+            [(sku, d.isoformat(), precio) for sku, d, precio in rows]
+        )
+
+    await manager._update_historical_flags(day2)
+    await manager._update_historical_flags(day3)
+    await manager._update_historical_flags(day3)  # Re-cierre idempotente
+
+    flags = {
+        (sku, fecha): (es_min, es_max)
+        for sku, fecha, es_min, es_max in manager._db.execute(
+            "SELECT codigo_interno, fecha, es_precio_historico_min, es_precio_historico_max FROM master_precios"
+        ).fetchall()
+    }
+    assert flags[("SKU1", day1)] == (False, False)
+    assert flags[("SKU1", day2)] == (True, False)
+    assert flags[("SKU1", day3)] == (True, False)
+    assert flags[("SKU2", day2)] == (False, True)
+    assert flags[("SKU2", day3)] == (False, False)
+
+    assert manager.get_price_extremes("SKU1") == {
+        "precio_historico_min": 900, "fecha_historico_min": day2,
+        "precio_historico_max": 1000, "fecha_historico_max": day1,
+        "ultima_fecha": day3,
+    }
+    assert manager.get_price_extremes("SKU2")["precio_historico_min"] == 500
+    assert manager.get_price_extremes("NO-EXISTE") == {}
@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.master_products_system import MasterProductsManager
+
+
+def _scraping(i, nombre=None):
+    return {
+        "link": f"https://ripley.cl/p/{i}",
+        "nombre": nombre or f"Producto {i}",
+        "retailer": "ripley",
+        "categoria": "smartphones",
+        "marca": "SAMSUNG",
+    }
+
+
+def test_save_writes_only_touched_products_and_compacts(tmp_path):
+    manager = MasterProductsManager(str(tmp_path))
+    for i in range(5):
+        manager.upsert_product(_scraping(i))
+    manager.save_to_storage()
+
+    manager.upsert_product(_scraping(2, nombre="Renombrado"))
+    manager.save_to_storage()
+    manager.save_to_storage()  # Sin cambios: no escribe delta
+
+    deltas = manager._list_deltas()
+    assert [len(pd.read_parquet(d)) for d in deltas] == [5, 1]
+
+    reloaded = MasterProductsManager(str(tmp_path))
+    assert reloaded.get_product_by_link("https://ripley.cl/p/2").nombre == "Renombrado"
+    assert len(reloaded.get_products_by_retailer("ripley")) == 5
+
+    reloaded.mark_products_as_inactive(["https://ripley.cl/p/0"])
+    reloaded.delta_compaction_threshold = 3
+    reloaded.upsert_product(_scraping(9))
+    reloaded.save_to_storage()
+    reloaded.wait_for_compaction()
+
+    assert reloaded._list_deltas() == []
+    base = pd.read_parquet(reloaded.parquet_path).set_index("link")
+    assert len(base) == 6
+    assert not base.loc["https://ripley.cl/p/0", "activo"]
+    assert base.loc["https://ripley.cl/p/2", "nombre"] == "Renombrado"
+
+    fresh = MasterProductsManager(str(tmp_path))
+    assert len(fresh.get_products_by_retailer("ripley")) == 5
+
+
+def test_lazy_load_matches_saved_products(tmp_path):
+    manager = MasterProductsManager(str(tmp_path))
+    originals = [manager.upsert_product({**_scraping(i), "rating": 4.5, "reviews_count": i})[0]
+                 for i in range(4)]
+    originals[1].badges = ["Envío gratis"]
+    manager.save_to_storage(compact=True)
+
+    reloaded = MasterProductsManager(str(tmp_path))
+    stats = reloaded.get_stats()
+    cache = reloaded._products_cache
+    assert stats["active_products"] == 4 and stats["by_retailer"] == {"ripley": 4}
+    assert cache.materialized == 0
+
+    product = reloaded.get_product_by_codigo(originals[3].codigo_interno)
+    assert cache.materialized == 1
+    assert product.to_dict() == originals[3].to_dict()
+    assert product.reviews_count == 3 and type(product.reviews_count) is int
+    assert product.ultimo_visto == originals[3].ultimo_visto
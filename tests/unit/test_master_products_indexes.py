@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.master_products_system import MasterProductsManager
+
+
+def _scraping(i, retailer, categoria="smartphones", marca="SAMSUNG"):
+    return {
+        "link": f"https://{retailer}.cl/p/{i}",
+        "nombre": f"Producto {i}",
+        "retailer": retailer,
+        "categoria": categoria,
+        "marca": marca,
+    }
+
+
+def test_secondary_indexes_follow_upsert_and_inactivation(tmp_path, monkeypatch):
+    manager = MasterProductsManager(str(tmp_path))
+    monkeypatch.setattr(manager, "save_to_storage", lambda: None)
+
+    products = [
+        manager.upsert_product(_scraping(1, "ripley"))[0],
+        manager.upsert_product(_scraping(2, "ripley", categoria="tablets"))[0],
+        manager.upsert_product(_scraping(3, "paris", marca="APPLE"))[0],
+    ]
+    again, is_new = manager.upsert_product(_scraping(1, "ripley"))
+    assert again is products[0] and not is_new
+
+    for product in products:
+        assert manager.get_product_by_codigo(product.codigo_interno) is product
+        assert manager.get_product_by_code(product.codigo_interno) is product
+    assert manager.get_products_by_retailer("ripley") == products[:2]
+    assert manager.get_products_by_categoria("smartphones") == [products[0], products[2]]
+    assert manager.get_products_by_marca("APPLE") == [products[2]]
+
+    manager.mark_products_as_inactive([products[0].link])
+
+    assert manager.get_products_by_retailer("ripley") == [products[1]]
+    assert manager.get_products_by_marca("SAMSUNG") == [products[1]]
+    assert manager.get_product_by_codigo(products[0].codigo_interno) is products[0]
+    assert manager.get_stats()["by_retailer"] == {"ripley": 1, "paris": 1}
+    assert manager.get_product_by_codigo("NO-EXISTE") is None
@@ -0,0 +1,48 @@
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.match_watermarks import MatchWatermarkStore
+
+
+def _product(codigo, retailer, nombre, precio):
+    return {"codigo_interno": codigo, "retailer": retailer, "nombre": nombre, "marca": "Samsung",
+            "categoria": "smartphones", "precio_oferta": precio}
+
+
+def _match(base, match):
+    return {"codigo_base": base, "codigo_match": match, "similarity_score": 0.9}
+
+
+def test_only_new_changed_or_repriced_products_are_rescored():
+    store = MatchWatermarkStore(price_tolerance=0.2)
+    products = [_product("R1", "ripley", "Galaxy S23", 500_000), _product("P1", "paris", "Galaxy S23", 520_000),
+                _product("F1", "falabella", "Galaxy A54", 300_000)]
+    t0 = datetime(2025, 9, 3, 10)
+
+    first = store.plan(products, now=t0)
+    assert first.dirty == [True, True, True] and first.reasons["new"] == 3
+    store.commit(products, first, [_match("R1", "P1")])
+
+    # Sin cambios (precio dentro de la tolerancia): nada que puntuar y el match se reutiliza
+    products[0]["precio_oferta"] = 540_000
+    second = store.plan(products, now=t0 + timedelta(hours=1))
+    assert second.dirty_count == 0 and second.filter_pairs([(0, 1), (0, 2), (1, 2)]) == []
+    assert [(m["codigo_match"], i, j) for m, i, j in store.kept_matches(products, second)] == [("P1", 0, 1)]
+    store.commit(products, second, [])
+
+    # Renombrado + producto nuevo + precio movido > 20%
+    products[1]["nombre"] = "Galaxy S23 FE"
+    products[2]["precio_oferta"] = 200_000
+    products.append(_product("H1", "hites", "Galaxy S23", 510_000))
+    third = store.plan(products, now=t0 + timedelta(hours=2))
+    assert third.dirty == [False, True, True, True]
+    assert third.reasons == {"new": 1, "changed": 1, "repriced": 1, "expired": 0}
+    assert store.kept_matches(products, third) == []
+    store.commit(products, third, [_match("R1", "H1")])
+
+    assert store.stored_matches == 1  # R1-P1 invalidado al cambiar P1
+    fourth = store.plan(products, now=t0 + timedelta(hours=25))  # R1 no se puntúa desde t0
+    assert fourth.reasons["expired"] == 1 and fourth.dirty == [True, False, False, False]
@@ -0,0 +1,74 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "portable_orchestrator_v5" / "arbitrage_system" / "core" / "match_writer.py"
+spec = importlib.util.spec_from_file_location("match_writer_v5", MODULE_PATH)
+match_writer = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(match_writer)
+
+
+class _SlowDb:
+    def __init__(self, fail=False):
+        self.batches, self.fail, self.next_id = [], fail, 1
+
+    async def save_product_matches(self, matches):
+        await asyncio.sleep(0.05)  # latencia de BD
+        if self.fail:
+            raise ConnectionError("db down")
+        self.batches.append(len(matches))
+        ids = {}
+        for match in matches:
+            ids[(match["codigo_base"], match["codigo_match"])] = self.next_id
+            self.next_id += 1
+        return ids
+
+
+class _PipelineCache:
+    def __init__(self):
+        self.calls = []
+
+    async def set_many(self, items, tags=None):
+        self.calls.append([key for key, _, _ in items])
+        return len(items)
+
+
+def _match(i):
+    return {"codigo_base": f"A{i}", "codigo_match": f"B{i}", "similarity_score": 0.9}
+
+
+def test_matches_are_flushed_in_batches_and_ids_resolved():
+    async def scenario():
+        db, cache = _SlowDb(), _PipelineCache()
+        writer = match_writer.MatchWriter(db, cache, batch_size=4, flush_interval=10)
+        writer.start()
+
+        matches = [_match(i) for i in range(10)]
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for match in matches:
+            writer.add(match, f"match:v5:{match['codigo_base']}", 60)
+        assert loop.time() - started < 0.01  # encolar no espera a la BD
+
+        await writer.flush()
+        assert sorted(db.batches, reverse=True) == [4, 4, 2]
+        assert [m["match_id"] for m in matches] == list(range(1, 11))
+        assert sum(len(call) for call in cache.calls) == 10 and len(cache.calls) == 3
+        await writer.close()
+        return writer.stats
+
+    stats = asyncio.run(scenario())
+    assert stats["saved"] == 10 and stats["failed"] == 0 and stats["flushes"] == 3
+
+
+def test_failed_batches_are_counted_without_ids():
+    async def scenario():
+        writer = match_writer.MatchWriter(_SlowDb(fail=True), batch_size=10)
+        match = _match(0)
+        writer.add(match)
+        assert await writer.flush() == 0
+        await writer.close()
+        return writer.stats, match
+
+    stats, match = asyncio.run(scenario())
+    assert stats["failed"] == 1 and "match_id" not in match
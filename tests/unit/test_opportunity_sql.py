@@ -0,0 +1,85 @@
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import duckdb
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.opportunity_sql import build_opportunity_query, detect_opportunities_duckdb
+
+CONFIG = {"min_similarity_score": 0.85, "min_margin_clp": 5000, "min_percentage": 15.0, "max_price_age_days": 3}
+
+
+@pytest.fixture
+def conn():
+    today = date.today()
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE master_productos (codigo_interno VARCHAR, nombre VARCHAR, retailer VARCHAR)")
+    conn.execute("CREATE TABLE master_precios (codigo_interno VARCHAR, fecha DATE, precio_oferta INTEGER)")
+    conn.execute("CREATE TABLE product_matching (id INTEGER, codigo_base VARCHAR, codigo_match VARCHAR, "
+                 "similarity_score DOUBLE, match_confidence VARCHAR, is_active BOOLEAN)")
+    conn.executemany("INSERT INTO master_productos VALUES (?, ?, ?)", [
+        ("R1", "Galaxy S23 Ripley", "ripley"), ("P1", "Galaxy S23 Paris", "paris"),
+        ("F1", "iPhone 15 Falabella", "falabella"), ("H1", "iPhone 15 Hites", "hites"),
+        ("A1", "Notebook Abcdin", "abcdin"), ("R2", "Notebook Ripley", "ripley"),
+    ])
+    conn.executemany("INSERT INTO master_precios VALUES (?, ?, ?)", [
+        # Historial: solo cuenta el último precio de cada SKU
+        ("R1", today - timedelta(days=2), 300_000), ("R1", today, 500_000),
+        ("P1", today, 400_000),
+        ("F1", today, 900_000), ("H1", today - timedelta(days=1), 1_200_000),
+        # Precio vencido (fuera de max_price_age_days): el match no se evalúa
+        ("A1", today - timedelta(days=10), 100_000), ("R2", today, 300_000),
+    ])
+    conn.executemany("INSERT INTO product_matching VALUES (?, ?, ?, ?, ?, ?)", [
+        (1, "R1", "P1", 0.95, "high", True),
+        (2, "H1", "F1", 0.90, "medium", True),
+        (3, "A1", "R2", 0.99, "high", True),
+        (4, "F1", "H1", 0.80, "high", True),  # bajo similitud mínima
+    ])
+    yield conn
+    conn.close()
+
+
+def test_latest_prices_metrics_and_ranking(conn):
+    opportunities = detect_opportunities_duckdb(conn, CONFIG, limit=10)
+
+    assert [o["matching_id"] for o in opportunities] == [2, 1]
+    top, second = opportunities
+
+    # Orientación barato/caro con el último precio (no el histórico de R1 a 300k)
+    assert (top["producto_barato_codigo"], top["retailer_compra"], top["precio_compra"]) == ("F1", "falabella", 900_000)
+    assert (top["producto_caro_codigo"], top["retailer_venta"], top["precio_venta"]) == ("H1", "hites", 1_200_000)
+    assert (second["producto_barato_codigo"], second["precio_compra"], second["precio_venta"]) == ("P1", 400_000, 500_000)
+
+    # Mismas fórmulas que el cálculo previo en Python
+    assert second["margen_bruto"] == 100_000 and second["diferencia_porcentaje"] == pytest.approx(25.0)
+    assert second["roi_estimado"] == pytest.approx((100_000 - int(400_000 * 0.08)) / 400_000 * 100)
+    assert second["opportunity_score"] == pytest.approx(0.5 + 0.5 * (0.25 * 0.4 + 0.95 * 0.3 + 1.0 * 0.3))
+    assert second["risk_level"] == "medium"  # high con ROI 17% ≤ 30 → rama ROI > 10
+    assert second["metadata"]["nombre_barato"] == "Galaxy S23 Paris"
+
+    assert detect_opportunities_duckdb(conn, {**CONFIG, "min_percentage": 30.0}) == [top]
+    assert [o["matching_id"] for o in detect_opportunities_duckdb(conn, CONFIG, limit=1)] == [2]
+
+
+def test_query_builder_paramstyles_and_table_whitelist():
+    assert build_opportunity_query(paramstyle="pyformat").count("%s") == 5
+    assert "$5" in build_opportunity_query("product_matching_v5") and "product_matching_v5 pm" in \
+        build_opportunity_query("product_matching_v5")
+    with pytest.raises(ValueError):
+        build_opportunity_query("product_matching; DROP TABLE x")
+
+
+def test_v5_matching_table(conn):
+    # Columnas relevantes de schema_v5.sql (similarity_score DECIMAL, no DOUBLE)
+    conn.execute("CREATE TABLE product_matching_v5 (id INTEGER, codigo_base VARCHAR(50), codigo_match VARCHAR(50), "
+                 "similarity_score DECIMAL(5,4), match_confidence VARCHAR(30), is_active BOOLEAN)")
+    conn.execute("INSERT INTO product_matching_v5 SELECT * FROM product_matching")
+
+    v5 = detect_opportunities_duckdb(conn, CONFIG, matching_table="product_matching_v5")
+
+    assert v5 == detect_opportunities_duckdb(conn, CONFIG)
+    assert v5[1]["metadata"]["similarity_score"] == pytest.approx(0.95)
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.master_prices_system import MasterPricesManager
+from core.price_history import PRICE_ROW_GROUP_SIZE
+
+
+def _day_frame(d, prices):
+    return pd.DataFrame({
+        "codigo_interno": list(prices),
+        "fecha": d.isoformat(),
+        "retailer": "ripley",
+        "precio_min_dia": list(prices.values()),
+        "cambios_en_dia": 1,
+        "cambio_porcentaje": -5.0,
+    })
+
+
+@pytest.mark.asyncio
+async def test_history_reads_partitions_with_deltas(tmp_path):
+    manager = MasterPricesManager(str(tmp_path))
+    today = date.today()
+    old = today - timedelta(days=60)
+    for d, prices in ((old, {"SKU1": 1}), (today - timedelta(days=2), {"SKU2": 700, "SKU1": 1000})):
+        path = manager._daily_parquet_file(d)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _day_frame(d, prices).to_parquet(path)
+        manager.compact_daily_deltas(d)  # Sin deltas: no reescribe
+
+    await manager.update_price("SKU1", "ripley", 1000, 900, 0)
+    manager.save_daily_snapshots()
+    await manager.update_price("SKU1", "ripley", 1000, 850, 0)
+    manager.save_daily_snapshots()
+
+    evolution = manager.get_daily_price_evolution("SKU1", days_back=7)
+    assert [(e["fecha"], e["precio_min_dia"]) for e in evolution] == [
+        (today, 850), (today - timedelta(days=2), 1000)
+    ]
+    stats = manager.get_historical_price_stats("SKU1")
+    assert stats["precio_historico_min"] == 850 and stats["dias_con_datos"] == 2
+
+    table = manager.get_price_history_batch(["SKU2", "SKU1", "SKU9"], days_back=7)
+    assert table.column("codigo_interno").to_pylist() == ["SKU1", "SKU1", "SKU2"]
+    assert manager.get_price_history_batch(["SKU2", "SKU1", "SKU9"], days_back=7) is table
+    assert manager.history.stats["cache_hits"] == 1
+
+    manager.save_daily_snapshots(compact=True)
+    compacted = pq.ParquetFile(manager._daily_parquet_file(today))
+    assert compacted.metadata.row_group(0).num_rows <= PRICE_ROW_GROUP_SIZE
+    assert manager.get_price_history_batch(["SKU2", "SKU1", "SKU9"], days_back=7) is not table
+    assert manager.get_historical_price_stats("NO-EXISTE")["dias_con_datos"] == 0
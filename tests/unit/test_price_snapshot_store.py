@@ -0,0 +1,63 @@
+from datetime import date
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.master_prices_system import DailyPriceSnapshot, PriceSnapshotView
+from core.price_snapshot_store import PriceSnapshotStore
+
+
+def _store_with(snapshots):
+    store = PriceSnapshotStore(date.today(), view_class=PriceSnapshotView)
+    for snapshot in snapshots:
+        store[snapshot.codigo_interno] = snapshot
+    return store
+
+
+def test_batch_update_matches_per_snapshot_semantics():
+    originals = [
+        DailyPriceSnapshot(codigo_interno=f"SKU{i}", retailer="ripley",
+                           precio_normal=1000, precio_oferta=900, precio_tarjeta=0)
+        for i in range(4)
+    ]
+    store = _store_with(originals)
+    updates = [(1000, 900, 0), (1000, 700, 650), (None, 800, None), (1200, 900, 0)]
+
+    changed = store.update_prices(
+        [s.codigo_interno for s in originals],
+        precio_normal=[u[0] for u in updates],
+        precio_oferta=[u[1] for u in updates],
+        precio_tarjeta=[u[2] for u in updates],
+    )
+
+    for snapshot, update in zip(originals, updates):
+        snapshot.update_prices(*update)
+
+    assert changed.tolist() == [False, True, True, True]
+    for snapshot in originals:
+        view = store[snapshot.codigo_interno]
+        for attr in ("precio_normal", "precio_oferta", "precio_tarjeta", "precio_min_dia",
+                     "cambios_en_dia", "volatilidad_dia"):
+            assert getattr(view, attr) == getattr(snapshot, attr), attr
+
+
+def test_view_api_and_frame_roundtrip():
+    store = _store_with([
+        DailyPriceSnapshot(codigo_interno="SKU1", retailer="paris", precio_normal=1000,
+                           precio_oferta=800, precio_anterior_dia=1000),
+    ])
+    view = store["SKU1"]
+    view.tipos_alertas.append("price_drop")
+    view.alertas_enviadas += 1
+
+    assert view.cambio_porcentaje == -20.0
+    assert view.to_dict()["tipos_alertas"] == '["price_drop"]'
+
+    reloaded = PriceSnapshotStore.from_frame(store.to_frame(), date.today(), view_class=PriceSnapshotView)
+    again = reloaded.get("SKU1")
+    assert again.retailer == "paris"
+    assert again.precio_min_dia == 800
+    assert again.alertas_enviadas == 1
+    assert again.tipos_alertas == ["price_drop"]
+    assert not again.dirty
@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.master_prices_system import MasterPricesManager
+from core.price_wal import PriceWriteAheadLog
+
+
+@pytest.mark.asyncio
+async def test_wal_replay_rebuilds_unsaved_day_and_truncates_on_save(tmp_path):
+    manager = MasterPricesManager(str(tmp_path))
+    await manager.update_price("SKU1", "ripley", 1000, 900, 0)
+    await manager.update_prices_batch([
+        {"codigo_interno": "SKU1", "retailer": "ripley", "precio_oferta": 850},
+        {"codigo_interno": "SKU2", "retailer": "paris", "precio_normal": 500, "precio_oferta": 0},
+    ])
+    await manager.update_price("SKU1", "ripley", 1000, 800, 0)
+    expected = manager._today_cache.to_frame().set_index("codigo_interno")
+
+    # Caída sin save_daily_snapshots: segmento con un registro a medio escribir
+    segment = manager._wal.segments()[-1]
+    with open(segment, "ab") as f:
+        f.write(b"\xff\xff\xff\xff\x10\x00")
+
+    recovered = MasterPricesManager(str(tmp_path))
+    snapshot = recovered.get_snapshot_today("SKU1")
+    assert len(recovered._today_cache) == 2
+    assert (snapshot.precio_oferta, snapshot.cambios_en_dia) == (800, 2)
+    assert snapshot.volatilidad_dia == expected.loc["SKU1", "volatilidad_dia"]
+    assert recovered.get_snapshot_today("SKU2").precio_min_dia == 500
+
+    recovered.save_daily_snapshots()
+    assert recovered._wal.segments() == []
+
+    # Tras el guardado el WAL no se vuelve a aplicar (sin doble conteo)
+    await recovered.update_price("SKU2", "paris", 450, 0, 0)
+    recovered._wal.flush()
+    reloaded = MasterPricesManager(str(tmp_path))
+    assert reloaded.get_snapshot_today("SKU1").cambios_en_dia == 2
+    assert reloaded.get_snapshot_today("SKU2").precio_normal == 450
+
+
+def test_checkpoint_keeps_records_appended_after_rotate(tmp_path):
+    wal = PriceWriteAheadLog(tmp_path / "20261018", fsync=False, commit_delay=0.05)
+    wal.append(["SKU1"], ["ripley"], [1000], [900], [None])
+    sealed = wal.rotate()  # estado guardado cubre SKU1
+
+    # Encolado y aún no escrito cuando llega el checkpoint
+    pending = wal.append(["SKU2"], ["paris"], [500], [None], [None])
+    wal.checkpoint(sealed)
+    pending.result(timeout=5)
+    wal.close()
+
+    replayed = [r["codigo_interno"] for batch in PriceWriteAheadLog(tmp_path / "20261018").replay()
+                for r in batch.to_pylist()]
+    assert replayed == ["SKU2"]
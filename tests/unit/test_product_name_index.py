@@ -0,0 +1,120 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from core.product_name_index import ProductNameIndex
+
+
+def _product(codigo, retailer, nombre):
+    return {"codigo_interno": codigo, "retailer": retailer, "nombre": nombre}
+
+
+PRODUCTS = [
+    _product("R1", "ripley", "Samsung Galaxy S23 256GB Negro"),
+    _product("R2", "ripley", "Samsung Galaxy S23 Ultra 512GB"),
+    _product("P1", "paris", "Celular Samsung Galaxy S23 256 GB"),
+    _product("P2", "paris", "Notebook Lenovo IdeaPad 3 15\""),
+    _product("F1", "falabella", "Smartphone Galaxy S23 Ultra 512GB Samsung"),
+    _product("F2", "falabella", "Lenovo IdeaPad 3 Notebook 15 pulgadas"),
+]
+
+
+def test_top_k_only_returns_other_retailers_ranked_by_similarity():
+    index = ProductNameIndex()
+    assert index.add(PRODUCTS) == 6
+    assert index.add(PRODUCTS[:2]) == 0  # sin cambios: no se re-indexa
+
+    neighbours = index.most_similar("R1", k=2)
+    assert [codigo for codigo, _, _ in neighbours] == ["P1", "F1"]
+    assert all(retailer != "ripley" for _, retailer, _ in neighbours)
+    assert neighbours[0][2] > neighbours[1][2] > 0
+
+    assert index.most_similar("F2", k=1)[0][0] == "P2"
+    assert index.query(["galaxy s23 ultra"], [None], k=2)[0][0][0] in {"R2", "F1"}
+    assert index.most_similar("NO-EXISTE") == []
+
+
+def test_incremental_updates_survive_save_and_load(tmp_path):
+    index = ProductNameIndex()
+    index.add(PRODUCTS)
+    index.add([_product("P2", "paris", "Samsung Galaxy S23 Ultra 512GB Verde"),
+               _product("H1", "hites", "Lenovo IdeaPad 3 15 Notebook")])
+    index.remove(["F2"])
+    index.save(str(tmp_path / "name_index"))
+
+    loaded = ProductNameIndex.load_or_create(str(tmp_path / "name_index"))
+
+    assert len(loaded) == len(index) == 6 and "F2" not in loaded
+    assert loaded.stats()["dead_rows"] == 0
+    assert loaded.most_similar("R2", k=3) == index.most_similar("R2", k=3)
+    assert loaded.most_similar("H1", k=1) == []  # P2 renombrado y F2 eliminado
+    assert len(ProductNameIndex.load_or_create(str(tmp_path / "vacio"))) == 0
+
+
+def test_retain_drops_products_missing_from_catalog():
+    index = ProductNameIndex()
+    index.add(PRODUCTS)
+    assert index.retain(["R1", "P1", "F1", "F2"]) == 2
+    assert "R2" not in index and "P2" not in index
+    assert index.most_similar("F2") == []
+
+
+def test_integration_adds_name_neighbours_to_candidates_and_saves_periodically(tmp_path, monkeypatch):
+    from arbitrage import ml_integration_sync
+    integration = ml_integration_sync.ArbitrageMLIntegration({})
+    integration.name_index = ProductNameIndex()
+    integration.name_index_path = tmp_path / "name_index"
+    integration.name_index_min_score = 0.3
+
+    # Misma oferta con categoría distinta por retailer: el blocking no la empareja
+    productos = [
+        {**_product("R1", "ripley", "Samsung Galaxy S23 256GB Negro"), "marca": "Samsung",
+         "categoria": "Telefonia", "precio_oferta": 700_000, "precio_normal": None},
+        {**_product("P1", "paris", "Celular Samsung Galaxy S23 256 GB"), "marca": "Samsung",
+         "categoria": "Smartphones", "precio_oferta": 690_000, "precio_normal": None},
+        {**_product("P2", "paris", "Notebook Lenovo IdeaPad 3 15\""), "marca": "Lenovo",
+         "categoria": "Notebooks", "precio_oferta": 400_000, "precio_normal": None},
+    ]
+    clock = [1000.0]
+    monkeypatch.setattr(ml_integration_sync.time, "monotonic", lambda: clock[0])
+    integration._name_index_saved_at = clock[0]
+
+    assert integration.update_name_index(productos, vigentes=["R1", "P1", "P2"]) == 3
+    assert (0, 1) in integration._candidate_pairs(productos)
+    assert integration.last_blocking_stats["name_index_pairs"] == 1
+    assert not (tmp_path / "name_index").exists()  # aún dentro del intervalo
+
+    clock[0] += integration.name_index_save_interval
+    assert integration.update_name_index(productos, vigentes=["R1", "P1"]) == 1
+    assert ProductNameIndex.load(str(tmp_path / "name_index")).stats()["products"] == 2
+    assert integration.save_name_index(force=True) is False  # sin cambios pendientes
+
+
+def test_integration_keeps_index_across_cycles_and_forces_save_on_shutdown(tmp_path, monkeypatch):
+    from arbitrage import ml_integration_sync
+
+    class _Conn:
+        def close(self):
+            pass
+
+    monkeypatch.setattr(ml_integration_sync.psycopg2, "connect", lambda dsn: _Conn())
+    integration = ml_integration_sync.ArbitrageMLIntegration(
+        dict.fromkeys(["host", "port", "database", "user", "password"], ""))
+    integration._load_config_from_db = lambda: None
+    integration.name_index_path = tmp_path / "name_index"
+    clock = [1000.0]
+    monkeypatch.setattr(ml_integration_sync.time, "monotonic", lambda: clock[0])
+
+    # Ciclos como BackendArbitrageEngine: connect / disconnect(shutdown=False)
+    integration.connect()
+    index = integration.name_index
+    integration.update_name_index(PRODUCTS)
+    integration.disconnect(shutdown=False)
+    integration.connect()
+
+    assert integration.name_index is index  # no se recarga desde disco
+    assert not (tmp_path / "name_index").exists()  # dentro del intervalo
+
+    integration.disconnect()
+    assert len(ProductNameIndex.load(str(tmp_path / "name_index"))) == len(PRODUCTS)
@@ -0,0 +1,87 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "portable_orchestrator_v5" / "arbitrage_system" / "core" / "profile_cache.py"
+spec = importlib.util.spec_from_file_location("profile_cache_v5", MODULE_PATH)
+profile_cache = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(profile_cache)
+
+
+class _Integrator:
+    def __init__(self):
+        self.calls = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def analyze_product_profile(self, product):
+        self.calls.append(product["codigo_interno"])
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if product["codigo_interno"] == "BAD":
+            raise ValueError("sin datos")
+        return {"codigo": product["codigo_interno"], "precio": product["precio_actual"]}
+
+
+def _product(codigo, precio):
+    return {"codigo_interno": codigo, "retailer": "ripley", "precio_actual": precio}
+
+
+def test_profiles_computed_once_per_price_version():
+    async def scenario():
+        integrator = _Integrator()
+        cache = profile_cache.ProductProfileCache(integrator.analyze_product_profile, concurrency=4)
+        products = [_product(f"P{i}", 1000 + i) for i in range(10)] + [_product("BAD", 1)]
+
+        profiles = await cache.prefetch(products + products[:3])
+        assert len(profiles) == 10 and "BAD" not in profiles
+        assert len(integrator.calls) == 11 and integrator.max_in_flight == 4
+
+        # Scoring de pares: solo lookups
+        for first in products[:10]:
+            for second in products[:10]:
+                await cache.get(first)
+                await cache.get(second)
+        assert len(integrator.calls) == 11
+
+        # Cambio de precio invalida solo ese perfil
+        products[0]["precio_actual"] = 900
+        assert (await cache.get(products[0]))["precio"] == 900
+        await cache.prefetch(products[:10])
+        assert integrator.calls.count("P0") == 2 and len(integrator.calls) == 12
+        return cache.summary()
+
+    summary = asyncio.run(scenario())
+    assert summary["invalidated"] == 1 and summary["errors"] == 1 and summary["computed"] == 11
+    assert summary["hit_rate"] == 210 / 222 and summary["avg_compute_ms"] > 0
+
+
+def test_failures_cached_per_price_version_until_next_cycle():
+    async def scenario():
+        integrator = _Integrator()
+        cache = profile_cache.ProductProfileCache(integrator.analyze_product_profile)
+        bad = _product("BAD", 1)
+
+        assert await cache.prefetch([bad, _product("P1", 10)]) != {}
+        for _ in range(5):
+            try:
+                await cache.get(bad)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("se esperaba el error guardado")
+        await cache.prefetch([bad])
+        assert integrator.calls.count("BAD") == 1 and cache.stats["failure_hits"] == 6
+
+        # Cambio de precio o nuevo ciclo: se reintenta
+        bad["precio_actual"] = 2
+        await cache.prefetch([bad])
+        assert integrator.calls.count("BAD") == 2
+        cache.start_cycle()
+        await cache.prefetch([bad])
+        assert integrator.calls.count("BAD") == 3
+        return cache.summary()
+
+    summary = asyncio.run(scenario())
+    assert summary["errors"] == 3 and summary["failed_entries"] == 1
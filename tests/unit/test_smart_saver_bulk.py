@@ -0,0 +1,293 @@
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "arbitrage"))
+
+import smart_data_saver
+from smart_data_saver import SmartArbitrageDataSaver, _STAGE_COLUMNS
+
+OPPORTUNITY = {
+    "matching_id": 42, "retailer_compra": "ripley", "retailer_venta": "falabella",
+    "precio_compra": 239_990, "precio_venta": 399_990, "margen_bruto": 160_000,
+    "diferencia_porcentaje": 66.7, "roi_estimado": 58.7, "opportunity_score": 0.85, "risk_level": "medium",
+    "metadata": {"nombre_barato": "Redmi Note 14 Pro 256GB", "nombre_caro": "Redmi Note 14 Pro 256GB",
+                 "similarity_score": 0.92},
+}
+PRODUCT = {"codigo_interno": "CL-RIP-1", "link": "https://ripley.cl/p/1", "sku": "1", "nombre": "Redmi",
+           "marca": "XIAOMI", "categoria": "smartphones", "rating": 4.5, "reviews_count": None,
+           "out_of_stock": False, "discount_percent": 10, "precio_normal": 299_990, "precio_oferta": 239_990,
+           "precio_min_dia": 239_990, "desc_pct": 20}
+
+
+class _StoreCursor:
+    """Cursor sobre una lista de oportunidades en memoria (solo las consultas del guardado fila a fila)"""
+
+    rowcount = 0
+
+    def __init__(self, conn):
+        self.conn, self.result = conn, None
+
+    def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        self.conn.statements.append(sql)
+        rows = self.conn.rows
+        if sql.startswith("SELECT * FROM arbitrage_opportunities WHERE opportunity_hash = %s"):
+            found = [row for row in rows if row.get("opportunity_hash") == params[0]]
+            self.result = found[-1] if found else None
+        elif sql.startswith("SELECT * FROM arbitrage_opportunities WHERE retailer_compra = %s"):
+            found = [row for row in rows if (row["retailer_compra"], row["retailer_venta"], row["marca_producto"])
+                     == tuple(params)]
+            self.result = found[-1] if found else None
+        elif sql.startswith("SELECT id, retailer_compra"):
+            self.result = [row for row in rows if row.get("opportunity_hash") is None]
+        elif sql.startswith("INSERT INTO arbitrage_opportunities"):
+            columns = [c.strip() for c in sql.split("(", 1)[1].split(")", 1)[0].split(",")]
+            rows.append({"id": len(rows) + 1, **dict(zip(columns, params))})
+            self.result = {"id": len(rows)}
+        elif sql.startswith("UPDATE arbitrage_opportunities SET precio_compra"):
+            row = next(row for row in rows if row["id"] == params[-1])
+            row.update(precio_compra=params[0], precio_venta=params[1])
+            row["times_detected"] += 1
+        elif sql.startswith("UPDATE arbitrage_opportunities SET times_detected"):
+            next(row for row in rows if row["id"] == params[0])["times_detected"] += 1
+        elif sql.startswith("ALTER TABLE") and self.conn.fail_migration:
+            raise RuntimeError("permission denied")
+
+    def fetchone(self):
+        return self.result
+
+    def fetchall(self):
+        return self.result
+
+
+class _StoreConn:
+    def __init__(self, rows=None, fail_migration=False):
+        self.rows, self.fail_migration = rows or [], fail_migration
+        self.statements, self.commits, self.rollbacks = [], 0, 0
+
+    def cursor(self):
+        return _StoreCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def _row_saver(conn):
+    saver = SmartArbitrageDataSaver({})
+    saver.conn, saver.use_bulk = conn, False
+    saver._enrich_opportunity_data = lambda opp: saver._build_enriched_opportunity(opp, PRODUCT, PRODUCT)
+    return saver
+
+
+class _RecordingCursor:
+    def execute(self, sql, params):
+        self.sql, self.params = sql, params
+
+    def fetchone(self):
+        return {"id": 1}
+
+
+def test_stage_row_matches_row_by_row_insert():
+    saver = SmartArbitrageDataSaver({})
+    enriched = saver._build_enriched_opportunity(OPPORTUNITY, PRODUCT, {**PRODUCT, "codigo_interno": "CL-FAL-9",
+                                                                        "out_of_stock": True})
+    opp_hash = saver._generate_opportunity_hash(enriched)
+
+    cursor = _RecordingCursor()
+    saver._insert_new_opportunity(enriched, opp_hash, cursor)
+    insert_columns = [c.strip() for c in cursor.sql.split("(", 1)[1].split(")", 1)[0].split(",")]
+    legacy = dict(zip(insert_columns, cursor.params))
+
+    staged = dict(zip([name for name, _ in _STAGE_COLUMNS], saver._stage_row(opp_hash, enriched)))
+
+    assert staged["opportunity_hash"] == opp_hash and staged["matching_id"] == 42
+    assert staged["stock_caro"] is False and staged["reviews_barato"] == 0
+    assert legacy["opportunity_hash"] == opp_hash and legacy["matching_id"] == 42
+    for column in insert_columns:
+        if column in staged:
+            assert staged[column] == legacy[column], column
+
+
+def test_row_path_classifies_by_hash_new_changed_unchanged():
+    conn = _StoreConn()
+    saver = _row_saver(conn)
+    other = {**OPPORTUNITY, "matching_id": "fuzzy-7",
+             "metadata": {**OPPORTUNITY["metadata"], "nombre_barato": "Galaxy A55 128GB"}}
+
+    first = saver.save_opportunities_smart([OPPORTUNITY, other])
+    assert first["new_opportunities"] == 2
+    assert [row["matching_id"] for row in conn.rows] == [42, None]
+    assert all(len(row["opportunity_hash"]) == 16 for row in conn.rows)
+
+    # Misma oportunidad sin cambios: solo suma detección, no inserta otra fila
+    second = saver.save_opportunities_smart([OPPORTUNITY])
+    assert second["new_opportunities"] == 0 and second["unchanged_opportunities"] == 1
+    assert len(conn.rows) == 2 and conn.rows[0]["times_detected"] == 2
+
+    # Cambio de precio significativo: actualiza la misma fila
+    cheaper = {**OPPORTUNITY, "precio_compra": 199_990}
+    third = saver.save_opportunities_smart([cheaper])
+    assert third["updated_opportunities"] == 1 and third["new_opportunities"] == 0
+    assert len(conn.rows) == 2 and conn.rows[0]["precio_compra"] == 199_990
+
+
+def test_hash_migration_backfills_active_rows(monkeypatch):
+    saver = _row_saver(_StoreConn())
+    enriched = saver._build_enriched_opportunity(OPPORTUNITY, PRODUCT, PRODUCT)
+    legacy_row = {"id": 1, "opportunity_hash": None, "retailer_compra": "ripley", "retailer_venta": "falabella",
+                  "marca_producto": "XIAOMI", "categoria_producto": "smartphones",
+                  "metadata": '{"nombre_barato": "Redmi Note 14 Pro 256GB", "nombre_caro": "Redmi Note 14 Pro 256GB"}'}
+    conn = _StoreConn(rows=[legacy_row])
+    saver.conn = conn
+
+    updates = []
+    monkeypatch.setattr(smart_data_saver, "execute_values",
+                        lambda cursor, sql, rows, page_size: updates.extend(rows))
+    saver._ensure_hash_column(conn.cursor())
+
+    assert updates == [(1, saver._generate_opportunity_hash(enriched))]
+    assert saver._hash_column_ready and conn.commits == 1
+
+
+def test_hash_migration_failure_keeps_flag_unset():
+    conn = _StoreConn(fail_migration=True)
+    saver = _row_saver(conn)
+
+    with pytest.raises(RuntimeError):
+        saver._ensure_hash_column(conn.cursor())
+    assert not saver._hash_column_ready and conn.rollbacks == 1
+
+    conn.fail_migration = False
+    saver._ensure_hash_column(conn.cursor())
+    assert saver._hash_column_ready
+
+
+def test_row_path_falls_back_to_retailer_lookup_when_migration_fails():
+    conn = _StoreConn(fail_migration=True)
+    saver = _row_saver(conn)
+
+    first = saver.save_opportunities_smart([OPPORTUNITY])
+    second = saver.save_opportunities_smart([OPPORTUNITY])
+
+    assert first["new_opportunities"] == 1 and second["unchanged_opportunities"] == 1
+    assert len(conn.rows) == 1 and "opportunity_hash" not in conn.rows[0]
+    assert conn.rows[0]["times_detected"] == 2 and conn.commits == 2
+
+
+class _DuckCursor:
+    """Traduce el SQL de PostgreSQL del guardado a DuckDB (filas como dict, igual que RealDictCursor)"""
+
+    rowcount = -1
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, sql, params=None):
+        sql = sql.replace("ON COMMIT DROP", "").replace("JSONB", "VARCHAR")
+        if sql.strip().startswith(("ANALYZE", "CREATE INDEX")):
+            return
+        temp = re.search(r"CREATE TEMP TABLE (\w+)", sql)
+        if temp:
+            self.db.execute(f"DROP TABLE IF EXISTS {temp.group(1)}")
+        sql = re.sub(r"%\((\w+)\)s", r"$\1", sql).replace("%s", "?").replace("NOW()", "now()::timestamp")
+        self.db.execute(sql, params if params is not None else [])
+        if sql.lstrip().startswith(("INSERT", "UPDATE", "DELETE")) and "RETURNING" not in sql:
+            self.rowcount = self.db.fetchone()[0]
+
+    def fetchone(self):
+        rows = self.fetchall()
+        return rows[0] if rows else None
+
+    def fetchall(self):
+        names = [column[0] for column in self.db.description]
+        return [dict(zip(names, row)) for row in self.db.fetchall()]
+
+
+class _DuckConn:
+    def __init__(self, duckdb):
+        self.db = duckdb.connect()
+        columns = ", ".join(f"{name} {sql_type}" for name, sql_type in _STAGE_COLUMNS if name != "opportunity_hash")
+        self.db.execute("CREATE SEQUENCE opp_id")
+        self.db.execute(f"""
+            CREATE TABLE arbitrage_opportunities (
+                id INTEGER DEFAULT nextval('opp_id'), {columns.replace('JSONB', 'VARCHAR')},
+                is_active BOOLEAN, validez_oportunidad VARCHAR, times_detected INTEGER,
+                fecha_ultima_actualizacion_precio TIMESTAMP,
+                created_at TIMESTAMP DEFAULT now()::timestamp, updated_at TIMESTAMP DEFAULT now()::timestamp)
+        """)
+        self.db.execute("""
+            CREATE TABLE arbitrage_price_history (
+                opportunity_id INTEGER, precio_compra_actual BIGINT, precio_venta_actual BIGINT,
+                margen_actual BIGINT, roi_actual DECIMAL(7,2), stock_barato_disponible BOOLEAN,
+                stock_caro_disponible BOOLEAN, price_change_reason TEXT)
+        """)
+
+    def cursor(self):
+        return _DuckCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def snapshot(self):
+        """Oportunidades e historial por hash (sin ids ni timestamps, que dependen del orden de inserción)"""
+        cursor = self.cursor()
+        cursor.execute("SELECT * FROM arbitrage_opportunities")
+        skip = {"id", "created_at", "updated_at", "fecha_ultima_actualizacion_precio"}
+        opportunities = {row["opportunity_hash"]: {k: v for k, v in row.items() if k not in skip}
+                         for row in cursor.fetchall()}
+        cursor.execute("""
+            SELECT ao.opportunity_hash, h.precio_compra_actual, h.precio_venta_actual, h.margen_actual,
+                   h.stock_barato_disponible, h.stock_caro_disponible, h.price_change_reason
+            FROM arbitrage_price_history h JOIN arbitrage_opportunities ao ON ao.id = h.opportunity_id
+            ORDER BY 1, 2
+        """)
+        return opportunities, cursor.fetchall()
+
+
+def _duck_execute_values(cursor, sql, rows, page_size):
+    for row in rows:
+        cursor.execute(sql.replace("VALUES %s", f"VALUES ({', '.join(['%s'] * len(row))})"), row)
+
+
+def test_bulk_save_matches_row_by_row_on_duckdb(monkeypatch):
+    duckdb = pytest.importorskip("duckdb")
+    monkeypatch.setattr(smart_data_saver, "execute_values", _duck_execute_values)
+
+    row_saver = _row_saver(_DuckConn(duckdb))
+    bulk_saver = _row_saver(_DuckConn(duckdb))
+    bulk_saver._enrich_opportunities_bulk = lambda opps, cursor: [
+        bulk_saver._build_enriched_opportunity(opp, PRODUCT, PRODUCT) for opp in opps]
+
+    def named(name, **changes):
+        return {**OPPORTUNITY, **changes, "metadata": {**OPPORTUNITY["metadata"], "nombre_barato": name}}
+
+    redmi, galaxy, iphone = named("Redmi Note 14"), named("Galaxy A55"), named("iPhone 15")
+    cycles = [
+        # Nuevas, con un duplicado dentro del ciclo
+        [redmi, galaxy, redmi],
+        # Sin cambios, con cambio de precio (duplicado) y una nueva duplicada
+        [redmi, named("Galaxy A55", precio_compra=199_990), named("Galaxy A55", precio_compra=199_990),
+         iphone, iphone],
+    ]
+    for cycle in cycles:
+        expected = row_saver.save_opportunities_smart(cycle)
+        assert bulk_saver._save_opportunities_bulk(cycle) == expected
+
+    assert expected == {"new_opportunities": 1, "updated_opportunities": 1, "unchanged_opportunities": 3,
+                        "invalidated_opportunities": 0}
+    row_state, bulk_state = row_saver.conn.snapshot(), bulk_saver.conn.snapshot()
+    assert bulk_state == row_state
+    opportunities, history = bulk_state
+    assert sorted(row["times_detected"] for row in opportunities.values()) == [2, 3, 3]
+    assert [row["price_change_reason"] for row in history] == ["1 cambios de precio"]
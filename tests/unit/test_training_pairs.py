@@ -0,0 +1,100 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("sklearn")
+pytest.importorskip("psycopg2")
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "arbitrage"))
+
+import ml_retraining_system
+from core.training_pairs import STRATUM_EASY, TrainingPairSampler, allocate_quota
+
+RETAILERS = ["falabella", "paris", "ripley", "hites"]
+MODELS = [("SAMSUNG", "Galaxy A55"), ("SAMSUNG", "Galaxy S24"), ("XIAOMI", "Redmi Note 14"),
+          ("APPLE", "iPhone 15"), ("LENOVO", "IdeaPad Slim 3")]
+
+
+def _products(per_retailer=30, seed=7):
+    rng = np.random.default_rng(seed)
+    products = []
+    for retailer in RETAILERS:
+        for k in range(per_retailer):
+            brand, model = MODELS[rng.integers(len(MODELS))]
+            storage = ["128GB", "256GB", "1TB", None][rng.integers(4)]
+            products.append({
+                "codigo_interno": f"{retailer}-{k}", "retailer": retailer,
+                "nombre": f"{brand.title()} {model} {storage or ''} {['Negro', 'Azul', ''][rng.integers(3)]}",
+                "marca": [brand, brand.title(), None][rng.integers(3)],
+                "categoria": "notebooks" if brand == "LENOVO" else ["smartphones", "Smartphones"][rng.integers(2)],
+                "storage": storage, "ram": ["8GB", "12 GB", None][rng.integers(3)],
+                "screen_size": ['6.7"', "6.6", "15.6", None][rng.integers(4)],
+                "color": ["negro", "Negro ", "azul", None][rng.integers(4)],
+                "rating": [4.5, 0, None, 3.9][rng.integers(4)], "reviews_count": int(rng.integers(0, 50)),
+                "out_of_stock": [True, False, None][rng.integers(3)],
+                "precio_min_dia": [None, 0, float(rng.integers(100, 2000) * 1000)][rng.integers(3)] if k % 7 else None,
+                "precio_oferta": float(rng.integers(100, 2000) * 1000), "veces_visto": int(rng.integers(0, 9)),
+            })
+    return products
+
+
+@pytest.fixture
+def retrainer(monkeypatch):
+    monkeypatch.setattr(ml_retraining_system, "SentenceTransformer", None)
+    return ml_retraining_system.MLRetrainingSystem({})
+
+
+def test_columnar_features_and_labels_match_pairwise(retrainer):
+    products = _products()
+    columns = retrainer._product_columns(products)
+    pairs = [(i, j) for i in range(len(products)) for j in range(i + 1, len(products))
+             if products[i]["retailer"] != products[j]["retailer"]]
+    i, j = (np.array(side) for side in zip(*pairs))
+
+    features = retrainer._pair_features_columnar(columns, i, j)
+    labels = retrainer._match_labels_columnar(columns, i, j)
+
+    expected = [retrainer._extract_pair_features(products[a], products[b]) for a, b in pairs]
+    assert list(features) == list(expected[0])
+    for name, values in features.items():
+        assert np.array_equal(values, [row[name] for row in expected]), name
+    assert np.array_equal(labels, [retrainer._determine_match_label(products[a], products[b]) for a, b in pairs])
+    assert 0 < labels.sum() < len(labels)
+
+
+def test_sampler_respects_quotas_and_balances_retailer_pairs(retrainer):
+    products = _products(per_retailer=60)
+    columns = retrainer._product_columns(products)
+    sampler = TrainingPairSampler(positive_quota=60, hard_negative_quota=120, easy_negative_quota=30)
+
+    i, j, labels, strata = sampler.sample(products, lambda a, b: retrainer._match_labels_columnar(columns, a, b))
+
+    assert np.all(i < j) and len(set(zip(i, j))) == len(i)
+    assert all(products[a]["retailer"] != products[b]["retailer"] for a, b in zip(i, j))
+    assert np.array_equal(labels, [retrainer._determine_match_label(products[a], products[b]) for a, b in zip(i, j)])
+    assert labels.sum() == 60 and ((labels == 0) & (strata != STRATUM_EASY)).sum() == 120
+    assert sampler.last_stats["positives_available"] > 60
+
+    # Cuotas repartidas entre los 6 pares de retailers, no solo los primeros
+    positives = pd.Series([tuple(sorted((products[a]["retailer"], products[b]["retailer"])))
+                           for a, b in zip(i[labels == 1], j[labels == 1])]).value_counts()
+    assert len(positives) == 6 and positives.max() - positives.min() <= 1
+    assert sampler.last_stats["retailer_pairs"] == 6
+
+
+def test_generate_enhanced_features_uses_sampler(retrainer):
+    retrainer.positive_quota, retrainer.hard_negative_quota = 40, 80
+    X, y, feature_names = retrainer.generate_enhanced_features(pd.DataFrame(_products()))
+
+    assert X.shape == (len(y), 19) and feature_names[0] == "text_similarity_embedding"
+    assert y.sum() == 40
+
+
+def test_allocate_quota_fills_small_groups_first():
+    assert allocate_quota(np.array([2, 50, 50, 1]), 21).tolist() == [2, 9, 9, 1]
+    assert allocate_quota(np.array([3, 3]), 10).tolist() == [3, 3]